@@ -0,0 +1,159 @@
+"""thread_latest table maintained by trigger
+
+Revision ID: 8c2f4d1a9b6e
+Revises: 5747ab82dfc6
+Create Date: 2026-10-16 09:12:00.000000
+
+One row per (thread_id, checkpoint_ns) holding the newest checkpoint, kept
+current by triggers on `checkpoints` so every writer (PostgresSaver, the
+LangGraph API server, scripts) updates it. Thread search reads this table
+with keyset pagination instead of DISTINCT ON over the full history.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2f4d1a9b6e'
+down_revision: Union[str, Sequence[str], None] = '5747ab82dfc6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# `ts` is the checkpoint's own ISO timestamp (set by LangGraph on every checkpoint)
+CHECKPOINT_TS = "COALESCE((NEW.checkpoint->>'ts')::timestamptz, now())"
+
+UPSERT_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION thread_latest_upsert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO thread_latest AS tl (
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+        type, checkpoint, metadata, created_at, updated_at
+    ) VALUES (
+        NEW.thread_id, NEW.checkpoint_ns, NEW.checkpoint_id, NEW.parent_checkpoint_id,
+        NEW.type, NEW.checkpoint, NEW.metadata, {CHECKPOINT_TS}, {CHECKPOINT_TS}
+    )
+    ON CONFLICT (thread_id, checkpoint_ns) DO UPDATE SET
+        checkpoint_id = EXCLUDED.checkpoint_id,
+        parent_checkpoint_id = EXCLUDED.parent_checkpoint_id,
+        type = EXCLUDED.type,
+        checkpoint = EXCLUDED.checkpoint,
+        metadata = EXCLUDED.metadata,
+        updated_at = EXCLUDED.updated_at
+    -- checkpoint ids are time-ordered; never move back to an older checkpoint
+    WHERE tl.checkpoint_id <= EXCLUDED.checkpoint_id;
+    RETURN NULL;
+END
+$$;
+"""
+
+# Deleting the latest checkpoint (thread deletion, manual cleanup) promotes
+# the next one, or drops the row when the thread has no checkpoints left.
+# Compaction never deletes the latest checkpoint, so this is a PK lookup.
+DELETE_FUNCTION = """
+CREATE OR REPLACE FUNCTION thread_latest_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    next_row checkpoints%ROWTYPE;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM thread_latest
+        WHERE thread_id = OLD.thread_id AND checkpoint_ns = OLD.checkpoint_ns
+          AND checkpoint_id = OLD.checkpoint_id
+    ) THEN
+        RETURN NULL;
+    END IF;
+    SELECT * INTO next_row FROM checkpoints
+    WHERE thread_id = OLD.thread_id AND checkpoint_ns = OLD.checkpoint_ns
+    ORDER BY checkpoint_id DESC LIMIT 1;
+    IF NOT FOUND THEN
+        DELETE FROM thread_latest WHERE thread_id = OLD.thread_id AND checkpoint_ns = OLD.checkpoint_ns;
+    ELSE
+        UPDATE thread_latest SET
+            checkpoint_id = next_row.checkpoint_id,
+            parent_checkpoint_id = next_row.parent_checkpoint_id,
+            type = next_row.type,
+            checkpoint = next_row.checkpoint,
+            metadata = next_row.metadata,
+            updated_at = COALESCE((next_row.checkpoint->>'ts')::timestamptz, updated_at)
+        WHERE thread_id = OLD.thread_id AND checkpoint_ns = OLD.checkpoint_ns;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+BACKFILL = """
+INSERT INTO thread_latest (
+    thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+    type, checkpoint, metadata, created_at, updated_at
+)
+SELECT DISTINCT ON (c.thread_id, c.checkpoint_ns)
+    c.thread_id, c.checkpoint_ns, c.checkpoint_id, c.parent_checkpoint_id,
+    c.type, c.checkpoint, c.metadata,
+    COALESCE(f.first_ts::timestamptz, now()),
+    COALESCE((c.checkpoint->>'ts')::timestamptz, now())
+FROM checkpoints c
+JOIN (
+    SELECT thread_id, checkpoint_ns, min(checkpoint->>'ts') AS first_ts
+    FROM checkpoints GROUP BY thread_id, checkpoint_ns
+) f USING (thread_id, checkpoint_ns)
+ORDER BY c.thread_id, c.checkpoint_ns, c.checkpoint_id DESC
+ON CONFLICT (thread_id, checkpoint_ns) DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'thread_latest',
+        sa.Column('thread_id', sa.Text(), nullable=False),
+        sa.Column('checkpoint_ns', sa.Text(), server_default='', nullable=False),
+        sa.Column('checkpoint_id', sa.Text(), nullable=False),
+        sa.Column('parent_checkpoint_id', sa.Text(), nullable=True),
+        sa.Column('type', sa.Text(), nullable=True),
+        sa.Column('checkpoint', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('metadata', postgresql.JSONB(astext_type=sa.Text()), server_default='{}', nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('thread_id', 'checkpoint_ns', name=op.f('thread_latest_pkey')),
+    )
+    # Keyset pagination: (checkpoint_ns, sort column, thread_id)
+    op.create_index('thread_latest_ns_updated_at_idx', 'thread_latest', ['checkpoint_ns', 'updated_at', 'thread_id'])
+    op.create_index('thread_latest_ns_created_at_idx', 'thread_latest', ['checkpoint_ns', 'created_at', 'thread_id'])
+    op.create_index('thread_latest_ns_thread_id_idx', 'thread_latest', ['checkpoint_ns', 'thread_id'])
+    # metadata @> filters
+    op.create_index(
+        'thread_latest_metadata_idx', 'thread_latest', ['metadata'],
+        postgresql_using='gin', postgresql_ops={'metadata': 'jsonb_path_ops'},
+    )
+
+    op.execute(UPSERT_FUNCTION)
+    op.execute(DELETE_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER checkpoints_thread_latest_upsert AFTER INSERT OR UPDATE ON checkpoints "
+        "FOR EACH ROW EXECUTE FUNCTION thread_latest_upsert()"
+    )
+    op.execute(
+        "CREATE TRIGGER checkpoints_thread_latest_delete AFTER DELETE ON checkpoints "
+        "FOR EACH ROW EXECUTE FUNCTION thread_latest_delete()"
+    )
+    # Triggers exist before the backfill (same transaction), so no write is missed
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS checkpoints_thread_latest_delete ON checkpoints")
+    op.execute("DROP TRIGGER IF EXISTS checkpoints_thread_latest_upsert ON checkpoints")
+    op.execute("DROP FUNCTION IF EXISTS thread_latest_delete()")
+    op.execute("DROP FUNCTION IF EXISTS thread_latest_upsert()")
+    op.drop_index('thread_latest_metadata_idx', table_name='thread_latest')
+    op.drop_index('thread_latest_ns_thread_id_idx', table_name='thread_latest')
+    op.drop_index('thread_latest_ns_created_at_idx', table_name='thread_latest')
+    op.drop_index('thread_latest_ns_updated_at_idx', table_name='thread_latest')
+    op.drop_table('thread_latest')
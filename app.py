@@ -1,6 +1,7 @@
 import logging
 import uuid
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
@@ -11,8 +12,8 @@ from src.database.qdrant_store import QdrantStore
 from src.tools.accounting_tools import accounting_tools
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
-from src.database.checkpointer import get_checkpointer
-from src.api.facebook import router as facebook_router
+from src.database.checkpointer import close_checkpointer, get_checkpointer
+from src.api.facebook import router as facebook_router, get_fb_service
 from src.domain_configs.domain_configs import MARKETING_DOMAIN
 load_dotenv()
 
@@ -24,6 +25,7 @@ logging.basicConfig(
 
 # Include the full adaptive RAG graph implementation here
 from src.graphs.core.adaptive_rag_graph import create_adaptive_rag_graph
+from src.utils.fast_router import get_fast_router
 
 
 # Compile the graph with a custom checkpointer
@@ -66,7 +68,24 @@ def compile_graph(checkpointer: BaseCheckpointSaver):
     return compiled_app
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Embed the fast router's route examples before the first request
+    fast_router = get_fast_router()
+    if fast_router is not None:
+        await fast_router.awarm()
+    # Pooled Graph API connections live as long as the app
+    fb_service = get_fb_service()
+    await fb_service.start()
+    try:
+        yield
+    finally:
+        await fb_service.aclose()
+        # Write-back checkpoints still queued are flushed before the pools close
+        await close_checkpointer()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Register Facebook router
 app.include_router(facebook_router)
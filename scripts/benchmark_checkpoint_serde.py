@@ -0,0 +1,114 @@
+"""
+Compare checkpoint serializers on recorded conversation states.
+
+Loads the latest checkpoints from the configured checkpointer (Postgres when
+DB_URI is set, otherwise the MemorySaver spill file) and reports, per
+serializer, stored bytes and encode/decode time over every channel value.
+Without recorded states a synthetic Vietnamese conversation is used.
+
+    python scripts/benchmark_checkpoint_serde.py --limit 200 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer  # noqa: E402
+
+from src.database.checkpoint_serde import CheckpointSerdeConfig, CompressedSerializer  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark checkpoint serializers")
+    parser.add_argument("--limit", type=int, default=100, help="Recorded checkpoints to load")
+    parser.add_argument("--repeat", type=int, default=3, help="Encode/decode rounds per value")
+    parser.add_argument("--threshold", type=int, default=CheckpointSerdeConfig().threshold, help="Compression threshold (bytes)")
+    parser.add_argument("--synthetic", action="store_true", help="Skip recorded states, use a synthetic conversation")
+    return parser.parse_args()
+
+
+def load_recorded_values(limit: int) -> list:
+    from src.database.checkpointer import get_checkpointer
+
+    checkpointer = get_checkpointer()
+    values = []
+    if hasattr(checkpointer, "spill") and checkpointer.spill is not None:
+        # MemorySaver: nothing is resident in a fresh process; read spilled threads
+        rows = checkpointer.spill._conn.execute(
+            "SELECT thread_id FROM spilled_threads ORDER BY spilled_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        for (thread_id,) in rows:
+            checkpoint_tuple = checkpointer.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+            if checkpoint_tuple:
+                values.extend(checkpoint_tuple.checkpoint["channel_values"].values())
+        return values
+    for checkpoint_tuple in checkpointer.list(None, limit=limit):
+        values.extend(checkpoint_tuple.checkpoint["channel_values"].values())
+    return values
+
+
+def synthetic_values() -> list:
+    messages = []
+    for i in range(30):
+        messages.append(HumanMessage(content=f"Cho em hỏi nhà hàng Tian Long chi nhánh {i} còn bàn tối nay không ạ?"))
+        messages.append(AIMessage(content="Dạ, chi nhánh còn bàn cho 4 người lúc 19h. Menu lẩu bò tươi, "
+                                          "ba chỉ bò Mỹ, nước lẩu đặc biệt... " * 5))
+    documents = [(f"menu-{i}", {"content": "Lẩu bò tươi Tian Long - giá 399.000đ, combo 4 người. " * 20,
+                                "namespace": "maketing"}, 0.8) for i in range(12)]
+    return [messages, documents, "Cho em đặt bàn 4 người", 2, True, {"user_info": {"user_id": "123", "name": "Anh Minh"}}]
+
+
+def bench(serde, values: list, repeat: int) -> dict:
+    encoded = [serde.dumps_typed(v) for v in values]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for v in values:
+            serde.dumps_typed(v)
+    encode_s = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for e in encoded:
+            serde.loads_typed(e)
+    decode_s = (time.perf_counter() - start) / repeat
+    return {"bytes": sum(len(e[1]) for e in encoded), "encode_ms": encode_s * 1000, "decode_ms": decode_s * 1000}
+
+
+def main():
+    args = parse_args()
+    values = []
+    if not args.synthetic:
+        try:
+            values = load_recorded_values(args.limit)
+        except Exception as e:  # noqa: BLE001
+            print(f"⚠️ Could not load recorded states: {e}")
+    if not values:
+        print("⚠️ No recorded states found, using a synthetic conversation")
+        values = synthetic_values()
+    print(f"📄 Benchmarking {len(values)} channel values (repeat={args.repeat})")
+
+    serdes = {"jsonplus (current)": JsonPlusSerializer()}
+    for level in (1, 3, 9):
+        config = CheckpointSerdeConfig(compression="zstd", threshold=args.threshold, level=level)
+        serdes[f"jsonplus+zstd-{level}"] = CompressedSerializer(JsonPlusSerializer(), config)
+
+    baseline = None
+    for name, serde in serdes.items():
+        result = bench(serde, values, args.repeat)
+        baseline = baseline or result
+        ratio = baseline["bytes"] / result["bytes"] if result["bytes"] else 0
+        print(
+            f"   {name:<22} {result['bytes']:>10} B ({ratio:.2f}x)  "
+            f"encode {result['encode_ms']:8.2f} ms  decode {result['decode_ms']:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Fit per-namespace grading thresholds from logged DocGrader decisions.
+
+Reads the JSONL decision log written by grade_documents_node
+(GRADING_DECISION_LOG_PATH, with its rotated backups) and writes the thresholds file read by
+GradingPolicy (GRADING_THRESHOLDS_PATH). Restart workers to pick it up.
+
+    python scripts/calibrate_grading_thresholds.py --precision 0.98 --min-support 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.grading_policy import (  # noqa: E402
+    GradingPolicyConfig,
+    decision_log_files,
+    fit_thresholds,
+    load_decisions,
+    save_thresholds,
+)
+
+
+def parse_args():
+    config = GradingPolicyConfig()
+    parser = argparse.ArgumentParser(description="Calibrate score-based grading thresholds")
+    parser.add_argument("--log", default=config.decision_log_path, help="Grader decision log (JSONL)")
+    parser.add_argument("--out", default=config.thresholds_path, help="Thresholds file to write")
+    parser.add_argument("--precision", type=float, default=0.98, help="Required agreement with the LLM grader in the bypass bands")
+    parser.add_argument("--min-support", type=int, default=20, help="Minimum decisions per band")
+    parser.add_argument("--dry-run", action="store_true", help="Print thresholds without writing")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not decision_log_files(args.log):
+        print(f"❌ Decision log not found: {args.log}")
+        sys.exit(1)
+
+    records = load_decisions(args.log)
+    print(f"📄 Loaded {len(records)} grader decisions from {args.log}")
+    thresholds = fit_thresholds(records, precision=args.precision, min_support=args.min_support)
+    if not thresholds:
+        print("⚠️ Not enough decisions to fit any namespace; nothing written")
+        sys.exit(1)
+
+    for namespace, t in sorted(thresholds.items()):
+        samples = [r for r in records if r.get("namespace", "") == namespace]
+        accepted = sum(1 for r in samples if r["score"] >= t.upper)
+        rejected = sum(1 for r in samples if r["score"] < t.lower)
+        print(
+            f"   {namespace or '<none>'}: lower={t.lower} upper={t.upper} "
+            f"(would bypass {accepted + rejected}/{len(samples)} decisions)"
+        )
+
+    if args.dry_run:
+        return
+    save_thresholds(thresholds, args.out, precision=args.precision, min_support=args.min_support, decisions=len(records))
+    print(f"✅ Thresholds written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
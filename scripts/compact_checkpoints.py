@@ -0,0 +1,57 @@
+"""
+Apply the checkpoint retention policy to the Postgres checkpoint tables.
+
+Keeps the latest --keep checkpoints per thread (plus the latest one's parent),
+deletes older checkpoints with their writes and unreferenced blobs in batches,
+optionally moving them to monthly-partitioned *_archive tables. Start with
+--dry-run to see how many rows would go.
+
+    python scripts/compact_checkpoints.py --dry-run
+    python scripts/compact_checkpoints.py --keep 20 --batch-size 1000 --archive
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.checkpoint_compaction import CheckpointCompactionConfig, CheckpointCompactor  # noqa: E402
+
+
+def parse_args():
+    defaults = CheckpointCompactionConfig()
+    parser = argparse.ArgumentParser(description="Compact Postgres checkpoint tables")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would be removed")
+    parser.add_argument("--keep", type=int, default=defaults.keep, help="Checkpoints kept per thread")
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size, help="Rows per DELETE statement")
+    parser.add_argument("--max-threads", type=int, default=defaults.max_threads, help="Threads compacted in this run")
+    parser.add_argument("--archive", action="store_true", default=defaults.archive,
+                        help="Move rows to partitioned *_archive tables instead of deleting them")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = CheckpointCompactionConfig(
+        keep=args.keep,
+        batch_size=args.batch_size,
+        max_threads=args.max_threads,
+        archive=args.archive,
+    )
+    report = CheckpointCompactor(config).run(dry_run=args.dry_run)
+    if not report["locked"]:
+        print("⚠️ Another compaction holds the lock, nothing done")
+        sys.exit(1)
+    verb = "Would remove" if report["dry_run"] else ("Archived" if report["archived"] else "Removed")
+    print(f"📄 {verb} (keep={config.keep}, threads={report['threads']}, {report['duration_s']}s):")
+    for key in ("checkpoints", "writes", "blobs"):
+        print(f"   {key:<12} {report[key]:>10}")
+
+
+if __name__ == "__main__":
+    main()
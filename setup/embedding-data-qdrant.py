@@ -210,10 +210,12 @@ def embed_and_store(
         vectors = model.embed_documents(texts)
     logger.info(f"[embed_and_store] Finished embedding. Storing to Qdrant...")
     print(f"[embed_and_store] Finished embedding. Storing to Qdrant...")
+    stored_namespaces = set()
     for i, (chunk, vector) in enumerate(zip(doc_chunks, vectors)):
         meta = metadata.copy() if metadata else {}
         meta.update(chunk.metadata)
         ns = namespace or meta.get("namespace") or "default"
+        stored_namespaces.add(ns)
         logger.info(
             f"[embed_and_store] Storing chunk {i+1}/{len(doc_chunks)} to Qdrant (namespace={ns})"
         )
@@ -225,6 +227,21 @@ def embed_and_store(
             key=f"chunk_{i}",
             value={"content": chunk.page_content, "embedding": vector, **meta},
         )
+    # Sparse BM25 index for hybrid retrieval (SearchStrategy.HYBRID)
+    for ns in sorted(stored_namespaces):
+        try:
+            count = qdrant_store.build_lexical_index(ns)
+            logger.info(f"[embed_and_store] Lexical index rebuilt for namespace={ns} ({count} chunks)")
+        except Exception as e:  # noqa: BLE001 lexical index is optional
+            logger.warning(f"[embed_and_store] Could not build lexical index for namespace={ns}: {e}")
+            print(f"⚠️ Could not build lexical index for namespace={ns}: {e}")
+    # New corpus version: cached grader decisions for the old corpus are no longer served
+    try:
+        from src.database.grader_cache import bump_corpus_version
+
+        bump_corpus_version(reason=f"embed_and_store namespaces={sorted(stored_namespaces)}")
+    except Exception as e:  # noqa: BLE001 cache invalidation must not fail ingestion
+        logger.warning(f"[embed_and_store] Could not bump corpus version: {e}")
     logger.info(
         f"Đã lưu {len(doc_chunks)} vectors vào Qdrant collection: {qdrant_store.collection_name if not collection_name else collection_name}"
     )
@@ -1,7 +1,10 @@
+import json
 import os
 import requests
+from datetime import datetime
+from typing import Optional
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 router = APIRouter()
 
@@ -24,3 +27,64 @@ def delete_all_threads():
         return JSONResponse({"deleted": deleted, "failed": failed, "total": len(thread_ids)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/admin/threads", tags=["Admin"])
+def list_threads(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    sort_by: str = "updated_at",
+    sort_order: str = "desc",
+):
+    """Danh sách thread theo trang (keyset trên thread_latest, chi phí O(page))"""
+    from src.repositories.checkpoints import search_threads_page
+
+    try:
+        page = search_threads_page(
+            limit=max(1, min(limit, 200)),
+            cursor=cursor,
+            sort_by=sort_by,
+            sort_order=sort_order,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return JSONResponse(page)
+
+
+
+def _json_default(value):
+    if hasattr(value, "model_dump"):  # langchain messages
+        return value.model_dump()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    return str(value)
+
+
+@router.get("/admin/threads/{thread_id}/history", tags=["Admin"])
+def stream_thread_history(
+    thread_id: str,
+    checkpoint_ns: str = "",
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    channels: Optional[str] = None,
+):
+    """Lịch sử thread dạng NDJSON (mỗi dòng một checkpoint, mới nhất trước), stream từ server-side cursor"""
+    from src.repositories.checkpoints import iter_thread_history
+
+    items = iter_thread_history(
+        thread_id,
+        checkpoint_ns=checkpoint_ns,
+        before_checkpoint_id=before,
+        limit=limit if limit and limit > 0 else None,
+        channels=[c.strip() for c in channels.split(",") if c.strip()] if channels else None,
+    )
+
+    def ndjson():
+        for item in items:
+            yield json.dumps(item, default=_json_default, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
@@ -1,4 +1,47 @@
 import os
+from dataclasses import field
+from typing import Any, Callable, Optional, Sequence, Union
 from dotenv import load_dotenv
 load_dotenv()
 DB_URI = os.getenv("DB_URI") or os.getenv("POSTGRES_URI")
+
+_TRUE = {"1", "true", "yes", "on"}
+
+
+def _parse_env(raw: str, default: Any) -> Any:
+    if isinstance(default, bool):
+        return raw.strip().lower() in _TRUE
+    if isinstance(default, int):
+        return int(raw)
+    if isinstance(default, float):
+        return float(raw)
+    if isinstance(default, tuple):
+        return tuple(item.strip() for item in raw.split(",") if item.strip())
+    return raw
+
+
+def env_field(
+    name: Union[str, Sequence[str]],
+    default: Any,
+    parse: Optional[Callable[[str], Any]] = None,
+) -> Any:
+    """
+    Dataclass field read from the environment when the config is created (not
+    when the module is imported).
+
+    `name` may list fallbacks ("EMBEDDING_CACHE_REDIS_URL", "REDIS_URL"); the
+    first variable set wins. The value is parsed to the type of `default`
+    (a tuple default reads a comma-separated list) unless `parse` is given. Config classes can then be built with keyword
+    overrides in tests, e.g. `OutboundQueueConfig(batch_size=10)`, or pick up
+    `monkeypatch.setenv`. The variable names are kept in the field metadata
+    (`metadata["env"]`).
+    """
+    names = (name,) if isinstance(name, str) else tuple(name)
+
+    def factory() -> Any:
+        for var in names:
+            raw = os.getenv(var)
+            if raw is not None and raw != "":
+                return parse(raw) if parse is not None else _parse_env(raw, default)
+        return default
+    return field(default_factory=factory, metadata={"env": names})
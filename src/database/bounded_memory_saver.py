@@ -0,0 +1,329 @@
+"""
+Memory-bounded MemorySaver.
+
+InMemorySaver keeps every checkpoint of every thread (one thread per Facebook
+PSID) for the lifetime of the process. BoundedMemorySaver keeps it bounded:
+
+- only the latest `keep_checkpoints` checkpoints of each thread/namespace are
+  kept; channel blobs no longer referenced by them are dropped,
+- at most `max_threads` threads stay resident (LRU), and threads idle for
+  longer than `idle_ttl` seconds are evicted,
+- evicted threads are spilled to a local SQLite file and reloaded
+  transparently the next time the thread is read or written.
+
+Resident thread count and bytes are reported by get_stats() and on
+/health/checkpointer. `list(None)` only covers resident threads.
+"""
+
+from __future__ import annotations
+
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BoundedMemoryConfig:
+    """Cấu hình giới hạn bộ nhớ cho MemorySaver"""
+    max_threads: int = env_field("MEMORY_CHECKPOINTER_MAX_THREADS", 500)
+    idle_ttl: float = env_field("MEMORY_CHECKPOINTER_IDLE_TTL", 1800.0)
+    keep_checkpoints: int = env_field("MEMORY_CHECKPOINTER_KEEP_CHECKPOINTS", 10)
+    # Empty path: evicted threads are dropped instead of spilled
+    spill_path: str = env_field("MEMORY_CHECKPOINTER_SPILL_PATH", "data/cache/checkpoint_spill.sqlite3")
+    # Minimum seconds between idle sweeps
+    sweep_interval: float = 30.0
+
+
+class SQLiteThreadSpill:
+    """Evicted threads, one pickled row per thread, in a single SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spilled_threads ("
+            " thread_id TEXT PRIMARY KEY,"
+            " payload BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " spilled_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def put(self, thread_id: str, payload: Dict[str, Any]) -> int:
+        blob = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO spilled_threads (thread_id, payload, size, spilled_at) VALUES (?, ?, ?, ?)",
+                (thread_id, blob, len(blob), time.time()),
+            )
+            self._conn.commit()
+        return len(blob)
+
+    def pop(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM spilled_threads WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM spilled_threads WHERE thread_id = ?", (thread_id,))
+                self._conn.commit()
+        return pickle.loads(row[0]) if row else None
+
+    def delete(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM spilled_threads WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+
+    def summary(self) -> Tuple[int, int]:
+        """(spilled thread count, spilled bytes)"""
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM spilled_threads"
+            ).fetchone()
+        return int(count), int(size)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """InMemorySaver with history pruning, LRU/TTL eviction and spill-to-disk."""
+
+    def __init__(self, config: Optional[BoundedMemoryConfig] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.config = config or BoundedMemoryConfig()
+        self.spill: Optional[SQLiteThreadSpill] = None
+        if self.config.spill_path:
+            try:
+                self.spill = SQLiteThreadSpill(self.config.spill_path)
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f"⚠️ Checkpoint spill file unavailable, evicted threads are dropped: {e}")
+        self._lock = threading.RLock()
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        self._last_sweep = time.monotonic()
+        # Per-thread indexes so eviction does not scan every blob/write of every thread
+        self._blob_keys: Dict[str, Set[Tuple[str, str, str, Any]]] = {}
+        self._write_keys: Dict[str, Set[Tuple[str, str, str]]] = {}
+        self._versions: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+        self._thread_bytes: Dict[str, int] = {}
+        self._stats = {
+            "evictions": 0,
+            "spilled": 0,
+            "dropped": 0,
+            "reloads": 0,
+            "pruned_checkpoints": 0,
+            "spill_errors": 0,
+        }
+
+    # --- Residency ---------------------------------------------------------
+    def _touch(self, thread_id: str) -> None:
+        if thread_id not in self._last_access and self.spill is not None:
+            self._reload(thread_id)
+        self._last_access[thread_id] = time.monotonic()
+        self._last_access.move_to_end(thread_id)
+
+    def _enforce_limits(self) -> None:
+        while len(self._last_access) > max(1, self.config.max_threads):
+            self._evict(next(iter(self._last_access)))
+        now = time.monotonic()
+        if now - self._last_sweep < self.config.sweep_interval:
+            return
+        self._last_sweep = now
+        while self._last_access:
+            thread_id, last_access = next(iter(self._last_access.items()))
+            if now - last_access <= self.config.idle_ttl:
+                break
+            self._evict(thread_id)
+
+    def _evict(self, thread_id: str) -> None:
+        payload = self._detach(thread_id)
+        self._stats["evictions"] += 1
+        if not payload["storage"]:
+            return
+        if self.spill is None:
+            self._stats["dropped"] += 1
+            return
+        try:
+            self.spill.put(thread_id, payload)
+            self._stats["spilled"] += 1
+        except Exception as e:  # noqa: BLE001
+            self._stats["spill_errors"] += 1
+            self._stats["dropped"] += 1
+            logger.error(f"❌ Failed to spill checkpoints of thread {thread_id}: {e}")
+
+    def _detach(self, thread_id: str) -> Dict[str, Any]:
+        """Remove a thread from memory and return everything stored for it."""
+        self._last_access.pop(thread_id, None)
+        self._thread_bytes.pop(thread_id, None)
+        storage = self.storage.pop(thread_id, {})
+        payload = {
+            "storage": {ns: dict(checkpoints) for ns, checkpoints in storage.items() if checkpoints},
+            "writes": {key: self.writes.pop(key) for key in self._write_keys.pop(thread_id, set()) if key in self.writes},
+            "blobs": {key: self.blobs.pop(key) for key in self._blob_keys.pop(thread_id, set()) if key in self.blobs},
+        }
+        for ns in storage:
+            self._versions.pop((thread_id, ns), None)
+        return payload
+
+    def _reload(self, thread_id: str) -> None:
+        try:
+            payload = self.spill.pop(thread_id)
+        except Exception as e:  # noqa: BLE001
+            self._stats["spill_errors"] += 1
+            logger.error(f"❌ Failed to reload checkpoints of thread {thread_id}: {e}")
+            return
+        if payload is None:
+            return
+        for ns, checkpoints in payload["storage"].items():
+            self.storage[thread_id][ns].update(checkpoints)
+            self._versions[(thread_id, ns)] = {
+                checkpoint_id: self.serde.loads_typed(saved[0])["channel_versions"]
+                for checkpoint_id, saved in checkpoints.items()
+            }
+        self.writes.update(payload["writes"])
+        self.blobs.update(payload["blobs"])
+        self._write_keys[thread_id] = set(payload["writes"])
+        self._blob_keys[thread_id] = set(payload["blobs"])
+        self._measure(thread_id)
+        self._stats["reloads"] += 1
+        logger.info(f"♻️ Reloaded spilled checkpoints of thread {thread_id}")
+
+    # --- Pruning -----------------------------------------------------------
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        excess = len(checkpoints) - max(1, self.config.keep_checkpoints)
+        if excess <= 0:
+            return
+        versions = self._versions.get((thread_id, checkpoint_ns), {})
+        write_keys = self._write_keys.get(thread_id, set())
+        for checkpoint_id in sorted(checkpoints)[:excess]:
+            del checkpoints[checkpoint_id]
+            versions.pop(checkpoint_id, None)
+            write_key = (thread_id, checkpoint_ns, checkpoint_id)
+            self.writes.pop(write_key, None)
+            write_keys.discard(write_key)
+        self._stats["pruned_checkpoints"] += excess
+
+        # Drop blobs that no remaining checkpoint of this namespace references
+        referenced = {(channel, version) for channel_versions in versions.values() for channel, version in channel_versions.items()}
+        blob_keys = self._blob_keys.get(thread_id, set())
+        for key in [k for k in blob_keys if k[1] == checkpoint_ns and (k[2], k[3]) not in referenced]:
+            self.blobs.pop(key, None)
+            blob_keys.discard(key)
+
+    def _measure(self, thread_id: str) -> None:
+        size = sum(
+            len(checkpoint[1]) + len(metadata[1])
+            for checkpoints in self.storage.get(thread_id, {}).values()
+            for checkpoint, metadata, _ in checkpoints.values()
+        )
+        size += sum(len(self.blobs[k][1]) for k in self._blob_keys.get(thread_id, ()) if k in self.blobs)
+        size += sum(
+            len(value[1])
+            for k in self._write_keys.get(thread_id, ())
+            for _, _, value, _ in self.writes.get(k, {}).values()
+        )
+        self._thread_bytes[thread_id] = size
+
+    # --- Saver API ---------------------------------------------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._lock:
+            self._touch(config["configurable"]["thread_id"])
+            checkpoint_tuple = super().get_tuple(config)
+            self._enforce_limits()
+            return checkpoint_tuple
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config:
+                self._touch(config["configurable"]["thread_id"])
+            checkpoint_tuples = list(super().list(config, filter=filter, before=before, limit=limit))
+            self._enforce_limits()
+        yield from checkpoint_tuples
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            self._touch(thread_id)
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            self._blob_keys.setdefault(thread_id, set()).update(
+                (thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()
+            )
+            self._versions.setdefault((thread_id, checkpoint_ns), {})[checkpoint["id"]] = dict(checkpoint["channel_versions"])
+            self._prune(thread_id, checkpoint_ns)
+            self._measure(thread_id)
+            self._enforce_limits()
+            return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        with self._lock:
+            self._touch(thread_id)
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys.setdefault(thread_id, set()).add(
+                (thread_id, configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"])
+            )
+            self._measure(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._detach(thread_id)
+            if self.spill is not None:
+                self.spill.delete(thread_id)
+
+    # --- Monitoring --------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                **self._stats,
+                "resident_threads": len(self._last_access),
+                "resident_bytes": sum(self._thread_bytes.values()),
+                "max_threads": self.config.max_threads,
+                "keep_checkpoints": self.config.keep_checkpoints,
+            }
+        if self.spill is not None:
+            stats["spilled_threads"], stats["spilled_bytes"] = self.spill.summary()
+        return stats
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0
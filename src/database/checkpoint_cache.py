@@ -0,0 +1,513 @@
+"""
+Read cache (and optional write-back) in front of a LangGraph checkpoint saver.
+
+One graph run writes a checkpoint after every super-step (user_info, summarizer,
+router, retrieve, grade, generate, ...) and reads the thread's latest state at
+the start of every turn. With a remote saver (PostgresSaver) each of those is a
+round trip. WriteBackCheckpointSaver:
+
+- keeps the latest checkpoint of hot threads in a bounded LRU. Another worker
+  may have written the thread since, so a cached "latest" read is only served
+  after checking the database's newest checkpoint_id for the thread (one
+  primary-key lookup instead of loading the checkpoint, its blobs and writes),
+- writes through by default: put() returns once the inner saver has persisted
+  the checkpoint.
+
+Optional write-back (CHECKPOINT_WRITE_BACK=true) is only safe when one process
+owns every thread (a single worker):
+
+- consecutive checkpoints of a thread that have not been flushed yet are
+  coalesced into one write (the persisted checkpoint keeps the parent of the
+  first one, so history stays a valid chain),
+- pending checkpoints are flushed from a background thread every
+  `flush_interval` seconds, when too many threads are pending, before
+  history listings and on close(),
+- put() is acknowledged before the checkpoint is durable, and intermediate
+  checkpoints inside one flush window are never persisted, so time-travel can
+  only target flushed checkpoints.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+    get_checkpoint_id,
+)
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+ThreadKey = Tuple[str, str]
+LatestIdFn = Callable[[str, str], Optional[str]]
+AsyncLatestIdFn = Callable[[str, str], Awaitable[Optional[str]]]
+
+
+@dataclass
+class CheckpointCacheConfig:
+    """Cấu hình cache/write-back cho checkpointer"""
+    max_threads: int = env_field("CHECKPOINT_CACHE_THREADS", 1000)
+    # Write-back acknowledges puts before they are durable; single-worker deployments only
+    write_back: bool = env_field("CHECKPOINT_WRITE_BACK", False)
+    flush_interval: float = env_field("CHECKPOINT_FLUSH_INTERVAL", 1.0)
+    # Flush immediately once this many threads have unflushed checkpoints
+    max_pending_threads: int = env_field("CHECKPOINT_MAX_PENDING_THREADS", 200)
+
+
+@dataclass
+class _PendingCheckpoint:
+    config: RunnableConfig  # config of the first coalesced put (parent = last persisted)
+    checkpoint: Checkpoint
+    metadata: CheckpointMetadata
+    new_versions: ChannelVersions
+    writes: List[Tuple[str, str, Sequence[Tuple[str, Any]]]] = field(default_factory=list)
+    coalesced: int = 0
+
+
+def _thread_key(config: RunnableConfig) -> ThreadKey:
+    configurable = config["configurable"]
+    return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+
+class WriteBackCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpoint saver wrapper with an LRU read cache and optional coalesced writes.
+
+    `latest_id` / `alatest_id` return the newest persisted checkpoint_id of a
+    (thread_id, checkpoint_ns). When given, cached latest reads are checked
+    against them; without them the cache trusts that no other process writes
+    the same threads.
+    """
+
+    def __init__(
+        self,
+        saver: BaseCheckpointSaver,
+        config: Optional[CheckpointCacheConfig] = None,
+        async_saver_factory: Optional[Callable[[], Awaitable[BaseCheckpointSaver]]] = None,
+        start_flusher: bool = True,
+        latest_id: Optional[LatestIdFn] = None,
+        alatest_id: Optional[AsyncLatestIdFn] = None,
+    ):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.config = config or CheckpointCacheConfig()
+        self._latest_id = latest_id
+        self._alatest_id = alatest_id
+        # Async reads go to a dedicated async saver (e.g. AsyncPostgresSaver on an
+        # AsyncConnectionPool) created on first use inside the running event loop
+        self._async_saver_factory = async_saver_factory
+        self._async_saver: Optional[BaseCheckpointSaver] = None if async_saver_factory else saver
+        self._async_saver_lock: Optional[asyncio.Lock] = None
+
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._latest: "OrderedDict[ThreadKey, CheckpointTuple]" = OrderedDict()
+        self._pending: Dict[ThreadKey, _PendingCheckpoint] = {}
+        self._closed = threading.Event()
+        self._stats = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "stale_reads": 0,
+            "validation_errors": 0,
+            "puts": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "flushed_checkpoints": 0,
+            "flush_errors": 0,
+            "evictions": 0,
+        }
+        self._flusher: Optional[threading.Thread] = None
+        if self.config.write_back and start_flusher:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="checkpoint-flusher", daemon=True
+            )
+            self._flusher.start()
+            atexit.register(self.close)
+
+    # --- Cache helpers ----------------------------------------------------
+    def _remember(self, key: ThreadKey, checkpoint_tuple: CheckpointTuple) -> None:
+        with self._lock:
+            self._latest[key] = checkpoint_tuple
+            self._latest.move_to_end(key)
+            while len(self._latest) > max(1, self.config.max_threads):
+                evicted, _ = self._latest.popitem(last=False)
+                if evicted in self._pending:
+                    # Never drop unflushed state; it is re-read from _pending anyway
+                    continue
+                self._stats["evictions"] += 1
+
+    def _cached(self, config: RunnableConfig) -> Tuple[Optional[CheckpointTuple], bool]:
+        """Cached tuple for `config`, and whether it must be checked against the database."""
+        key = _thread_key(config)
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            cached = self._latest.get(key)
+            pending = self._pending.get(key)
+            if cached is None and pending is not None:
+                cached = self._pending_tuple(key, pending)
+            if cached is None:
+                return None, False
+            if checkpoint_id and cached.checkpoint["id"] != checkpoint_id:
+                return None, False
+            # Checkpoints are immutable: only "latest" reads can go stale, and an
+            # unflushed checkpoint is newer than anything in the database
+            return cached, not checkpoint_id and pending is None
+
+    def _hit(self, config: RunnableConfig, cached: CheckpointTuple) -> CheckpointTuple:
+        key = _thread_key(config)
+        with self._lock:
+            self._latest[key] = cached
+            self._latest.move_to_end(key)
+            self._stats["cache_hits"] += 1
+        return cached
+
+    def _stale(self, config: RunnableConfig, cached: CheckpointTuple, latest_id: Optional[str]) -> bool:
+        """True (and the entry dropped) if the database has moved past the cached checkpoint."""
+        if latest_id == cached.checkpoint["id"]:
+            return False
+        key = _thread_key(config)
+        with self._lock:
+            if self._latest.get(key) is cached:
+                del self._latest[key]
+            self._stats["stale_reads"] += 1
+        return True
+
+    def _validation_failed(self, config: RunnableConfig, error: Exception) -> None:
+        self._stats["validation_errors"] += 1
+        logger.warning(f"⚠️ Checkpoint cache check failed for thread {_thread_key(config)[0]}: {error}")
+
+    def _get_cached(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        cached, check = self._cached(config)
+        if cached is None:
+            return None
+        if check and self._latest_id is not None:
+            try:
+                if self._stale(config, cached, self._latest_id(*_thread_key(config))):
+                    return None
+            except Exception as e:  # noqa: BLE001
+                self._validation_failed(config, e)
+                return None
+        return self._hit(config, cached)
+
+    async def _aget_cached(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        cached, check = self._cached(config)
+        if cached is None:
+            return None
+        if check and self._alatest_id is not None:
+            try:
+                if self._stale(config, cached, await self._alatest_id(*_thread_key(config))):
+                    return None
+            except Exception as e:  # noqa: BLE001
+                self._validation_failed(config, e)
+                return None
+        return self._hit(config, cached)
+
+    @staticmethod
+    def _pending_tuple(key: ThreadKey, pending: _PendingCheckpoint) -> CheckpointTuple:
+        thread_id, checkpoint_ns = key
+        parent_id = get_checkpoint_id(pending.config)
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": pending.checkpoint["id"]}},
+            checkpoint=pending.checkpoint,
+            metadata=pending.metadata,
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, value)
+                for task_id, _, writes in pending.writes
+                for channel, value in writes
+            ],
+        )
+
+    def _buffer_put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        key = _thread_key(config)
+        checkpoint = copy_checkpoint(checkpoint)
+        with self._lock:
+            self._stats["puts"] += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = _PendingCheckpoint(config, checkpoint, metadata, dict(new_versions))
+                self._pending[key] = pending
+            else:
+                # Coalesce: keep the first parent, the latest checkpoint and every
+                # channel changed in between (their blobs must be written)
+                pending.checkpoint = checkpoint
+                pending.metadata = metadata
+                pending.writes = []  # writes of a superseded checkpoint are obsolete
+                pending.new_versions = {
+                    channel: checkpoint["channel_versions"].get(channel, version)
+                    for channel, version in {**pending.new_versions, **new_versions}.items()
+                }
+                pending.coalesced += 1
+                self._stats["coalesced"] += 1
+            checkpoint_tuple = self._pending_tuple(key, pending)
+            self._remember(key, checkpoint_tuple)
+            too_many = len(self._pending) >= self.config.max_pending_threads
+        if too_many:
+            threading.Thread(target=self.flush, name="checkpoint-flush", daemon=True).start()
+        return checkpoint_tuple.config
+
+    def _buffer_writes(
+        self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str
+    ) -> bool:
+        """Attach writes to the pending checkpoint; False if it was already flushed."""
+        key = _thread_key(config)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None or pending.checkpoint["id"] != get_checkpoint_id(config):
+                return False
+            pending.writes.append((task_id, task_path, list(writes)))
+            self._remember(key, self._pending_tuple(key, pending))
+            return True
+
+    def _after_write_through(self, key: ThreadKey, next_config: RunnableConfig, checkpoint: Checkpoint,
+                             metadata: CheckpointMetadata, parent_config: RunnableConfig) -> None:
+        self._remember(key, CheckpointTuple(
+            config=next_config,
+            checkpoint=copy_checkpoint(checkpoint),
+            metadata=metadata,
+            parent_config=parent_config if get_checkpoint_id(parent_config) else None,
+            pending_writes=[],
+        ))
+
+    def _forget(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._latest if k[0] == thread_id]:
+                del self._latest[key]
+            for key in [k for k in self._pending if k[0] == thread_id]:
+                del self._pending[key]
+
+    # --- Flushing ---------------------------------------------------------
+    def flush(self) -> int:
+        """Persist all pending checkpoints; returns how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                pending_items = list(self._pending.items())
+                self._pending.clear()
+            flushed = 0
+            for key, pending in pending_items:
+                try:
+                    self.saver.put(pending.config, pending.checkpoint, pending.metadata, pending.new_versions)
+                    written_config = {"configurable": {
+                        "thread_id": key[0], "checkpoint_ns": key[1], "checkpoint_id": pending.checkpoint["id"],
+                    }}
+                    for task_id, task_path, writes in pending.writes:
+                        self.saver.put_writes(written_config, writes, task_id, task_path)
+                    flushed += 1
+                except Exception as e:  # noqa: BLE001
+                    self._stats["flush_errors"] += 1
+                    logger.error(f"❌ Checkpoint flush failed for thread {key[0]}: {e}")
+                    self._requeue(key, pending)
+            if pending_items:
+                self._stats["flushes"] += 1
+                self._stats["flushed_checkpoints"] += flushed
+            return flushed
+
+    def _requeue(self, key: ThreadKey, failed: _PendingCheckpoint) -> None:
+        """Put a checkpoint whose flush failed back in the queue for the next round."""
+        with self._lock:
+            newer = self._pending.get(key)
+            if newer is None:
+                self._pending[key] = failed
+                return
+            # A newer checkpoint was buffered meanwhile. Its parent (the failed one)
+            # was never persisted, so fold the failed one in: keep the older parent
+            # and the blobs of every channel either of them changed
+            newer.config = failed.config
+            newer.new_versions = {
+                channel: newer.checkpoint["channel_versions"].get(channel, version)
+                for channel, version in {**failed.new_versions, **newer.new_versions}.items()
+            }
+            newer.coalesced += failed.coalesced + 1
+            self._stats["coalesced"] += 1
+            self._remember(key, self._pending_tuple(key, newer))
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.config.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"❌ Checkpoint flusher error: {e}")
+
+    def close(self) -> None:
+        """Stop the flusher and persist everything still pending."""
+        self._closed.set()
+        self.flush()
+
+    async def aclose(self) -> None:
+        """`close` from the event loop: the final flush runs in a worker thread."""
+        self._closed.set()
+        await asyncio.to_thread(self.flush)
+
+    # --- Sync API ---------------------------------------------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        cached = self._get_cached(config)
+        if cached is not None:
+            return cached
+        self._stats["cache_misses"] += 1
+        if get_checkpoint_id(config):
+            self.flush()
+        checkpoint_tuple = self.saver.get_tuple(config)
+        if checkpoint_tuple is not None and not get_checkpoint_id(config):
+            self._remember(_thread_key(config), checkpoint_tuple)
+        return checkpoint_tuple
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        self.flush()
+        yield from self.saver.list(config, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        if self.config.write_back:
+            return self._buffer_put(config, checkpoint, metadata, new_versions)
+        self._stats["puts"] += 1
+        next_config = self.saver.put(config, checkpoint, metadata, new_versions)
+        self._after_write_through(_thread_key(config), next_config, checkpoint, metadata, config)
+        return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if self.config.write_back and self._buffer_writes(config, writes, task_id, task_path):
+            return
+        with self._lock:
+            self._latest.pop(_thread_key(config), None)
+        self.saver.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._forget(str(thread_id))
+        self.saver.delete_thread(thread_id)
+
+    def get_next_version(self, current: Any, channel: Any) -> Any:
+        return self.saver.get_next_version(current, channel)
+
+    # --- Async API --------------------------------------------------------
+    async def _get_async_saver(self) -> BaseCheckpointSaver:
+        if self._async_saver is None:
+            if self._async_saver_lock is None:
+                self._async_saver_lock = asyncio.Lock()
+            async with self._async_saver_lock:
+                if self._async_saver is None:
+                    self._async_saver = await self._async_saver_factory()
+        return self._async_saver
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        saver = await self._get_async_saver()  # alatest_id may run on the async saver's pool
+        cached = await self._aget_cached(config)
+        if cached is not None:
+            return cached
+        self._stats["cache_misses"] += 1
+        if get_checkpoint_id(config):
+            await asyncio.to_thread(self.flush)
+        checkpoint_tuple = await saver.aget_tuple(config)
+        if checkpoint_tuple is not None and not get_checkpoint_id(config):
+            self._remember(_thread_key(config), checkpoint_tuple)
+        return checkpoint_tuple
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        await asyncio.to_thread(self.flush)
+        saver = await self._get_async_saver()
+        async for checkpoint_tuple in saver.alist(config, filter=filter, before=before, limit=limit):
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        if self.config.write_back:
+            # Memory only; the flusher thread persists it off the event loop
+            return self._buffer_put(config, checkpoint, metadata, new_versions)
+        self._stats["puts"] += 1
+        saver = await self._get_async_saver()
+        next_config = await saver.aput(config, checkpoint, metadata, new_versions)
+        self._after_write_through(_thread_key(config), next_config, checkpoint, metadata, config)
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if self.config.write_back and self._buffer_writes(config, writes, task_id, task_path):
+            return
+        with self._lock:
+            self._latest.pop(_thread_key(config), None)
+        saver = await self._get_async_saver()
+        await saver.aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self._forget(str(thread_id))
+        saver = await self._get_async_saver()
+        await saver.adelete_thread(thread_id)
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                **self._stats,
+                "cached_threads": len(self._latest),
+                "pending_threads": len(self._pending),
+            }
+        lookups = stats["cache_hits"] + stats["cache_misses"]
+        stats["hit_rate"] = round(stats["cache_hits"] / lookups, 4) if lookups else 0.0
+        stats["write_back"] = self.config.write_back
+        stats["validated"] = self._latest_id is not None
+        stats["flush_interval"] = self.config.flush_interval
+        stats["saver"] = type(self.saver).__name__
+        return stats
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0
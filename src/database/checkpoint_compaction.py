@@ -0,0 +1,305 @@
+"""
+Retention and compaction for the Postgres checkpoint tables.
+
+PostgresSaver never deletes anything: every super-step adds a row to
+`checkpoints`, its pending writes to `checkpoint_writes` and the changed
+channel values to `checkpoint_blobs`. History queries
+(src/repositories/checkpoints.py) and the DISTINCT ON scans behind thread
+search slow down as those tables grow. CheckpointCompactor bounds them:
+
+- per (thread_id, checkpoint_ns) the latest `keep` checkpoints are kept, plus
+  the parent of the latest one (forked/coalesced chains),
+- writes of older checkpoints are deleted, as are blobs that no kept
+  checkpoint references through `checkpoint->'channel_versions'`,
+- deletes run in batches of `batch_size` rows (one short statement each), in
+  the order writes -> blobs -> checkpoints so an interrupted run leaves the
+  thread over the limit and the next run finishes it,
+- with `archive` enabled rows are moved (DELETE ... RETURNING into INSERT)
+  to `<table>_archive`, range-partitioned by month on `archived_at`, so cold
+  partitions can be detached or dropped.
+
+Only rows older than the oldest kept checkpoint are touched: blobs are
+written before their checkpoint row, so a checkpoint being saved concurrently
+never loses its blobs.
+
+A run takes a session advisory lock; with several workers only one compacts.
+Runs come from scripts/compact_checkpoints.py or the background scheduler
+started with the Postgres checkpointer (CHECKPOINT_COMPACTION_ENABLED=true).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key shared by every worker and the CLI
+COMPACTION_LOCK_ID = 7_215_032_001
+CHECKPOINT_TABLES = ("checkpoints", "checkpoint_writes", "checkpoint_blobs")
+
+
+@dataclass
+class CheckpointCompactionConfig:
+    """Cấu hình dọn dẹp/lưu trữ checkpoint Postgres"""
+    enabled: bool = env_field("CHECKPOINT_COMPACTION_ENABLED", False)
+    # Checkpoints kept per thread and namespace
+    keep: int = env_field("CHECKPOINT_RETENTION_KEEP", 20)
+    batch_size: int = env_field("CHECKPOINT_COMPACTION_BATCH_SIZE", 1000)
+    # Pause between batches so foreground checkpoint writes are not starved
+    batch_pause: float = env_field("CHECKPOINT_COMPACTION_BATCH_PAUSE", 0.05)
+    # Threads compacted per run (largest first); the rest wait for the next run
+    max_threads: int = env_field("CHECKPOINT_COMPACTION_MAX_THREADS", 500)
+    interval: float = env_field("CHECKPOINT_COMPACTION_INTERVAL", 3600.0)
+    archive: bool = env_field("CHECKPOINT_COMPACTION_ARCHIVE", False)
+    dry_run: bool = env_field("CHECKPOINT_COMPACTION_DRY_RUN", False)
+
+
+# --- SQL ------------------------------------------------------------------
+# A row is compactable when it is older than the oldest kept checkpoint
+# (%(cutoff)s) and is not the latest checkpoint's parent (%(parent)s).
+_OLD = "{alias}checkpoint_id < %(cutoff)s AND {alias}checkpoint_id IS DISTINCT FROM %(parent)s"
+
+CANDIDATES_SQL = """
+SELECT thread_id, checkpoint_ns, count(*) AS checkpoints
+FROM checkpoints
+GROUP BY thread_id, checkpoint_ns
+HAVING count(*) > %(keep)s
+ORDER BY count(*) DESC
+LIMIT %(max_threads)s
+"""
+
+BOUNDARY_SQL = """
+SELECT
+    (SELECT checkpoint_id FROM checkpoints
+     WHERE thread_id = %(thread_id)s AND checkpoint_ns = %(checkpoint_ns)s
+     ORDER BY checkpoint_id DESC OFFSET %(offset)s LIMIT 1) AS cutoff,
+    (SELECT parent_checkpoint_id FROM checkpoints
+     WHERE thread_id = %(thread_id)s AND checkpoint_ns = %(checkpoint_ns)s
+     ORDER BY checkpoint_id DESC LIMIT 1) AS parent
+"""
+
+_SCOPE = "thread_id = %(thread_id)s AND checkpoint_ns = %(checkpoint_ns)s"
+
+# Blobs no kept checkpoint references. Kept = not _OLD, so dry-run counts
+# match what a real run deletes.
+_UNREFERENCED_BLOB = f"""
+{_SCOPE}
+AND NOT EXISTS (
+    SELECT 1 FROM checkpoints c
+    WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+      AND NOT ({_OLD.format(alias="c.")})
+      AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+)
+AND EXISTS (
+    SELECT 1 FROM checkpoints c
+    WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+      AND c.checkpoint_id = %(cutoff)s
+      AND b.version < c.checkpoint -> 'channel_versions' ->> b.channel
+)
+"""
+
+_PREDICATES = {
+    "checkpoint_writes": f"{_SCOPE} AND {_OLD.format(alias='')}",
+    "checkpoint_blobs": _UNREFERENCED_BLOB,
+    "checkpoints": f"{_SCOPE} AND {_OLD.format(alias='')}",
+}
+
+
+def count_sql(table: str) -> str:
+    return f"SELECT count(*) AS n FROM {table} b WHERE {_PREDICATES[table]}"
+
+
+def delete_sql(table: str, archive: bool = False) -> str:
+    """Delete (or move to `<table>_archive`) one batch of compactable rows."""
+    delete = (
+        f"DELETE FROM {table} t USING ("
+        f"SELECT ctid FROM {table} b WHERE {_PREDICATES[table]} LIMIT %(limit)s"
+        f") doomed WHERE t.ctid = doomed.ctid"
+    )
+    if not archive:
+        return delete
+    # archived_at is the last archive column and takes its DEFAULT now()
+    return f"WITH moved AS ({delete} RETURNING t.*) INSERT INTO {table}_archive SELECT * FROM moved"
+
+
+def archive_partition_name(table: str, month: date) -> str:
+    return f"{table}_archive_{month.year:04d}{month.month:02d}"
+
+
+def _month_start(day: date, offset: int = 0) -> date:
+    index = day.year * 12 + day.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def archive_ddl(table: str, today: Optional[date] = None) -> List[str]:
+    """Partitioned archive table plus partitions for this and next month."""
+    today = today or datetime.now(timezone.utc).date()
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {table}_archive "
+        f"(LIKE {table}, archived_at timestamptz NOT NULL DEFAULT now()) "
+        f"PARTITION BY RANGE (archived_at)"
+    ]
+    for offset in (0, 1):
+        start, end = _month_start(today, offset), _month_start(today, offset + 1)
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {archive_partition_name(table, start)} "
+            f"PARTITION OF {table}_archive FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    return statements
+
+
+def _connect_default():
+    import psycopg
+    from psycopg.rows import dict_row
+
+    from src.core.config import DB_URI
+
+    if not DB_URI:
+        raise RuntimeError("DB_URI is not configured")
+    return psycopg.connect(DB_URI, autocommit=True, row_factory=dict_row)
+
+
+class CheckpointCompactor:
+    """Applies the retention policy to the PostgresSaver tables."""
+
+    def __init__(
+        self,
+        config: Optional[CheckpointCompactionConfig] = None,
+        connect: Optional[Callable[[], Any]] = None,
+    ):
+        self.config = config or CheckpointCompactionConfig()
+        # Must return an autocommit psycopg connection with dict rows
+        self.connect = connect or _connect_default
+        self._stats = {"runs": 0, "skipped_runs": 0, "errors": 0, "checkpoints": 0, "writes": 0, "blobs": 0}
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def run(self, dry_run: Optional[bool] = None) -> Dict[str, Any]:
+        """One compaction pass; returns per-table row counts (to delete when dry_run)."""
+        dry_run = self.config.dry_run if dry_run is None else dry_run
+        started = time.perf_counter()
+        report = {"dry_run": dry_run, "threads": 0, "checkpoints": 0, "writes": 0, "blobs": 0,
+                  "archived": self.config.archive and not dry_run, "locked": False}
+        conn = self.connect()
+        try:
+            if not conn.execute("SELECT pg_try_advisory_lock(%s) AS locked", (COMPACTION_LOCK_ID,)).fetchone()["locked"]:
+                self._stats["skipped_runs"] += 1
+                logger.info("⏭️ Checkpoint compaction already running on another worker")
+                return report
+            report["locked"] = True
+            try:
+                if report["archived"]:
+                    for table in CHECKPOINT_TABLES:
+                        for statement in archive_ddl(table):
+                            conn.execute(statement)
+                candidates = conn.execute(
+                    CANDIDATES_SQL, {"keep": self.config.keep, "max_threads": self.config.max_threads}
+                ).fetchall()
+                for row in candidates:
+                    counts = self._compact_thread(conn, row["thread_id"], row["checkpoint_ns"], dry_run, report["archived"])
+                    report["threads"] += 1
+                    for key, n in counts.items():
+                        report[key] += n
+            finally:
+                conn.execute("SELECT pg_advisory_unlock(%s)", (COMPACTION_LOCK_ID,))
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            conn.close()
+
+        report["duration_s"] = round(time.perf_counter() - started, 3)
+        self._stats["runs"] += 1
+        if not dry_run:
+            for key in ("checkpoints", "writes", "blobs"):
+                self._stats[key] += report[key]
+        self.last_report = report
+        verb = "would delete" if dry_run else ("archived" if report["archived"] else "deleted")
+        logger.info(
+            f"🧹 Checkpoint compaction {verb} {report['checkpoints']} checkpoints, {report['writes']} writes, "
+            f"{report['blobs']} blobs across {report['threads']} threads in {report['duration_s']}s"
+        )
+        return report
+
+    def _compact_thread(self, conn, thread_id: str, checkpoint_ns: str, dry_run: bool, archive: bool) -> Dict[str, int]:
+        params = {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "offset": max(self.config.keep, 1) - 1}
+        params.update(conn.execute(BOUNDARY_SQL, params).fetchone())
+        if params["cutoff"] is None:
+            return {}
+        counts = {}
+        # Checkpoints last: until they are gone the thread stays a candidate
+        for table, key in (("checkpoint_writes", "writes"), ("checkpoint_blobs", "blobs"), ("checkpoints", "checkpoints")):
+            if dry_run:
+                counts[key] = conn.execute(count_sql(table), params).fetchone()["n"]
+            else:
+                counts[key] = self._delete_batches(conn, table, params, archive)
+        return counts
+
+    def _delete_batches(self, conn, table: str, params: Dict[str, Any], archive: bool) -> int:
+        sql = delete_sql(table, archive)
+        batch = {**params, "limit": self.config.batch_size}
+        total = 0
+        while True:
+            deleted = conn.execute(sql, batch).rowcount
+            total += max(deleted, 0)
+            if deleted < self.config.batch_size:
+                return total
+            if self.config.batch_pause:
+                time.sleep(self.config.batch_pause)
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "keep": self.config.keep,
+            "archive": self.config.archive,
+            "interval": self.config.interval,
+            "last_run": self.last_report,
+        }
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0
+
+
+_compactor: Optional[CheckpointCompactor] = None
+_scheduler: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def get_compactor() -> Optional[CheckpointCompactor]:
+    return _compactor
+
+
+def start_compaction_scheduler(config: Optional[CheckpointCompactionConfig] = None, connect=None) -> Optional[CheckpointCompactor]:
+    """Run the compactor every `interval` seconds in a daemon thread (once per process)."""
+    global _compactor, _scheduler
+    config = config or CheckpointCompactionConfig()
+    if not config.enabled or _scheduler is not None:
+        return _compactor
+    _compactor = CheckpointCompactor(config, connect)
+    _stop.clear()
+
+    def loop():
+        while not _stop.wait(config.interval):
+            try:
+                _compactor.run()
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"❌ Checkpoint compaction failed: {e}")
+
+    _scheduler = threading.Thread(target=loop, name="checkpoint-compaction", daemon=True)
+    _scheduler.start()
+    logger.info(f"✅ Checkpoint compaction scheduled every {config.interval:.0f}s (keep {config.keep})")
+    return _compactor
+
+
+def stop_compaction_scheduler() -> None:
+    global _scheduler
+    _stop.set()
+    _scheduler = None
@@ -0,0 +1,113 @@
+"""
+Checkpoint serializer with optional zstd compression of large blobs.
+
+The base format is LangGraph's JsonPlusSerializer, which already encodes with
+msgpack (ormsgpack) and typed extensions for LangChain messages, pydantic
+models and dataclasses. CompressedSerializer wraps it and compresses encoded
+values above `threshold` bytes with zstd. Long Vietnamese message histories
+and document text compress well; small values (flags, counters) are stored
+as-is.
+
+Format tags: compressed values are stored with the inner type plus a
+"+zstd" suffix (e.g. "msgpack+zstd"). Untagged rows written before this
+change, or with compression disabled, are read by the inner serializer, and
+compressed rows stay readable after turning compression off.
+
+zstandard is a hard dependency (requirements.txt): a missing package fails at
+import instead of silently disabling compression and breaking reads of rows
+that are already compressed.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import zstandard
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+ZSTD_SUFFIX = "+zstd"
+
+
+@dataclass
+class CheckpointSerdeConfig:
+    """Cấu hình serializer cho checkpoint"""
+    # "zstd" | "none"
+    compression: str = env_field("CHECKPOINT_COMPRESSION", "zstd", str.lower)
+    # Encoded values smaller than this are stored uncompressed
+    threshold: int = env_field("CHECKPOINT_COMPRESSION_THRESHOLD", 1024)
+    level: int = env_field("CHECKPOINT_COMPRESSION_LEVEL", 3)
+
+
+class CompressedSerializer(SerializerProtocol):
+    """SerializerProtocol wrapper adding zstd compression above a size threshold."""
+
+    def __init__(self, inner: Optional[SerializerProtocol] = None, config: Optional[CheckpointSerdeConfig] = None):
+        self.inner = inner or JsonPlusSerializer()
+        self.config = config or CheckpointSerdeConfig()
+        if self.config.compression not in ("zstd", "none"):
+            raise ValueError(
+                f"Unknown CHECKPOINT_COMPRESSION {self.config.compression!r} (expected 'zstd' or 'none')"
+            )
+        self._compress = self.config.compression == "zstd"
+        self._local = threading.local()  # zstd (de)compressors are not thread-safe
+        self._stats = {"encoded": 0, "compressed": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+    def _compressor(self):
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.config.level)
+        return compressor
+
+    def _decompressor(self):
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(obj)
+        self._stats["encoded"] += 1
+        self._stats["raw_bytes"] += len(data)
+        if self._compress and len(data) >= self.config.threshold:
+            compressed = self._compressor().compress(data)
+            if len(compressed) < len(data):
+                self._stats["compressed"] += 1
+                self._stats["stored_bytes"] += len(compressed)
+                return type_ + ZSTD_SUFFIX, compressed
+        self._stats["stored_bytes"] += len(data)
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(ZSTD_SUFFIX):
+            # Content size is in the zstd frame header (ZstdCompressor default)
+            payload = self._decompressor().decompress(payload)
+            type_ = type_[: -len(ZSTD_SUFFIX)]
+        return self.inner.loads_typed((type_, payload))
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["compression_ratio"] = (
+            round(stats["raw_bytes"] / stats["stored_bytes"], 3) if stats["stored_bytes"] else None
+        )
+        stats["compression"] = self.config.compression
+        stats["threshold"] = self.config.threshold
+        return stats
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0
+
+
+def create_checkpoint_serde(config: Optional[CheckpointSerdeConfig] = None) -> SerializerProtocol:
+    """Serializer for every checkpointer backend (decoding stays compatible either way)."""
+    return CompressedSerializer(JsonPlusSerializer(), config)
@@ -1,60 +1,206 @@
-from langgraph.checkpoint.postgres import PostgresSaver
-from langgraph.checkpoint.memory import MemorySaver
+import asyncio
 from contextlib import contextmanager
-from src.core.config import DB_URI
-import psycopg
-import os
+from dataclasses import dataclass
+from src.core.config import DB_URI, env_field
+from src.database.bounded_memory_saver import BoundedMemorySaver
+from src.database.checkpoint_cache import CheckpointCacheConfig, WriteBackCheckpointSaver
+from src.database.checkpoint_compaction import get_compactor, start_compaction_scheduler, stop_compaction_scheduler
+from src.database.checkpoint_serde import create_checkpoint_serde
+import threading
+
+
+@dataclass
+class CheckpointerConfig:
+    """Cấu hình Postgres checkpointer"""
+    use_memory: bool = env_field("USE_MEMORY_CHECKPOINTER", False)
+    pool_min_size: int = env_field("CHECKPOINTER_POOL_MIN_SIZE", 1)
+    pool_max_size: int = env_field("CHECKPOINTER_POOL_MAX_SIZE", 10)
+    # Seconds to wait for the first pool connection before falling back to MemorySaver
+    pool_timeout: float = env_field("CHECKPOINTER_POOL_TIMEOUT", 10.0)
+
+
+# Newest checkpoint of a thread: a primary-key range scan, no blobs or writes
+LATEST_CHECKPOINT_ID_SQL = """
+SELECT checkpoint_id FROM checkpoints
+WHERE thread_id = %s AND checkpoint_ns = %s
+ORDER BY checkpoint_id DESC
+LIMIT 1
+"""
+
+_checkpointer = None
+_serde = None
+_checkpointer_lock = threading.Lock()
+_pool = None
+_async_pool = None
+
+
+def get_checkpoint_serde():
+    """Shared serializer (msgpack + zstd above a size threshold) for all backends."""
+    global _serde
+    if _serde is None:
+        _serde = create_checkpoint_serde()
+    return _serde
+
+
+def _connection_kwargs():
+    from psycopg.rows import dict_row
+
+    # Same settings PostgresSaver.from_conn_string uses
+    return {"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row}
+
+
+def create_postgres_pool(config=None):
+    """psycopg connection pool for the checkpointer (replaces the single connection)."""
+    from psycopg_pool import ConnectionPool
+
+    config = config or CheckpointerConfig()
+    pool = ConnectionPool(
+        DB_URI,
+        min_size=config.pool_min_size,
+        max_size=config.pool_max_size,
+        kwargs=_connection_kwargs(),
+        open=True,
+        name="checkpointer",
+    )
+    pool.wait(timeout=config.pool_timeout)
+    return pool
+
+
+def _async_saver_factory(config):
+    async def factory():
+        # Created lazily so the async pool binds to the running event loop
+        global _async_pool
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        from psycopg_pool import AsyncConnectionPool
+
+        _async_pool = AsyncConnectionPool(
+            DB_URI,
+            min_size=config.pool_min_size,
+            max_size=config.pool_max_size,
+            kwargs=_connection_kwargs(),
+            open=False,
+            name="checkpointer-async",
+        )
+        await _async_pool.open(wait=True, timeout=config.pool_timeout)
+        return AsyncPostgresSaver(_async_pool, serde=get_checkpoint_serde())
+
+    return factory
+
+
+def _latest_checkpoint_id(pool):
+    def latest_id(thread_id, checkpoint_ns):
+        with pool.connection() as conn:
+            row = conn.execute(LATEST_CHECKPOINT_ID_SQL, (thread_id, checkpoint_ns)).fetchone()
+        return row["checkpoint_id"] if row else None
+
+    return latest_id
+
+
+async def _alatest_checkpoint_id(thread_id, checkpoint_ns):
+    # The cache creates the async saver (and _async_pool) before calling this
+    async with _async_pool.connection() as conn:
+        cursor = await conn.execute(LATEST_CHECKPOINT_ID_SQL, (thread_id, checkpoint_ns))
+        row = await cursor.fetchone()
+    return row["checkpoint_id"] if row else None
+
+
+def create_postgres_checkpointer(config=None, cache_config=None):
+    """PostgresSaver on a connection pool, behind the validated read cache."""
+    global _pool
+    from langgraph.checkpoint.postgres import PostgresSaver
+
+    config = config or CheckpointerConfig()
+    _pool = create_postgres_pool(config)
+    saver = PostgresSaver(_pool, serde=get_checkpoint_serde())
+    saver.setup()  # Ensure tables are created
+    start_compaction_scheduler()  # No-op unless CHECKPOINT_COMPACTION_ENABLED=true
+    return WriteBackCheckpointSaver(
+        saver,
+        config=cache_config or CheckpointCacheConfig(),
+        async_saver_factory=_async_saver_factory(config),
+        latest_id=_latest_checkpoint_id(_pool),
+        alatest_id=_alatest_checkpoint_id,
+    )
 
 
 def get_checkpointer():
-    """Get appropriate checkpointer based on environment"""
-    print(f"get_checkpointer->DB_URI:{DB_URI}")
-    
-    # FORCE MemorySaver for Facebook integration to avoid async issues
-    # This is a temporary fix for production deployment
-    print("FORCING MemorySaver for Facebook integration")
-    return MemorySaver()
-    
-    # Original logic kept for reference
-    # if os.getenv("USE_MEMORY_CHECKPOINTER", "").lower() == "true":
-    #     print("Using MemorySaver for checkpointing")
-    #     return MemorySaver()
-    
-    # try:
-    #     conn = psycopg.connect(DB_URI, autocommit=True)
-    #     # Initialize PostgresSaver with setup
-    #     checkpointer = PostgresSaver(conn)
-    #     checkpointer.setup()  # Ensure tables are created
-    #     print("Using PostgresSaver for checkpointing")
-    #     return checkpointer
-    # except Exception as e:
-    #     print(f"PostgresSaver failed, falling back to MemorySaver: {e}")
-    #     return MemorySaver()
+    """Get appropriate checkpointer based on environment (shared per process)"""
+    global _checkpointer
+    if _checkpointer is not None:
+        return _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is not None:
+            return _checkpointer
+        config = CheckpointerConfig()
+        if config.use_memory or not DB_URI:
+            print("Using bounded MemorySaver for checkpointing")
+            _checkpointer = BoundedMemorySaver(serde=get_checkpoint_serde())
+            return _checkpointer
+        try:
+            _checkpointer = create_postgres_checkpointer(config)
+            print(f"Using pooled PostgresSaver for checkpointing (pool {config.pool_min_size}-{config.pool_max_size})")
+        except Exception as e:
+            print(f"PostgresSaver failed, falling back to MemorySaver: {e}")
+            _checkpointer = BoundedMemorySaver(serde=get_checkpoint_serde())
+        return _checkpointer
+
+
+def get_checkpointer_stats():
+    """Cache/write-back counters plus pool stats, or residency stats for the bounded MemorySaver."""
+    serde_stats = _serde.get_stats() if hasattr(_serde, "get_stats") else None
+    if isinstance(_checkpointer, BoundedMemorySaver):
+        return {"backend": "memory", **_checkpointer.get_stats(), "serde": serde_stats}
+    if not isinstance(_checkpointer, WriteBackCheckpointSaver):
+        return None
+    stats = {"backend": "postgres", **_checkpointer.get_stats(), "serde": serde_stats}
+    if _pool is not None:
+        stats["pool"] = _pool.get_stats()
+    if _async_pool is not None:
+        stats["async_pool"] = _async_pool.get_stats()
+    if get_compactor() is not None:
+        stats["compaction"] = get_compactor().get_stats()
+    return stats
+
+
+async def close_checkpointer():
+    """Flush pending checkpoints and close both pools (application shutdown)."""
+    global _pool, _async_pool
+    stop_compaction_scheduler()
+    if isinstance(_checkpointer, WriteBackCheckpointSaver):
+        await _checkpointer.aclose()
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+    if _pool is not None:
+        await asyncio.to_thread(_pool.close)
+        _pool = None
 
 
 @contextmanager
 def get_checkpointer_ctx():
     print(f"get_checkpointer_ctx->DB_URI:{DB_URI}")
-    
-    if os.getenv("USE_MEMORY_CHECKPOINTER", "").lower() == "true":
-        checkpointer = MemorySaver()
+
+    config = CheckpointerConfig()
+    if config.use_memory:
+        checkpointer = BoundedMemorySaver(serde=get_checkpoint_serde())
         try:
             yield checkpointer
         finally:
             pass  # MemorySaver doesn't need cleanup
     else:
         try:
-            conn = psycopg.connect(DB_URI, autocommit=True)
-            checkpointer = PostgresSaver(conn)
+            from langgraph.checkpoint.postgres import PostgresSaver
+
+            pool = create_postgres_pool(config)
+            checkpointer = PostgresSaver(pool, serde=get_checkpoint_serde())
             checkpointer.setup()
             try:
                 yield checkpointer
             finally:
-                if hasattr(checkpointer, "close"):
-                    checkpointer.close()
+                pool.close()
         except Exception as e:
             print(f"PostgresSaver failed, using MemorySaver: {e}")
-            checkpointer = MemorySaver()
+            checkpointer = BoundedMemorySaver(serde=get_checkpoint_serde())
             try:
                 yield checkpointer
             finally:
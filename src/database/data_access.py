@@ -0,0 +1,407 @@
+"""
+Shared data-access layer for repositories and SQL tools.
+
+Repositories and the travel tools used to run every query through
+`pd.read_sql` on a SQLAlchemy engine (some created and disposed per call),
+converting DataFrames back to dicts. That cost a pandas import at startup,
+DataFrame construction per query and, with per-call engines, a new TCP/TLS
+connection per lookup. Database/AsyncDatabase replace that with:
+
+- one psycopg3 connection pool per process (sync and async), opened lazily,
+- rows mapped straight to dicts (psycopg `dict_row`),
+- server-side prepared statements: psycopg prepares a query after
+  `prepare_threshold` executions on a connection; set 0 behind PgBouncer in
+  transaction mode,
+- queries written with SQLAlchemy-style `:name` placeholders, converted once
+  (cached) to psycopg's `%(name)s`,
+- per-query timing hooks (`add_hook`), with a built-in slow-query log and
+  counters exposed at /health/database,
+- `stream()` for large reads: a server-side (named) cursor fetches
+  `batch_size` rows at a time, so memory stays constant however many rows
+  the query returns.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import count
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+from src.core.config import env_field
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+Row = Dict[str, Any]
+# hook(sql, duration_ms, rows, error)
+QueryHook = Callable[[str, float, int, Optional[BaseException]], None]
+
+_cursor_ids = count(1)
+_NAMED_PARAM = re.compile(r"(?<![:\w]):(\w+)")
+_LITERAL_PERCENT = re.compile(r"%(?!\()")
+
+
+@dataclass
+class DataAccessConfig:
+    """Cấu hình pool kết nối Postgres cho repositories và tools"""
+    db_uri: Optional[str] = env_field(("DATABASE_CONNECTION", "DB_URI", "POSTGRES_URI"), None)
+    pool_min_size: int = env_field("DATA_POOL_MIN_SIZE", 2)
+    pool_max_size: int = env_field("DATA_POOL_MAX_SIZE", 10)
+    pool_timeout: float = env_field("DATA_POOL_TIMEOUT", 10.0)
+    # Idle connections above min_size are closed after this many seconds
+    max_idle: float = env_field("DATA_POOL_MAX_IDLE", 300.0)
+    # Executions of the same query on a connection before it is prepared (0 disables)
+    prepare_threshold: int = env_field("DATA_PREPARE_THRESHOLD", 2)
+    slow_query_ms: float = env_field("DATA_SLOW_QUERY_MS", 100.0)
+
+
+@lru_cache(maxsize=1024)
+def to_pyformat(sql: str) -> str:
+    """`:name` placeholders -> psycopg `%(name)s`; literal % escaped, `::` casts kept."""
+    return _NAMED_PARAM.sub(r"%(\1)s", _LITERAL_PERCENT.sub("%%", sql))
+
+
+def _connection_kwargs(config: DataAccessConfig) -> Dict[str, Any]:
+    from psycopg.rows import dict_row
+
+    return {
+        "autocommit": True,
+        "prepare_threshold": config.prepare_threshold or None,
+        "row_factory": dict_row,
+    }
+
+
+class _QueryStats:
+    """Timing hooks and counters shared by the sync and async layers."""
+
+    def __init__(self, config: DataAccessConfig):
+        self.config = config
+        self._hooks: List[QueryHook] = []
+        self._stats = {"queries": 0, "errors": 0, "slow_queries": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0}
+
+    def add_hook(self, hook: QueryHook) -> None:
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: QueryHook) -> None:
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def _record(self, sql: str, started: float, rows: int, error: Optional[BaseException] = None) -> None:
+        duration_ms = (time.perf_counter() - started) * 1000
+        self._stats["queries"] += 1
+        self._stats["rows"] += rows
+        self._stats["total_ms"] += duration_ms
+        self._stats["max_ms"] = max(self._stats["max_ms"], duration_ms)
+        if error is not None:
+            self._stats["errors"] += 1
+        if duration_ms >= self.config.slow_query_ms:
+            self._stats["slow_queries"] += 1
+            logger.warning(f"🐢 Slow query ({duration_ms:.1f} ms): {' '.join(sql.split())[:200]}")
+        for hook in self._hooks:
+            try:
+                hook(sql, duration_ms, rows, error)
+            except Exception as e:  # noqa: BLE001
+                logger.debug(f"Query hook failed: {e}")
+
+    @staticmethod
+    def _result(cursor, fetch: str):
+        if fetch == "all":
+            rows = cursor.fetchall()
+            return rows, len(rows)
+        if fetch == "one":
+            row = cursor.fetchone()
+            return row, int(row is not None)
+        return cursor.rowcount, max(cursor.rowcount, 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["avg_ms"] = round(stats["total_ms"] / stats["queries"], 3) if stats["queries"] else None
+        stats["total_ms"] = round(stats["total_ms"], 3)
+        stats["max_ms"] = round(stats["max_ms"], 3)
+        return stats
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0.0 if k.endswith("_ms") else 0
+
+
+class Transaction:
+    """Queries on one pooled connection inside BEGIN ... COMMIT."""
+
+    def __init__(self, db: "Database", conn):
+        self._db = db
+        self._conn = conn
+
+    def fetch_all(self, sql: str, params: Optional[Dict[str, Any]] = None) -> List[Row]:
+        return self._db._run(self._conn, sql, params, "all")
+
+    def fetch_one(self, sql: str, params: Optional[Dict[str, Any]] = None) -> Optional[Row]:
+        return self._db._run(self._conn, sql, params, "one")
+
+    def execute(self, sql: str, params: Optional[Dict[str, Any]] = None) -> int:
+        return self._db._run(self._conn, sql, params, "rowcount")
+
+
+class Database(_QueryStats):
+    """Pooled synchronous access (psycopg3 ConnectionPool)."""
+
+    def __init__(self, config: Optional[DataAccessConfig] = None, pool=None):
+        super().__init__(config or DataAccessConfig())
+        self._pool = pool
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = self._open_pool()
+        return self._pool
+
+    def _open_pool(self):
+        from psycopg_pool import ConnectionPool
+
+        if not self.config.db_uri:
+            raise RuntimeError("DATABASE_CONNECTION is not configured")
+        pool = ConnectionPool(
+            self.config.db_uri,
+            min_size=self.config.pool_min_size,
+            max_size=self.config.pool_max_size,
+            max_idle=self.config.max_idle,
+            timeout=self.config.pool_timeout,
+            kwargs=_connection_kwargs(self.config),
+            open=True,
+            name="data-access",
+        )
+        logger.info(f"✅ Data access pool ready ({self.config.pool_min_size}-{self.config.pool_max_size} connections)")
+        return pool
+
+    def _run(self, conn, sql: str, params: Optional[Dict[str, Any]], fetch: str):
+        started = time.perf_counter()
+        try:
+            # Always pass a mapping: psycopg only unescapes %% when params are given
+            result, rows = self._result(conn.execute(to_pyformat(sql), params or {}), fetch)
+        except Exception as e:
+            self._record(sql, started, 0, e)
+            raise
+        self._record(sql, started, rows)
+        return result
+
+    def fetch_all(self, sql: str, params: Optional[Dict[str, Any]] = None) -> List[Row]:
+        with self.pool.connection() as conn:
+            return self._run(conn, sql, params, "all")
+
+    def fetch_one(self, sql: str, params: Optional[Dict[str, Any]] = None) -> Optional[Row]:
+        with self.pool.connection() as conn:
+            return self._run(conn, sql, params, "one")
+
+    def execute(self, sql: str, params: Optional[Dict[str, Any]] = None) -> int:
+        """Run a statement on its own (autocommit); returns the affected row count."""
+        with self.pool.connection() as conn:
+            return self._run(conn, sql, params, "rowcount")
+
+    @contextmanager
+    def transaction(self):
+        """Several statements committed together (rolled back on exception)."""
+        with self.pool.connection() as conn:
+            with conn.transaction():
+                yield Transaction(self, conn)
+
+    def stream(self, sql: str, params: Optional[Dict[str, Any]] = None, batch_size: int = 100) -> Iterator[Row]:
+        """Rows through a server-side cursor, fetched `batch_size` at a time.
+
+        The pooled connection is held until the iterator is exhausted or closed.
+        """
+        started = time.perf_counter()
+        rows, error = 0, None
+        try:
+            with self.pool.connection() as conn:
+                # Named cursors live inside a transaction
+                with conn.transaction():
+                    with conn.cursor(name=f"stream_{next(_cursor_ids)}") as cursor:
+                        cursor.itersize = batch_size
+                        cursor.execute(to_pyformat(sql), params or {})
+                        for row in cursor:
+                            rows += 1
+                            yield row
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._record(sql, started, rows, error)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        if self._pool is not None:
+            stats["pool"] = self._pool.get_stats()
+        return stats
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+
+class AsyncTransaction:
+    def __init__(self, db: "AsyncDatabase", conn):
+        self._db = db
+        self._conn = conn
+
+    async def fetch_all(self, sql: str, params: Optional[Dict[str, Any]] = None) -> List[Row]:
+        return await self._db._run(self._conn, sql, params, "all")
+
+    async def fetch_one(self, sql: str, params: Optional[Dict[str, Any]] = None) -> Optional[Row]:
+        return await self._db._run(self._conn, sql, params, "one")
+
+    async def execute(self, sql: str, params: Optional[Dict[str, Any]] = None) -> int:
+        return await self._db._run(self._conn, sql, params, "rowcount")
+
+
+class AsyncDatabase(_QueryStats):
+    """Pooled asynchronous access (psycopg3 AsyncConnectionPool) with the same API."""
+
+    def __init__(self, config: Optional[DataAccessConfig] = None, pool=None):
+        super().__init__(config or DataAccessConfig())
+        self._pool = pool
+
+    async def _get_pool(self):
+        if self._pool is None:
+            # Created on first use so the pool binds to the running event loop
+            from psycopg_pool import AsyncConnectionPool
+
+            if not self.config.db_uri:
+                raise RuntimeError("DATABASE_CONNECTION is not configured")
+            pool = AsyncConnectionPool(
+                self.config.db_uri,
+                min_size=self.config.pool_min_size,
+                max_size=self.config.pool_max_size,
+                max_idle=self.config.max_idle,
+                timeout=self.config.pool_timeout,
+                kwargs=_connection_kwargs(self.config),
+                open=False,
+                name="data-access-async",
+            )
+            await pool.open(wait=True, timeout=self.config.pool_timeout)
+            self._pool = pool
+        return self._pool
+
+    async def _run(self, conn, sql: str, params: Optional[Dict[str, Any]], fetch: str):
+        started = time.perf_counter()
+        try:
+            cursor = await conn.execute(to_pyformat(sql), params or {})
+            if fetch == "all":
+                result = await cursor.fetchall()
+                rows = len(result)
+            elif fetch == "one":
+                result = await cursor.fetchone()
+                rows = int(result is not None)
+            else:
+                result = cursor.rowcount
+                rows = max(result, 0)
+        except Exception as e:
+            self._record(sql, started, 0, e)
+            raise
+        self._record(sql, started, rows)
+        return result
+
+    async def fetch_all(self, sql: str, params: Optional[Dict[str, Any]] = None) -> List[Row]:
+        pool = await self._get_pool()
+        async with pool.connection() as conn:
+            return await self._run(conn, sql, params, "all")
+
+    async def fetch_one(self, sql: str, params: Optional[Dict[str, Any]] = None) -> Optional[Row]:
+        pool = await self._get_pool()
+        async with pool.connection() as conn:
+            return await self._run(conn, sql, params, "one")
+
+    async def execute(self, sql: str, params: Optional[Dict[str, Any]] = None) -> int:
+        pool = await self._get_pool()
+        async with pool.connection() as conn:
+            return await self._run(conn, sql, params, "rowcount")
+
+    @asynccontextmanager
+    async def transaction(self):
+        pool = await self._get_pool()
+        async with pool.connection() as conn:
+            async with conn.transaction():
+                yield AsyncTransaction(self, conn)
+
+    async def stream(
+        self, sql: str, params: Optional[Dict[str, Any]] = None, batch_size: int = 100
+    ) -> AsyncIterator[Row]:
+        started = time.perf_counter()
+        rows, error = 0, None
+        pool = await self._get_pool()
+        try:
+            async with pool.connection() as conn:
+                async with conn.transaction():
+                    async with conn.cursor(name=f"stream_{next(_cursor_ids)}") as cursor:
+                        cursor.itersize = batch_size
+                        await cursor.execute(to_pyformat(sql), params or {})
+                        async for row in cursor:
+                            rows += 1
+                            yield row
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._record(sql, started, rows, error)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        if self._pool is not None:
+            stats["pool"] = self._pool.get_stats()
+        return stats
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+_database: Optional[Database] = None
+_async_database: Optional[AsyncDatabase] = None
+_database_lock = threading.Lock()
+
+
+def get_database() -> Database:
+    """Process-wide sync data access (pool opened on first query)."""
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = Database()
+    return _database
+
+
+def get_async_database() -> AsyncDatabase:
+    global _async_database
+    if _async_database is None:
+        with _database_lock:
+            if _async_database is None:
+                _async_database = AsyncDatabase()
+    return _async_database
+
+
+def get_data_access_stats() -> Optional[Dict[str, Any]]:
+    if _database is None and _async_database is None:
+        return None
+    return {
+        "sync": _database.get_stats() if _database is not None else None,
+        "async": _async_database.get_stats() if _async_database is not None else None,
+    }
+
+
+def close_database() -> None:
+    """Close the sync pool (the async pool is closed with `await get_async_database().close()`)."""
+    if _database is not None:
+        _database.close()
@@ -1,5 +1,4 @@
 import os
-import logging
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -7,15 +6,22 @@ from dotenv import load_dotenv
 # Tải các biến môi trường từ file .env
 load_dotenv()
 
-# Enable SQLAlchemy logging
-logging.basicConfig()
-logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+# SQL logging chỉ bật khi debug (SQL_ECHO=true); echo=True in mọi câu lệnh ra log
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
 
 # Lấy chuỗi kết nối từ biến môi trường
 DB_URI = os.getenv("DATABASE_CONNECTION")
 
-# Khởi tạo engine và sessionmaker cho ORM
-engine = create_engine(DB_URI, echo=True, future=True)
+# Khởi tạo engine và sessionmaker cho ORM (repositories/tools dùng src.database.data_access)
+engine = create_engine(
+    DB_URI,
+    echo=SQL_ECHO,
+    future=True,
+    pool_size=int(os.getenv("SQL_POOL_SIZE", "5")),
+    max_overflow=int(os.getenv("SQL_MAX_OVERFLOW", "10")),
+    pool_pre_ping=True,
+    pool_recycle=int(os.getenv("SQL_POOL_RECYCLE", "1800")),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Import Base từ models (chỉ import 1 nơi duy nhất)
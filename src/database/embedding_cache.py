@@ -0,0 +1,347 @@
+"""
+Query-embedding cache shared by QdrantStore and UserMemoryStore.
+
+Every retrieval turn used to pay a full `genai.embed_content` round trip, even for
+the same FAQ/branch question asked a minute ago or the constant "User {id} restaurant"
+profile lookup. This module keeps recently computed vectors in a bounded in-process
+LRU (with TTL) and, optionally, in a persistent second tier (SQLite file or Redis)
+so that warm restarts and sibling workers can reuse them.
+
+Cache keys are built from (model, output dimensionality, task_type, normalized text).
+Normalization is tuned for Vietnamese input: Unicode NFC (so precomposed and
+combining-diacritic forms collide), lower-casing and whitespace collapsing.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EmbeddingCacheConfig:
+    """Cấu hình embedding cache"""
+    enabled: bool = env_field("EMBEDDING_CACHE_ENABLED", True)
+    max_entries: int = env_field("EMBEDDING_CACHE_SIZE", 4096)
+    ttl_seconds: float = env_field("EMBEDDING_CACHE_TTL", float(24 * 3600))
+    # Persistent second tier: "none" | "sqlite" | "redis"
+    persistent_backend: str = env_field("EMBEDDING_CACHE_BACKEND", "none", str.lower)
+    sqlite_path: str = env_field("EMBEDDING_CACHE_PATH", "data/cache/embeddings.sqlite3")
+    redis_url: str = env_field(("EMBEDDING_CACHE_REDIS_URL", "REDIS_URL"), "")
+    redis_prefix: str = "emb:"
+
+
+def normalize_embedding_text(text: str) -> str:
+    """Normalize text for cache-key purposes (NFC, lower-case, collapsed whitespace)."""
+    if not isinstance(text, str):
+        text = str(text)
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.lower().split())
+
+
+def make_embedding_key(
+    model: str,
+    dimensionality: Optional[int],
+    task_type: Optional[str],
+    text: str,
+) -> str:
+    """Build a stable cache key for an embedding request."""
+    raw = f"{model}|{dimensionality or 'default'}|{task_type or 'default'}|{normalize_embedding_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _pack_vector(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack_vector(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class SQLiteEmbeddingStore:
+    """On-disk persistent tier backed by a single SQLite file."""
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        blob, created_at = row
+        if self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+            self.delete(key)
+            return None
+        return _unpack_vector(blob)
+
+    def set(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                (key, _pack_vector(vector), time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RedisEmbeddingStore:
+    """Persistent tier shared between workers through Redis (SETEX with TTL)."""
+
+    def __init__(self, url: str, ttl_seconds: float, prefix: str = "emb:"):
+        import redis  # Lazy import: only needed when this backend is selected
+
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.redis = redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+
+    def get(self, key: str) -> Optional[List[float]]:
+        blob = self.redis.get(self.prefix + key)
+        return _unpack_vector(blob) if blob else None
+
+    def set(self, key: str, vector: List[float]) -> None:
+        ttl = int(self.ttl_seconds) if self.ttl_seconds else None
+        self.redis.set(self.prefix + key, _pack_vector(vector), ex=ttl)
+
+    def delete(self, key: str) -> None:
+        self.redis.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        for k in self.redis.scan_iter(match=self.prefix + "*", count=500):
+            self.redis.delete(k)
+
+    def close(self) -> None:
+        self.redis.close()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: bounded in-process LRU with TTL + optional persistent store.
+
+    Thread-safe; MultiNamespaceRetriever searches namespaces from a thread pool.
+    Failures of the persistent tier are logged and never propagate to callers.
+    """
+
+    def __init__(
+        self,
+        config: Optional[EmbeddingCacheConfig] = None,
+        persistent_store: Optional[Any] = None,
+    ):
+        self.config = config or EmbeddingCacheConfig()
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.persistent_store = persistent_store
+        if self.persistent_store is None and self.config.enabled:
+            self.persistent_store = self._create_persistent_store()
+        self._stats = {
+            "hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+            "persistent_errors": 0,
+        }
+
+    def _create_persistent_store(self) -> Optional[Any]:
+        backend = self.config.persistent_backend
+        try:
+            if backend == "sqlite":
+                store = SQLiteEmbeddingStore(self.config.sqlite_path, self.config.ttl_seconds)
+                logger.info(f"✅ Embedding cache persistent tier: sqlite ({self.config.sqlite_path})")
+                return store
+            if backend == "redis" and self.config.redis_url:
+                store = RedisEmbeddingStore(
+                    self.config.redis_url, self.config.ttl_seconds, self.config.redis_prefix
+                )
+                logger.info("✅ Embedding cache persistent tier: redis")
+                return store
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding cache persistent tier '{backend}' unavailable: {e}")
+        return None
+
+    # --- Lookup -----------------------------------------------------------
+    def get(
+        self,
+        model: str,
+        dimensionality: Optional[int],
+        task_type: Optional[str],
+        text: str,
+    ) -> Optional[List[float]]:
+        """Return a cached vector or None (counts a miss)."""
+        if not self.config.enabled:
+            return None
+        key = make_embedding_key(model, dimensionality, task_type, text)
+        vector = self._get_memory(key)
+        if vector is not None:
+            self._stats["hits"] += 1
+            return vector
+
+        vector = self._get_persistent(key)
+        if vector is not None:
+            self._stats["persistent_hits"] += 1
+            self._set_memory(key, vector)
+            return vector
+
+        self._stats["misses"] += 1
+        return None
+
+    def set(
+        self,
+        model: str,
+        dimensionality: Optional[int],
+        task_type: Optional[str],
+        text: str,
+        vector: List[float],
+    ) -> None:
+        if not self.config.enabled or not vector:
+            return
+        key = make_embedding_key(model, dimensionality, task_type, text)
+        vector = list(vector)
+        self._set_memory(key, vector)
+        if self.persistent_store is not None:
+            try:
+                self.persistent_store.set(key, vector)
+            except Exception as e:
+                self._stats["persistent_errors"] += 1
+                logger.warning(f"⚠️ Embedding cache persistent write failed: {e}")
+
+    def get_or_compute(
+        self,
+        model: str,
+        dimensionality: Optional[int],
+        task_type: Optional[str],
+        text: str,
+        compute: Callable[[], Optional[List[float]]],
+    ) -> Optional[List[float]]:
+        """
+        Return the cached vector for this request or compute and store it.
+
+        Exceptions raised by `compute` propagate unchanged and nothing is cached,
+        so callers keep their existing error handling.
+        """
+        vector = self.get(model, dimensionality, task_type, text)
+        if vector is not None:
+            return vector
+        vector = compute()
+        if vector:
+            self.set(model, dimensionality, task_type, text, vector)
+        return vector
+
+    # --- Internal tiers ---------------------------------------------------
+    def _get_memory(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, vector = entry
+            if self.config.ttl_seconds and time.time() - created_at > self.config.ttl_seconds:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _set_memory(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(1, self.config.max_entries):
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _get_persistent(self, key: str) -> Optional[List[float]]:
+        if self.persistent_store is None:
+            return None
+        try:
+            return self.persistent_store.get(key)
+        except Exception as e:
+            self._stats["persistent_errors"] += 1
+            logger.warning(f"⚠️ Embedding cache persistent read failed: {e}")
+            return None
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss statistics for monitoring."""
+        lookups = self._stats["hits"] + self._stats["persistent_hits"] + self._stats["misses"]
+        hit_rate = (
+            (self._stats["hits"] + self._stats["persistent_hits"]) / lookups if lookups else 0.0
+        )
+        with self._lock:
+            size = len(self._entries)
+        return {
+            **self._stats,
+            "size": size,
+            "max_entries": self.config.max_entries,
+            "hit_rate": round(hit_rate, 4),
+            "persistent_backend": type(self.persistent_store).__name__ if self.persistent_store else None,
+        }
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (and persistent ones if a tier is configured)."""
+        with self._lock:
+            self._entries.clear()
+        if self.persistent_store is not None:
+            try:
+                self.persistent_store.clear()
+            except Exception as e:
+                logger.warning(f"⚠️ Embedding cache persistent clear failed: {e}")
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide embedding cache instance."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache()
+    return _embedding_cache
@@ -0,0 +1,383 @@
+"""
+Decision cache for the document and hallucination graders.
+
+Popular questions are graded against the same chunks many times a day. Decisions
+are cached under a key built from:
+
+    grader kind | prompt fingerprint | knowledge-base version | normalized question | content hash
+
+The knowledge-base (corpus) version is bumped by `embed_and_store` after every
+ingestion run (see `bump_corpus_version`), so decisions made against an older
+corpus are never served again; they simply age out through the TTL. Backends:
+in-process LRU (always) plus an optional SQLite file or Redis tier shared by workers.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from src.core.config import env_field
+from src.database.embedding_cache import normalize_embedding_text
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GraderCacheConfig:
+    """Cấu hình grader decision cache"""
+    enabled: bool = env_field("GRADER_CACHE_ENABLED", True)
+    max_entries: int = env_field("GRADER_CACHE_SIZE", 20000)
+    ttl_seconds: float = env_field("GRADER_CACHE_TTL", float(7 * 24 * 3600))
+    # Persistent tier: "none" | "sqlite" | "redis"
+    persistent_backend: str = env_field("GRADER_CACHE_BACKEND", "none", str.lower)
+    sqlite_path: str = env_field("GRADER_CACHE_PATH", "data/cache/grader_decisions.sqlite3")
+    redis_url: str = env_field(("GRADER_CACHE_REDIS_URL", "REDIS_URL"), "")
+    redis_prefix: str = "grader:"
+    corpus_version_path: str = env_field("CORPUS_VERSION_PATH", "data/cache/corpus_version.json")
+    # How often (seconds) workers re-read the corpus version
+    corpus_version_check_interval: float = 2.0
+
+
+def prompt_fingerprint(*prompts: Any) -> str:
+    """Stable short hash of one or more prompt templates (changes when the prompt changes)."""
+    raw = "|".join(repr(getattr(p, "messages", p)) for p in prompts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def content_hash(text: Any) -> str:
+    return hashlib.sha256(normalize_embedding_text(str(text)).encode("utf-8")).hexdigest()
+
+
+# --- Corpus version ---------------------------------------------------------
+def _read_corpus_version_file(path: str) -> str:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return str(json.load(f).get("version", "0"))
+    except (OSError, ValueError):
+        return "0"
+
+
+def bump_corpus_version(config: Optional[GraderCacheConfig] = None, reason: str = "") -> str:
+    """
+    Publish a new knowledge-base version. Called by the ingestion pipeline after
+    writing to Qdrant; every cached grader decision becomes unreachable.
+    """
+    config = config or GraderCacheConfig()
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    path = Path(config.corpus_version_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + f".tmp{os.getpid()}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "updated_at": time.time(), "reason": reason}, f)
+    os.replace(tmp_path, path)
+    if config.persistent_backend == "redis" and config.redis_url:
+        try:
+            import redis  # Lazy import: only needed when this backend is selected
+
+            client = redis.from_url(config.redis_url, socket_timeout=2, socket_connect_timeout=2)
+            client.set(config.redis_prefix + "corpus_version", version)
+            client.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not publish corpus version to Redis: {e}")
+    logger.info(f"✅ Corpus version bumped to {version} ({reason})")
+    return version
+
+
+def read_corpus_version(config: Optional[GraderCacheConfig] = None) -> str:
+    """
+    Current knowledge-base version as published by `bump_corpus_version`
+    (Redis when that backend is configured, else the version file).
+    """
+    config = config or GraderCacheConfig()
+    if config.persistent_backend == "redis" and config.redis_url:
+        try:
+            import redis  # Lazy import: only needed when this backend is selected
+
+            client = redis.from_url(config.redis_url, socket_timeout=2, socket_connect_timeout=2)
+            value = client.get(config.redis_prefix + "corpus_version")
+            client.close()
+            if value:
+                return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read corpus version from Redis: {e}")
+    return _read_corpus_version_file(config.corpus_version_path)
+
+
+# --- Persistent tiers -------------------------------------------------------
+class SQLiteGraderStore:
+    """On-disk decision store shared by workers on one host."""
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS grader_decisions ("
+            " key TEXT PRIMARY KEY,"
+            " decision TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT decision, created_at FROM grader_decisions WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        decision, created_at = row
+        if self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+            return None
+        return decision
+
+    def set(self, key: str, decision: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO grader_decisions (key, decision, created_at) VALUES (?, ?, ?)",
+                (key, decision, time.time()),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> None:
+        if not self.ttl_seconds:
+            return
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM grader_decisions WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._conn.commit()
+
+    def get_corpus_version(self) -> Optional[str]:
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM grader_decisions")
+            self._conn.commit()
+
+
+class RedisGraderStore:
+    """Decision store shared by all workers through Redis (SET with EX)."""
+
+    def __init__(self, url: str, ttl_seconds: float, prefix: str = "grader:"):
+        import redis  # Lazy import: only needed when this backend is selected
+
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.redis = redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.redis.get(self.prefix + key)
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key: str, decision: str) -> None:
+        ttl = int(self.ttl_seconds) if self.ttl_seconds else None
+        self.redis.set(self.prefix + key, decision, ex=ttl)
+
+    def purge_expired(self) -> None:
+        """Redis expires keys itself."""
+
+    def get_corpus_version(self) -> Optional[str]:
+        value = self.redis.get(self.prefix + "corpus_version")
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def clear(self) -> None:
+        for k in self.redis.scan_iter(match=self.prefix + "d:*", count=500):
+            self.redis.delete(k)
+
+
+# --- Cache ------------------------------------------------------------------
+class GraderDecisionCache:
+    """
+    Cache of grader decisions ("yes"/"no") keyed by question, content and corpus version.
+
+    Thread-safe; failures of the persistent tier are logged and never propagate.
+    """
+
+    def __init__(
+        self,
+        config: Optional[GraderCacheConfig] = None,
+        persistent_store: Optional[Any] = None,
+    ):
+        self.config = config or GraderCacheConfig()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.persistent_store = persistent_store
+        if self.persistent_store is None and self.config.enabled:
+            self.persistent_store = self._create_persistent_store()
+        self._corpus_version = "0"
+        self._corpus_version_checked_at = 0.0
+        self._stats = {
+            "hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "corpus_version_changes": 0,
+            "persistent_errors": 0,
+        }
+
+    def _create_persistent_store(self) -> Optional[Any]:
+        backend = self.config.persistent_backend
+        try:
+            if backend == "sqlite":
+                store = SQLiteGraderStore(self.config.sqlite_path, self.config.ttl_seconds)
+                logger.info(f"✅ Grader cache persistent tier: sqlite ({self.config.sqlite_path})")
+                return store
+            if backend == "redis" and self.config.redis_url:
+                store = RedisGraderStore(
+                    self.config.redis_url, self.config.ttl_seconds, self.config.redis_prefix
+                )
+                logger.info("✅ Grader cache persistent tier: redis")
+                return store
+        except Exception as e:
+            logger.warning(f"⚠️ Grader cache persistent tier '{backend}' unavailable: {e}")
+        return None
+
+    # --- Corpus version ---------------------------------------------------
+    def corpus_version(self) -> str:
+        """Current knowledge-base version (re-read at most every few seconds)."""
+        now = time.time()
+        if now - self._corpus_version_checked_at < self.config.corpus_version_check_interval:
+            return self._corpus_version
+        self._corpus_version_checked_at = now
+        version = None
+        if self.persistent_store is not None:
+            try:
+                version = self.persistent_store.get_corpus_version()
+            except Exception as e:
+                self._stats["persistent_errors"] += 1
+                logger.warning(f"⚠️ Grader cache corpus version read failed: {e}")
+        version = version or _read_corpus_version_file(self.config.corpus_version_path)
+        if version != self._corpus_version:
+            if self._corpus_version_checked_at and self._entries:
+                self._stats["corpus_version_changes"] += 1
+                logger.info(f"🔄 Corpus version changed to {version}, dropping cached grader decisions")
+            with self._lock:
+                self._entries.clear()
+            if self.persistent_store is not None:
+                try:
+                    self.persistent_store.purge_expired()
+                except Exception:
+                    pass
+            self._corpus_version = version
+        return self._corpus_version
+
+    def make_key(self, kind: str, prompt_hash: str, question: str, content: Any) -> str:
+        raw = "|".join(
+            [
+                kind,
+                prompt_hash,
+                self.corpus_version(),
+                normalize_embedding_text(question),
+                content_hash(content),
+            ]
+        )
+        return "d:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # --- Lookup -----------------------------------------------------------
+    def get(self, kind: str, prompt_hash: str, question: str, content: Any) -> Optional[str]:
+        if not self.config.enabled or not question:
+            return None
+        key = self.make_key(kind, prompt_hash, question, content)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, decision = entry
+                if not self.config.ttl_seconds or time.time() - created_at <= self.config.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return decision
+                del self._entries[key]
+
+        if self.persistent_store is not None:
+            try:
+                decision = self.persistent_store.get(key)
+            except Exception as e:
+                self._stats["persistent_errors"] += 1
+                logger.warning(f"⚠️ Grader cache persistent read failed: {e}")
+                decision = None
+            if decision is not None:
+                self._stats["persistent_hits"] += 1
+                self._set_memory(key, decision)
+                return decision
+
+        self._stats["misses"] += 1
+        return None
+
+    def set(self, kind: str, prompt_hash: str, question: str, content: Any, decision: str) -> None:
+        decision = (decision or "").strip().lower()
+        if not self.config.enabled or not question or decision not in ("yes", "no"):
+            return
+        key = self.make_key(kind, prompt_hash, question, content)
+        self._set_memory(key, decision)
+        if self.persistent_store is not None:
+            try:
+                self.persistent_store.set(key, decision)
+            except Exception as e:
+                self._stats["persistent_errors"] += 1
+                logger.warning(f"⚠️ Grader cache persistent write failed: {e}")
+
+    def _set_memory(self, key: str, decision: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), decision)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(1, self.config.max_entries):
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["persistent_hits"] + self._stats["misses"]
+        hit_rate = (
+            (self._stats["hits"] + self._stats["persistent_hits"]) / lookups if lookups else 0.0
+        )
+        with self._lock:
+            size = len(self._entries)
+        return {
+            **self._stats,
+            "size": size,
+            "hit_rate": round(hit_rate, 4),
+            "corpus_version": self._corpus_version,
+            "persistent_backend": type(self.persistent_store).__name__ if self.persistent_store else None,
+        }
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.persistent_store is not None:
+            try:
+                self.persistent_store.clear()
+            except Exception as e:
+                logger.warning(f"⚠️ Grader cache persistent clear failed: {e}")
+
+
+_grader_cache: Optional[GraderDecisionCache] = None
+_grader_cache_lock = threading.Lock()
+
+
+def get_grader_cache() -> GraderDecisionCache:
+    """Get the process-wide grader decision cache."""
+    global _grader_cache
+    if _grader_cache is None:
+        with _grader_cache_lock:
+            if _grader_cache is None:
+                _grader_cache = GraderDecisionCache()
+    return _grader_cache
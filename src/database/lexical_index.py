@@ -0,0 +1,243 @@
+"""
+Sparse lexical (BM25) index over Vietnamese syllable tokens.
+
+Branch, district and dish names ("Times City", "Vincom", "lẩu bò") are exact-match
+lookups that dense embeddings often rank poorly. This index is built at ingestion
+time (see `QdrantStore.build_lexical_index`) and fused with dense results by
+`MultiNamespaceRetriever` (SearchStrategy.HYBRID).
+
+Tokenization:
+  - Unicode NFC + lower-case, split into syllables on non-word characters
+  - every syllable is also emitted in diacritic-folded form ("lẩu" -> "lau",
+    "đỗ" -> "do"), so unaccented queries still match and accented exact
+    matches score higher
+  - folded syllable bigrams ("lau_bo", "times_city") reward multi-syllable names
+
+One JSON file per (collection, namespace) is written to LEXICAL_INDEX_DIR.
+Query paths read it through `LexicalIndexCache`, which checks the file for a
+rebuild at most every LEXICAL_INDEX_CHECK_INTERVAL seconds.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class LexicalIndexConfig:
+    """Cấu hình BM25 lexical index"""
+    index_dir: str = env_field("LEXICAL_INDEX_DIR", "data/cache/lexical_index")
+    k1: float = env_field("LEXICAL_INDEX_BM25_K1", 1.5)
+    b: float = env_field("LEXICAL_INDEX_BM25_B", 0.75)
+    # Seconds between checks of an index file for a rebuild (0 = every query)
+    check_interval: float = env_field("LEXICAL_INDEX_CHECK_INTERVAL", 5.0)
+
+
+def fold_diacritics(text: str) -> str:
+    """Strip Vietnamese diacritics ("lẩu bò" -> "lau bo", "đ" -> "d")."""
+    decomposed = unicodedata.normalize("NFD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return stripped.replace("đ", "d").replace("Đ", "D")
+
+
+def tokenize(text: str) -> List[str]:
+    """Syllable tokens + diacritic-folded variants + folded bigrams."""
+    if not text:
+        return []
+    syllables = _TOKEN_RE.findall(unicodedata.normalize("NFC", str(text)).lower())
+    tokens: List[str] = []
+    folded: List[str] = []
+    for syllable in syllables:
+        plain = fold_diacritics(syllable)
+        tokens.append(syllable)
+        if plain != syllable:
+            tokens.append(plain)
+        folded.append(plain)
+    tokens.extend(f"{a}_{b}" for a, b in zip(folded, folded[1:]))
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over a small, static document set (one namespace)."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.keys: List[str] = []
+        self.values: List[Dict[str, Any]] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.avg_doc_length = 0.0
+        self.built_at = 0.0
+
+    @classmethod
+    def build(
+        cls,
+        documents: Iterable[Tuple[str, Dict[str, Any]]],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> "BM25Index":
+        """Build from (key, value) pairs; `value["content"]` is indexed."""
+        index = cls(k1=k1, b=b)
+        for key, value in documents:
+            content = value.get("content", "") if isinstance(value, dict) else str(value)
+            term_counts = Counter(tokenize(content))
+            if not term_counts:
+                continue
+            doc_id = len(index.keys)
+            index.keys.append(key)
+            if isinstance(value, dict):
+                value = {k: v for k, v in value.items() if k != "embedding"}
+            index.values.append(value)
+            index.doc_lengths.append(sum(term_counts.values()))
+            for term, tf in term_counts.items():
+                index.postings.setdefault(term, []).append((doc_id, tf))
+        index.avg_doc_length = (
+            sum(index.doc_lengths) / len(index.doc_lengths) if index.doc_lengths else 0.0
+        )
+        index.built_at = time.time()
+        return index
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Return the top `limit` (key, value, bm25_score) tuples with score > 0."""
+        n_docs = len(self.keys)
+        if n_docs == 0 or limit <= 0:
+            return []
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings:
+                length_norm = 1.0 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_doc_length or 1.0)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + self.k1 * length_norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(self.keys[doc_id], self.values[doc_id], score) for doc_id, score in ranked]
+
+    # --- Persistence ------------------------------------------------------
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "built_at": self.built_at,
+            "keys": self.keys,
+            "values": self.values,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        index = cls(k1=data.get("k1", 1.5), b=data.get("b", 0.75))
+        index.keys = data["keys"]
+        index.values = data["values"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = {term: [tuple(p) for p in plist] for term, plist in data["postings"].items()}
+        index.avg_doc_length = (
+            sum(index.doc_lengths) / len(index.doc_lengths) if index.doc_lengths else 0.0
+        )
+        index.built_at = data.get("built_at", 0.0)
+        return index
+
+    def save(self, path: Path) -> None:
+        """Write atomically so concurrent readers never see a partial file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + f".tmp{os.getpid()}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def lexical_index_path(collection_name: str, namespace: str, config: Optional[LexicalIndexConfig] = None) -> Path:
+    config = config or LexicalIndexConfig()
+    return Path(config.index_dir) / f"{collection_name}__{namespace}.bm25.json"
+
+
+class LexicalIndexCache:
+    """
+    BM25 indexes loaded on first use and reloaded when their file is rebuilt.
+
+    The file's mtime is checked at most every `check_interval` seconds per
+    namespace rather than on every query; a rebuild in this process
+    (`invalidate`) is picked up immediately.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        config: Optional[LexicalIndexConfig] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.collection_name = collection_name
+        self.config = config or LexicalIndexConfig()
+        self.clock = clock
+        self._lock = threading.Lock()
+        # namespace -> (checked_at, mtime, index); index is None when there is no file
+        self._entries: Dict[str, Tuple[float, Optional[float], Optional[BM25Index]]] = {}
+        self._stats = {"stat_checks": 0, "loads": 0}
+
+    def path(self, namespace: str) -> Path:
+        return lexical_index_path(self.collection_name, namespace, self.config)
+
+    def get(self, namespace: str) -> Optional[BM25Index]:
+        """The namespace's index, or None when none has been built."""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(namespace)
+        if entry is not None and now - entry[0] < self.config.check_interval:
+            return entry[2]
+
+        self._stats["stat_checks"] += 1
+        try:
+            mtime: Optional[float] = self.path(namespace).stat().st_mtime
+        except OSError:
+            mtime = None
+        if entry is not None and entry[1] == mtime:
+            index = entry[2]
+        elif mtime is None:
+            index = None
+        else:
+            index = BM25Index.load(self.path(namespace))
+            self._stats["loads"] += 1
+        with self._lock:
+            self._entries[namespace] = (now, mtime, index)
+        return index
+
+    def invalidate(self, namespace: Optional[str] = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(namespace, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = sum(1 for entry in self._entries.values() if entry[2] is not None)
+        return {**self._stats, "loaded_namespaces": loaded, "check_interval": self.config.check_interval}
@@ -0,0 +1,335 @@
+"""
+In-process, memory-mapped mirror of small Qdrant namespaces.
+
+The marketing/FAQ knowledge base is only a few hundred chunks, so an exact cosine
+top-k over a float32 matrix is a single matrix-vector product (microseconds) instead
+of a network round trip to Qdrant. Each mirrored namespace is snapshotted to disk:
+
+    <index_dir>/<collection>__<namespace>.<build>.npy  unit-normalized float32 vectors
+    <index_dir>/<collection>__<namespace>.meta.json    keys, payload values, version,
+                                                       name of the matrix file
+
+Every build writes its matrix under a new name and then swaps meta.json, which
+names it, so a reader always pairs keys and payloads with their own vectors.
+
+The .npy file is opened with `mmap_mode="r"`, so every worker process on the host
+shares the same page-cache copy. A snapshot's version is the knowledge-base
+(corpus) version published by the ingestion run (`bump_corpus_version`) plus the
+namespace point count, so re-ingested content is picked up even when the number
+of chunks is unchanged. If Qdrant is unreachable the existing snapshot keeps
+serving, so retrieval survives short Qdrant outages.
+
+Construction only maps the snapshots already on disk; reconciling with Qdrant
+(and scrolling a namespace when it changed) runs in a background thread, and
+searches fall back to Qdrant until a namespace is mirrored.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client.http.models import FieldCondition, Filter, MatchValue
+
+from src.core.config import env_field
+from src.database.grader_cache import read_corpus_version
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LocalVectorIndexConfig:
+    """Cấu hình local vector index mirror"""
+    enabled: bool = env_field("LOCAL_VECTOR_INDEX_ENABLED", False)
+    index_dir: str = env_field("LOCAL_VECTOR_INDEX_DIR", "data/cache/vector_index")
+    # Seconds between version checks against Qdrant (done off the request path)
+    refresh_interval: float = env_field("LOCAL_VECTOR_INDEX_REFRESH_SECS", 60.0)
+    # Namespaces larger than this are left to Qdrant
+    max_points: int = env_field("LOCAL_VECTOR_INDEX_MAX_POINTS", 20000)
+    scroll_batch_size: int = 256
+
+
+@dataclass
+class _NamespaceSnapshot:
+    namespace: str
+    version: str
+    matrix: np.ndarray  # shape (n, dim), rows unit-normalized, memory-mapped
+    keys: List[str] = field(default_factory=list)
+    values: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class LocalVectorIndex:
+    """Exact cosine top-k over memory-mapped snapshots of selected namespaces."""
+
+    def __init__(
+        self,
+        qdrant_client: Any,
+        collection_name: str,
+        namespaces: List[str],
+        config: Optional[LocalVectorIndexConfig] = None,
+        corpus_version_fn: Optional[Callable[[], str]] = None,
+    ):
+        self.qdrant_client = qdrant_client
+        self.collection_name = collection_name
+        self.namespaces = list(namespaces)
+        self.config = config or LocalVectorIndexConfig()
+        self.corpus_version_fn = corpus_version_fn or read_corpus_version
+        self.index_dir = Path(self.config.index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+        self._snapshots: Dict[str, _NamespaceSnapshot] = {}
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._last_check = 0.0
+        self._stats = {
+            "local_searches": 0,
+            "snapshots_built": 0,
+            "snapshots_loaded": 0,
+            "refresh_checks": 0,
+            "refresh_errors": 0,
+        }
+
+        # Serve whatever is already on disk immediately, reconcile with Qdrant in the background
+        for namespace in self.namespaces:
+            self._load_snapshot(namespace)
+        self._maybe_schedule_refresh()
+
+    # --- Paths ------------------------------------------------------------
+    def _base_path(self, namespace: str) -> Path:
+        return self.index_dir / f"{self.collection_name}__{namespace}"
+
+    def _matrix_path(self, namespace: str, build_id: str) -> Path:
+        base = self._base_path(namespace)
+        return base.with_name(f"{base.name}.{build_id}.npy")
+
+    def _meta_path(self, namespace: str) -> Path:
+        return self._base_path(namespace).with_suffix(".meta.json")
+
+    # --- Snapshot management ---------------------------------------------
+    def _namespace_filter(self, namespace: str) -> Filter:
+        return Filter(
+            must=[FieldCondition(key="namespace", match=MatchValue(value=namespace))]
+        )
+
+    def _remote_version(self, namespace: str, corpus_version: str) -> Tuple[str, int]:
+        """(snapshot version, point count) of the namespace in Qdrant."""
+        result = self.qdrant_client.count(
+            collection_name=self.collection_name,
+            count_filter=self._namespace_filter(namespace),
+            exact=True,
+        )
+        count = int(result.count)
+        return f"{corpus_version}:{count}", count
+
+    def _load_snapshot(self, namespace: str) -> bool:
+        """Load (mmap) an on-disk snapshot written by this or another worker."""
+        meta_path = self._meta_path(namespace)
+        if not meta_path.exists():
+            return False
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            # The matrix written together with these keys (never replaced in place)
+            matrix = np.load(self.index_dir / meta["matrix"], mmap_mode="r")
+            if matrix.shape[0] != len(meta.get("keys", [])):
+                logger.warning(f"⚠️ Local index snapshot for '{namespace}' is inconsistent, ignoring")
+                return False
+            self._snapshots[namespace] = _NamespaceSnapshot(
+                namespace=namespace,
+                version=str(meta.get("version", "")),
+                matrix=matrix,
+                keys=meta["keys"],
+                values=meta["values"],
+            )
+            self._stats["snapshots_loaded"] += 1
+            logger.info(f"📂 Local index loaded '{namespace}': {matrix.shape[0]} vectors (version={meta.get('version')})")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load local index snapshot for '{namespace}': {e}")
+            return False
+
+    def _on_disk_meta(self, namespace: str) -> Dict[str, Any]:
+        try:
+            with open(self._meta_path(namespace), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _on_disk_version(self, namespace: str) -> Optional[str]:
+        meta = self._on_disk_meta(namespace)
+        # Snapshots without a named matrix file predate per-build matrices: rebuild them
+        if "version" not in meta or "matrix" not in meta:
+            return None
+        return str(meta["version"])
+
+    def _remove_old_matrices(self, namespace: str, keep: set) -> None:
+        """Drop superseded matrices; the previous one stays for readers that just read the old meta."""
+        for path in self.index_dir.glob(f"{self._base_path(namespace).name}.*.npy"):
+            if path.name not in keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def _build_snapshot(self, namespace: str, version: str) -> None:
+        """Scroll the namespace from Qdrant and atomically write a new snapshot."""
+        keys: List[str] = []
+        values: List[Dict[str, Any]] = []
+        vectors: List[List[float]] = []
+        offset = None
+        while True:
+            points, offset = self.qdrant_client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=self._namespace_filter(namespace),
+                with_payload=True,
+                with_vectors=True,
+                limit=self.config.scroll_batch_size,
+                offset=offset,
+            )
+            for point in points:
+                payload = point.payload or {}
+                key = payload.get("key")
+                value = payload.get("value")
+                if not key or not value or point.vector is None:
+                    continue
+                if isinstance(value, dict):
+                    # Raw vectors live in the matrix; don't duplicate them in metadata
+                    value = {k: v for k, v in value.items() if k != "embedding"}
+                keys.append(key)
+                values.append(value)
+                vectors.append(point.vector)
+            if offset is None:
+                break
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.size:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+        else:
+            matrix = matrix.reshape(0, 0)
+
+        matrix_path = self._matrix_path(namespace, uuid.uuid4().hex[:12])
+        meta_path = self._meta_path(namespace)
+        previous_matrix = self._on_disk_meta(namespace).get("matrix")
+        tmp_suffix = f".tmp{os.getpid()}"
+        tmp_matrix = matrix_path.with_name(matrix_path.name + tmp_suffix)
+        tmp_meta = meta_path.with_name(meta_path.name + tmp_suffix)
+        with open(tmp_matrix, "wb") as f:
+            np.save(f, matrix)
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "collection": self.collection_name,
+                    "namespace": namespace,
+                    "version": version,
+                    "created_at": time.time(),
+                    "matrix": matrix_path.name,
+                    "keys": keys,
+                    "values": values,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        # The new matrix gets its own name; swapping meta.json publishes both at once
+        os.replace(tmp_matrix, matrix_path)
+        os.replace(tmp_meta, meta_path)
+        self._remove_old_matrices(namespace, keep={matrix_path.name, previous_matrix})
+        self._stats["snapshots_built"] += 1
+        logger.info(f"✅ Local index snapshot built for '{namespace}': {len(keys)} vectors (version={version})")
+
+    def refresh(self, force: bool = False) -> None:
+        """Reconcile every mirrored namespace with Qdrant (corpus version + point count)."""
+        with self._refresh_lock:
+            self._last_check = time.time()
+            self._stats["refresh_checks"] += 1
+            try:
+                corpus_version = self.corpus_version_fn()
+            except Exception as e:
+                self._stats["refresh_errors"] += 1
+                logger.warning(f"⚠️ Local index could not read the corpus version, keeping current snapshots: {e}")
+                return
+            for namespace in self.namespaces:
+                try:
+                    version, count = self._remote_version(namespace, corpus_version)
+                    if count > self.config.max_points:
+                        logger.info(f"ℹ️ Namespace '{namespace}' too large for local index ({count} points)")
+                        self._snapshots.pop(namespace, None)
+                        continue
+                    current = self._snapshots.get(namespace)
+                    if not force and current is not None and current.version == version:
+                        continue
+                    # Another worker may already have written the new snapshot
+                    if force or self._on_disk_version(namespace) != version:
+                        self._build_snapshot(namespace, version)
+                    self._load_snapshot(namespace)
+                except Exception as e:
+                    self._stats["refresh_errors"] += 1
+                    logger.warning(f"⚠️ Local index refresh failed for '{namespace}', keeping current snapshot: {e}")
+
+    def _maybe_schedule_refresh(self) -> None:
+        if time.time() - self._last_check < self.config.refresh_interval:
+            return
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._last_check = time.time()
+        self._refresh_thread = threading.Thread(target=self.refresh, name="local-index-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def wait_for_refresh(self, timeout: Optional[float] = None) -> None:
+        """Block until the running background refresh (if any) is done."""
+        thread = self._refresh_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    # --- Search -----------------------------------------------------------
+    def has_namespace(self, namespace: str) -> bool:
+        return namespace in self._snapshots
+
+    def search(
+        self, namespace: str, query_vector: List[float], limit: int = 10
+    ) -> Optional[List[Tuple[str, Dict[str, Any], float]]]:
+        """
+        Exact cosine top-k for a mirrored namespace.
+
+        Returns None when the namespace is not mirrored so callers can fall back to Qdrant.
+        """
+        self._maybe_schedule_refresh()
+        snapshot = self._snapshots.get(namespace)
+        if snapshot is None:
+            return None
+        self._stats["local_searches"] += 1
+        n = snapshot.matrix.shape[0]
+        if n == 0 or limit <= 0:
+            return []
+
+        q = np.asarray(query_vector, dtype=np.float32)
+        q_norm = float(np.linalg.norm(q))
+        if q_norm == 0.0 or q.shape[0] != snapshot.matrix.shape[1]:
+            return None
+        scores = snapshot.matrix @ (q / q_norm)
+
+        k = min(limit, n)
+        if k < n:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        return [(snapshot.keys[i], snapshot.values[i], float(scores[i])) for i in top]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "namespaces": {
+                ns: {"vectors": int(snap.matrix.shape[0]), "version": snap.version}
+                for ns, snap in self._snapshots.items()
+            },
+        }
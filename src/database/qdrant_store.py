@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import uuid
@@ -20,6 +21,8 @@ from qdrant_client.http.models import (
     VectorParams,
 )
 
+from src.database.embedding_cache import EmbeddingCache, get_embedding_cache
+
 load_dotenv()
 
 # (imports consolidated at top)
@@ -31,6 +34,7 @@ class QdrantStore:
         embedding_model: str = "models/text-embedding-004",
         output_dimensionality_query: int = 768,
         collection_name: str = "langgraph_store",
+        embedding_cache: Optional[EmbeddingCache] = None,
     ) -> None:
         self.qdrant_client = QdrantClient(
             host=os.getenv("QDRANT_HOST", "localhost"),
@@ -40,9 +44,47 @@ class QdrantStore:
         self.collection_name = collection_name
         self.embedding_model = self._normalize_model_name(embedding_model)
         self.output_dimensionality_query = output_dimensionality_query
+        # Query embeddings are cached (LRU/TTL + optional persistent tier); pass a
+        # dedicated EmbeddingCache to isolate a store, default is the shared one.
+        self.embedding_cache = embedding_cache or get_embedding_cache()
+        # Optional in-process mirror for small namespaces (see enable_local_index)
+        self.local_index = None
+        # BM25 indexes loaded from disk on first use (LexicalIndexCache)
+        self._lexical_indexes = None
+        # AsyncQdrantClient for the async graph path, created on first use
+        self._async_client = None
         print(f"self.collection_name:{collection_name}")
         self._ensure_collection()
 
+    def enable_local_index(self, namespaces: List[str], config: Optional[Any] = None) -> None:
+        """
+        Mirror the given (small) namespaces into a memory-mapped local index.
+
+        Searches on these namespaces then run as an in-process cosine top-k and
+        keep working while Qdrant is briefly unavailable.
+        """
+        from src.database.local_vector_index import LocalVectorIndex
+
+        try:
+            self.local_index = LocalVectorIndex(
+                self.qdrant_client, self.collection_name, namespaces, config=config
+            )
+            print(f"✅ Local vector index enabled for namespaces: {namespaces}")
+        except Exception as e:  # noqa: BLE001
+            self.local_index = None
+            print(f"⚠️ Local vector index unavailable, using Qdrant only: {e}")
+
+    def _search_local(
+        self, namespace: str, query_vector: List[float], limit: int
+    ) -> Optional[List[Tuple[str, Dict[str, Any], float]]]:
+        if self.local_index is None:
+            return None
+        try:
+            return self.local_index.search(namespace, query_vector, limit=limit)
+        except Exception as e:  # noqa: BLE001
+            print(f"Local index search failed for {namespace}, using Qdrant: {e}")
+            return None
+
     # --- Internal helpers -------------------------------------------------
     def _normalize_model_name(self, name: str) -> str:
         aliases = {
@@ -73,17 +115,61 @@ class QdrantStore:
             text = str(text)
         return text
 
-    def _get_embedding(self, text: Any) -> Optional[List[float]]:
+    def _embed_content(self, text: str) -> List[float]:
+        resp = genai.embed_content(
+            model=self.embedding_model,
+            content=text,
+            output_dimensionality=self.output_dimensionality_query,
+        )
+        return resp["embedding"]
+
+    def _get_embedding(self, text: Any, use_cache: bool = True) -> Optional[List[float]]:
         text = self._prepare_text(text)
         if not text.strip():
             return None
-        resp = genai.embed_content(
+        if not use_cache:
+            return self._embed_content(text)
+        return self.embedding_cache.get_or_compute(
+            model=self.embedding_model,
+            dimensionality=self.output_dimensionality_query,
+            task_type=None,
+            text=text,
+            compute=lambda: self._embed_content(text),
+        )
+
+    @property
+    def async_client(self):
+        """Lazily created AsyncQdrantClient (same host/port as the sync client)."""
+        if self._async_client is None:
+            from qdrant_client import AsyncQdrantClient
+
+            self._async_client = AsyncQdrantClient(
+                host=os.getenv("QDRANT_HOST", "localhost"),
+                port=int(os.getenv("QDRANT_PORT", "6333")),
+            )
+        return self._async_client
+
+    async def _aembed_content(self, text: str) -> List[float]:
+        resp = await genai.embed_content_async(
             model=self.embedding_model,
             content=text,
             output_dimensionality=self.output_dimensionality_query,
         )
         return resp["embedding"]
 
+    async def _aget_embedding(self, text: Any) -> Optional[List[float]]:
+        text = self._prepare_text(text)
+        if not text.strip():
+            return None
+        args = (self.embedding_model, self.output_dimensionality_query, None, text)
+        vector = self.embedding_cache.get(*args)
+        if vector is not None:
+            return vector
+        vector = await self._aembed_content(text)
+        if vector:
+            self.embedding_cache.set(*args, vector)
+        return vector
+
     # --- Public API -------------------------------------------------------
     def put(self, namespace: str, key: str, value: Dict[str, Any]) -> None:
         pre_vec = value.get("embedding") if isinstance(value, dict) else None
@@ -96,7 +182,8 @@ class QdrantStore:
             
         # Keep full text_content for payload storage but don't use for embedding
         text_content = f"namespace: {namespace}, key: {key}, value: {json.dumps(value, ensure_ascii=False)}"
-        embedding = pre_vec if isinstance(pre_vec, list) else self._get_embedding(content_for_embedding)
+        # Document embeddings are one-off; keep them out of the query cache
+        embedding = pre_vec if isinstance(pre_vec, list) else self._get_embedding(content_for_embedding, use_cache=False)
         point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{namespace}:{key}"))
         point = PointStruct(
             id=point_id,
@@ -151,61 +238,256 @@ class QdrantStore:
             print(f"Error listing from namespace {namespace}: {e}")
             return []
 
+    def embed_query(self, query: Any) -> Optional[List[float]]:
+        """Embed a search query once so it can be reused across namespaces."""
+        return self._get_embedding(query)
+
+    def _namespace_filter(self, namespace: str) -> Filter:
+        return Filter(
+            must=[FieldCondition(key="namespace", match=MatchValue(value=namespace))]
+        )
+
+    def _log_results_summary(self, search_result: List[Any]) -> None:
+        # Print concise summary of results without embeddings or full payloads
+        try:
+            summary = []
+            for i, sp in enumerate(search_result, 1):
+                payload = getattr(sp, "payload", {}) or {}
+                value = payload.get("value") if isinstance(payload, dict) else None
+                content = ""
+                if isinstance(value, dict):
+                    content = value.get("content") or value.get("text") or ""
+                preview = (content[:200] + "...") if isinstance(content, str) and len(content) > 200 else content
+                entry = {
+                    "#": i,
+                    "id": getattr(sp, "id", None),
+                    "score": getattr(sp, "score", None),
+                    "namespace": payload.get("namespace") if isinstance(payload, dict) else None,
+                    "key": payload.get("key") if isinstance(payload, dict) else None,
+                    "content_preview": preview,
+                }
+                summary.append(entry)
+            print(f"search->results_summary:{summary}")
+        except Exception as _e:
+            print(f"search->results_summary:<unavailable> (error summarizing: {_e})")
+
+    def _to_results(self, search_result: List[Any]) -> List[Tuple[str, Dict[str, Any], float]]:
+        results: List[Tuple[str, Dict[str, Any], float]] = []
+        for sp in search_result:
+            payload = sp.payload
+            if payload:
+                k = payload.get("key")
+                v = payload.get("value")
+                score = sp.score
+                if k and v:
+                    results.append((k, v, score))
+        return results
+
     def search(self, namespace: str, query: str, limit: int = 10) -> List[Tuple[str, Dict[str, Any], float]]:
         query_vec = self._get_embedding(query)
         
         if query_vec is None:
             return []
+        return self.search_by_vector(namespace, query_vec, limit=limit)
+
+    def search_by_vector(
+        self, namespace: str, query_vector: List[float], limit: int = 10
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Search one namespace with a precomputed query vector (no embedding call)."""
+        local_results = self._search_local(namespace, query_vector, limit)
+        if local_results is not None:
+            return local_results
         try:
             print(f"search->namespace:{namespace}")
             print(f"search->self.collection_name:{self.collection_name}")
-        
 
             search_result = self.qdrant_client.search(
                 collection_name=self.collection_name,
-                query_vector=query_vec,
+                query_vector=query_vector,
                 limit=limit,
                 with_payload=True,
-                query_filter=Filter(
-                    must=[FieldCondition(key="namespace", match=MatchValue(value=namespace))]
-                ),
+                query_filter=self._namespace_filter(namespace),
             )
-            # Print concise summary of results without embeddings or full payloads
-            try:
-                summary = []
-                for i, sp in enumerate(search_result, 1):
-                    payload = getattr(sp, "payload", {}) or {}
-                    value = payload.get("value") if isinstance(payload, dict) else None
-                    content = ""
-                    if isinstance(value, dict):
-                        content = value.get("content") or value.get("text") or ""
-                    preview = (content[:200] + "...") if isinstance(content, str) and len(content) > 200 else content
-                    entry = {
-                        "#": i,
-                        "id": getattr(sp, "id", None),
-                        "score": getattr(sp, "score", None),
-                        "namespace": payload.get("namespace") if isinstance(payload, dict) else None,
-                        "key": payload.get("key") if isinstance(payload, dict) else None,
-                        "content_preview": preview,
-                    }
-                    summary.append(entry)
-                print(f"search->results_summary:{summary}")
-            except Exception as _e:
-                print(f"search->results_summary:<unavailable> (error summarizing: {_e})")
-            results: List[Tuple[str, Dict[str, Any], float]] = []
-            for sp in search_result:
-                payload = sp.payload
-                if payload:
-                    k = payload.get("key")
-                    v = payload.get("value")
-                    score = sp.score
-                    if k and v:
-                        results.append((k, v, score))
+            self._log_results_summary(search_result)
+            return self._to_results(search_result)
+        except Exception as e:  # noqa: BLE001
+            print(f"Error searching in namespace {namespace}: {e}")
+            return []
+
+    def search_many(
+        self, namespaces: List[str], query_vector: List[float], limit: int = 10
+    ) -> Dict[str, List[Tuple[str, Dict[str, Any], float]]]:
+        """
+        Search several namespaces with one precomputed vector in a single Qdrant
+        `search_batch` request. Falls back to per-namespace searches if the batch
+        call is unavailable or fails.
+        """
+        if not namespaces:
+            return {}
+        results: Dict[str, List[Tuple[str, Dict[str, Any], float]]] = {}
+        for ns in namespaces:
+            local_results = self._search_local(ns, query_vector, limit)
+            if local_results is not None:
+                results[ns] = local_results
+        namespaces = [ns for ns in namespaces if ns not in results]
+        if not namespaces:
+            return results
+        try:
+            from qdrant_client.http.models import SearchRequest
+
+            print(f"search_many->namespaces:{namespaces}")
+            batch_result = self.qdrant_client.search_batch(
+                collection_name=self.collection_name,
+                requests=[
+                    SearchRequest(
+                        vector=query_vector,
+                        filter=self._namespace_filter(ns),
+                        limit=limit,
+                        with_payload=True,
+                    )
+                    for ns in namespaces
+                ],
+            )
+            for ns, search_result in zip(namespaces, batch_result):
+                self._log_results_summary(search_result)
+                results[ns] = self._to_results(search_result)
+            return results
+        except Exception as e:  # noqa: BLE001
+            print(f"search_many batch failed, searching namespaces one by one: {e}")
+            for ns in namespaces:
+                results[ns] = self.search_by_vector(ns, query_vector, limit=limit)
             return results
+
+    # --- Async search (event-loop friendly graph path) ---------------------
+    async def aembed_query(self, query: Any) -> Optional[List[float]]:
+        """Async `embed_query`; shares the embedding cache with the sync path."""
+        return await self._aget_embedding(query)
+
+    async def asearch(self, namespace: str, query: str, limit: int = 10) -> List[Tuple[str, Dict[str, Any], float]]:
+        query_vec = await self._aget_embedding(query)
+        if query_vec is None:
+            return []
+        return await self.asearch_by_vector(namespace, query_vec, limit=limit)
+
+    async def asearch_by_vector(
+        self, namespace: str, query_vector: List[float], limit: int = 10
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Async `search_by_vector` (local index first, then AsyncQdrantClient)."""
+        local_results = self._search_local(namespace, query_vector, limit)
+        if local_results is not None:
+            return local_results
+        try:
+            search_result = await self.async_client.search(
+                collection_name=self.collection_name,
+                query_vector=query_vector,
+                limit=limit,
+                with_payload=True,
+                query_filter=self._namespace_filter(namespace),
+            )
+            self._log_results_summary(search_result)
+            return self._to_results(search_result)
         except Exception as e:  # noqa: BLE001
             print(f"Error searching in namespace {namespace}: {e}")
             return []
 
+    async def asearch_many(
+        self, namespaces: List[str], query_vector: List[float], limit: int = 10
+    ) -> Dict[str, List[Tuple[str, Dict[str, Any], float]]]:
+        """Async `search_many`: one `search_batch` request, concurrent per-namespace fallback."""
+        if not namespaces:
+            return {}
+        results: Dict[str, List[Tuple[str, Dict[str, Any], float]]] = {}
+        for ns in namespaces:
+            local_results = self._search_local(ns, query_vector, limit)
+            if local_results is not None:
+                results[ns] = local_results
+        namespaces = [ns for ns in namespaces if ns not in results]
+        if not namespaces:
+            return results
+        try:
+            from qdrant_client.http.models import SearchRequest
+
+            batch_result = await self.async_client.search_batch(
+                collection_name=self.collection_name,
+                requests=[
+                    SearchRequest(
+                        vector=query_vector,
+                        filter=self._namespace_filter(ns),
+                        limit=limit,
+                        with_payload=True,
+                    )
+                    for ns in namespaces
+                ],
+            )
+            for ns, search_result in zip(namespaces, batch_result):
+                self._log_results_summary(search_result)
+                results[ns] = self._to_results(search_result)
+            return results
+        except Exception as e:  # noqa: BLE001
+            print(f"search_many batch failed, searching namespaces concurrently: {e}")
+            per_namespace = await asyncio.gather(
+                *(self.asearch_by_vector(ns, query_vector, limit=limit) for ns in namespaces)
+            )
+            results.update(zip(namespaces, per_namespace))
+            return results
+
+    # --- Lexical (BM25) index --------------------------------------------
+    def build_lexical_index(self, namespace: str) -> int:
+        """
+        (Re)build the BM25 index of a namespace from its Qdrant payloads and
+        persist it next to the other caches. Called at ingestion time.
+        """
+        from src.database.lexical_index import LexicalIndexConfig, BM25Index, lexical_index_path
+
+        config = LexicalIndexConfig()
+        documents: List[Tuple[str, Dict[str, Any]]] = []
+        offset = None
+        while True:
+            points, offset = self.qdrant_client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=self._namespace_filter(namespace),
+                with_payload=True,
+                with_vectors=False,
+                limit=256,
+                offset=offset,
+            )
+            for point in points:
+                payload = point.payload or {}
+                if payload.get("key") and payload.get("value"):
+                    documents.append((payload["key"], payload["value"]))
+            if offset is None:
+                break
+        index = BM25Index.build(documents, k1=config.k1, b=config.b)
+        path = lexical_index_path(self.collection_name, namespace, config)
+        index.save(path)
+        if self._lexical_indexes is not None:
+            self._lexical_indexes.invalidate(namespace)
+        print(f"✅ Lexical index built for '{namespace}': {len(index)} chunks -> {path}")
+        return len(index)
+
+    def _get_lexical_index(self, namespace: str) -> Optional[Any]:
+        if self._lexical_indexes is None:
+            from src.database.lexical_index import LexicalIndexCache
+
+            self._lexical_indexes = LexicalIndexCache(self.collection_name)
+        return self._lexical_indexes.get(namespace)
+
+    def lexical_search(
+        self, namespace: str, query: str, limit: int = 10
+    ) -> Optional[List[Tuple[str, Dict[str, Any], float]]]:
+        """
+        BM25 search over a namespace. Returns None when no lexical index has been
+        built for it, so callers can fall back to dense-only retrieval.
+        """
+        try:
+            index = self._get_lexical_index(namespace)
+        except Exception as e:  # noqa: BLE001
+            print(f"Error loading lexical index for {namespace}: {e}")
+            return None
+        if index is None:
+            return None
+        return index.search(self._prepare_text(query), limit=limit)
+
 
 # Global instance
 qdrant_store = QdrantStore()
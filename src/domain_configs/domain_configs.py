@@ -89,4 +89,8 @@ MARKETING_DOMAIN = {
     "faq_namespace": "faq",
     "embedding_model": "models/text-embedding-004",
     "output_dimensionality_query": 768,
+    # Keyword / route-example set in keyword_mappings (query classifier, fast-path router)
+    "keyword_domain": "restaurant",
+    # Start the first retrieve while the LLM router is deciding (most turns are vectorstore)
+    "speculative_retrieval": True,
 }
@@ -55,9 +55,77 @@ RESTAURANT_KEYWORDS = {
     "promotion_signals": [
         "BẠC", "VÀNG", "KIM CƯƠNG", "%", "sinh nhật", "Ngày hội", 
         "thành viên", "chương trình", "giảm", "ưu đãi"
+    ],
+    
+    # Fast-path router: messages made only of these words are small talk
+    "greeting_keywords": [
+        # Vietnamese
+        "xin", "chào", "chao", "cảm", "cám", "ơn", "on", "dạ", "vâng", "ạ", "nhé", "nha",
+        "ok", "oke", "okie", "em", "anh", "chị", "shop", "bạn", "quán", "nhà", "hàng",
+        "rất", "nhiều", "tạm", "biệt",
+        # English
+        "hi", "hello", "hey", "thanks", "thank", "you", "bye"
+    ],
+    
+    # Booking-flow messages go to direct_answer; the fast-path router defers them to the LLM
+    "booking_keywords": [
+        "đặt bàn", "dat ban", "đặt chỗ", "book", "booking", "người lớn", "trẻ em",
+        "xác nhận", "hủy bàn", "huỷ bàn", "tối nay", "trưa nay", "ngày mai"
     ]
 }
 
+# Labelled examples per route for the fast-path router's nearest-centroid tier
+RESTAURANT_ROUTE_EXAMPLES: Dict[str, List[str]] = {
+    "vectorstore": [
+        "Menu có những món lẩu gì?",
+        "Giá combo lẩu bò bao nhiêu?",
+        "Chi nhánh Times City ở đâu?",
+        "Nhà hàng có chi nhánh ở Hải Phòng không?",
+        "Hotline đặt bàn là số nào?",
+        "Có chương trình ưu đãi sinh nhật không?",
+        "Thẻ thành viên vàng được giảm bao nhiêu?",
+        "Nhà hàng mở cửa đến mấy giờ?",
+        "Có xuất hóa đơn VAT không?",
+        "Có chỗ đỗ xe ô tô không?",
+    ],
+    "direct_answer": [
+        "Xin chào",
+        "Cảm ơn em nhiều nhé",
+        "Ok em",
+        "7h tối nay",
+        "3 người lớn 2 trẻ em",
+        "Không có ai sinh nhật",
+        "Xác nhận đặt bàn giúp anh",
+        "Anh tên Nam, số điện thoại 0912345678",
+        "Anh thích ăn cay",
+        "Tạm biệt em",
+    ],
+    "web_search": [
+        "Thời tiết Hà Nội hôm nay thế nào?",
+        "Tỷ giá đô la hôm nay bao nhiêu?",
+        "Tin tức mới nhất về giá thịt bò",
+        "Kết quả bóng đá tối qua",
+        "Đường từ Hồ Gươm đến Times City có tắc không?",
+        "Lễ 2/9 năm nay được nghỉ mấy ngày?",
+        "Giá vàng hôm nay là bao nhiêu?",
+        "Review quán lẩu ngon ở Hà Nội trên mạng",
+    ],
+    "process_document": [
+        "Em xem giúp anh ảnh này với",
+        "Món trong ảnh anh gửi là món gì?",
+        "Anh gửi ảnh hóa đơn, kiểm tra giúp anh",
+        "Ảnh chụp menu này còn đúng giá không?",
+        "Em đọc giúp anh file đính kèm",
+        "Đây là ảnh chuyển khoản đặt cọc nhé",
+        "Xem video này giúp chị",
+        "Trong hình này là chi nhánh nào vậy em?",
+    ],
+}
+
+DOMAIN_ROUTE_EXAMPLES: Dict[str, Dict[str, List[str]]] = {
+    "restaurant": RESTAURANT_ROUTE_EXAMPLES,
+}
+
 # Generic keyword mappings that can be extended for other domains
 DOMAIN_KEYWORD_MAPPINGS: Dict[str, Dict[str, List[str]]] = {
     "restaurant": RESTAURANT_KEYWORDS,
@@ -79,6 +147,18 @@ def get_keywords_for_domain(domain: str, category: str) -> List[str]:
     """
     return DOMAIN_KEYWORD_MAPPINGS.get(domain, {}).get(category, [])
 
+def get_route_examples_for_domain(domain: str) -> Dict[str, List[str]]:
+    """
+    Get labelled routing examples ({datasource: [messages]}) for a domain.
+    
+    Args:
+        domain: Domain name (e.g., "restaurant")
+    
+    Returns:
+        Dictionary mapping router datasource to example user messages
+    """
+    return DOMAIN_ROUTE_EXAMPLES.get(domain, {})
+
 def get_all_keywords_for_domain(domain: str) -> Dict[str, List[str]]:
     """
     Get all keyword mappings for a specific domain.
@@ -34,7 +34,7 @@ from langgraph.graph import StateGraph
 
 from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import Runnable, RunnableConfig, RunnablePassthrough
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda, RunnablePassthrough
 
 from src.tools.memory_tools import get_user_profile
 from src.tools.enhanced_memory_tools import save_user_preference_with_refresh_flag
@@ -45,13 +45,25 @@ from src.tools.booking_validation_tool import validate_booking_info
 from src.graphs.state.state import RagState
 from src.database.qdrant_store import QdrantStore
 from src.graphs.core.assistants.router_assistant import RouterAssistant, RouteQuery
-from src.graphs.core.assistants.doc_grader_assistant import DocGraderAssistant, GradeDocuments
+from src.graphs.core.assistants.doc_grader_assistant import DocGraderAssistant, GradeDocuments, BatchDocGraderAssistant
 from src.graphs.core.assistants.rewrite_assistant import RewriteAssistant
 from src.graphs.core.assistants.generation_assistant import GenerationAssistant
 from src.graphs.core.assistants.suggestive_assistant import SuggestiveAssistant
 from src.graphs.core.assistants.hallucination_grader_assistant import HallucinationGraderAssistant, GradeHallucinations
 from src.graphs.core.assistants.direct_answer_assistant import DirectAnswerAssistant
 from src.graphs.core.assistants.document_processing_assistant import DocumentProcessingAssistant
+from src.utils.grading_policy import get_grading_policy, document_namespace
+from src.database.grader_cache import get_grader_cache, prompt_fingerprint, content_hash
+from src.utils.fast_router import FastRouter, RouteContext, set_fast_router
+from src.utils.speculative_retrieval import SpeculativeRetriever, is_enabled_for_domain, set_speculative_retriever
+from src.utils.ephemeral_state import EphemeralChannels, set_ephemeral_channels
+from src.utils.state_audit import StateUpdateAudit, set_state_audit
+from src.utils.conversation_memory import (
+    MEMORY_NODE,
+    ConversationMemory,
+    memory_summary_node,
+    set_conversation_memory,
+)
 
 # Import từ nodes.py như code cũ
 from src.nodes.nodes import user_info
@@ -349,6 +361,14 @@ def create_adaptive_rag_graph(
 
     # 2. Document Grader Assistant
     doc_grader_assistant = DocGraderAssistant(llm_grade_documents, domain_context)
+    # Grades all candidates in one structured call (per-document grader is the fallback)
+    batch_doc_grader_assistant = BatchDocGraderAssistant(llm_grade_documents, domain_context)
+    batch_grading_enabled = os.getenv("DOC_GRADER_BATCH_ENABLED", "true").lower() == "true"
+    # Grader decisions are cached per (question, content, prompt, corpus version)
+    grader_cache = get_grader_cache()
+    doc_grading_fingerprint = prompt_fingerprint(
+        doc_grader_assistant.prompt_fingerprint, batch_doc_grader_assistant.prompt_fingerprint
+    )
 
     # 3. Rewrite Assistant
     rewrite_assistant = RewriteAssistant(llm_rewrite, domain_context)
@@ -388,6 +408,29 @@ def create_adaptive_rag_graph(
         ]
         return any(re.search(p, t) for p in patterns)
 
+    fast_router = FastRouter(
+        domain=DOMAIN.get("keyword_domain", ""),
+        embed_fn=retriever.embed_query if hasattr(retriever, "embed_query") else None,
+        has_attachment_fn=_has_attachment_metadata,
+        aembed_fn=retriever.aembed_query if hasattr(retriever, "aembed_query") else None,
+    )
+    set_fast_router(fast_router)
+
+    speculative_retriever = SpeculativeRetriever(enabled=is_enabled_for_domain(DOMAIN))
+    set_speculative_retriever(speculative_retriever)
+
+    # Documents are checkpointed by reference and rehydrated from this process's
+    # cache (or Qdrant) when a node reads them
+    ephemeral_channels = EphemeralChannels()
+    ephemeral_channels.store.set_loader(
+        lambda namespace, key: retriever.get(namespace, key) if namespace else None
+    )
+    set_ephemeral_channels(ephemeral_channels)
+
+    # STATE_AUDIT_ENABLED=true: flag unchanged writes, reducer time and update bytes per node
+    state_audit = StateUpdateAudit(RagState)
+    set_state_audit(state_audit)
+
     def _sanitize_for_router(text: str) -> str:
         # Only strip historical reply context, but keep current-turn attachment metadata
         if not isinstance(text, str):
@@ -395,9 +438,7 @@ def create_adaptive_rag_graph(
         # Only remove [REPLY_CONTEXT] block, preserve current attachment markers
         return _strip_reply_context_block(text)
 
-    def route_question(state: RagState, config: RunnableConfig):
-        logging.info("---NODE: ROUTE QUESTION---")
-        
+    def _router_question(state: RagState) -> tuple:
         # Get current user question for consistent context
         current_question = get_current_user_question(state)
         logging.debug(f"route_question->current_question -> {current_question}")
@@ -405,15 +446,30 @@ def create_adaptive_rag_graph(
         # Sanitize input passed to the router to avoid historical attachment leakage
         sanitized_question = _sanitize_for_router(current_question)
         logging.debug(f"route_question->sanitized_question -> {sanitized_question}")
-        
+        return current_question, sanitized_question
+
+    def _router_context(state: RagState) -> RouteContext:
+        # Previous turn: the route it took and the assistant reply before the current message
+        previous_reply = ""
+        seen_current = False
+        for msg in reversed(state.get("messages", [])):
+            if isinstance(msg, HumanMessage):
+                seen_current = True
+            elif seen_current and isinstance(msg, AIMessage) and msg.content:
+                previous_reply = extract_text_from_message_content(msg.content)
+                break
+        return RouteContext(previous_route=state.get("datasource"), previous_reply=previous_reply)
+
+    def _router_prompt(state: RagState, sanitized_question: str) -> dict:
         prompt_data = router_assistant.binding_prompt(state)
         prompt_data["messages"] = sanitized_question
+        return prompt_data
 
-        result = router_assistant.runnable.invoke(prompt_data)
-        datasource = result.datasource
+    def _route_update(current_question: str, decision, prefetched_documents) -> dict:
+        datasource = decision.datasource
         
         # Log the routing decision with context
-        logging.info(f"🔀 ROUTER DECISION: '{datasource}' for message: {current_question[:100]}...")
+        logging.info(f"🔀 ROUTER DECISION: '{datasource}' ({decision.source}) for message: {current_question[:100]}...")
         
         # Debug: check if attachment metadata exists
         has_attachment = _has_attachment_metadata(current_question)
@@ -425,139 +481,266 @@ def create_adaptive_rag_graph(
         elif "📸" in current_question and "Phân tích hình ảnh" in current_question and datasource != "process_document":
             logging.warning(f"⚠️ POTENTIAL ROUTING ISSUE: Pre-analyzed image message routed to '{datasource}' instead of 'process_document'")
         
-        return {"datasource": datasource}
+        # The hint applies to a single turn only
+        return {"datasource": datasource, "route_hint": None, "prefetched_documents": prefetched_documents}
+
+    def route_question(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: ROUTE QUESTION---")
+        current_question, sanitized_question = _router_question(state)
+        speculation = None
+
+        def _llm_route() -> str:
+            nonlocal speculation
+            # Start the first retrieve while the LLM router is deciding
+            speculation = speculative_retriever.start(_retrieve_documents, dict(state))
+            result = router_assistant.runnable.invoke(_router_prompt(state, sanitized_question))
+            return result.datasource
+
+        # Tiered routing: confident local decisions (hint, attachments, greetings,
+        # keyword classifier, nearest centroid) skip the LLM router call
+        try:
+            decision = fast_router.route(
+                sanitized_question,
+                llm_route=_llm_route,
+                route_hint=state.get("route_hint"),
+                context=_router_context(state),
+            )
+        except Exception:
+            speculative_retriever.discard(speculation)
+            raise
+
+        prefetched_documents = None
+        if decision.datasource == "vectorstore":
+            speculative_result = speculative_retriever.take(speculation, decided_at=time.perf_counter())
+            if speculative_result is not None:
+                prefetched_documents = speculative_result.get("documents")
+        else:
+            speculative_retriever.discard(speculation)
+        return _route_update(current_question, decision, prefetched_documents)
+
+    async def aroute_question(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: ROUTE QUESTION (async)---")
+        current_question, sanitized_question = _router_question(state)
+        speculation = None
+
+        async def _allm_route() -> str:
+            nonlocal speculation
+            speculation = speculative_retriever.astart(_aretrieve_documents, dict(state))
+            result = await router_assistant.runnable.ainvoke(_router_prompt(state, sanitized_question))
+            return result.datasource
+
+        try:
+            decision = await fast_router.aroute(
+                sanitized_question,
+                allm_route=_allm_route,
+                route_hint=state.get("route_hint"),
+                context=_router_context(state),
+            )
+        except Exception:
+            speculative_retriever.discard(speculation)
+            raise
+
+        prefetched_documents = None
+        if decision.datasource == "vectorstore":
+            speculative_result = await speculative_retriever.atake(speculation, decided_at=time.perf_counter())
+            if speculative_result is not None:
+                prefetched_documents = speculative_result.get("documents")
+        else:
+            speculative_retriever.discard(speculation)
+        return _route_update(current_question, decision, prefetched_documents)
+
+    def _prefetched_update(state: RagState):
+        # First attempt already retrieved speculatively while the router was deciding
+        prefetched = state.get("prefetched_documents")
+        if prefetched is not None and state.get("search_attempts", 0) == 0 and state.get("rewrite_count", 0) == 0:
+            logging.info(f"⚡ Using {len(prefetched)} speculatively retrieved documents")
+            return {
+                "documents": prefetched,
+                "search_attempts": 1,
+                "prefetched_documents": None,
+            }
+        return None
 
     def retrieve(state: RagState, config: RunnableConfig):
         """
         Enhanced retrieve node with intelligent multi-namespace search strategy.
         Searches across all available namespaces with smart fallback and fusion.
         """
-        from src.utils.multi_namespace_retriever import MultiNamespaceRetriever
-        
         logging.info("---NODE: RETRIEVE (Multi-Namespace)---")
+        result = _prefetched_update(state) or _retrieve_documents(state)
+        result["prefetched_documents"] = None
+        return result
+
+    async def aretrieve(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: RETRIEVE (Multi-Namespace, async)---")
+        result = _prefetched_update(state) or await _aretrieve_documents(state)
+        result["prefetched_documents"] = None
+        return result
+
+    def _retrieval_plan(state: RagState) -> dict:
+        """Search strategy for the current attempt: start focused, then expand."""
+        from src.utils.multi_namespace_retriever import MultiNamespaceRetriever, SearchStrategy
+
+        # Multi-namespace configuration
+        available_namespaces = ["maketing", "faq"]  # All available namespaces
+        default_namespace = DOMAIN.get("namespace", "maketing")
+        
+        # Determine search strategy based on context
+        search_attempts = state.get("search_attempts", 0)
+        rewrite_count = state.get("rewrite_count", 0)
+        
+        # Progressive search strategy: start focused, then expand
+        if search_attempts == 0 and rewrite_count == 0:
+            # First attempt: hybrid BM25 + dense (exact branch/dish names) when
+            # enabled, otherwise fallback strategy (primary + backup)
+            if os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true":
+                search_strategy = "hybrid"
+            else:
+                search_strategy = "fallback"
+            limit = 12
+        else:
+            # Later attempts or rewrites: cast wider net
+            search_strategy = "comprehensive"
+            limit = 16
+        
+        logging.info(f"🎯 Multi-namespace search strategy: {search_strategy}")
+        logging.info(f"   Available namespaces: {available_namespaces}")
+        logging.info(f"   Search attempts: {search_attempts}, Rewrites: {rewrite_count}")
+        
+        # Initialize multi-namespace retriever
+        multi_retriever = MultiNamespaceRetriever(
+            qdrant_store=retriever,
+            namespaces=available_namespaces,
+            default_namespace=default_namespace
+        )
+        if search_strategy == "comprehensive":
+            # Search ALL namespaces for maximum coverage
+            limit = max(6, limit // len(available_namespaces)) * len(available_namespaces)
+        return {
+            "multi_retriever": multi_retriever,
+            "strategy": SearchStrategy(search_strategy),
+            "limit": limit,
+            "default_namespace": default_namespace,
+        }
+
+    def _retrieval_update(state: RagState, question: str, documents: list, plan: dict) -> dict:
+        logging.info(f"🔎 {plan['strategy'].value} search: {len(documents)} results")
+
+        # Log detailed retrieval stats
+        namespace_stats = {}
+        for _, doc_dict, _ in documents:
+            ns = doc_dict.get('domain', 'unknown')
+            namespace_stats[ns] = namespace_stats.get(ns, 0) + 1
+        
+        logging.info(f"📊 Namespace distribution: {namespace_stats}")
+        
+        # Log collection info for debugging
+        try:
+            collection_name = getattr(retriever, "collection_name", "<unknown>")
+        except Exception:
+            collection_name = "<unknown>"
+        
+        logging.info(
+            "🔍 Multi-namespace search params: collection=%s, strategy=%s, limit=%s, query=%.120s",
+            collection_name,
+            plan["strategy"].value,
+            plan["limit"],
+            question,
+        )
+
+        logging.info(f"✅ Retrieved {len(documents)} documents using multi-namespace strategy")
+        
+        # Clean documents: remove embedding vectors to save memory and reduce token usage
+        cleaned_documents = clean_documents_remove_embeddings(documents)
+        
+        return {
+            "documents": cleaned_documents,
+            "search_attempts": state.get("search_attempts", 0) + 1,
+        }
+
+    def _retrieval_failed(state: RagState, question: str, e: Exception) -> None:
+        user_id = state.get("user", {}).get("user_info", {}).get("user_id", "unknown")
+        log_exception_details(
+            exception=e,
+            context=f"Multi-namespace retrieve failure for question: {question[:100]}",
+            user_id=user_id
+        )
+        logging.warning(f"⚠️ Falling back to basic search in default namespace")
+
+    def _empty_retrieval(state: RagState) -> dict:
+        return {
+            "documents": [],
+            "search_attempts": state.get("search_attempts", 0) + 1,
+        }
+
+    def _retrieve_documents(state: RagState) -> dict:
+        """Retrieve for the current question; shared by the retrieve node and speculation."""
         question = get_current_user_question(state)
 
         # Ensure question is valid
         if not question:
             logging.error("Invalid question for retrieval")
-            return {
-                "documents": [],
-                "search_attempts": state.get("search_attempts", 0) + 1,
-            }
+            return _empty_retrieval(state)
 
         try:
-            user_id = state.get("user", {}).get("user_info", {}).get("user_id", "unknown")
-            
-            # Multi-namespace configuration
-            available_namespaces = ["maketing", "faq"]  # All available namespaces
-            default_namespace = DOMAIN.get("namespace", "maketing")
-            
-            # Determine search strategy based on context
-            search_attempts = state.get("search_attempts", 0)
-            rewrite_count = state.get("rewrite_count", 0)
-            
-            # Progressive search strategy: start focused, then expand
-            if search_attempts == 0 and rewrite_count == 0:
-                # First attempt: use fallback strategy (primary + backup)
-                search_strategy = "fallback"
-                limit = 12
-            else:
-                # Later attempts or rewrites: cast wider net
-                search_strategy = "comprehensive"
-                limit = 16
-            
-            logging.info(f"🎯 Multi-namespace search strategy: {search_strategy}")
-            logging.info(f"   Available namespaces: {available_namespaces}")
-            logging.info(f"   Search attempts: {search_attempts}, Rewrites: {rewrite_count}")
-            
-            # Initialize multi-namespace retriever
-            multi_retriever = MultiNamespaceRetriever(
-                qdrant_store=retriever,
-                namespaces=available_namespaces,
-                default_namespace=default_namespace
+            plan = _retrieval_plan(state)
+            documents = plan["multi_retriever"].search(
+                query=question,
+                strategy=plan["strategy"],
+                limit=plan["limit"],
+                primary_namespace=plan["default_namespace"],
             )
-
-            # Execute search based on strategy
-            if search_strategy == "comprehensive":
-                # Search ALL namespaces for maximum coverage
-                limit_per_ns = max(6, limit // len(available_namespaces))
-                documents = multi_retriever.search_all_namespaces(
-                    query=question, 
-                    limit_per_namespace=limit_per_ns
-                )
-                logging.info(f"🌐 Comprehensive search: {len(documents)} results from all namespaces")
-                
-            else:  # fallback strategy
-                # Smart primary selection with fallback
-                documents = multi_retriever.search_with_fallback(
-                    query=question,
-                    primary_namespace=default_namespace,
-                    limit=limit,
-                    fallback_threshold=0.65,  # Aggressive fallback for better coverage
-                    min_primary_results=4
-                )
-                logging.info(f"🔄 Fallback search: {len(documents)} results with smart fallback")
-
-            # Log detailed retrieval stats
-            namespace_stats = {}
-            for _, doc_dict, _ in documents:
-                ns = doc_dict.get('domain', 'unknown')
-                namespace_stats[ns] = namespace_stats.get(ns, 0) + 1
-            
-            logging.info(f"📊 Namespace distribution: {namespace_stats}")
-            
-            # Log collection info for debugging
-            try:
-                collection_name = getattr(retriever, "collection_name", "<unknown>")
-            except Exception:
-                collection_name = "<unknown>"
-            
-            logging.info(
-                "🔍 Multi-namespace search params: collection=%s, strategy=%s, limit=%s, query=%.120s",
-                collection_name,
-                search_strategy,
-                limit,
-                question,
-            )
-
-            logging.info(f"✅ Retrieved {len(documents)} documents using multi-namespace strategy")
-            
-            # Clean documents: remove embedding vectors to save memory and reduce token usage
-            cleaned_documents = clean_documents_remove_embeddings(documents)
-            
-            return {
-                "documents": cleaned_documents,
-                "search_attempts": state.get("search_attempts", 0) + 1,
-            }
-            
+            return _retrieval_update(state, question, documents, plan)
         except Exception as e:
-            log_exception_details(
-                exception=e,
-                context=f"Multi-namespace retrieve failure for question: {question[:100]}",
-                user_id=user_id
-            )
-            
+            _retrieval_failed(state, question, e)
             # Fallback to basic single-namespace search on error
             try:
-                logging.warning(f"⚠️ Falling back to basic search in default namespace")
                 default_namespace = DOMAIN.get("namespace", "maketing")
                 documents = retriever.search(namespace=default_namespace, query=question, limit=10)
-                cleaned_documents = clean_documents_remove_embeddings(documents)
-                
                 return {
-                    "documents": cleaned_documents,
+                    "documents": clean_documents_remove_embeddings(documents),
                     "search_attempts": state.get("search_attempts", 0) + 1,
                 }
             except Exception as fallback_e:
                 logging.error(f"❌ Fallback search also failed: {fallback_e}")
+                return _empty_retrieval(state)
+
+    async def _aretrieve_documents(state: RagState) -> dict:
+        """Async `_retrieve_documents` (async embedding + AsyncQdrantClient)."""
+        question = get_current_user_question(state)
+        if not question:
+            logging.error("Invalid question for retrieval")
+            return _empty_retrieval(state)
+
+        try:
+            plan = _retrieval_plan(state)
+            documents = await plan["multi_retriever"].asearch(
+                query=question,
+                strategy=plan["strategy"],
+                limit=plan["limit"],
+                primary_namespace=plan["default_namespace"],
+            )
+            return _retrieval_update(state, question, documents, plan)
+        except Exception as e:
+            _retrieval_failed(state, question, e)
+            try:
+                default_namespace = DOMAIN.get("namespace", "maketing")
+                documents = await retriever.asearch(namespace=default_namespace, query=question, limit=10)
                 return {
-                    "documents": [],
+                    "documents": clean_documents_remove_embeddings(documents),
                     "search_attempts": state.get("search_attempts", 0) + 1,
                 }
+            except Exception as fallback_e:
+                logging.error(f"❌ Fallback search also failed: {fallback_e}")
+                return _empty_retrieval(state)
 
-    def grade_documents_node(state: RagState, config: RunnableConfig):
-        logging.info("---NODE: GRADE DOCUMENTS---")
+    def _grading_plan(state: RagState):
+        """
+        Pick the documents that still need an LLM grade.
 
+        Returns a final state update when there is nothing to grade, otherwise a
+        dict with the score-policy and cache decisions and the `to_grade` list.
+        """
         # Get the question from state using consistent method
         question = get_current_user_question(state)
 
@@ -581,40 +764,94 @@ def create_adaptive_rag_graph(
         
         logging.info(f"Grading {len(documents_to_grade)} documents, including {len(remaining_docs)} without grading")
 
-        filtered_docs = []
-        
-        # Grade limited number of documents
+        # Collect gradable documents (tuple format with dict payload)
+        gradable = []
         for i, d in enumerate(documents_to_grade):
+            if isinstance(d, tuple) and len(d) > 1 and isinstance(d[1], dict):
+                gradable.append((i, d, d[1].get("content", "")))
+            else:
+                logging.warning(f"Skipping invalid document format at index {i}")
+
+        # Score-based policy: confident hits skip the LLM grader entirely
+        grading_policy = get_grading_policy()
+        auto_accepted, auto_rejected, ambiguous = grading_policy.partition(
+            [d for _, d, _ in gradable]
+        )
+        if auto_accepted or auto_rejected:
+            ambiguous_ids = {id(d) for d in ambiguous}
+            calls_before = 1 if batch_grading_enabled and len(gradable) > 1 else len(gradable)
+            gradable = [g for g in gradable if id(g[1]) in ambiguous_ids]
+            calls_after = 1 if batch_grading_enabled and len(gradable) > 1 else len(gradable)
+            grading_policy.record_llm_calls_saved(calls_before - calls_after)
+            logging.info(
+                f"⚖️ Grading policy: {len(auto_accepted)} accepted, {len(auto_rejected)} dropped by score, "
+                f"{len(gradable)} sent to LLM grader"
+            )
+
+        # Decision cache: repeat (question, chunk) pairs skip grading entirely
+        cached_grades = {}
+        for i, d, doc_content in gradable:
+            decision = grader_cache.get("doc_grader", doc_grading_fingerprint, question, doc_content)
+            if decision is not None:
+                cached_grades[i] = GradeDocuments(binary_score=decision)
+        to_grade = [g for g in gradable if g[0] not in cached_grades]
+        if cached_grades:
+            logging.info(f"💾 Grader cache: {len(cached_grades)} cached decisions, {len(to_grade)} to grade")
+
+        return {
+            "question": question,
+            "grading_policy": grading_policy,
+            "gradable": gradable,
+            "auto_accepted": auto_accepted,
+            "remaining_docs": remaining_docs,
+            "cached_grades": cached_grades,
+            "to_grade": to_grade,
+            "use_batch": batch_grading_enabled and len(to_grade) > 1,
+        }
+
+    def _grade_query(state: RagState, question: str, doc_content: str) -> dict:
+        return {
+            "document": doc_content,
+            "messages": question,
+            "user": state.get("user", {}),
+        }
+
+    def _graded_documents(plan: dict, llm_grades: dict) -> dict:
+        """
+        Apply cached and LLM grades. A document whose grading failed
+        (`llm_grades[i] is None`) is kept to avoid losing content.
+        """
+        question = plan["question"]
+        grading_policy = plan["grading_policy"]
+        remaining_docs = plan["remaining_docs"]
+        filtered_docs = list(plan["auto_accepted"])
+        
+        for i, d, doc_content in plan["gradable"]:
+            score = plan["cached_grades"].get(i)
+            if score is not None:
+                if score.binary_score == "yes":
+                    filtered_docs.append(d)
+                continue
+            score = llm_grades.get(i)
+            if score is None:
+                # Include document if grading fails to avoid losing content
+                filtered_docs.append(d)
+                continue
+            
+            logging.debug(f"score:{score}")
             try:
-                logging.debug(f"Grading document {i+1}/{len(documents_to_grade)}")
-                
-                if isinstance(d, tuple) and len(d) > 1 and isinstance(d[1], dict):
-                    doc_content = d[1].get("content", "")
-                else:
-                    logging.warning(f"Skipping invalid document format at index {i}")
-                    continue
-                    
-                query_grade_document = {
-                    "document": doc_content,
-                    "messages": question,
-                    "user": state.get("user", {}),
-                }
-                logging.debug(f"query_grade_document:{query_grade_document}")
-                
-                score = doc_grader_assistant(
-                    query_grade_document,
-                    config,
+                grading_policy.log_decision(
+                    document_namespace(d[1]), d[2] if len(d) > 2 else None, score.binary_score
+                )
+                grader_cache.set(
+                    "doc_grader", doc_grading_fingerprint, question, doc_content, score.binary_score
                 )
-                
-                logging.debug(f"score:{score}")
                 if score.binary_score.lower() == "yes":
                     filtered_docs.append(d)
-                        
             except Exception as e:
-                logging.error(f"Error grading document {i+1}: {e}")
+                logging.error(f"Error reading grade for document {i+1}: {e}")
                 # Include document if grading fails to avoid losing content
                 filtered_docs.append(d)
-                continue
         
         # Include remaining documents only if we already have some relevant docs;
         # otherwise keep empty to trigger rewrite flow.
@@ -634,11 +871,48 @@ def create_adaptive_rag_graph(
 
         return {"documents": filtered_docs}
 
-    def rewrite(state: RagState, config: RunnableConfig):
-        logging.info("---NODE: REWRITE---")
-        original_question = get_current_user_question(state)
-        logging.debug(f"rewrite->original_question -> {original_question}")
-        
+    def grade_documents_node(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: GRADE DOCUMENTS---")
+        plan = _grading_plan(state)
+        if "to_grade" not in plan:
+            return plan
+        question, to_grade = plan["question"], plan["to_grade"]
+
+        # Batch mode: one structured LLM call for all documents, then one call
+        # per document for anything the batch did not cover
+        grades = batch_doc_grader_assistant.grade_all(
+            question,
+            [doc_content for _, _, doc_content in to_grade],
+            state.get("user", {}),
+            config,
+            grade_one=lambda content: doc_grader_assistant(_grade_query(state, question, content), config),
+            use_batch=plan["use_batch"],
+        )
+        llm_grades = {to_grade[pos][0]: grade for pos, grade in grades.items()}
+
+        return _graded_documents(plan, llm_grades)
+
+    async def agrade_documents_node(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: GRADE DOCUMENTS (async)---")
+        plan = _grading_plan(state)
+        if "to_grade" not in plan:
+            return plan
+        question, to_grade = plan["question"], plan["to_grade"]
+
+        # Documents the batch call did not cover are graded concurrently
+        grades = await batch_doc_grader_assistant.agrade_all(
+            question,
+            [doc_content for _, _, doc_content in to_grade],
+            state.get("user", {}),
+            config,
+            agrade_one=lambda content: doc_grader_assistant.acall(_grade_query(state, question, content), config),
+            use_batch=plan["use_batch"],
+        )
+        llm_grades = {to_grade[pos][0]: grade for pos, grade in grades.items()}
+
+        return _graded_documents(plan, llm_grades)
+
+    def _rewrite_guard(state: RagState, original_question: str):
         # Kiểm tra state trước khi gọi assistant
         if not original_question or original_question == "Câu hỏi không rõ ràng":
             logging.warning("Rewrite node: No valid question found, using fallback")
@@ -647,49 +921,55 @@ def create_adaptive_rag_graph(
                 "rewrite_count": state.get("rewrite_count", 0) + 1,
                 "documents": [],
             }
+        return None
+
+    def _rewrite_update(state: RagState, new_question: str) -> dict:
+        logging.info(f"Rewritten question for retrieval: {new_question}")
+        return {
+            "question": new_question,
+            "rewrite_count": state.get("rewrite_count", 0) + 1,
+            "documents": [],
+        }
+
+    def _rewrite_failed(state: RagState, original_question: str, e: Exception) -> dict:
+        user_id = state.get("user", {}).get("user_info", {}).get("user_id", "unknown")
+        log_exception_details(
+            exception=e,
+            context=f"Rewrite node failure for question: {original_question[:100]}",
+            user_id=user_id
+        )
         
+        # Fallback rewrite
+        fallback_question = f"Thông tin về {original_question}"
+        logging.warning(f"Rewrite failed, using fallback: {fallback_question}")
+        return _rewrite_update(state, fallback_question)
+
+    def rewrite(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: REWRITE---")
+        original_question = get_current_user_question(state)
+        logging.debug(f"rewrite->original_question -> {original_question}")
+        guarded = _rewrite_guard(state, original_question)
+        if guarded is not None:
+            return guarded
         try:
             rewritten_question_msg = rewrite_assistant(state, config)
-            new_question = rewritten_question_msg.content
-            logging.info(f"Rewritten question for retrieval: {new_question}")
-            
-            return {
-                "question": new_question,
-                "rewrite_count": state.get("rewrite_count", 0) + 1,
-                "documents": [],
-            }
+            return _rewrite_update(state, rewritten_question_msg.content)
         except Exception as e:
-            user_id = state.get("user", {}).get("user_info", {}).get("user_id", "unknown")
-            log_exception_details(
-                exception=e,
-                context=f"Rewrite node failure for question: {original_question[:100]}",
-                user_id=user_id
-            )
-            
-            # Fallback rewrite
-            fallback_question = f"Thông tin về {original_question}"
-            logging.warning(f"Rewrite failed, using fallback: {fallback_question}")
-            return {
-                "question": fallback_question,
-                "rewrite_count": state.get("rewrite_count", 0) + 1,
-                "documents": [],
-            }
+            return _rewrite_failed(state, original_question, e)
 
-    def web_search_node(state: RagState, config: RunnableConfig):
-        logging.info("---NODE: WEB SEARCH---")
-
-        # Get the question from state using consistent method
-        query_search = get_current_user_question(state)
-
-        # Ensure query_search is valid
-        if not query_search:
-            logging.error("Invalid query for web search")
-            return {"documents": [], "web_search_attempted": True}
-
-        logging.debug(f"web_search_node->query_search -> {query_search}")
-        
-        search_results = web_search_tool.invoke({"query": query_search}, config)
+    async def arewrite(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: REWRITE (async)---")
+        original_question = get_current_user_question(state)
+        guarded = _rewrite_guard(state, original_question)
+        if guarded is not None:
+            return guarded
+        try:
+            rewritten_question_msg = await rewrite_assistant.acall(state, config)
+            return _rewrite_update(state, rewritten_question_msg.content)
+        except Exception as e:
+            return _rewrite_failed(state, original_question, e)
 
+    def _web_search_update(state: RagState, search_results) -> dict:
         if isinstance(search_results, dict) and "results" in search_results:
             results = search_results["results"]
         else:
@@ -715,8 +995,33 @@ def create_adaptive_rag_graph(
             "search_attempts": state.get("search_attempts", 0) + 1,
         }
 
-    def generate(state: RagState, config: RunnableConfig):
-        logging.info("---NODE: GENERATE---")
+    def web_search_node(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: WEB SEARCH---")
+
+        # Get the question from state using consistent method
+        query_search = get_current_user_question(state)
+
+        # Ensure query_search is valid
+        if not query_search:
+            logging.error("Invalid query for web search")
+            return {"documents": [], "web_search_attempted": True}
+
+        logging.debug(f"web_search_node->query_search -> {query_search}")
+        
+        search_results = web_search_tool.invoke({"query": query_search}, config)
+        return _web_search_update(state, search_results)
+
+    async def aweb_search_node(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: WEB SEARCH (async)---")
+        query_search = get_current_user_question(state)
+        if not query_search:
+            logging.error("Invalid query for web search")
+            return {"documents": [], "web_search_attempted": True}
+
+        search_results = await web_search_tool.ainvoke({"query": query_search}, config)
+        return _web_search_update(state, search_results)
+
+    def _log_generate_input(state: RagState) -> str:
         current_question = get_current_user_question(state)
         documents_count = len(state.get("documents", []))
         logging.debug(f"generate->current_question -> {current_question}")
@@ -737,19 +1042,19 @@ def create_adaptive_rag_graph(
                 logging.info(f"   📄 Generate Doc {i+1}: {doc_content}...")
         else:
             logging.warning(f"   ⚠️ NO DOCUMENTS found for GENERATE node!")
-        
-        try:
-            generation = generation_assistant(state, config)
-        except Exception as e:
-            user_id = state.get("user", {}).get("user_info", {}).get("user_id", "unknown")
-            log_exception_details(
-                exception=e,
-                context=f"Generate node failure for question: {current_question[:100]}",
-                user_id=user_id
-            )
-            # Return error response
-            generation = {"messages": [{"role": "assistant", "content": "Xin lỗi, có lỗi xảy ra khi tạo câu trả lời. Vui lòng thử lại."}]}
+        return current_question
+
+    def _generate_failed(state: RagState, current_question: str, e: Exception):
+        user_id = state.get("user", {}).get("user_info", {}).get("user_id", "unknown")
+        log_exception_details(
+            exception=e,
+            context=f"Generate node failure for question: {current_question[:100]}",
+            user_id=user_id
+        )
+        # Return error response
+        return {"messages": [{"role": "assistant", "content": "Xin lỗi, có lỗi xảy ra khi tạo câu trả lời. Vui lòng thử lại."}]}
 
+    def _generate_update(generation) -> dict:
         # Post-format price lists if the result is a text-based assistant message
         try:
             # LangChain AIMessage typically; support dict for safety
@@ -766,9 +1071,26 @@ def create_adaptive_rag_graph(
 
         return {"messages": [generation]}
 
-    def hallucination_grader_node(state: RagState, config: RunnableConfig):
-        logging.info("---NODE: HALLUCINATION GRADER---")
-        
+    def generate(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: GENERATE---")
+        current_question = _log_generate_input(state)
+        try:
+            generation = generation_assistant(state, config)
+        except Exception as e:
+            generation = _generate_failed(state, current_question, e)
+        return _generate_update(generation)
+
+    async def agenerate(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: GENERATE (async)---")
+        current_question = _log_generate_input(state)
+        try:
+            generation = await generation_assistant.acall(state, config)
+        except Exception as e:
+            generation = _generate_failed(state, current_question, e)
+        return _generate_update(generation)
+
+    def _hallucination_plan(state: RagState) -> dict:
+        """Early {"update": ...} when no check is needed, otherwise the cache key and cached score."""
         # DETAILED INPUT LOGGING
         current_question = get_current_user_question(state)
         logging.info(f"🔍 HALLUCINATION_GRADER INPUT ANALYSIS:")
@@ -783,11 +1105,11 @@ def create_adaptive_rag_graph(
         
         if not state.get("documents"):
             logging.warning("⚠️ HALLUCINATION_GRADER: No documents found, skipping hallucination check")
-            return {"hallucination_score": "grounded"}
+            return {"update": {"hallucination_score": "grounded"}}
             
         if hasattr(generation_message, "tool_calls"):
             logging.warning("⚠️ HALLUCINATION_GRADER: Generation has tool_calls, skipping hallucination check")
-            return {"hallucination_score": "grounded"}
+            return {"update": {"hallucination_score": "grounded"}}
         
         # Log documents for hallucination check
         documents = state.get("documents", [])
@@ -796,26 +1118,50 @@ def create_adaptive_rag_graph(
             doc_content = str(doc)[:150] if doc else "EMPTY"
             logging.info(f"   📄 Doc {i+1}: {doc_content}...")
             
-        try:
-            logging.info(f"🔍 HALLUCINATION_GRADER: Calling assistant...")
-            score = hallucination_grader_assistant(state, config)
-            logging.info(f"🔍 HALLUCINATION_GRADER: Assistant returned type: {type(score)}")
-            logging.info(f"🔍 HALLUCINATION_GRADER: Assistant returned content: {score}")
-            
-            if hasattr(score, 'binary_score'):
-                logging.info(f"✅ HALLUCINATION SCORE: {score.binary_score.upper()}")
-            else:
-                logging.error(f"❌ HALLUCINATION_GRADER: score missing binary_score attribute: {score}")
-                logging.error(f"❌ HALLUCINATION_GRADER: score attributes: {dir(score) if score else 'None'}")
-                # Force grounded if we can't get a proper score
-                return {"hallucination_score": "grounded"}
-                
-        except Exception as e:
-            logging.error(f"❌ HALLUCINATION_GRADER EXCEPTION:")
-            logging.error(f"   Exception type: {type(e).__name__}")
-            logging.error(f"   Exception message: {str(e)}")
-            logging.error(f"   Full traceback:", exc_info=True)
-            # Return grounded to prevent blocking the flow
+        # Decision cache keyed on (question + generation, documents)
+        generation_text = str(getattr(generation_message, 'content', generation_message))
+        hallucination_question = f"{current_question}\n{generation_text}"
+        documents_digest = "|".join(content_hash(str(doc)) for doc in documents)
+        cached_decision = grader_cache.get(
+            "hallucination_grader",
+            hallucination_grader_assistant.prompt_fingerprint,
+            hallucination_question,
+            documents_digest,
+        )
+        score = None
+        if cached_decision is not None:
+            logging.info(f"💾 HALLUCINATION_GRADER: cached decision {cached_decision}")
+            score = GradeHallucinations(binary_score=cached_decision)
+        return {"question": hallucination_question, "digest": documents_digest, "score": score}
+
+    def _cache_hallucination_score(plan: dict, score) -> None:
+        if hasattr(score, 'binary_score'):
+            grader_cache.set(
+                "hallucination_grader",
+                hallucination_grader_assistant.prompt_fingerprint,
+                plan["question"],
+                plan["digest"],
+                score.binary_score,
+            )
+
+    def _hallucination_failed(e: Exception) -> dict:
+        logging.error(f"❌ HALLUCINATION_GRADER EXCEPTION:")
+        logging.error(f"   Exception type: {type(e).__name__}")
+        logging.error(f"   Exception message: {str(e)}")
+        logging.error(f"   Full traceback:", exc_info=True)
+        # Return grounded to prevent blocking the flow
+        return {"hallucination_score": "grounded"}
+
+    def _hallucination_update(state: RagState, score) -> dict:
+        logging.info(f"🔍 HALLUCINATION_GRADER: Assistant returned type: {type(score)}")
+        logging.info(f"🔍 HALLUCINATION_GRADER: Assistant returned content: {score}")
+        
+        if hasattr(score, 'binary_score'):
+            logging.info(f"✅ HALLUCINATION SCORE: {score.binary_score.upper()}")
+        else:
+            logging.error(f"❌ HALLUCINATION_GRADER: score missing binary_score attribute: {score}")
+            logging.error(f"❌ HALLUCINATION_GRADER: score attributes: {dir(score) if score else 'None'}")
+            # Force grounded if we can't get a proper score
             return {"hallucination_score": "grounded"}
         
         grading_result = "grounded" if score.binary_score.lower() == "yes" else "not_grounded"
@@ -835,6 +1181,35 @@ def create_adaptive_rag_graph(
         logging.debug(f"hallucination_grader_node->update:{update}")
         return update
 
+    def hallucination_grader_node(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: HALLUCINATION GRADER---")
+        plan = _hallucination_plan(state)
+        if "update" in plan:
+            return plan["update"]
+        try:
+            score = plan["score"]
+            if score is None:
+                logging.info(f"🔍 HALLUCINATION_GRADER: Calling assistant...")
+                score = hallucination_grader_assistant(state, config)
+                _cache_hallucination_score(plan, score)
+            return _hallucination_update(state, score)
+        except Exception as e:
+            return _hallucination_failed(e)
+
+    async def ahallucination_grader_node(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: HALLUCINATION GRADER (async)---")
+        plan = _hallucination_plan(state)
+        if "update" in plan:
+            return plan["update"]
+        try:
+            score = plan["score"]
+            if score is None:
+                score = await hallucination_grader_assistant.acall(state, config)
+                _cache_hallucination_score(plan, score)
+            return _hallucination_update(state, score)
+        except Exception as e:
+            return _hallucination_failed(e)
+
     def generate_direct_node(state: RagState, config: RunnableConfig):
         logging.info("---NODE: GENERATE DIRECT---")
         current_question = get_current_user_question(state)
@@ -848,18 +1223,31 @@ def create_adaptive_rag_graph(
 
         return {"messages": [response]}
 
-    def force_suggest_node(state: RagState, config: RunnableConfig):
-        logging.info("---NODE: FORCE SUGGEST---")
-        current_question = get_current_user_question(state)
-        
-        response = suggestive_assistant(state, config)
+    async def agenerate_direct_node(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: GENERATE DIRECT (async)---")
+        response = await direct_answer_assistant.acall(state, config)
+        return {"messages": [response]}
 
+    def _force_suggest_update(response) -> dict:
         return {
             "messages": [response],
             "skip_hallucination": True,
             "force_suggest": False,
         }
 
+    def force_suggest_node(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: FORCE SUGGEST---")
+        current_question = get_current_user_question(state)
+        
+        response = suggestive_assistant(state, config)
+
+        return _force_suggest_update(response)
+
+    async def aforce_suggest_node(state: RagState, config: RunnableConfig):
+        logging.info("---NODE: FORCE SUGGEST (async)---")
+        response = await suggestive_assistant.acall(state, config)
+        return _force_suggest_update(response)
+
     def process_document_node(state: RagState, config: RunnableConfig):
         """Extract and store image analysis as context for conversation.
         
@@ -1233,8 +1621,15 @@ Hãy phân tích một cách chi tiết và toàn diện để thông tin này c
     # --- Build the Graph ---
     graph = StateGraph(RagState)
 
+    # Token accounting on the critical path; summarization runs after the reply
+    conversation_memory = ConversationMemory(model=llm_summarizer)
+    set_conversation_memory(conversation_memory)
+
     # Create summarization node - simple approach like official example
-    if _LANGMEM_AVAILABLE and SummarizationNode is not None:
+    if conversation_memory.config.enabled:
+        summarization_node = conversation_memory.account
+        logging.info("✅ Background summarization enabled (token accounting node)")
+    elif _LANGMEM_AVAILABLE and SummarizationNode is not None:
         summarization_node = SummarizationNode(
             token_counter=count_tokens_approximately,
             model=llm_summarizer,
@@ -1253,20 +1648,32 @@ Hãy phân tích một cách chi tiết và toàn diện để thông tin này c
         logging.warning("⚠️ Using fallback summarization node (LangMem unavailable)")
 
 
+    def _dual_node(func, afunc) -> RunnableLambda:
+        """Sync body for .stream()/.invoke(), async body for .astream()/.ainvoke()."""
+        return RunnableLambda(
+            state_audit.wrap(ephemeral_channels.wrap(func)),
+            afunc=state_audit.awrap(ephemeral_channels.awrap(afunc)),
+            name=func.__name__,
+        )
+
     # Add nodes to graph
-    graph.add_node("user_info", user_info)
-    graph.add_node("summarizer", summarization_node)
+    graph.add_node("user_info", state_audit.wrap(user_info))
+    # summarized_messages is not read by any node; keep it out of checkpoints
+    graph.add_node("summarizer", summarization_node | RunnableLambda(ephemeral_channels.slim_update))
+    # Only written to by the background summary (graph.aupdate_state as this node)
+    graph.add_node(MEMORY_NODE, memory_summary_node)
    
-    graph.add_node("router", route_question)
-    graph.add_node("retrieve", retrieve)
-    graph.add_node("grade_documents", grade_documents_node)
-    graph.add_node("rewrite", rewrite)
-    graph.add_node("web_search", web_search_node)
-    graph.add_node("generate", generate)
-    graph.add_node("hallucination_grader", hallucination_grader_node)
-    graph.add_node("force_suggest", force_suggest_node)
-    graph.add_node("generate_direct", generate_direct_node)
-    graph.add_node("process_document", process_document_node)
+    graph.add_node("router", _dual_node(route_question, aroute_question))
+    graph.add_node("retrieve", _dual_node(retrieve, aretrieve))
+    graph.add_node("grade_documents", _dual_node(grade_documents_node, agrade_documents_node))
+    graph.add_node("rewrite", _dual_node(rewrite, arewrite))
+    graph.add_node("web_search", _dual_node(web_search_node, aweb_search_node))
+    graph.add_node("generate", _dual_node(generate, agenerate))
+    graph.add_node("hallucination_grader", _dual_node(hallucination_grader_node, ahallucination_grader_node))
+    graph.add_node("force_suggest", _dual_node(force_suggest_node, aforce_suggest_node))
+    graph.add_node("generate_direct", _dual_node(generate_direct_node, agenerate_direct_node))
+    # Image download/analysis stays sync (Gemini upload API); run in the executor under astream
+    graph.add_node("process_document", state_audit.wrap(process_document_node))
     graph.add_node("tools", ToolNode(tools=all_tools))
     graph.add_node("direct_tools", ToolNode(tools=memory_tools + tools + image_context_tools + validation_tools))
     graph.add_node("tool_result_processor", process_tool_results_and_set_flags)
@@ -1279,6 +1686,7 @@ Hãy phân tích một cách chi tiết và toàn diện để thông tin này c
     # Let SummarizationNode handle its own logic internally
     graph.add_edge("user_info", "summarizer")
     graph.add_edge("summarizer", "router")
+    graph.add_edge(MEMORY_NODE, END)
     graph.add_conditional_edges(
         "router",
         decide_entry,
@@ -1,7 +1,7 @@
 """This package contains the assistant classes for the adaptive RAG graph."""
 from .base_assistant import BaseAssistant
 from .router_assistant import RouterAssistant, RouteQuery
-from .doc_grader_assistant import DocGraderAssistant, GradeDocuments
+from .doc_grader_assistant import DocGraderAssistant, GradeDocuments, BatchDocGraderAssistant, BatchGradeDocuments
 from .rewrite_assistant import RewriteAssistant
 from .generation_assistant import GenerationAssistant
 from .suggestive_assistant import SuggestiveAssistant
@@ -15,6 +15,8 @@ __all__ = [
     "RouteQuery",
     "DocGraderAssistant",
     "GradeDocuments", 
+    "BatchDocGraderAssistant",
+    "BatchGradeDocuments",
     "RewriteAssistant",
     "GenerationAssistant",
     "SuggestiveAssistant",
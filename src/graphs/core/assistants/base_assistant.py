@@ -5,27 +5,53 @@ from typing import Any
 from datetime import datetime
 
 from langchain_core.messages import AIMessage
+from langchain_core.prompts import BasePromptTemplate
 from langchain_core.runnables import Runnable, RunnableConfig
 
 from src.core.logging_config import log_exception_details
 from src.graphs.state.state import RagState
+from src.utils.conversation_memory import get_conversation_memory
+
+
+def prompt_variables(runnable: Any) -> frozenset[str] | None:
+    """Variables read by the runnable's leading prompt template; None when unknown."""
+    first = getattr(runnable, "first", runnable)
+    if not isinstance(first, BasePromptTemplate):
+        return None
+    return frozenset(first.input_variables) | frozenset(first.optional_variables or ()) | {"messages"}
 
 
 class BaseAssistant:
     def __init__(self, runnable: Runnable):
         self.runnable = runnable
+        # Only these state keys are copied into the prompt (all of them when unknown)
+        self.prompt_variables = prompt_variables(runnable)
+
+    @staticmethod
+    def message_window(messages: Any, summary_obj: Any = None) -> Any:
+        """Messages not covered by the running summary, trimmed to the token budget."""
+        memory = get_conversation_memory()
+        if memory is None or not memory.config.enabled or not isinstance(messages, list):
+            return messages
+        return memory.window(messages, summary_obj)
+
+    def prompt_state(self, state: RagState) -> dict[str, Any]:
+        """The part of the state the prompt template reads."""
+        if self.prompt_variables is None:
+            return dict(state)
+        return {k: state[k] for k in self.prompt_variables if k in state}
 
     def binding_prompt(self, state: RagState) -> dict[str, Any]:
         """Binds state to the prompt, adding necessary context."""
         logging.debug(f"🔍 BaseAssistant.binding_prompt - START with state keys: {list(state.keys())}")
             
         running_summary = ""
+        summary_obj = None
         context_obj = state.get("context")
         logging.info(f"🔍 CONTEXT DEBUG: context type={type(context_obj)}, value={context_obj}")
         
         if context_obj and isinstance(context_obj, dict):
             # Try different possible keys for RunningSummary object
-            summary_obj = None
             for possible_key in ["running_summary", "summary", context_obj.get("thread_id", "default")]:
                 if possible_key in context_obj:
                     summary_obj = context_obj[possible_key]
@@ -75,7 +101,7 @@ class BaseAssistant:
             logging.debug(f"🔍 BaseAssistant.binding_prompt - found document in state: {state['document'][:100] if state['document'] else 'EMPTY'}...")
         
         prompt = {
-            **state,
+            **self.prompt_state(state),
             "user_info": user_info,
             "user_profile": user_profile,
             "conversation_summary": running_summary,
@@ -88,72 +114,89 @@ class BaseAssistant:
         if not prompt.get("messages"):
             logging.error("No messages found in prompt data during binding.")
             prompt["messages"] = [] # Ensure messages is always a list
-        print(f"binding->prompt:{prompt}")
+        else:
+            prompt["messages"] = self.message_window(prompt["messages"], summary_obj)
+        logging.debug(f"binding->prompt keys:{list(prompt)}")
+        return prompt
+
+    def _runnable_input(self, state: RagState, config: RunnableConfig) -> dict[str, Any]:
+        """Builds the runnable input for one call; raises ValueError on an unusable prompt."""
+        # DIRECT ACCESS: user_data luôn có format dict với user_info
+        user_data = state.get("user", {})
+        user_info = user_data.get("user_info", {"user_id": "unknown"})
+        user_id = user_info.get("user_id", "unknown")
+            
+        logging.debug(f"🔍 BaseAssistant.__call__ - user_id: {user_id}")
+
+        if "configurable" not in config:
+            config["configurable"] = {}
+        config["configurable"]["user_id"] = user_id
+
+        logging.debug(f"🔍 BaseAssistant.__call__ - calling binding_prompt")
+        prompt = self.binding_prompt(state)
+        
+        # CRITICAL: Log the exact prompt data being sent to LLM for DocGrader analysis
+        if "DocGrader" in str(type(self)):
+            logging.info(f"🔬 DOCGRADER PROMPT DATA TO LLM:")
+            logging.info(f"   📄 document: {prompt.get('document', 'MISSING')[:200] if prompt.get('document') else 'MISSING'}...")
+            logging.info(f"   ❓ messages: {prompt.get('messages', 'MISSING')}")
+            logging.info(f"   📝 conversation_summary: {prompt.get('conversation_summary', 'MISSING')[:100] if prompt.get('conversation_summary') else 'MISSING'}...")
+            logging.info(f"   🏢 domain_context: {prompt.get('domain_context', 'MISSING')}")
+            logging.info(f"   📅 current_date: {prompt.get('current_date', 'MISSING')}")
+            logging.info(f"   👤 user_info: {prompt.get('user_info', 'MISSING')}")
+            logging.info(f"   📋 user_profile: {prompt.get('user_profile', 'MISSING')}")
+            
+        logging.debug(f"🔍 BaseAssistant.__call__ - prompt keys: {list(prompt.keys()) if prompt else 'None'}")
+        
+        if not prompt or not prompt.get("messages"):
+            logging.error("❌ BaseAssistant: Aborting LLM call due to empty or invalid prompt data.")
+            raise ValueError("Prompt data is empty or missing required 'messages' field.")
         return prompt
 
+    def _handle_result(self, result: Any, state: RagState) -> Any:
+        if self._is_valid_response(result):
+            logging.debug("✅ BaseAssistant: Assistant returned a valid response.")
+            return result
+        logging.warning("⚠️ BaseAssistant: Assistant returned an invalid or empty response. Providing fallback.")
+        fallback = self._create_fallback_response(state)
+        logging.debug(f"🔍 BaseAssistant.__call__ - fallback response: {fallback}")
+        return fallback
+
+    def _handle_exception(self, e: Exception, state: RagState) -> AIMessage:
+        # DIRECT ACCESS: user_data luôn có format dict với user_info
+        user_data = state.get("user", {})
+        user_info = user_data.get("user_info", {"user_id": "unknown"})
+        user_id = user_info.get("user_id", "unknown")
+            
+        logging.error(f"❌ BaseAssistant.__call__ - Exception: {type(e).__name__}: {str(e)}")
+        log_exception_details(
+            exception=e,
+            context="Assistant LLM call failed",
+            user_id=user_id
+        )
+        logging.error(f"❌ BaseAssistant: Assistant exception, providing fallback: {e}")
+        fallback = self._create_fallback_response(state)
+        logging.debug(f"🔍 BaseAssistant.__call__ - exception fallback: {fallback}")
+        return fallback
+
     def __call__(self, state: RagState, config: RunnableConfig) -> dict[str, Any]:
         """Executes the assistant's runnable."""
         logging.debug(f"🔍 BaseAssistant.__call__ - START")
         try:
-            # DIRECT ACCESS: user_data luôn có format dict với user_info
-            user_data = state.get("user", {})
-            user_info = user_data.get("user_info", {"user_id": "unknown"})
-            user_id = user_info.get("user_id", "unknown")
-                
-            logging.debug(f"🔍 BaseAssistant.__call__ - user_id: {user_id}")
-
-            if "configurable" not in config:
-                config["configurable"] = {}
-            config["configurable"]["user_id"] = user_id
-
-            logging.debug(f"🔍 BaseAssistant.__call__ - calling binding_prompt")
-            prompt = self.binding_prompt(state)
-            
-            # CRITICAL: Log the exact prompt data being sent to LLM for DocGrader analysis
-            if "DocGrader" in str(type(self)):
-                logging.info(f"🔬 DOCGRADER PROMPT DATA TO LLM:")
-                logging.info(f"   📄 document: {prompt.get('document', 'MISSING')[:200] if prompt.get('document') else 'MISSING'}...")
-                logging.info(f"   ❓ messages: {prompt.get('messages', 'MISSING')}")
-                logging.info(f"   📝 conversation_summary: {prompt.get('conversation_summary', 'MISSING')[:100] if prompt.get('conversation_summary') else 'MISSING'}...")
-                logging.info(f"   🏢 domain_context: {prompt.get('domain_context', 'MISSING')}")
-                logging.info(f"   📅 current_date: {prompt.get('current_date', 'MISSING')}")
-                logging.info(f"   👤 user_info: {prompt.get('user_info', 'MISSING')}")
-                logging.info(f"   📋 user_profile: {prompt.get('user_profile', 'MISSING')}")
-                
-            logging.debug(f"🔍 BaseAssistant.__call__ - prompt keys: {list(prompt.keys()) if prompt else 'None'}")
-            
-            if not prompt or not prompt.get("messages"):
-                logging.error("❌ BaseAssistant: Aborting LLM call due to empty or invalid prompt data.")
-                raise ValueError("Prompt data is empty or missing required 'messages' field.")
-
-           
+            prompt = self._runnable_input(state, config)
             result = self.runnable.invoke(prompt, config)
-           
-            if self._is_valid_response(result):
-                logging.debug("✅ BaseAssistant: Assistant returned a valid response.")
-                return result
-            else:
-                logging.warning("⚠️ BaseAssistant: Assistant returned an invalid or empty response. Providing fallback.")
-                fallback = self._create_fallback_response(state)
-                logging.debug(f"🔍 BaseAssistant.__call__ - fallback response: {fallback}")
-                return fallback
+            return self._handle_result(result, state)
+        except Exception as e:
+            return self._handle_exception(e, state)
 
+    async def acall(self, state: RagState, config: RunnableConfig) -> dict[str, Any]:
+        """Async `__call__`: same prompt binding and fallbacks, `ainvoke` on the runnable."""
+        try:
+            prompt = self._runnable_input(state, config)
+            result = await self.runnable.ainvoke(prompt, config)
+            return self._handle_result(result, state)
         except Exception as e:
-            # DIRECT ACCESS: user_data luôn có format dict với user_info
-            user_data = state.get("user", {})
-            user_info = user_data.get("user_info", {"user_id": "unknown"})
-            user_id = user_info.get("user_id", "unknown")
-                
-            logging.error(f"❌ BaseAssistant.__call__ - Exception: {type(e).__name__}: {str(e)}")
-            log_exception_details(
-                exception=e,
-                context="Assistant LLM call failed",
-                user_id=user_id
-            )
-            logging.error(f"❌ BaseAssistant: Assistant exception, providing fallback: {e}")
-            fallback = self._create_fallback_response(state)
-            logging.debug(f"🔍 BaseAssistant.__call__ - exception fallback: {fallback}")
-            return fallback
+            return self._handle_exception(e, state)
 
     def _is_valid_response(self, result: Any) -> bool:
         """Checks if the LLM response is meaningful."""
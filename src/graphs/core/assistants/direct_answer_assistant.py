@@ -169,48 +169,21 @@ class DirectAnswerAssistant(BaseAssistant):
         )
         super().__init__(runnable)
     
-    def __call__(self, state: RagState, config) -> Dict[str, Any]:
+    def _runnable_input(self, state: RagState, config) -> Dict[str, Any]:
         """Override to ensure context generation works with full state."""
         import logging
-        from src.core.logging_config import log_exception_details
+
+        # Prepare prompt data with user_info, user_profile, etc.
+        prompt_data = self.binding_prompt(state)
         
-        # CRITICAL DEBUG: Log that DirectAnswerAssistant.__call__ is being used
-        logging.info("🔥 USING DirectAnswerAssistant.__call__ OVERRIDE - NOT BaseAssistant.__call__")
+        # Merge state with prompt_data to ensure RunnablePassthrough.assign has all needed data
+        full_state = {**state, **prompt_data}
         
-        try:
-            # Prepare prompt data with user_info, user_profile, etc.
-            prompt_data = self.binding_prompt(state)
-            
-            # Merge state with prompt_data to ensure RunnablePassthrough.assign has all needed data
-            full_state = {**state, **prompt_data}
-            
-            logging.info(f"🔍 DirectAnswerAssistant.__call__ - full_state keys: {list(full_state.keys())}")
-            
-            # CRITICAL: Call runnable with full_state instead of just prompt_data
-            # This allows RunnablePassthrough.assign in our chain to access documents, image_contexts
-            result = self.runnable.invoke(full_state, config)
-            
-            if self._is_valid_response(result):
-                logging.debug("✅ DirectAnswerAssistant: Valid response generated.")
-                return result
-            else:
-                logging.warning("⚠️ DirectAnswerAssistant: Invalid response, using fallback.")
-                return self._create_fallback_response(state)
-                
-        except Exception as e:
-            user_data = state.get("user", {})
-            user_info = user_data.get("user_info", {"user_id": "unknown"})
-            user_id = user_info.get("user_id", "unknown")
-                
-            logging.error(f"❌ DirectAnswerAssistant.__call__ - Exception: {type(e).__name__}: {str(e)}")
-            log_exception_details(
-                exception=e,
-                context="DirectAnswerAssistant LLM call failed",
-                user_id=user_id
-            )
-            
-            logging.error(f"❌ DirectAnswerAssistant: Assistant exception, providing fallback: {str(e)}")
-            return self._create_fallback_response(state)
+        logging.info(f"🔍 DirectAnswerAssistant - full_state keys: {list(full_state.keys())}")
+        
+        # CRITICAL: Call runnable with full_state instead of just prompt_data
+        # This allows RunnablePassthrough.assign in our chain to access documents, image_contexts
+        return full_state
 
     def binding_prompt(self, state: RagState) -> Dict[str, Any]:
         """Override binding_prompt to add domain_context variables."""
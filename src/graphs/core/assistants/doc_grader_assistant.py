@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime
 import logging
 import traceback
-from typing import Any
+from typing import Any, Awaitable, Callable, List, Optional
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import Runnable, RunnableConfig
@@ -11,6 +12,7 @@ from pydantic import BaseModel, Field
 
 from src.graphs.core.assistants.base_assistant import BaseAssistant
 from src.graphs.state.state import RagState
+from src.database.grader_cache import prompt_fingerprint
 from src.core.logging_config import log_exception_details
 
 
@@ -21,6 +23,18 @@ class GradeDocuments(BaseModel):
     )
 
 
+class GradedDocument(GradeDocuments):
+    """Grade for one document of a batch, identified by its id in the prompt."""
+    document_id: int = Field(description="Id of the graded document, as given in the prompt")
+
+
+class BatchGradeDocuments(BaseModel):
+    """Pydantic model for the output of the batch document grader."""
+    grades: List[GradedDocument] = Field(
+        description="One grade per document in the prompt, 'yes' or 'no' each"
+    )
+
+
 class DocGraderAssistant(BaseAssistant):
     """
     An assistant that grades the relevance of a document to the user's question.
@@ -66,6 +80,8 @@ class DocGraderAssistant(BaseAssistant):
         ).partial(domain_context=domain_context, current_date=datetime.now())
         
         logging.info(f"🔍 DocGraderAssistant.__init__ - prompt created with partial values")
+        # Cache key component: cached decisions are dropped when the prompt changes
+        self.prompt_fingerprint = prompt_fingerprint(prompt)
 
         runnable = prompt | llm.with_structured_output(GradeDocuments)
         logging.info(f"🔍 DocGraderAssistant.__init__ - runnable created with structured output")
@@ -140,3 +156,160 @@ class DocGraderAssistant(BaseAssistant):
         parent_valid = super()._is_valid_response(result)
         logging.debug(f"🔍 DocGraderAssistant._is_valid_response - parent validation: {parent_valid}")
         return parent_valid
+
+
+class BatchDocGraderAssistant(BaseAssistant):
+    """
+    Grades all candidate documents against the question in a single structured call.
+
+    Replaces up to N sequential DocGraderAssistant calls with one request; the
+    criteria are the same as the per-document grader.
+    """
+    def __init__(self, llm: Runnable, domain_context: str):
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                (
+                "system",
+                "🔍 **BẠN LÀ CHUYÊN GIA ĐÁNH GIÁ MỨC ĐỘ LIÊN QUAN CỦA TÀI LIỆU**\n\n"
+                "**NHIỆM VỤ CHÍNH:** Đánh giá TỪNG tài liệu trong danh sách xem có liên quan đến câu hỏi của người dùng hay không.\n\n"
+                "**TIÊU CHÍ ĐÁNH GIÁ NGHIÊM NGẶT:**\n"
+                "✅ **'yes' KHI:**\n"
+                "• Tài liệu chứa thông tin trực tiếp trả lời câu hỏi\n"
+                "• Tài liệu đề cập đến cùng chủ đề/khái niệm chính với câu hỏi\n"
+                "• Tài liệu có từ khóa quan trọng liên quan đến câu hỏi\n"
+                "• Tài liệu cung cấp bối cảnh hữu ích cho cuộc hội thoại\n\n"
+                "❌ **'no' KHI:**\n"
+                "• Tài liệu hoàn toàn không liên quan đến câu hỏi\n"
+                "• Tài liệu chỉ có sự trùng lặp từ ngẫu nhiên\n"
+                "• Tài liệu về chủ đề khác hoàn toàn\n\n"
+                "**NGUYÊN TẮC:**\n"
+                "• Đánh giá từng tài liệu độc lập, không so sánh giữa các tài liệu\n"
+                "• Nếu có mối liên hệ hợp lý → chọn 'yes'\n\n"
+                "**BỐI CẢNH HIỆN TẠI:**\n"
+                "• Ngày: {current_date}\n"
+                "• Domain: {domain_context}\n"
+                "• Cuộc hội thoại: {conversation_summary}\n\n"
+                "**TRẢ VỀ:** đúng một grade cho MỖI document_id, binary_score là 'yes' hoặc 'no'"
+            ),
+            ("human",
+             "**DANH SÁCH TÀI LIỆU CẦN ĐÁNH GIÁ:**\n{documents}\n\n"
+             "**CÂU HỎI CỦA NGƯỜI DÙNG:**\n{messages}\n\n"
+             "**YÊU CẦU:** Đánh giá từng tài liệu có liên quan đến câu hỏi không? (yes/no)"
+            ),
+            ]
+        ).partial(domain_context=domain_context, current_date=datetime.now())
+
+        self.prompt_fingerprint = prompt_fingerprint(prompt)
+        runnable = prompt | llm.with_structured_output(BatchGradeDocuments)
+        super().__init__(runnable)
+
+    @staticmethod
+    def format_documents(documents: List[str]) -> str:
+        return "\n\n".join(
+            f"[document_id={i}]\n{content}" for i, content in enumerate(documents)
+        )
+
+    def grade(
+        self, question: str, documents: List[str], user: dict, config: RunnableConfig
+    ) -> dict[int, GradeDocuments]:
+        """
+        Grade all documents in one call.
+
+        Returns {document_id: GradeDocuments} for every id the model graded;
+        ids that are missing from the answer are left for the caller to grade
+        individually. Raises ValueError when the batch call fails.
+        """
+        if not documents:
+            return {}
+        result = super().__call__(self._batch_state(question, documents, user), config)
+        return self._parse_grades(result, documents)
+
+    async def agrade(
+        self, question: str, documents: List[str], user: dict, config: RunnableConfig
+    ) -> dict[int, GradeDocuments]:
+        """Async `grade`."""
+        if not documents:
+            return {}
+        result = await self.acall(self._batch_state(question, documents, user), config)
+        return self._parse_grades(result, documents)
+
+    def grade_all(
+        self,
+        question: str,
+        documents: List[str],
+        user: dict,
+        config: RunnableConfig,
+        grade_one: Callable[[str], GradeDocuments],
+        use_batch: bool = True,
+    ) -> dict[int, Optional[GradeDocuments]]:
+        """
+        Grade every document: one batch call, then `grade_one(content)` for each
+        document the batch did not grade (failed call, malformed or short answer).
+
+        Returns {position in `documents`: grade}; None where grading failed.
+        """
+        grades: dict[int, Optional[GradeDocuments]] = {}
+        if use_batch:
+            try:
+                grades.update(self.grade(question, documents, user, config))
+            except Exception as e:
+                logging.warning(f"⚠️ Batch grading failed, grading documents one by one: {e}")
+        for i, content in enumerate(documents):
+            if i in grades:
+                continue
+            try:
+                logging.debug(f"Grading document {i+1}/{len(documents)}")
+                grades[i] = grade_one(content)
+            except Exception as e:
+                logging.error(f"Error grading document {i+1}: {e}")
+                grades[i] = None
+        return grades
+
+    async def agrade_all(
+        self,
+        question: str,
+        documents: List[str],
+        user: dict,
+        config: RunnableConfig,
+        agrade_one: Callable[[str], Awaitable[GradeDocuments]],
+        use_batch: bool = True,
+    ) -> dict[int, Optional[GradeDocuments]]:
+        """Async `grade_all`; documents the batch did not grade are graded concurrently."""
+        grades: dict[int, Optional[GradeDocuments]] = {}
+        if use_batch:
+            try:
+                grades.update(await self.agrade(question, documents, user, config))
+            except Exception as e:
+                logging.warning(f"⚠️ Batch grading failed, grading remaining documents concurrently: {e}")
+        missing = [i for i in range(len(documents)) if i not in grades]
+        results = await asyncio.gather(*(agrade_one(documents[i]) for i in missing), return_exceptions=True)
+        for i, result in zip(missing, results):
+            if isinstance(result, Exception):
+                logging.error(f"Error grading document {i+1}: {result}")
+                result = None
+            grades[i] = result
+        return grades
+
+    def _batch_state(self, question: str, documents: List[str], user: dict) -> dict[str, Any]:
+        return {
+            "documents": self.format_documents(documents),
+            "messages": question,
+            "user": user,
+        }
+
+    def _parse_grades(self, result: Any, documents: List[str]) -> dict[int, GradeDocuments]:
+        if not isinstance(result, BatchGradeDocuments):
+            raise ValueError(f"Batch grading returned no structured result: {type(result).__name__}")
+
+        grades: dict[int, GradeDocuments] = {}
+        for grade in result.grades:
+            score = (grade.binary_score or "").strip().lower()
+            if 0 <= grade.document_id < len(documents) and score in ("yes", "no"):
+                grades[grade.document_id] = GradeDocuments(binary_score=score)
+        logging.info(f"📦 BatchDocGraderAssistant: {len(grades)}/{len(documents)} documents graded in one call")
+        return grades
+
+    def _is_valid_response(self, result: Any) -> bool:
+        if isinstance(result, BatchGradeDocuments):
+            return bool(result.grades)
+        return super()._is_valid_response(result)
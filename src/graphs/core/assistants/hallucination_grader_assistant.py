@@ -10,6 +10,7 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 from src.graphs.core.assistants.base_assistant import BaseAssistant
 from src.graphs.state.state import RagState
+from src.database.grader_cache import prompt_fingerprint
 
 
 class GradeHallucinations(BaseModel):
@@ -51,6 +52,8 @@ class HallucinationGraderAssistant(BaseAssistant):
         ).partial(domain_context=domain_context, current_date=datetime.now())
         
         logging.info(f"🔍 HallucinationGraderAssistant.__init__ - prompt created with partial values")
+        # Cache key component: cached decisions are dropped when the prompt changes
+        self.prompt_fingerprint = prompt_fingerprint(prompt)
         
         runnable = prompt | llm.with_structured_output(GradeHallucinations)
         logging.info(f"🔍 HallucinationGraderAssistant.__init__ - runnable created with structured output")
@@ -122,6 +122,7 @@ class SuggestiveAssistant(BaseAssistant):
         
         # Lấy summary context từ state (giống code cũ)
         running_summary = ""
+        summary_obj = None
         if state.get("context") and isinstance(state["context"], dict):
             summary_obj = state["context"].get("running_summary")
             if summary_obj and hasattr(summary_obj, "summary"):
@@ -168,7 +169,7 @@ class SuggestiveAssistant(BaseAssistant):
 
         # Tạo prompt theo format code cũ (truyền toàn bộ state)
         prompt = {
-            **state,  # Truyền toàn bộ state như code cũ
+            **self.prompt_state(state),  # Chỉ các biến mà prompt template dùng
             "question": question,  # Thêm question riêng biệt
             "user_info": user_data["user_info"],
             "user_profile": user_data["user_profile"],
@@ -182,6 +183,8 @@ class SuggestiveAssistant(BaseAssistant):
         if not prompt.get("messages"):
             logging.error("SuggestiveAssistant: No messages found in prompt data")
             prompt["messages"] = []
+        else:
+            prompt["messages"] = self.message_window(prompt["messages"], summary_obj)
 
         logging.debug(f"SuggestiveAssistant binding_prompt: question={question[:50]}..., user_id={user_id}")
         return prompt
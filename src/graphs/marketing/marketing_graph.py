@@ -1,4 +1,5 @@
 import logging
+import os
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_groq import ChatGroq
@@ -33,6 +34,12 @@ retriever = QdrantStore(
     embedding_model=MARKETING_DOMAIN["embedding_model"],
 )
 
+# Small knowledge-base namespaces can be served from an in-process mmap mirror
+if os.getenv("LOCAL_VECTOR_INDEX_ENABLED", "false").lower() == "true":
+    retriever.enable_local_index(
+        [MARKETING_DOMAIN["namespace"], MARKETING_DOMAIN["faq_namespace"]]
+    )
+
 # Combine tools: accounting tools + reservation tools
 domain_tools = accounting_tools + reservation_tools  # NEW: Include reservation tools
 
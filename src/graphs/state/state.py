@@ -20,10 +20,14 @@ except Exception as _lm_err:  # noqa: BLE001
         "LangMem unavailable in state module (%s). Using stub RunningSummary.", _lm_err
     )
 
+    from dataclasses import dataclass as _dataclass, field as _field
+
+    @_dataclass
     class RunningSummary:  # type: ignore
-        def __init__(self, max_tokens: int = 1200):
-            self.max_tokens = max_tokens
-            self.summary = ""  # compatibility attribute
+        # Same fields as langmem's RunningSummary
+        summary: str = ""
+        summarized_message_ids: set = _field(default_factory=set)
+        last_summarized_message_id: Optional[str] = None
 
         def append(self, _text: str):  # no-op
             return None
@@ -180,4 +184,7 @@ class RagState(State):
     summarized_messages: list[AnyMessage] = Field(default_factory=list)  # Required for SummarizationNode
     context: dict[str, RunningSummary] = Field(default_factory=dict)  # Real conversation summary via LangMem
     image_contexts: Optional[List[str]]  # Direct image analysis contexts for immediate use 
+    route_hint: Optional[str]  # Explicit datasource from the caller (e.g. attachment-only batches), consumed by route_question
+    prefetched_documents: Optional[List[dict]]  # Speculative first retrieve set by route_question, consumed by retrieve
+    token_usage: Optional[dict]  # Running token totals of `messages`, kept by the summarizer node
     
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Text, LargeBinary, ForeignKey
+from sqlalchemy import Column, String, Integer, Text, LargeBinary, ForeignKey, TIMESTAMP, text
 from sqlalchemy.dialects.postgresql import JSONB
 from src.models.base import Base
 
@@ -33,3 +33,16 @@ class CheckpointBlob(Base):
     version = Column(Text, primary_key=True)
     type = Column(Text, primary_key=True)
     blob = Column(LargeBinary)
+
+class ThreadLatest(Base):
+    """Newest checkpoint per thread, maintained by triggers on checkpoints (migration 8c2f4d1a9b6e)."""
+    __tablename__ = "thread_latest"
+    thread_id = Column(Text, primary_key=True)
+    checkpoint_ns = Column(Text, primary_key=True, default="")
+    checkpoint_id = Column(Text, nullable=False)
+    parent_checkpoint_id = Column(Text, nullable=True)
+    type = Column(Text)
+    checkpoint = Column(JSONB, nullable=False)
+    metadata_ = Column('metadata', JSONB, nullable=False, default=dict)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
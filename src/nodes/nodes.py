@@ -27,8 +27,15 @@ from src.agents.Agents import (
 
 
 from src.tools.user_tools import get_user_info, get_latest_thread_id_by_user
+from src.utils.state_audit import changed_channels, channel_reducers
 import os
 
+logger = logging.getLogger(__name__)
+
+# update_reasoning_steps starts over on a user_info step
+NEW_QUERY_STEP = {"node": "user_info", "summary": "Bắt đầu câu hỏi mới", "details": {}}
+# messages, dialog_state, reasoning_steps: always written, never diffed
+REDUCER_CHANNELS = frozenset(channel_reducers(State))
 
 
 def user_info(state: State, config: RunnableConfig):
@@ -106,6 +113,7 @@ def user_info(state: State, config: RunnableConfig):
             "datasource": "",
             "hallucination_score": "",
             "skip_hallucination": False,
+            "reasoning_steps": [NEW_QUERY_STEP],
         }
         
         # Reset dialog_state if this seems like a new conversation
@@ -115,7 +123,8 @@ def user_info(state: State, config: RunnableConfig):
             logging.info(f"🔄 Would reset dialog_state for new conversation: {question[:50]}")
             # NOTE: We'll handle dialog_state reset differently to avoid triggering update with []
         
-        return {**state, **updates}
+        # Only changed channels: echoing the whole state re-ran every reducer
+        return changed_channels(state, updates, REDUCER_CHANNELS)
 
     # Allow bypassing DB lookup for user info (e.g., when only Facebook data is available)
     BYPASS_USER_DB = os.getenv("BYPASS_USER_DB", "0") == "1"
@@ -177,8 +186,7 @@ def user_info(state: State, config: RunnableConfig):
         user = User(user_info=user_info_data, user_profile=user_profile)
     
     # RESET: Start with clean reasoning_steps and set current question
-    new_state = {
-        **state, 
+    updates = {
         "user": user, 
         "thread_id": thread_id, 
         "session_id": session_id,  # Set session_id for image context retrieval
@@ -191,6 +199,7 @@ def user_info(state: State, config: RunnableConfig):
         "datasource": "",
         "hallucination_score": "",
         "skip_hallucination": False,
+        "reasoning_steps": [NEW_QUERY_STEP],
     }
     
     # Reset dialog_state if this seems like a new conversation
@@ -203,8 +212,9 @@ def user_info(state: State, config: RunnableConfig):
     
     
     
-    print(f"new_state:{new_state}")
-    return new_state
+    updates = changed_channels(state, updates, REDUCER_CHANNELS)
+    logger.debug(f"user_info updates: {list(updates)}")
+    return updates
 
 
 def route_flight_assistant(
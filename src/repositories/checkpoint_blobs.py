@@ -2,10 +2,21 @@
 Checkpoint blobs database operations
 """
 
-import pandas as pd
-import sqlalchemy
 from typing import List, Dict, Any, Optional
-from src.database.database import get_db_session
+
+from src.database.data_access import get_database
+
+
+def blob_to_text(blob):
+    """UTF-8 text when the blob decodes, hex otherwise (None/empty unchanged)."""
+    if not blob:
+        return blob
+    blob = bytes(blob)
+    try:
+        return blob.decode("utf-8")
+    except UnicodeDecodeError:
+        return blob.hex()
+
 
 def get_checkpoint_blobs(
     thread_id: str,
@@ -23,8 +34,6 @@ def get_checkpoint_blobs(
     Returns:
         List of blob dictionaries
     """
-    engine = get_db_session()
-    
     conditions = ["thread_id = :thread_id", "checkpoint_ns = :checkpoint_ns"]
     params = {
         "thread_id": thread_id,
@@ -51,24 +60,13 @@ def get_checkpoint_blobs(
     """
     
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(sqlalchemy.text(query), conn, params=params)
-            results = df.to_dict("records")
-            
-            # Convert blob data to string representation if needed
-            for result in results:
-                if 'blob' in result and result['blob']:
-                    try:
-                        # Try to decode blob as string
-                        result['blob'] = result['blob'].decode('utf-8')
-                    except:
-                        # If decoding fails, convert to hex string
-                        result['blob'] = result['blob'].hex()
-            
-            engine.dispose()
-            return results
+        results = get_database().fetch_all(query, params)
+
+        # Convert blob data to string representation if needed
+        for result in results:
+            result["blob"] = blob_to_text(result.get("blob"))
+        return results
     except Exception as e:
-        engine.dispose()
         raise Exception(f"Database error getting checkpoint blobs: {e}")
 
 def get_blob_by_channel_version(
@@ -89,8 +87,6 @@ def get_blob_by_channel_version(
     Returns:
         Blob dictionary or None if not found
     """
-    engine = get_db_session()
-    
     query = """
     SELECT 
         thread_id,
@@ -114,24 +110,12 @@ def get_blob_by_channel_version(
     }
     
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(sqlalchemy.text(query), conn, params=params)
-            if df.empty:
-                return None
-            
-            result = df.to_dict("records")[0]
-            
-            # Convert blob data to string representation if needed
-            if 'blob' in result and result['blob']:
-                try:
-                    # Try to decode blob as string
-                    result['blob'] = result['blob'].decode('utf-8')
-                except:
-                    # If decoding fails, convert to hex string
-                    result['blob'] = result['blob'].hex()
-            
-            engine.dispose()
-            return result
+        result = get_database().fetch_one(query, params)
+        if result is None:
+            return None
+
+        # Convert blob data to string representation if needed
+        result["blob"] = blob_to_text(result.get("blob"))
+        return result
     except Exception as e:
-        engine.dispose()
         raise Exception(f"Database error getting blob: {e}")
@@ -2,10 +2,11 @@
 Checkpoint writes database operations
 """
 
-import pandas as pd
-import sqlalchemy
 from typing import List, Dict, Any
-from src.database.database import get_db_connection
+
+from src.database.data_access import get_database
+from src.repositories.checkpoint_blobs import blob_to_text
+
 
 def get_checkpoint_tasks(
     thread_id: str,
@@ -23,8 +24,6 @@ def get_checkpoint_tasks(
     Returns:
         List of task dictionaries
     """
-    engine = get_db_connection()
-    
     query = """
     SELECT 
         thread_id,
@@ -50,24 +49,13 @@ def get_checkpoint_tasks(
     }
     
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(sqlalchemy.text(query), conn, params=params)
-            results = df.to_dict("records")
-            
-            # Convert blob data to string representation if needed
-            for result in results:
-                if 'blob' in result and result['blob']:
-                    try:
-                        # Try to decode blob as string
-                        result['blob'] = result['blob'].decode('utf-8')
-                    except:
-                        # If decoding fails, convert to hex string
-                        result['blob'] = result['blob'].hex()
-            
-            engine.dispose()
-            return results
+        results = get_database().fetch_all(query, params)
+
+        # Convert blob data to string representation if needed
+        for result in results:
+            result["blob"] = blob_to_text(result.get("blob"))
+        return results
     except Exception as e:
-        engine.dispose()
         raise Exception(f"Database error getting checkpoint tasks: {e}")
 
 def get_tasks_by_thread(
@@ -84,8 +72,6 @@ def get_tasks_by_thread(
     Returns:
         List of task dictionaries grouped by checkpoint
     """
-    engine = get_db_connection()
-    
     query = """
     SELECT 
         thread_id,
@@ -109,22 +95,11 @@ def get_tasks_by_thread(
     }
     
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(sqlalchemy.text(query), conn, params=params)
-            results = df.to_dict("records")
-            
-            # Convert blob data to string representation if needed
-            for result in results:
-                if 'blob' in result and result['blob']:
-                    try:
-                        # Try to decode blob as string
-                        result['blob'] = result['blob'].decode('utf-8')
-                    except:
-                        # If decoding fails, convert to hex string
-                        result['blob'] = result['blob'].hex()
-            
-            engine.dispose()
-            return results
+        results = get_database().fetch_all(query, params)
+
+        # Convert blob data to string representation if needed
+        for result in results:
+            result["blob"] = blob_to_text(result.get("blob"))
+        return results
     except Exception as e:
-        engine.dispose()
         raise Exception(f"Database error getting thread tasks: {e}")
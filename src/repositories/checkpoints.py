@@ -2,19 +2,18 @@
 Checkpoint database operations
 """
 
-import pandas as pd
-import sqlalchemy
+import base64
 import json
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from src.database.database import get_db_connection, DatabaseManager, DB_URI
-from sqlalchemy import create_engine, text, inspect, select, func, literal_column
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import sessionmaker
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.database.data_access import get_database
 
-# Create an engine with echo=True for logging
-engine = create_engine(DB_URI, echo=True)
-Session = sessionmaker(bind=engine)
+
+def _iso(value: Any) -> str:
+    """created_at as ISO string (the checkpoints column is text; may be NULL)."""
+    if value is None:
+        return datetime.now().isoformat()
+    return value.isoformat() if isinstance(value, datetime) else str(value)
 
 
 def get_thread_checkpoints(
@@ -35,8 +34,6 @@ def get_thread_checkpoints(
     Returns:
         List of checkpoint dictionaries
     """
-    engine = get_db_connection()
-
     # Build query with optional filters
     conditions = ["thread_id = :thread_id"]
     params = {"thread_id": thread_id, "limit": limit}
@@ -71,21 +68,11 @@ def get_thread_checkpoints(
     """
 
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(sqlalchemy.text(query), conn, params=params)
-            results = df.to_dict("records")
-
-            # Convert pandas timestamps to string if needed
-            for result in results:
-                if "created_at" in result and pd.notna(result["created_at"]):
-                    result["created_at"] = result["created_at"].isoformat()
-                elif "created_at" not in result or pd.isna(result["created_at"]):
-                    result["created_at"] = datetime.now().isoformat()
-
-            engine.dispose()
-            return results
+        results = get_database().fetch_all(query, params)
+        for result in results:
+            result["created_at"] = _iso(result.get("created_at"))
+        return results
     except Exception as e:
-        engine.dispose()
         raise Exception(f"Database error getting checkpoints: {e}")
 
 
@@ -103,8 +90,6 @@ def get_checkpoint_by_id(
     Returns:
         Checkpoint dictionary or None if not found
     """
-    engine = get_db_connection()
-
     query = """
     SELECT 
         thread_id,
@@ -128,23 +113,12 @@ def get_checkpoint_by_id(
     }
 
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(sqlalchemy.text(query), conn, params=params)
-            if df.empty:
-                return None
-
-            result = df.to_dict("records")[0]
-
-            # Convert timestamp to string if needed
-            if "created_at" in result and pd.notna(result["created_at"]):
-                result["created_at"] = result["created_at"].isoformat()
-            elif "created_at" not in result or pd.isna(result["created_at"]):
-                result["created_at"] = datetime.now().isoformat()
-
-            engine.dispose()
-            return result
+        result = get_database().fetch_one(query, params)
+        if result is None:
+            return None
+        result["created_at"] = _iso(result.get("created_at"))
+        return result
     except Exception as e:
-        engine.dispose()
         raise Exception(f"Database error getting checkpoint: {e}")
 
 
@@ -163,8 +137,6 @@ def get_thread_history_with_tasks(
     Returns:
         List of history items with nested structure matching the API spec
     """
-    engine = get_db_connection()
-
     # Main query to get checkpoints with tasks
     query = """
     WITH checkpoint_data AS (
@@ -192,7 +164,6 @@ def get_thread_history_with_tasks(
             cw.idx,
             cw.channel,
             cw.type as task_type,
-            cw.blob,
             cw.task_path
         FROM checkpoint_writes cw
         WHERE cw.thread_id = :thread_id 
@@ -205,7 +176,6 @@ def get_thread_history_with_tasks(
         td.idx,
         td.channel,
         td.task_type,
-        td.blob,
         td.task_path
     FROM checkpoint_data cd
     LEFT JOIN task_data td ON cd.checkpoint_id = td.checkpoint_id
@@ -215,328 +185,448 @@ def get_thread_history_with_tasks(
     params = {"thread_id": thread_id, "limit": limit, "checkpoint_ns": checkpoint_ns}
 
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(sqlalchemy.text(query), conn, params=params)
-
-            # Group by checkpoint_id to build nested structure
-            history_items = []
-            current_checkpoint = None
-            current_tasks = []
-
-            for _, row in df.iterrows():
-                checkpoint_id = row["checkpoint_id"]
-
-                # If we're starting a new checkpoint
-                if (
-                    current_checkpoint is None
-                    or current_checkpoint["checkpoint_id"] != checkpoint_id
-                ):
-                    # Save previous checkpoint if exists
-                    if current_checkpoint is not None:
-                        current_checkpoint["tasks"] = current_tasks
-                        history_items.append(current_checkpoint)
-
-                    # Start new checkpoint
-                    current_checkpoint = {
-                        "values": [{}],  # Default empty values
-                        "next": [],  # Extract from checkpoint data if available
-                        "tasks": [],
-                        "checkpoint": {
-                            "thread_id": row["thread_id"],
-                            "checkpoint_ns": row["checkpoint_ns"],
-                            "checkpoint_id": row["checkpoint_id"],
-                            "checkpoint_map": {},
-                        },
-                        "metadata": (
-                            row["metadata"] if pd.notna(row["metadata"]) else {}
-                        ),
-                        "created_at": (
-                            row["created_at"].isoformat()
-                            if pd.notna(row["created_at"])
-                            else datetime.now().isoformat()
-                        ),
-                        "parent_checkpoint": (
-                            {
-                                "thread_id": row["thread_id"],
-                                "checkpoint_ns": row["checkpoint_ns"],
-                                "checkpoint_id": (
-                                    row["parent_checkpoint_id"]
-                                    if pd.notna(row["parent_checkpoint_id"])
-                                    else ""
-                                ),
-                                "checkpoint_map": {},
-                            }
-                            if pd.notna(row["parent_checkpoint_id"])
-                            else {}
-                        ),
-                    }
-                    current_tasks = []
-
-                    # Extract values and next from checkpoint data
-                    if pd.notna(row["checkpoint"]) and isinstance(
-                        row["checkpoint"], dict
-                    ):
-                        checkpoint_data = row["checkpoint"]
-                        if "channel_values" in checkpoint_data:
-                            current_checkpoint["values"] = [
-                                checkpoint_data["channel_values"]
-                            ]
-                        elif "values" in checkpoint_data:
-                            current_checkpoint["values"] = [checkpoint_data["values"]]
-
-                        if "next" in checkpoint_data and isinstance(
-                            checkpoint_data["next"], list
-                        ):
-                            current_checkpoint["next"] = checkpoint_data["next"]
-
-                # Add task if exists
-                if pd.notna(row["task_id"]):
-                    task_blob = ""
-                    if pd.notna(row["blob"]):
-                        try:
-                            task_blob = row["blob"].decode("utf-8")
-                        except:
-                            task_blob = row["blob"].hex()
-
-                    task_item = {
-                        "id": row["task_id"],
-                        "name": row["channel"] if pd.notna(row["channel"]) else "",
-                        "error": None,  # No error field in current schema
-                        "interrupts": [],  # Empty interrupts array
-                        "checkpoint": {
-                            "thread_id": row["thread_id"],
-                            "checkpoint_ns": row["checkpoint_ns"],
-                            "checkpoint_id": row["checkpoint_id"],
-                            "checkpoint_map": {},
-                        },
-                        "state": {
-                            "values": [{}],
-                            "next": [],
-                            "tasks": [],  # Avoid circular reference
-                            "checkpoint": {
-                                "thread_id": row["thread_id"],
-                                "checkpoint_ns": row["checkpoint_ns"],
-                                "checkpoint_id": row["checkpoint_id"],
-                                "checkpoint_map": {},
-                            },
-                            "metadata": {},
-                            "created_at": (
-                                row["created_at"].isoformat()
-                                if pd.notna(row["created_at"])
-                                else datetime.now().isoformat()
-                            ),
-                            "parent_checkpoint": {},
-                        },
-                    }
-                    current_tasks.append(task_item)
-
-            # Don't forget the last checkpoint
-            if current_checkpoint is not None:
-                current_checkpoint["tasks"] = current_tasks
-                history_items.append(current_checkpoint)
-
-            engine.dispose()
-            return history_items
-
+        rows = get_database().fetch_all(query, params)
     except Exception as e:
-        engine.dispose()
         raise Exception(f"Database error getting thread history: {e}")
 
+    return list(group_history_rows(rows))
+
+
+def _history_item(row: Dict[str, Any]) -> Dict[str, Any]:
+    """History item (without tasks) for one checkpoint row."""
+    item = {
+        "values": [{}],  # Default empty values
+        "next": [],  # Extract from checkpoint data if available
+        "tasks": [],
+        "checkpoint": {
+            "thread_id": row["thread_id"],
+            "checkpoint_ns": row["checkpoint_ns"],
+            "checkpoint_id": row["checkpoint_id"],
+            "checkpoint_map": {},
+        },
+        "metadata": row["metadata"] or {},
+        "created_at": _iso(row["created_at"]),
+        "parent_checkpoint": (
+            {
+                "thread_id": row["thread_id"],
+                "checkpoint_ns": row["checkpoint_ns"],
+                "checkpoint_id": row["parent_checkpoint_id"],
+                "checkpoint_map": {},
+            }
+            if row["parent_checkpoint_id"] is not None
+            else {}
+        ),
+    }
+
+    # Extract values and next from checkpoint data
+    checkpoint_data = row["checkpoint"]
+    if isinstance(checkpoint_data, dict):
+        if "channel_values" in checkpoint_data:
+            item["values"] = [checkpoint_data["channel_values"]]
+        elif "values" in checkpoint_data:
+            item["values"] = [checkpoint_data["values"]]
+
+        if "next" in checkpoint_data and isinstance(checkpoint_data["next"], list):
+            item["next"] = checkpoint_data["next"]
+    return item
+
+
+def _task_item(row: Dict[str, Any], created_at: str) -> Dict[str, Any]:
+    task_checkpoint = {
+        "thread_id": row["thread_id"],
+        "checkpoint_ns": row["checkpoint_ns"],
+        "checkpoint_id": row["checkpoint_id"],
+        "checkpoint_map": {},
+    }
+    return {
+        "id": row["task_id"],
+        "name": row["channel"] or "",
+        "error": None,  # No error field in current schema
+        "interrupts": [],  # Empty interrupts array
+        "checkpoint": task_checkpoint,
+        "state": {
+            "values": [{}],
+            "next": [],
+            "tasks": [],  # Avoid circular reference
+            "checkpoint": dict(task_checkpoint),
+            "metadata": {},
+            "created_at": created_at,
+            "parent_checkpoint": {},
+        },
+    }
 
-def search_threads(
+
+def group_history_rows(
+    rows: Iterable[Dict[str, Any]],
+    decode_values: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Fold checkpoint LEFT JOIN checkpoint_writes rows (ordered by checkpoint_id)
+    into history items, yielding each item as soon as its last row is read.
+    """
+    current = None
+    for row in rows:
+        if current is None or current["checkpoint"]["checkpoint_id"] != row["checkpoint_id"]:
+            if current is not None:
+                yield current
+            current = _history_item(row)
+            if decode_values is not None:
+                current["values"][0] = {**current["values"][0], **decode_values(row)}
+        # Add task if exists
+        if row["task_id"] is not None:
+            current["tasks"].append(_task_item(row, current["created_at"]))
+    if current is not None:
+        yield current
+
+
+# Blob of a requested channel at the version this checkpoint points to
+_BLOB_OF_CHECKPOINT = """
+        FROM checkpoint_blobs b
+        WHERE b.thread_id = c.thread_id AND b.checkpoint_ns = c.checkpoint_ns
+          AND b.channel = ANY(:channels)
+          AND b.version = c.checkpoint -> 'channel_versions' ->> b.channel
+        ORDER BY b.channel"""
+
+
+def build_history_stream_query(
+    thread_id: str,
+    checkpoint_ns: str = "",
+    before_checkpoint_id: Optional[str] = None,
+    limit: Optional[int] = None,
+    channels: Optional[List[str]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    SQL for streaming history newest first.
+
+    Keyset on checkpoint_id (`before_checkpoint_id` is the last id a client
+    received). Write blobs are never selected; checkpoint blobs only for the
+    requested channels, as parallel channel/type/blob arrays per checkpoint.
+    """
+    params: Dict[str, Any] = {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}
+    conditions = ["c.thread_id = :thread_id", "c.checkpoint_ns = :checkpoint_ns"]
+    if before_checkpoint_id:
+        conditions.append("c.checkpoint_id < :before_checkpoint_id")
+        params["before_checkpoint_id"] = before_checkpoint_id
+
+    blob_columns = ""
+    if channels:
+        params["channels"] = list(channels)
+        blob_columns = "".join(
+            f",\n        ARRAY(SELECT b.{col}{_BLOB_OF_CHECKPOINT}) AS blob_{col}s"
+            for col in ("channel", "type", "blob")
+        )
+
+    limit_clause = ""
+    if limit:
+        limit_clause = "LIMIT :limit"
+        params["limit"] = limit
+
+    query = f"""
+    WITH page AS (
+        SELECT
+            c.thread_id,
+            c.checkpoint_ns,
+            c.checkpoint_id,
+            c.parent_checkpoint_id,
+            c.checkpoint,
+            c.metadata,
+            c.created_at{blob_columns}
+        FROM checkpoints c
+        WHERE {" AND ".join(conditions)}
+        ORDER BY c.checkpoint_id DESC
+        {limit_clause}
+    )
+    SELECT
+        page.*,
+        w.task_id,
+        w.idx,
+        w.channel,
+        w.task_path
+    FROM page
+    LEFT JOIN checkpoint_writes w
+        ON w.thread_id = page.thread_id
+        AND w.checkpoint_ns = page.checkpoint_ns
+        AND w.checkpoint_id = page.checkpoint_id
+    ORDER BY page.checkpoint_id DESC, w.task_id, w.idx
+    """
+    return query, params
+
+
+def _channel_decoder(serde: Any) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    def decode(row: Dict[str, Any]) -> Dict[str, Any]:
+        values = {}
+        for channel, type_, blob in zip(row.get("blob_channels") or [], row.get("blob_types") or [], row.get("blob_blobs") or []):
+            if type_ == "empty" or blob is None:
+                continue
+            try:
+                values[channel] = serde.loads_typed((type_, bytes(blob)))
+            except Exception as e:  # noqa: BLE001
+                values[channel] = {"error": f"cannot decode {type_} blob: {e}"}
+        return values
+
+    return decode
+
+
+def iter_thread_history(
+    thread_id: str,
+    checkpoint_ns: str = "",
+    before_checkpoint_id: Optional[str] = None,
+    limit: Optional[int] = None,
+    channels: Optional[List[str]] = None,
+    batch_size: int = 50,
+    serde: Any = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream thread history items newest first, in constant memory.
+
+    Rows come through a server-side cursor `batch_size` at a time. Channel
+    values stored as blobs are decoded (with the checkpointer's serializer)
+    only for `channels`; other channels keep what the checkpoint row holds.
+
+    Args:
+        thread_id: The thread ID to get history for
+        checkpoint_ns: Checkpoint namespace filter
+        before_checkpoint_id: Keyset cursor, only older checkpoints are returned
+        limit: Maximum number of checkpoints (None streams the whole history)
+        channels: Channels whose blob values should be decoded
+        batch_size: Rows fetched per round trip
+        serde: Serializer for blobs (defaults to the checkpointer's)
+
+    Yields:
+        History items with nested tasks, as get_thread_history_with_tasks
+    """
+    query, params = build_history_stream_query(thread_id, checkpoint_ns, before_checkpoint_id, limit, channels)
+    decode_values = None
+    if channels:
+        if serde is None:
+            from src.database.checkpointer import get_checkpoint_serde
+
+            serde = get_checkpoint_serde()
+        decode_values = _channel_decoder(serde)
+    rows = get_database().stream(query, params, batch_size=batch_size)
+    yield from group_history_rows(rows, decode_values)
+
+
+# Sort columns of thread_latest; checkpoint ids are time-ordered, so sorting
+# by checkpoint_id is sorting by updated_at (which is indexed).
+THREAD_SORT_FIELDS = {
+    "thread_id": "thread_id",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+    "checkpoint_id": "updated_at",
+}
+
+
+def encode_thread_cursor(sort_value: Any, thread_id: str) -> str:
+    """Opaque keyset cursor: the sort value and thread_id of the last row of a page."""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, thread_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_thread_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        sort_value, thread_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Invalid thread cursor: {e}")
+    return sort_value, thread_id
+
+
+def build_thread_search_query(
     metadata_filter: Optional[Dict[str, Any]] = None,
     values_filter: Optional[Dict[str, Any]] = None,
-    status: Optional[str] = None,
     limit: int = 10,
-    offset: int = 0,
+    cursor: Optional[str] = None,
     sort_by: str = "thread_id",
     sort_order: str = "asc",
-    checkpoint_ns: Optional[str] = None,  # Changed default to None
-) -> List[Dict[str, Any]]:
-    """
-    Search threads with advanced filtering, sorting and pagination.
-
-    Args:
-        metadata_filter: Filter by metadata fields
-        values_filter: Filter by values fields
-        status: Filter by status (not used in current schema)
-        limit: Maximum number of threads to return
-        offset: Number of threads to skip for pagination
-        sort_by: Field to sort by (thread_id, created_at, etc.)
-        sort_order: Sort order ('asc' or 'desc')
-        checkpoint_ns: Checkpoint namespace filter (optional)
-
-    Returns:
-        List of thread dictionaries with full thread information
+    checkpoint_ns: Optional[str] = None,
+    offset: int = 0,
+) -> Tuple[str, Dict[str, Any]]:
     """
-    engine = get_db_connection()
+    SQL and params for one page of threads from thread_latest.
 
-    # Initialize params and dynamic WHERE conditions
-    params = {"limit": limit, "offset": offset}
-    where_conditions = []
-
-    # Get latest checkpoint for each thread with full state
-    base_query = """
-    WITH filtered_checkpoints AS (
-        SELECT 
-            thread_id,
-            checkpoint_ns,
-            checkpoint_id,
-            parent_checkpoint_id,
-            type,
-            checkpoint,
-            metadata,
-            created_at
-        FROM checkpoints
+    Every page is an index range scan: filter on checkpoint_ns, keyset
+    condition `(sort column, thread_id) > cursor`, ORDER BY the same columns,
+    LIMIT page size + 1 (the extra row tells whether a next page exists).
     """
+    sort_column = THREAD_SORT_FIELDS.get(sort_by, "thread_id")
+    descending = sort_order.lower() != "asc"
+    direction = "DESC" if descending else "ASC"
 
-    # Conditionally add checkpoint_ns filter
-    if checkpoint_ns:
-        where_conditions.append("checkpoint_ns = :checkpoint_ns")
-        params["checkpoint_ns"] = checkpoint_ns
+    # thread_latest keeps one row per namespace; the root namespace is the thread
+    params: Dict[str, Any] = {"checkpoint_ns": checkpoint_ns or "", "limit": limit + 1}
+    where_conditions = ["checkpoint_ns = :checkpoint_ns"]
 
-    # Add metadata filter using the @> operator for JSONB containment
+    # JSONB containment, served by the GIN index on metadata
     if metadata_filter:
         metadata_filter_json = {
             k: str(v) for k, v in metadata_filter.items() if v is not None
         }
         if metadata_filter_json:
-            where_conditions.append("metadata @> :metadata_filter")
+            where_conditions.append("metadata @> CAST(:metadata_filter AS jsonb)")
             params["metadata_filter"] = json.dumps(metadata_filter_json)
 
-    # Add values filter if provided
     if values_filter:
-        for key, value in values_filter.items():
+        for i, (key, value) in enumerate(values_filter.items()):
             if value is not None:
                 where_conditions.append(
-                    f" AND checkpoint->'channel_values'->'{key}' @> :values_{key}"
+                    f"checkpoint->'channel_values'->:values_key_{i} @> CAST(:values_{i} AS jsonb)"
                 )
-                params[f"values_{key}"] = json.dumps(value)
-
-    # Append WHERE clause if any conditions exist
-    if where_conditions:
-        base_query += " WHERE " + " AND ".join(where_conditions)
+                params[f"values_key_{i}"] = key
+                params[f"values_{i}"] = json.dumps(value)
+
+    if cursor:
+        after_value, after_thread_id = decode_thread_cursor(cursor)
+        comparison = "<" if descending else ">"
+        if sort_column == "thread_id":
+            where_conditions.append(f"thread_id {comparison} :after_thread_id")
+        else:
+            where_conditions.append(
+                f"({sort_column}, thread_id) {comparison} (CAST(:after_value AS timestamptz), :after_thread_id)"
+            )
+            params["after_value"] = after_value
+        params["after_thread_id"] = after_thread_id
+
+    order_by = f"{sort_column} {direction}"
+    if sort_column != "thread_id":
+        order_by += f", thread_id {direction}"
 
-    # Complete the CTE and get latest for each thread
-    query = (
-        base_query
-        + """
-    ),
-    latest_checkpoints AS (
-        SELECT DISTINCT ON (thread_id)
-            thread_id,
-            checkpoint_ns,
-            checkpoint_id,
-            parent_checkpoint_id,
-            type,
-            checkpoint,
-            metadata,
-            created_at
-        FROM filtered_checkpoints
-        ORDER BY thread_id, checkpoint_id DESC
-    )
-    SELECT 
-        lc.*
-    FROM latest_checkpoints lc
+    query = f"""
+    SELECT
+        thread_id,
+        checkpoint_ns,
+        checkpoint_id,
+        parent_checkpoint_id,
+        type,
+        checkpoint,
+        metadata,
+        created_at,
+        updated_at
+    FROM thread_latest
+    WHERE {" AND ".join(where_conditions)}
+    ORDER BY {order_by}
+    LIMIT :limit
     """
-    )
+    # Legacy offset paging, only without a cursor (cost grows with the offset)
+    if offset and not cursor:
+        query += " OFFSET :offset"
+        params["offset"] = offset
+    return query, params
+
+
+def _thread_item(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a thread item matching the API spec from a thread_latest row."""
+    checkpoint_data = row["checkpoint"] or {}
+    thread_item = {
+        "thread_id": row["thread_id"],
+        "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+        "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None,
+        "metadata": row["metadata"] or {},
+        "status": None,  # Status is not stored in the DB
+        "config": None,  # Config is not stored in the DB
+        "values": {
+            "messages": [],
+            "user": None,
+            "thread_id": {"thread_id": row["thread_id"]},
+            "dialog_state": None,
+        },
+        "interrupts": {},
+        "error": None,
+    }
 
-    # Add sorting
-    valid_sort_fields = ["thread_id", "created_at", "checkpoint_id"]
-    if sort_by not in valid_sort_fields:
-        sort_by = "thread_id"
+    # Extract messages from checkpoint data if available
+    if isinstance(checkpoint_data, dict):
+        values = checkpoint_data.get("channel_values", checkpoint_data.get("values"))
+        if isinstance(values, dict):
+            for key in ("messages", "user", "dialog_state"):
+                if key in values:
+                    thread_item["values"][key] = values[key]
+    return thread_item
 
-    sort_direction = "ASC" if sort_order.lower() == "asc" else "DESC"
-    query += f" ORDER BY {sort_by} {sort_direction}"
 
-    # Add pagination
-    query += " LIMIT :limit OFFSET :offset"
+def search_threads_page(
+    metadata_filter: Optional[Dict[str, Any]] = None,
+    values_filter: Optional[Dict[str, Any]] = None,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    sort_by: str = "thread_id",
+    sort_order: str = "asc",
+    checkpoint_ns: Optional[str] = None,
+    offset: int = 0,
+) -> Dict[str, Any]:
+    """
+    One page of threads with its keyset cursor.
 
-    print("Executing query:", query)
-    print("With params:", params)
+    Reads the trigger-maintained thread_latest table, so the cost depends on
+    the page size, not on the number of checkpoints per thread.
 
+    Returns:
+        {"threads": [...], "next_cursor": str or None}
+    """
+    query, params = build_thread_search_query(
+        metadata_filter=metadata_filter,
+        values_filter=values_filter,
+        limit=limit,
+        cursor=cursor,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        checkpoint_ns=checkpoint_ns,
+        offset=offset,
+    )
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(sqlalchemy.text(query), conn, params=params)
-            results = []
-
-            for _, row in df.iterrows():
-                # Extract checkpoint data
-                checkpoint_data = (
-                    row["checkpoint"] if pd.notna(row["checkpoint"]) else {}
-                )
-                metadata = row["metadata"] if pd.notna(row["metadata"]) else {}
-
-                # Build thread item matching the API spec, without hardcoded values
-                thread_item = {
-                    "thread_id": row["thread_id"],
-                    "created_at": (
-                        row["created_at"].isoformat()
-                        if pd.notna(row["created_at"])
-                        else None
-                    ),
-                    "updated_at": (
-                        row["created_at"].isoformat()
-                        if pd.notna(row["created_at"])
-                        else None
-                    ),
-                    "metadata": metadata,
-                    "status": None,  # Status is not stored in the DB
-                    "config": None,  # Config is not stored in the DB
-                    "values": {
-                        "messages": [],
-                        "user": None,
-                        "thread_id": {"thread_id": row["thread_id"]},
-                        "dialog_state": None,
-                    },
-                    "interrupts": {},
-                    "error": None,
-                }
-
-                # Extract messages from checkpoint data if available
-                if isinstance(checkpoint_data, dict):
-                    if "channel_values" in checkpoint_data:
-                        channel_values = checkpoint_data["channel_values"]
-                        if (
-                            isinstance(channel_values, dict)
-                            and "messages" in channel_values
-                        ):
-                            thread_item["values"]["messages"] = channel_values[
-                                "messages"
-                            ]
-                        if (
-                            isinstance(channel_values, dict)
-                            and "user" in channel_values
-                        ):
-                            thread_item["values"]["user"] = channel_values["user"]
-                        if (
-                            isinstance(channel_values, dict)
-                            and "dialog_state" in channel_values
-                        ):
-                            thread_item["values"]["dialog_state"] = channel_values[
-                                "dialog_state"
-                            ]
-                    elif "values" in checkpoint_data:
-                        values = checkpoint_data["values"]
-                        if isinstance(values, dict):
-                            if "messages" in values:
-                                thread_item["values"]["messages"] = values["messages"]
-                            if "user" in values:
-                                thread_item["values"]["user"] = values["user"]
-                            if "dialog_state" in values:
-                                thread_item["values"]["dialog_state"] = values[
-                                    "dialog_state"
-                                ]
-
-                results.append(thread_item)
-
-            engine.dispose()
-            return results
-
+        rows = get_database().fetch_all(query, params)
     except Exception as e:
-        engine.dispose()
         raise Exception(f"Database error searching threads: {e}")
 
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        sort_column = THREAD_SORT_FIELDS.get(sort_by, "thread_id")
+        next_cursor = encode_thread_cursor(last[sort_column], last["thread_id"])
+    return {"threads": [_thread_item(row) for row in rows], "next_cursor": next_cursor}
+
+
+def search_threads(
+    metadata_filter: Optional[Dict[str, Any]] = None,
+    values_filter: Optional[Dict[str, Any]] = None,
+    status: Optional[str] = None,
+    limit: int = 10,
+    offset: int = 0,
+    sort_by: str = "thread_id",
+    sort_order: str = "asc",
+    checkpoint_ns: Optional[str] = None,  # Changed default to None
+    cursor: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Search threads with advanced filtering, sorting and pagination.
+
+    Args:
+        metadata_filter: Filter by metadata fields
+        values_filter: Filter by values fields
+        status: Filter by status (not used in current schema)
+        limit: Maximum number of threads to return
+        offset: Number of threads to skip (legacy; prefer cursor)
+        sort_by: Field to sort by (thread_id, created_at, updated_at)
+        sort_order: Sort order ('asc' or 'desc')
+        checkpoint_ns: Checkpoint namespace filter (optional, root namespace by default)
+        cursor: Keyset cursor from search_threads_page()["next_cursor"]
+
+    Returns:
+        List of thread dictionaries with full thread information
+    """
+    return search_threads_page(
+        metadata_filter=metadata_filter,
+        values_filter=values_filter,
+        limit=limit,
+        cursor=cursor,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        checkpoint_ns=checkpoint_ns,
+        offset=offset,
+    )["threads"]
+
 
 def get_latest_checkpoint_for_thread(
     thread_id: str, checkpoint_ns: str = ""
@@ -551,8 +641,6 @@ def get_latest_checkpoint_for_thread(
     Returns:
         Latest checkpoint dictionary or None if not found
     """
-    engine = get_db_connection()
-
     query = """
     SELECT 
         thread_id,
@@ -573,23 +661,10 @@ def get_latest_checkpoint_for_thread(
     params = {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}
 
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(sqlalchemy.text(query), conn, params=params)
-
-            if df.empty:
-                return None
-
-            result = df.to_dict("records")[0]
-
-            # Convert timestamp to string if needed
-            if "created_at" in result and pd.notna(result["created_at"]):
-                result["created_at"] = result["created_at"].isoformat()
-            elif "created_at" not in result or pd.isna(result["created_at"]):
-                result["created_at"] = datetime.now().isoformat()
-
-            engine.dispose()
-            return result
-
+        result = get_database().fetch_one(query, params)
+        if result is None:
+            return None
+        result["created_at"] = _iso(result.get("created_at"))
+        return result
     except Exception as e:
-        engine.dispose()
         raise Exception(f"Database error getting latest checkpoint: {e}")
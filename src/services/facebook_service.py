@@ -7,8 +7,11 @@ import asyncio
 import concurrent.futures
 from typing import Any, Dict, Optional, List
 
-import httpx
 import time
+from src.utils.conversation_memory import schedule_conversation_summary
+from .graph_api_client import GraphApiClient
+from .keyed_executor import KeyedExecutor, stream_id_time
+from .outbound_queue import GraphSender, OutboundQueue, OutboundQueueConfig, OutboxEnqueueError, split_message
 from .message_history_service import get_message_history_service
 from .image_processing_service import get_image_processing_service
 
@@ -16,7 +19,10 @@ logger = logging.getLogger(__name__)
 
 # Import Redis components - sẽ fallback nếu Redis không available
 try:
-    from .redis_message_queue import RedisMessageQueue, SmartMessageAggregator, RedisConfig, MessageProcessingConfig
+    from .redis_message_queue import (
+        RedisMessageQueue, SmartMessageAggregator, RedisMessageAggregator, RedisConfig, MessageProcessingConfig,
+        UserLease, create_message_aggregator,
+    )
     REDIS_AVAILABLE = True
     logger.info("✅ Redis components loaded successfully")
 except ImportError:
@@ -49,6 +55,8 @@ class FacebookMessengerService:
         self.api_version = api_version
         # Optional Page ID (used to ignore echo messages and self-sent events)
         self.page_id = page_id or os.getenv("PAGE_ID", "")
+        # One pooled (HTTP/2, keep-alive) client for every Graph API call
+        self.graph_client = GraphApiClient(self.GRAPH_API_BASE)
         # Simple in-memory TTL cache for user profiles to reduce Graph API calls
         self._profile_cache: dict[str, tuple[float, Dict[str, Any]]] = {}
         try:
@@ -84,8 +92,21 @@ class FacebookMessengerService:
         # Initialize Redis components if available
         if REDIS_AVAILABLE:
             self.redis_queue = RedisMessageQueue()
-            self.message_aggregator = SmartMessageAggregator(self.redis_queue)
+            # Pending batches in Redis (any worker finalizes) unless AGGREGATOR_BACKEND=memory
+            self.message_aggregator = create_message_aggregator(self.redis_queue)
             self._redis_processor_started = False
+            # Stream events run in parallel across users, in order per user
+            # (the user lease extends that across workers)
+            self.event_executor = KeyedExecutor()
+            self.user_lease = UserLease(self.redis_queue)
+            # Replies go through a Redis outbox (ordered, rate-limited, retried)
+            outbox_config = OutboundQueueConfig()
+            self.outbox = OutboundQueue(
+                self.redis_queue,
+                GraphSender(self.graph_client, self.page_access_token, self.api_version),
+                outbox_config,
+                page_id=self.page_id or "default",
+            ) if outbox_config.enabled else None
             logger.info("✅ Redis Smart Message Aggregator initialized")
             # Diagnostic: instance identities for singleton verification
             try:
@@ -100,6 +121,9 @@ class FacebookMessengerService:
         else:
             self.redis_queue = None
             self.message_aggregator = None
+            self.outbox = None
+            self.event_executor = None
+            self.user_lease = None
             # Fallback to legacy message merging
             self._pending_messages = {}
             logger.info("📝 Using legacy message merging system")
@@ -148,9 +172,24 @@ class FacebookMessengerService:
             logger.warning("Invalid Facebook signature")
         return valid
 
+    # --- HTTP client lifecycle (FastAPI lifespan) ---
+    async def start(self) -> None:
+        await self.graph_client.start()
+
+    async def aclose(self) -> None:
+        if self.outbox is not None:
+            await self.outbox.stop()
+        if REDIS_AVAILABLE and isinstance(self.message_aggregator, RedisMessageAggregator):
+            await self.message_aggregator.stop()
+        if self.event_executor is not None:
+            await self.event_executor.stop()
+        if self.redis_queue is not None:
+            await self.redis_queue.close()
+        await self.graph_client.aclose()
+
     # --- Outbound ---
     async def send_message(self, recipient_psid: str, text: str) -> Dict[str, Any]:
-        url = f"{self.GRAPH_API_BASE}/{self.api_version}/me/messages"
+        path = f"/{self.api_version}/me/messages"
         params = {"access_token": self.page_access_token}
         payload = {
             "recipient": {"id": recipient_psid},
@@ -159,29 +198,50 @@ class FacebookMessengerService:
         }
 
         backoff = 0.5
-        async with httpx.AsyncClient(timeout=10) as client:
-            for attempt in range(3):
-                try:
-                    resp = await client.post(url, params=params, json=payload)
-                    if resp.is_success:
-                        return resp.json()
-                    logger.error("Facebook send_message failed (attempt %d): %s", attempt + 1, resp.text)
-                except Exception as e:  # noqa: BLE001
-                    logger.exception("Facebook send_message exception (attempt %d): %s", attempt + 1, e)
-                await self._sleep(backoff)
-                backoff *= 2
+        for attempt in range(3):
+            try:
+                resp = await self.graph_client.request("POST", path, "send", params=params, json=payload)
+                if resp.is_success:
+                    return resp.json()
+                logger.error("Facebook send_message failed (attempt %d): %s", attempt + 1, resp.text)
+            except Exception as e:  # noqa: BLE001
+                logger.exception("Facebook send_message exception (attempt %d): %s", attempt + 1, e)
+            await self._sleep(backoff)
+            backoff *= 2
         return {"ok": False, "error": "failed_to_send"}
 
+    async def deliver_reply(self, recipient_psid: str, text: str) -> None:
+        """
+        Queue a reply in the outbox; sends directly (split, in order) when the
+        outbox is not running or nothing was queued.
+        """
+        if self.outbox is not None and self._redis_processor_started:
+            try:
+                await self.outbox.enqueue(recipient_psid, text)
+                return
+            except OutboxEnqueueError as e:
+                if e.enqueued:
+                    # Already queued: the outbox delivers it, a direct send would duplicate it
+                    logger.warning(f"⚠️ Outbox enqueue for {recipient_psid} reported an error after queuing: {e}")
+                    return
+                if e.enqueued is None:
+                    logger.error(f"❌ Outbox enqueue failed and Redis is unreachable, sending directly (may duplicate): {e}")
+                else:
+                    logger.error(f"❌ Outbox enqueue failed, sending directly: {e}")
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"❌ Outbox unavailable, sending directly: {e}")
+        for part in split_message(text):
+            await self.send_message(recipient_psid, part)
+
     async def send_sender_action(self, recipient_psid: str, action: str = "typing_on") -> None:
         """Send a sender_action (e.g., typing_on) to Messenger; best-effort, no raise."""
         if action not in {"typing_on", "typing_off", "mark_seen"}:
             action = "typing_on"
-        url = f"{self.GRAPH_API_BASE}/{self.api_version}/me/messages"
+        path = f"/{self.api_version}/me/messages"
         params = {"access_token": self.page_access_token}
         payload = {"recipient": {"id": recipient_psid}, "sender_action": action}
         try:
-            async with httpx.AsyncClient(timeout=5) as client:
-                await client.post(url, params=params, json=payload)
+            await self.graph_client.request("POST", path, "sender_action", params=params, json=payload)
         except Exception:
             # Silence errors; this is non-critical UX enhancement
             return
@@ -210,35 +270,34 @@ class FacebookMessengerService:
         if cached and (now - cached[0] < self._profile_ttl):
             return cached[1]
 
-        url = f"{self.GRAPH_API_BASE}/{self.api_version}/{psid}"
+        path = f"/{self.api_version}/{psid}"
         params = {
             "access_token": self.page_access_token,
             "fields": "first_name,last_name,name,profile_pic,locale,timezone",
         }
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                resp = await client.get(url, params=params)
-                if not resp.is_success:
-                    # Common cases: permissions missing, expired token, user not available
-                    logger.info("get_user_profile(%s) failed: %s", psid, resp.text)
-                    return None
-                data = resp.json()
-                # Normalize name
-                name = data.get("name") or (
-                    ((data.get("first_name") or "").strip() + " " + (data.get("last_name") or "").strip()).strip()
-                )
-                profile = {
-                    "user_id": psid,
-                    "name": name or None,
-                    "first_name": data.get("first_name"),
-                    "last_name": data.get("last_name"),
-                    "profile_pic": data.get("profile_pic"),
-                    "locale": data.get("locale"),
-                    "timezone": data.get("timezone"),
-                }
-                # Cache it
-                self._profile_cache[psid] = (now, profile)
-                return profile
+            resp = await self.graph_client.request("GET", path, "profile", params=params)
+            if not resp.is_success:
+                # Common cases: permissions missing, expired token, user not available
+                logger.info("get_user_profile(%s) failed: %s", psid, resp.text)
+                return None
+            data = resp.json()
+            # Normalize name
+            name = data.get("name") or (
+                ((data.get("first_name") or "").strip() + " " + (data.get("last_name") or "").strip()).strip()
+            )
+            profile = {
+                "user_id": psid,
+                "name": name or None,
+                "first_name": data.get("first_name"),
+                "last_name": data.get("last_name"),
+                "profile_pic": data.get("profile_pic"),
+                "locale": data.get("locale"),
+                "timezone": data.get("timezone"),
+            }
+            # Cache it
+            self._profile_cache[psid] = (now, profile)
+            return profile
         except Exception as e:  # noqa: BLE001
             logger.exception("get_user_profile exception: %s", e)
             return None
@@ -328,11 +387,9 @@ class FacebookMessengerService:
     async def call_agent_stream(self, app_state, inputs: Dict[str, Any]) -> str:
         """Stream responses from LangGraph and return the final assistant text.
 
-        This wraps the synchronous LangGraph .stream(...) in a thread to avoid
-        blocking the event loop.
+        Runs the graph with .astream(...) on the event loop, so a waiting
+        conversation does not hold a worker thread.
         """
-        import asyncio
-
         question = (inputs.get("question") or "").strip()
         user_id = str(inputs.get("user_id") or "").strip()
         session_id = str(inputs.get("session_id") or f"facebook_session_{user_id}")
@@ -351,7 +408,7 @@ class FacebookMessengerService:
                 return " ".join(p for p in parts if p).strip()
             return str(content).strip() if content is not None else ""
 
-        def _run_stream() -> str:
+        async def _run_stream() -> str:
             try:
                 config = {"configurable": {"thread_id": session_id, "user_id": user_id}}
                 final_text = ""
@@ -364,9 +421,12 @@ class FacebookMessengerService:
                         "user_id": user_id
                     }
                 }
+                graph_input = {"messages": [message_with_metadata]}
+                if inputs.get("route_hint"):
+                    graph_input["route_hint"] = inputs["route_hint"]
                 # Stream values to capture the latest assistant message
-                for chunk in app_state.graph.stream(
-                    {"messages": [message_with_metadata]},
+                async for chunk in app_state.graph.astream(
+                    graph_input,
                     config,
                     stream_mode="values",
                 ):
@@ -382,17 +442,17 @@ class FacebookMessengerService:
                     except Exception as ie:  # noqa: BLE001
                         logger.debug("Stream chunk parse error: %s", ie)
                         continue
+                # Summarize older messages after the reply, off the user-visible path
+                schedule_conversation_summary(app_state.graph, config)
                 return final_text or "Tôi đã nhận được tin nhắn của bạn. Cảm ơn bạn!"
             except Exception as e:  # noqa: BLE001
                 logger.exception("Error streaming agent result: %s", e)
                 return "Xin lỗi, có lỗi xảy ra khi xử lý tin nhắn. Vui lòng thử lại sau."
 
-        return await asyncio.to_thread(_run_stream)
+        return await _run_stream()
 
     async def call_agent_with_state(self, app_state, inputs: Dict[str, Any]) -> tuple[str, dict]:
         """Call agent and return both response and final state"""
-        import asyncio
-
         question = (inputs.get("question") or "").strip()
         user_id = str(inputs.get("user_id") or "").strip()
         session_id = str(inputs.get("session_id") or f"facebook_session_{user_id}")
@@ -411,7 +471,7 @@ class FacebookMessengerService:
                 return " ".join(p for p in parts if p).strip()
             return str(content).strip() if content is not None else ""
 
-        def _run_with_state() -> tuple[str, dict]:
+        async def _run_with_state() -> tuple[str, dict]:
             try:
                 config = {"configurable": {"thread_id": session_id, "user_id": user_id}}
                 final_text = ""
@@ -427,9 +487,13 @@ class FacebookMessengerService:
                     }
                 }
                 
+                graph_input = {"messages": [message_with_metadata]}
+                if inputs.get("route_hint"):
+                    graph_input["route_hint"] = inputs["route_hint"]
+                
                 # Stream to get both final response and state
-                for chunk in app_state.graph.stream(
-                    {"messages": [message_with_metadata]},
+                async for chunk in app_state.graph.astream(
+                    graph_input,
                     config,
                     stream_mode="values",
                 ):
@@ -451,13 +515,14 @@ class FacebookMessengerService:
                         logger.debug("Stream chunk parse error: %s", ie)
                         continue
                         
+                schedule_conversation_summary(app_state.graph, config)
                 return final_text or "Tôi đã nhận được tin nhắn của bạn.", final_state
                 
             except Exception as e:
                 logger.exception("Error in agent call with state: %s", e)
                 return "Xin lỗi, có lỗi xảy ra khi xử lý tin nhắn.", {}
 
-        return await asyncio.to_thread(_run_with_state)
+        return await _run_with_state()
 
     def _resolve_thread_id(self, messaging: Dict[str, Any]) -> str:
         """Best-effort thread id: use recipient.id (page) or PAGE_ID."""
@@ -491,29 +556,20 @@ class FacebookMessengerService:
             
             logger.info("🚀 Starting Redis message processor...")
             asyncio.create_task(self._background_message_processor())
+            asyncio.create_task(self._recover_stale_events())
+            if isinstance(self.message_aggregator, RedisMessageAggregator):
+                self.message_aggregator.start()
+            if self.outbox is not None:
+                self.outbox.start()
             
         except Exception as e:
             logger.error(f"❌ Failed to start Redis processor: {e}")
     
     async def _background_message_processor(self):
-        """Background processor cho Redis events"""
+        """Background processor cho Redis events: song song giữa các user, tuần tự trong một user"""
         try:
             async for msg_id, fields in self.redis_queue.consume_events():
-                try:
-                    event_type = fields.get("event_type")
-                    user_id = fields.get("user_id")
-                    data = json.loads(fields.get("data", "{}"))
-                    
-                    if event_type == "process_complete_message":
-                        await self._process_aggregated_context_from_queue(user_id, data)
-                        
-                    # Acknowledge message
-                    await self.redis_queue.acknowledge_message(msg_id)
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error processing Redis message {msg_id}: {e}")
-                    # Still acknowledge to avoid reprocessing
-                    await self.redis_queue.acknowledge_message(msg_id)
+                await self._submit_event(msg_id, fields)
                     
         except Exception as e:
             logger.error(f"❌ Background processor error: {e}")
@@ -521,6 +577,44 @@ class FacebookMessengerService:
             await asyncio.sleep(5)
             asyncio.create_task(self._background_message_processor())
     
+    async def _submit_event(self, msg_id: str, fields: dict):
+        """Queue one stream event behind earlier events of the same user"""
+        await self.event_executor.submit(
+            fields.get("user_id") or msg_id,
+            lambda: self._handle_stream_event(msg_id, fields),
+            job_id=msg_id,
+            enqueued_at=stream_id_time(msg_id),
+        )
+    
+    async def _handle_stream_event(self, msg_id: str, fields: dict):
+        """Xử lý một event (giữ lease của user) rồi ack (kể cả khi lỗi, để tránh xử lý lại; không ack khi bị hủy lúc shutdown)"""
+        try:
+            event_type = fields.get("event_type")
+            user_id = fields.get("user_id")
+            data = json.loads(fields.get("data", "{}"))
+            
+            async with self.user_lease.hold(user_id, msg_id):
+                if event_type == "process_complete_message":
+                    await self._process_aggregated_context_from_queue(user_id, data)
+                
+        except Exception as e:
+            logger.error(f"❌ Error processing Redis message {msg_id}: {e}")
+        await self.redis_queue.acknowledge_message(msg_id)
+    
+    async def _recover_stale_events(self):
+        """Giữ event đang chờ trong executor không bị idle (XCLAIM JUSTID), rồi XAUTOCLAIM event pending của consumer đã crash"""
+        config = self.redis_queue.config
+        # Refresh well inside the idle threshold other workers claim at
+        interval = min(config.claim_interval, config.claim_min_idle_ms / 3000)
+        while self._redis_processor_started:
+            try:
+                await self.redis_queue.refresh_pending(self.event_executor.tracked_ids())
+                for msg_id, fields in await self.redis_queue.claim_stale():
+                    await self._submit_event(msg_id, fields)
+            except Exception as e:
+                logger.error(f"❌ Stale event recovery error: {e}")
+            await asyncio.sleep(interval)
+    
     async def _process_aggregated_context_from_queue(self, user_id: str, context_data: dict):
         """Xử lý aggregated context từ Redis queue theo thứ tự: images trước, text sau"""
         try:
@@ -581,6 +675,8 @@ class FacebookMessengerService:
                                 "question": image_message_content.strip(),
                                 "user_id": user_id,
                                 "session_id": session,
+                                # Attachment-only batch: skip the LLM router
+                                "route_hint": "process_document",
                             }
                             
                             # Process images to get contexts and state - BLOCKING OPERATION
@@ -666,10 +762,10 @@ class FacebookMessengerService:
                         # Call agent with enhanced inputs
                         config = {"configurable": {"thread_id": session, "user_id": user_id}}
                         
-                        def _run_text_with_context():
+                        async def _run_text_with_context():
                             try:
                                 final_text = ""
-                                for chunk in app_state.graph.stream(initial_state, config, stream_mode="values"):
+                                async for chunk in app_state.graph.astream(initial_state, config, stream_mode="values"):
                                     try:
                                         messages = chunk.get("messages") if isinstance(chunk, dict) else None
                                         if messages:
@@ -680,16 +776,16 @@ class FacebookMessengerService:
                                     except Exception as ie:
                                         logger.debug("Text stream chunk parse error: %s", ie)
                                         continue
+                                schedule_conversation_summary(app_state.graph, config)
                                 return final_text or "Tôi đã nhận được tin nhắn của bạn."
                             except Exception as e:
                                 logger.exception("Error in text processing with context: %s", e)
                                 return "Xin lỗi, có lỗi xảy ra khi xử lý tin nhắn."
                         
-                        import asyncio
-                        reply = await asyncio.to_thread(_run_text_with_context)
+                        reply = await _run_text_with_context()
                         
                         if reply:  # Only send message if reply is not None
-                            await self.send_message(user_id, reply)
+                            await self.deliver_reply(user_id, reply)
                             
                             # Store bot reply
                             self.message_history.store_message(
@@ -703,7 +799,7 @@ class FacebookMessengerService:
                             
                     except Exception as e:
                         logger.error(f"❌ Agent error for text processing {user_id}: {e}")
-                        await self.send_message(user_id, "Xin lỗi, có lỗi xảy ra. Vui lòng thử lại sau.")
+                        await self.deliver_reply(user_id, "Xin lỗi, có lỗi xảy ra. Vui lòng thử lại sau.")
             
             # If only images (no text), the image processing already handled the response
             elif image_messages and not text_messages:
@@ -977,7 +1073,7 @@ class FacebookMessengerService:
                 reply = await self.call_agent(app_state, sender, full_message)
                 
                 if reply:  # Only send message if reply is not None
-                    await self.send_message(sender, reply)
+                    await self.deliver_reply(sender, reply)
                     
                     # Store bot reply in history
                     bot_message_id = f"bot_{sender}_{int(time.time())}"
@@ -992,7 +1088,7 @@ class FacebookMessengerService:
             except Exception as agent_error:
                 logger.error(f"❌ Agent processing failed for {sender}: {agent_error}")
                 reply = "Xin lỗi, em đang gặp sự cố kỹ thuật. Anh/chị vui lòng thử lại sau ít phút."
-                await self.send_message(sender, reply)
+                await self.deliver_reply(sender, reply)
                         
         except Exception as e:
             logger.error(f"❌ Error processing complete message: {e}")
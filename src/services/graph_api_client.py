@@ -0,0 +1,167 @@
+"""
+Long-lived HTTP client for the Facebook Graph API.
+
+send_message, send_sender_action and get_user_profile each opened their own
+httpx.AsyncClient, so every reply and typing indicator paid a fresh TCP + TLS
+handshake to graph.facebook.com. GraphApiClient keeps one pooled client per
+service:
+
+- HTTP/2 (one multiplexed connection) with HTTP/1.1 keep-alive as fallback,
+- bounded pool (FB_HTTP_MAX_CONNECTIONS / FB_HTTP_MAX_KEEPALIVE) with an idle
+  expiry,
+- a timeout per endpoint (send / sender_action / profile),
+- started and closed by the FastAPI lifespan; created lazily on first use
+  otherwise (scripts, tests),
+- connection-reuse metrics from httpcore's trace events, exposed at
+  /health/facebook.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GraphApiClientConfig:
+    """Cấu hình HTTP client dùng chung cho Graph API"""
+    http2: bool = env_field("FB_HTTP2", True)
+    max_connections: int = env_field("FB_HTTP_MAX_CONNECTIONS", 20)
+    max_keepalive_connections: int = env_field("FB_HTTP_MAX_KEEPALIVE", 10)
+    keepalive_expiry: float = env_field("FB_HTTP_KEEPALIVE_EXPIRY", 60.0)
+    connect_timeout: float = env_field("FB_HTTP_CONNECT_TIMEOUT", 3.0)
+    # Per-endpoint total timeouts (seconds)
+    send_timeout: float = env_field("FB_SEND_TIMEOUT", 10.0)
+    sender_action_timeout: float = env_field("FB_SENDER_ACTION_TIMEOUT", 5.0)
+    profile_timeout: float = env_field("FB_PROFILE_TIMEOUT", 10.0)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class GraphApiClient:
+    """One pooled httpx.AsyncClient for graph.facebook.com, with reuse metrics."""
+
+    def __init__(
+        self,
+        base_url: str,
+        config: Optional[GraphApiClientConfig] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.config = config or GraphApiClientConfig()
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.http2 = False
+        self._stats: Dict[str, Any] = {
+            "requests": 0,
+            "errors": 0,
+            "new_connections": 0,
+            "tls_handshakes": 0,
+            "http2_requests": 0,
+            "clients_created": 0,
+        }
+        self._latency: Dict[str, Dict[str, float]] = {}
+
+    def _timeouts(self) -> Dict[str, httpx.Timeout]:
+        connect = self.config.connect_timeout
+        return {
+            "send": httpx.Timeout(self.config.send_timeout, connect=connect),
+            "sender_action": httpx.Timeout(self.config.sender_action_timeout, connect=connect),
+            "profile": httpx.Timeout(self.config.profile_timeout, connect=connect),
+        }
+
+    def _create_client(self) -> httpx.AsyncClient:
+        http2 = self.http2 = self.config.http2 and _http2_available()
+        if self.config.http2 and not http2:
+            logger.warning("⚠️ h2 not installed (pip install 'httpx[http2]'), Graph API client uses HTTP/1.1")
+        self._stats["clients_created"] += 1
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            transport=self._transport,
+            limits=httpx.Limits(
+                max_connections=self.config.max_connections,
+                max_keepalive_connections=self.config.max_keepalive_connections,
+                keepalive_expiry=self.config.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(self.config.send_timeout, connect=self.config.connect_timeout),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    async def start(self) -> None:
+        """Create the client up front (FastAPI lifespan startup)."""
+        _ = self.client
+        logger.info(f"✅ Graph API client ready (http2={self.http2})")
+
+    async def aclose(self) -> None:
+        """Close pooled connections (FastAPI lifespan shutdown)."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def _trace(self, event: str, info: Dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.complete":
+            self._stats["new_connections"] += 1
+        elif event == "connection.start_tls.complete":
+            self._stats["tls_handshakes"] += 1
+        elif event == "http2.send_request_headers.started":
+            self._stats["http2_requests"] += 1
+
+    async def request(self, method: str, path: str, endpoint: str, **kwargs: Any) -> httpx.Response:
+        """Send a request with the endpoint's timeout; transport errors are raised."""
+        kwargs.setdefault("timeout", self._timeouts().get(endpoint, self.client.timeout))
+        started = time.perf_counter()
+        self._stats["requests"] += 1
+        try:
+            return await self.client.request(method, path, extensions={"trace": self._trace}, **kwargs)
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            latency = self._latency.setdefault(endpoint, {"requests": 0, "total_ms": 0.0})
+            latency["requests"] += 1
+            latency["total_ms"] += (time.perf_counter() - started) * 1000
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self._stats["requests"]
+        reused = max(requests - self._stats["new_connections"], 0)
+        return {
+            **self._stats,
+            # Requests served on an already open connection
+            "reused_requests": reused,
+            "reuse_ratio": round(reused / requests, 3) if requests else 0.0,
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": self.http2,
+            "endpoints": {
+                name: {
+                    "requests": int(v["requests"]),
+                    "avg_ms": round(v["total_ms"] / v["requests"], 1) if v["requests"] else 0.0,
+                }
+                for name, v in self._latency.items()
+            },
+        }
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0
+        self._latency.clear()
@@ -48,7 +48,7 @@ async def redis_health():
     
     try:
         # Test Redis connection
-        await asyncio.to_thread(_redis_queue.redis.ping)
+        await _redis_queue.redis.ping()
         
         # Get stream info
         stream_info = await _redis_queue.get_stream_info()
@@ -60,6 +60,7 @@ async def redis_health():
             "consumer_group": _redis_queue.config.consumer_group,
             "stream_length": stream_info.get("length", 0),
             "last_generated_id": stream_info.get("last-generated-id", "N/A"),
+            "consumer": _redis_queue.get_stats(),
             "timestamp": time.time()
         })
         
@@ -141,6 +142,7 @@ async def facebook_health():
                 "redis_available": REDIS_AVAILABLE,
                 "legacy_mode": not REDIS_AVAILABLE
             },
+            "http": _facebook_service.graph_client.get_stats() if hasattr(_facebook_service, "graph_client") else None,
             "timestamp": time.time()
         })
         
@@ -244,6 +246,247 @@ async def detailed_metrics():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Metrics error: {str(e)}")
 
+@router.get("/embedding-cache")
+async def embedding_cache_metrics():
+    """Hit/miss statistics của query-embedding cache"""
+    try:
+        from src.database.embedding_cache import get_embedding_cache
+
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": get_embedding_cache().get_stats(),
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Embedding cache metrics error: {str(e)}")
+
+@router.get("/grading-policy")
+async def grading_policy_metrics():
+    """Số tài liệu được accept/drop theo score và số LLM grader call tiết kiệm được"""
+    try:
+        from src.utils.grading_policy import get_grading_policy
+
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": get_grading_policy().get_stats(),
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Grading policy metrics error: {str(e)}")
+
+@router.get("/grader-cache")
+async def grader_cache_metrics():
+    """Hit/miss statistics của grader decision cache"""
+    try:
+        from src.database.grader_cache import get_grader_cache
+
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": get_grader_cache().get_stats(),
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Grader cache metrics error: {str(e)}")
+
+@router.get("/fast-router")
+async def fast_router_metrics():
+    """Tỷ lệ route cục bộ (bỏ qua LLM router) và độ đồng thuận với LLM router"""
+    try:
+        from src.utils.fast_router import get_fast_router
+
+        fast_router = get_fast_router()
+        if fast_router is None:
+            return JSONResponse({
+                "status": "not_initialized",
+                "message": "Fast router not initialized",
+                "timestamp": time.time()
+            }, status_code=503)
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": fast_router.get_stats(),
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Fast router metrics error: {str(e)}")
+
+@router.get("/speculative-retrieval")
+async def speculative_retrieval_metrics():
+    """Tỷ lệ trúng của retrieve chạy song song với router và thời gian retrieve bị lãng phí"""
+    try:
+        from src.utils.speculative_retrieval import get_speculative_retriever
+
+        speculative = get_speculative_retriever()
+        if speculative is None:
+            return JSONResponse({
+                "status": "not_initialized",
+                "message": "Speculative retrieval not initialized",
+                "timestamp": time.time()
+            }, status_code=503)
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": speculative.get_stats(),
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Speculative retrieval metrics error: {str(e)}")
+
+@router.get("/checkpointer")
+async def checkpointer_metrics():
+    """Thống kê checkpointer: cache/write-back và pool Postgres, hoặc số thread và bytes đang giữ trong RAM"""
+    try:
+        from src.database.checkpointer import get_checkpointer_stats
+
+        stats = get_checkpointer_stats()
+        if stats is None:
+            return JSONResponse({
+                "status": "not_initialized",
+                "message": "Checkpointer not initialized",
+                "timestamp": time.time()
+            }, status_code=503)
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": stats,
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Checkpointer metrics error: {str(e)}")
+
+@router.get("/database")
+async def database_metrics():
+    """Thống kê data access layer: số truy vấn, latency, truy vấn chậm và pool kết nối"""
+    try:
+        from src.database.data_access import get_data_access_stats
+
+        stats = get_data_access_stats()
+        if stats is None:
+            return JSONResponse({
+                "status": "not_initialized",
+                "message": "Data access layer not initialized",
+                "timestamp": time.time()
+            }, status_code=503)
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": stats,
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database metrics error: {str(e)}")
+
+@router.get("/state-audit")
+async def state_audit_metrics():
+    """Audit cập nhật state theo node: channel ghi lại giá trị không đổi, thời gian reducer và bytes checkpoint"""
+    try:
+        from src.utils.state_audit import get_state_audit
+
+        audit = get_state_audit()
+        if audit is None:
+            return JSONResponse({
+                "status": "not_initialized",
+                "message": "State audit not initialized",
+                "timestamp": time.time()
+            }, status_code=503)
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": audit.get_stats(),
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"State audit metrics error: {str(e)}")
+
+@router.get("/conversation-memory")
+async def conversation_memory_metrics():
+    """Tóm tắt hội thoại chạy nền: số lần tóm tắt, thời gian LLM và cache đếm token theo message"""
+    try:
+        from src.utils.conversation_memory import get_conversation_memory
+
+        memory = get_conversation_memory()
+        if memory is None:
+            return JSONResponse({
+                "status": "not_initialized",
+                "message": "Conversation memory not initialized",
+                "timestamp": time.time()
+            }, status_code=503)
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": memory.get_stats(),
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Conversation memory metrics error: {str(e)}")
+
+@router.get("/outbound-queue")
+async def outbound_queue_metrics():
+    """Hàng đợi gửi tin nhắn Messenger: đã gửi, retry, lỗi rate limit (613), dead letter và số người nhận đang chờ"""
+    outbox = getattr(_facebook_service, "outbox", None) if _facebook_service else None
+    if outbox is None:
+        return JSONResponse({
+            "status": "not_initialized",
+            "message": "Outbound queue not initialized",
+            "timestamp": time.time()
+        }, status_code=503)
+    try:
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": {**outbox.get_stats(), "queue": await outbox.get_queue_info()},
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Outbound queue metrics error: {str(e)}")
+
+@router.get("/event-processor")
+async def event_processor_metrics():
+    """Xử lý event Redis song song theo user: số job đang chạy / đang chờ, độ trễ hàng đợi, lease theo user và event nhận lại (XAUTOCLAIM)"""
+    executor = getattr(_facebook_service, "event_executor", None) if _facebook_service else None
+    if executor is None:
+        return JSONResponse({
+            "status": "not_initialized",
+            "message": "Event processor not initialized",
+            "timestamp": time.time()
+        }, status_code=503)
+    try:
+        metrics = executor.get_stats()
+        if _redis_queue is not None:
+            metrics["stream"] = _redis_queue.get_stats()
+        user_lease = getattr(_facebook_service, "user_lease", None)
+        if user_lease is not None:
+            metrics["user_lease"] = user_lease.get_stats()
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": metrics,
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Event processor metrics error: {str(e)}")
+
+@router.get("/checkpoint-size")
+async def checkpoint_size(thread_id: str):
+    """Kích thước checkpoint mới nhất của một thread theo từng channel (bytes sau serialize)"""
+    try:
+        from src.database.checkpointer import get_checkpointer
+        from src.utils.ephemeral_state import checkpoint_size_report, get_ephemeral_channels
+
+        checkpointer = get_checkpointer()
+        checkpoint_tuple = await checkpointer.aget_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+        if checkpoint_tuple is None:
+            return JSONResponse({
+                "status": "not_found",
+                "message": f"No checkpoint for thread {thread_id}",
+                "timestamp": time.time()
+            }, status_code=404)
+        ephemeral = get_ephemeral_channels()
+        return JSONResponse({
+            "status": "healthy",
+            "metrics": {
+                "thread_id": thread_id,
+                "checkpoint_id": checkpoint_tuple.checkpoint["id"],
+                **checkpoint_size_report(checkpoint_tuple.checkpoint["channel_values"], checkpointer.serde),
+                "ephemeral": ephemeral.get_stats() if ephemeral else None,
+            },
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Checkpoint size report error: {str(e)}")
+
 # Utility endpoint for testing
 @router.post("/test/message-flow")
 async def test_message_flow(test_data: Dict[str, Any]):
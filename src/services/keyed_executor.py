@@ -0,0 +1,168 @@
+"""
+Concurrent executor that keeps jobs with the same key in order.
+
+The Redis background processor awaited every process_complete_message event
+before reading the next one, so one slow image analysis or LLM call held up
+every other customer. KeyedExecutor runs jobs for different keys (PSIDs) in
+parallel, up to `concurrency`, and jobs for the same key strictly one after
+another, in submission order:
+
+- one drain task per active key pops that key's jobs FIFO,
+- a global semaphore bounds the jobs running at once,
+- `submit` waits while `max_pending` jobs are queued or running, so the
+  stream reader stops reading instead of buffering without bound,
+- job ids already queued or running are ignored (a stale-entry reclaim can
+  hand back an event this process is still working on); `tracked_ids()`
+  lists them so the caller can keep their stream entries from going idle.
+
+Gauges (in flight, queued, active keys, queue lag from the stream entry's
+timestamp) are exposed at /health/event-processor.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class KeyedExecutorConfig:
+    """Cấu hình xử lý song song event theo người dùng"""
+    # Jobs running at once across all keys
+    concurrency: int = env_field("EVENT_PROCESSOR_CONCURRENCY", 8)
+    # Queued + running jobs before submit() waits (backpressure on the reader)
+    max_pending: int = env_field("EVENT_PROCESSOR_MAX_PENDING", 200)
+
+
+def stream_id_time(msg_id: str) -> Optional[float]:
+    """Creation time (epoch seconds) of a Redis stream entry id `<ms>-<seq>`."""
+    try:
+        return int(str(msg_id).split("-", 1)[0]) / 1000
+    except (TypeError, ValueError):
+        return None
+
+
+class KeyedExecutor:
+    """Runs jobs concurrently across keys and in order within a key."""
+
+    def __init__(self, config: Optional[KeyedExecutorConfig] = None, clock: Callable[[], float] = time.time):
+        self.config = config or KeyedExecutorConfig()
+        self.clock = clock
+        self._running = asyncio.Semaphore(max(self.config.concurrency, 1))
+        self._capacity = asyncio.Semaphore(max(self.config.max_pending, 1))
+        self._queues: Dict[str, Deque[Tuple[str, Job, Optional[float]]]] = {}
+        self._drains: Dict[str, asyncio.Task] = {}
+        self._tracked: Set[str] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._in_flight = 0
+        self._stats: Dict[str, Any] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "duplicates": 0,
+            "max_in_flight": 0,
+            "lag_samples": 0,
+            "lag_ms_total": 0.0,
+            "last_lag_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
+
+    async def submit(self, key: str, job: Job, job_id: Optional[str] = None, enqueued_at: Optional[float] = None) -> bool:
+        """Queue `job` behind earlier jobs of `key`; returns False for an id already tracked."""
+        if job_id is not None and job_id in self._tracked:
+            self._stats["duplicates"] += 1
+            return False
+        await self._capacity.acquire()
+        job_id = job_id or f"{key}:{self._stats['submitted']}"
+        self._tracked.add(job_id)
+        self._stats["submitted"] += 1
+        self._idle.clear()
+        self._queues.setdefault(key, deque()).append((job_id, job, enqueued_at))
+        if key not in self._drains:
+            self._drains[key] = asyncio.create_task(self._drain(key))
+        return True
+
+    async def _drain(self, key: str) -> None:
+        queue = self._queues[key]
+        try:
+            while queue:
+                job_id, job, enqueued_at = queue.popleft()
+                try:
+                    async with self._running:
+                        self._start(enqueued_at)
+                        try:
+                            await job()
+                            self._stats["completed"] += 1
+                        except Exception as e:  # noqa: BLE001
+                            self._stats["failed"] += 1
+                            logger.error(f"❌ Job {job_id} for {key} failed: {e}")
+                        finally:
+                            self._in_flight -= 1
+                finally:
+                    self._tracked.discard(job_id)
+                    self._capacity.release()
+        finally:
+            # Jobs left behind by a cancelled drain (shutdown)
+            while queue:
+                job_id, _, _ = queue.popleft()
+                self._tracked.discard(job_id)
+                self._capacity.release()
+            self._queues.pop(key, None)
+            self._drains.pop(key, None)
+            if not self._drains:
+                self._idle.set()
+
+    def _start(self, enqueued_at: Optional[float]) -> None:
+        self._in_flight += 1
+        self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._in_flight)
+        if enqueued_at is not None:
+            lag_ms = max(self.clock() - enqueued_at, 0.0) * 1000
+            self._stats["lag_samples"] += 1
+            self._stats["lag_ms_total"] += lag_ms
+            self._stats["last_lag_ms"] = round(lag_ms, 1)
+            self._stats["max_lag_ms"] = round(max(self._stats["max_lag_ms"], lag_ms), 1)
+
+    def is_tracked(self, job_id: str) -> bool:
+        return job_id in self._tracked
+
+    def tracked_ids(self) -> List[str]:
+        """Ids of the jobs queued or running (e.g. stream entries still owed an ack)."""
+        return list(self._tracked)
+
+    async def join(self) -> None:
+        """Wait until every submitted job has finished."""
+        await self._idle.wait()
+
+    async def stop(self) -> None:
+        """Cancel queued and running jobs (shutdown); unfinished events stay pending in Redis."""
+        for task in list(self._drains.values()):
+            task.cancel()
+        await asyncio.gather(*self._drains.values(), return_exceptions=True)
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        samples = self._stats["lag_samples"]
+        return {
+            **self._stats,
+            "lag_ms_total": round(self._stats["lag_ms_total"], 1),
+            "avg_lag_ms": round(self._stats["lag_ms_total"] / samples, 1) if samples else 0.0,
+            "in_flight": self._in_flight,
+            "queued": len(self._tracked) - self._in_flight,
+            "active_keys": len(self._drains),
+            "concurrency": self.config.concurrency,
+        }
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0.0 if isinstance(self._stats[k], float) else 0
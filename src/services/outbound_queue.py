@@ -0,0 +1,597 @@
+"""
+Ordered, rate-limited outbound delivery for Messenger replies.
+
+Replies were sent inline from _process_aggregated_context_from_queue: the
+worker running the graph waited on the Graph API and on send_message's
+retries, answers over 2000 characters were cut off, and nothing throttled a
+burst of replies against the page's rate limit (error 613). Failed sends then
+retried on the same fixed schedule, all at once.
+
+OutboundQueue keeps pending messages in Redis, so they survive a restart:
+
+- `{prefix}:q:{recipient}` list - per-recipient FIFO of message parts,
+- `{prefix}:ready` sorted set - recipients with pending parts, scored by the
+  time their head part may be sent (a retry moves the score forward),
+- `{prefix}:lease:{recipient}` - one sender per recipient at a time, so
+  parts arrive in order,
+- `{prefix}:bucket` hash - the page's token bucket, shared by all workers,
+- `{prefix}:dead` list - the last FB_OUTBOX_DEAD_MAX parts that failed
+  permanently or ran out of attempts.
+
+Long answers are split at paragraph / sentence boundaries (`split_message`)
+and queued in one script call, so a reply is queued whole or not at all.
+Every send takes a token from the page's `RedisTokenBucket`; a rate-limit
+error also pauses the bucket so every worker's recipients back off too. Retries use
+exponential backoff with full jitter. With FB_SEND_BATCH_SIZE > 1 the head
+parts of several recipients go out in one Graph batch request.
+
+Delivery is at least once: a part whose send succeeded but whose worker died
+before removing it is sent again after the lease expires.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+# Messenger text limit (characters)
+MAX_MESSAGE_CHARS = 2000
+# Graph API limit on operations per batch request
+MAX_BATCH_SIZE = 50
+# Graph error codes for application / page / user rate limits
+RATE_LIMIT_CODES = frozenset({4, 17, 32, 613})
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+@dataclass
+class OutboundQueueConfig:
+    """Cấu hình hàng đợi gửi tin nhắn Messenger"""
+    enabled: bool = env_field("FB_OUTBOX_ENABLED", True)
+    key_prefix: str = env_field("FB_OUTBOX_PREFIX", "messenger:outbox")
+    max_message_chars: int = env_field("FB_MAX_MESSAGE_CHARS", MAX_MESSAGE_CHARS)
+    # Token bucket per page: sustained sends per second and burst size
+    rate_per_second: float = env_field("FB_SEND_RATE", 10.0)
+    burst: int = env_field("FB_SEND_BURST", 20)
+    # > 1: send the head parts of several recipients in one Graph batch request
+    batch_size: int = env_field("FB_SEND_BATCH_SIZE", 1)
+    # Recipients served per dispatch round
+    concurrency: int = env_field("FB_SEND_CONCURRENCY", 8)
+    max_attempts: int = env_field("FB_SEND_MAX_ATTEMPTS", 6)
+    base_backoff: float = env_field("FB_SEND_BACKOFF", 0.5)
+    max_backoff: float = env_field("FB_SEND_MAX_BACKOFF", 60.0)
+    # Pause of the whole page after a rate-limit error (seconds)
+    rate_limit_pause: float = env_field("FB_RATE_LIMIT_PAUSE", 30.0)
+    lease_seconds: float = env_field("FB_OUTBOX_LEASE", 60.0)
+    # Dead letters kept for inspection (oldest are trimmed)
+    dead_letter_max: int = env_field("FB_OUTBOX_DEAD_MAX", 1000)
+    poll_interval: float = env_field("FB_OUTBOX_POLL", 0.2)
+
+
+def _units(text: str, limit: int) -> Iterator[Tuple[str, str]]:
+    """(separator, piece) pairs; every piece is at most `limit` characters."""
+    for paragraph in _PARAGRAPH.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        sep = "\n\n"
+        if len(paragraph) <= limit:
+            yield sep, paragraph
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            if len(sentence) <= limit:
+                yield sep, sentence
+                sep = " "
+                continue
+            # A sentence over the limit: words, then hard cuts
+            for word in sentence.split(" "):
+                if not word:
+                    continue
+                while len(word) > limit:
+                    yield sep, word[:limit]
+                    sep, word = "", word[limit:]
+                yield sep, word
+                sep = " "
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_CHARS) -> List[str]:
+    """Split a reply into messages of at most `limit` characters, at paragraph or sentence boundaries."""
+    parts: List[str] = []
+    current = ""
+    for sep, piece in _units((text or "").strip(), limit):
+        if not current:
+            current = piece
+        elif len(current) + len(sep) + len(piece) <= limit:
+            current += sep + piece
+        else:
+            parts.append(current)
+            current = piece
+    if current:
+        parts.append(current)
+    return parts
+
+
+def backoff_delay(attempt: int, base: float, maximum: float, rng: Callable[[], float] = random.random) -> float:
+    """Exponential backoff with full jitter: uniform in [0, min(maximum, base * 2**attempt)]."""
+    return rng() * min(maximum, base * (2 ** attempt))
+
+
+# KEYS: bucket hash
+# ARGV: rate (tokens/s), capacity, n, ttl ms
+# Returns {wait ms, tokens left, paused (1/0)}; the clock is the Redis server's,
+# so every worker sending for the page shares one bucket.
+TOKEN_BUCKET_TAKE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rate = tonumber(ARGV[1]) / 1000
+local capacity = tonumber(ARGV[2])
+local n = math.min(tonumber(ARGV[3]), capacity)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'paused_until')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+local paused_until = tonumber(state[3]) or 0
+if now < paused_until then
+    return {paused_until - now, tostring(tokens), 1}
+end
+tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate)
+local wait = 0
+if tokens >= n then
+    tokens = tokens - n
+else
+    wait = math.ceil((n - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', now)
+redis.call('PEXPIRE', KEYS[1], ARGV[4])
+return {wait, tostring(tokens), 0}
+"""
+
+# KEYS: bucket hash
+# ARGV: pause ms, ttl ms
+# Empties the bucket and blocks it until now + pause; returns the pause end (ms)
+TOKEN_BUCKET_PAUSE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local paused_until = math.max(tonumber(redis.call('HGET', KEYS[1], 'paused_until')) or 0, now + tonumber(ARGV[1]))
+redis.call('HSET', KEYS[1], 'tokens', '0', 'updated', paused_until, 'paused_until', paused_until)
+redis.call('PEXPIRE', KEYS[1], math.max(tonumber(ARGV[2]), paused_until - now))
+return paused_until
+"""
+
+# KEYS: recipient list, ready zset
+# ARGV: recipient, now, part json...
+# All parts and the ready entry are written together or not at all.
+ENQUEUE_SCRIPT = """
+for i = 3, #ARGV do
+    redis.call('RPUSH', KEYS[1], ARGV[i])
+end
+redis.call('ZADD', KEYS[2], 'NX', ARGV[2], ARGV[1])
+return #ARGV - 2
+"""
+
+
+class RedisTokenBucket:
+    """
+    Token bucket for one page, kept in Redis so all workers share the page's rate.
+
+    `pause` empties it after a rate-limit error; every worker then waits.
+    """
+
+    def __init__(self, redis_queue: Any, key: str, rate: float, capacity: int):
+        self.redis_queue = redis_queue
+        self.key = key
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1)
+        # Last state seen by this worker (monitoring only)
+        self.tokens = float(self.capacity)
+        self.paused_until = 0.0
+        self._take_script = None
+        self._pause_script = None
+
+    def _scripts(self) -> Tuple[Any, Any]:
+        if self._take_script is None:
+            redis_client = self.redis_queue.redis
+            self._take_script = redis_client.register_script(TOKEN_BUCKET_TAKE_SCRIPT)
+            self._pause_script = redis_client.register_script(TOKEN_BUCKET_PAUSE_SCRIPT)
+        return self._take_script, self._pause_script
+
+    def _ttl_ms(self) -> int:
+        # Long enough to refill completely; an idle page's bucket then expires full
+        return int(self.capacity / self.rate * 1000) + 60000
+
+    async def try_take(self, n: int = 1) -> float:
+        """Take `n` tokens and return 0, or return the seconds to wait first."""
+        take, _ = self._scripts()
+        wait_ms, tokens, paused = await take(keys=[self.key], args=[self.rate, self.capacity, n, self._ttl_ms()])
+        self.tokens = float(tokens)
+        if int(paused):
+            self.paused_until = time.time() + int(wait_ms) / 1000
+        return int(wait_ms) / 1000
+
+    async def take(self, n: int = 1) -> None:
+        while True:
+            wait = await self.try_take(n)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def pause(self, seconds: float) -> None:
+        _, pause = self._scripts()
+        await pause(keys=[self.key], args=[int(seconds * 1000), self._ttl_ms()])
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, time.time() + seconds)
+
+    def paused_for(self) -> float:
+        return max(self.paused_until - time.time(), 0.0)
+
+
+class OutboxEnqueueError(Exception):
+    """Enqueue failed; `enqueued` is the number of parts queued anyway (None: unknown)."""
+
+    def __init__(self, message: str, enqueued: Optional[int]):
+        super().__init__(message)
+        self.enqueued = enqueued
+
+
+@dataclass
+class SendResult:
+    ok: bool
+    retryable: bool = False
+    rate_limited: bool = False
+    error: str = ""
+    response: Dict[str, Any] = field(default_factory=dict)
+
+
+def classify_response(status: int, body: Any) -> SendResult:
+    """Map a Graph API answer to ok / retryable / permanent."""
+    body = body if isinstance(body, dict) else {}
+    if 200 <= status < 300:
+        return SendResult(ok=True, response=body)
+    error = body.get("error") or {}
+    code = error.get("code")
+    rate_limited = status == 429 or code in RATE_LIMIT_CODES
+    retryable = rate_limited or status >= 500 or bool(error.get("is_transient"))
+    message = error.get("message") or f"HTTP {status}"
+    return SendResult(
+        ok=False,
+        retryable=retryable,
+        rate_limited=rate_limited,
+        error=f"{code}: {message}" if code is not None else message,
+        response=body,
+    )
+
+
+class GraphSender:
+    """Sends queued parts through the service's pooled GraphApiClient."""
+
+    def __init__(self, graph_client: Any, page_access_token: str, api_version: str):
+        self.graph_client = graph_client
+        self.page_access_token = page_access_token
+        self.api_version = api_version
+
+    @staticmethod
+    def payload(item: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "recipient": {"id": item["recipient"]},
+            "messaging_type": item.get("messaging_type", "RESPONSE"),
+            "message": {"text": item["text"]},
+        }
+
+    async def send(self, item: Dict[str, Any]) -> SendResult:
+        try:
+            resp = await self.graph_client.request(
+                "POST",
+                f"/{self.api_version}/me/messages",
+                "send",
+                params={"access_token": self.page_access_token},
+                json=self.payload(item),
+            )
+        except Exception as e:  # noqa: BLE001
+            return SendResult(ok=False, retryable=True, error=str(e) or type(e).__name__)
+        try:
+            body = resp.json()
+        except ValueError:
+            body = {}
+        return classify_response(resp.status_code, body)
+
+    async def send_batch(self, items: List[Dict[str, Any]]) -> List[SendResult]:
+        """One Graph batch request; results are in the order of `items`."""
+        operations = []
+        for item in items:
+            payload = self.payload(item)
+            operations.append({
+                "method": "POST",
+                "relative_url": f"{self.api_version}/me/messages",
+                "body": urlencode({k: json.dumps(v) if isinstance(v, dict) else v for k, v in payload.items()}),
+            })
+        try:
+            resp = await self.graph_client.request(
+                "POST",
+                "/",
+                "send",
+                data={"access_token": self.page_access_token, "batch": json.dumps(operations)},
+            )
+        except Exception as e:  # noqa: BLE001
+            return [SendResult(ok=False, retryable=True, error=str(e) or type(e).__name__) for _ in items]
+        try:
+            answers = resp.json()
+        except ValueError:
+            answers = None
+        if not resp.is_success or not isinstance(answers, list):
+            result = classify_response(resp.status_code, answers)
+            if result.ok:
+                result = SendResult(ok=False, retryable=True, error="malformed batch response")
+            return [result for _ in items]
+
+        results = []
+        for i in range(len(items)):
+            answer = answers[i] if i < len(answers) else None
+            if not answer:
+                # Operation not completed within the batch timeout
+                results.append(SendResult(ok=False, retryable=True, error="batch operation timed out"))
+                continue
+            try:
+                body = json.loads(answer.get("body") or "{}")
+            except ValueError:
+                body = {}
+            results.append(classify_response(int(answer.get("code", 500)), body))
+        return results
+
+
+class OutboundQueue:
+    """Redis-backed per-recipient FIFO with a shared per-page token bucket and jittered retries."""
+
+    def __init__(
+        self,
+        redis_queue: Any,
+        sender: Any,
+        config: Optional[OutboundQueueConfig] = None,
+        page_id: str = "default",
+        clock: Callable[[], float] = time.time,
+    ):
+        self.redis_queue = redis_queue
+        self.sender = sender
+        self.config = config or OutboundQueueConfig()
+        self.page_id = page_id or "default"
+        self.clock = clock
+        self.bucket = RedisTokenBucket(
+            redis_queue, self._key("bucket"), self.config.rate_per_second, self.config.burst
+        )
+        self._enqueue_script = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._stats = {
+            "enqueued_messages": 0,
+            "enqueued_parts": 0,
+            "split_messages": 0,
+            "sent": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "dead_lettered": 0,
+            "batches": 0,
+            "errors": 0,
+        }
+
+    # --- Keys ---------------------------------------------------------------
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.config.key_prefix, self.page_id) + parts)
+
+    @property
+    def redis(self) -> Any:
+        return self.redis_queue.redis
+
+    async def _ensure_setup(self) -> None:
+        if not self.redis_queue._initialized:
+            await self.redis_queue.setup()
+
+    # --- Producer -----------------------------------------------------------
+    async def enqueue(self, recipient: str, text: str, messaging_type: str = "RESPONSE") -> int:
+        """
+        Queue a reply (split when too long); returns the number of parts.
+
+        Raises OutboxEnqueueError; its `enqueued` tells whether the parts were
+        queued before the error (e.g. the reply to the script call was lost).
+        """
+        parts = split_message(text, self.config.max_message_chars)
+        if not parts:
+            return 0
+        await self._ensure_setup()
+        now = self.clock()
+        items = [
+            json.dumps({
+                "id": uuid.uuid4().hex,
+                "recipient": recipient,
+                "text": part,
+                "messaging_type": messaging_type,
+                "attempts": 0,
+                "enqueued_at": now,
+            }, ensure_ascii=False)
+            for part in parts
+        ]
+        # One script keeps the parts contiguous; ZADD NX keeps a pending retry time
+        queue_key = self._key("q", recipient)
+        try:
+            if self._enqueue_script is None:
+                self._enqueue_script = self.redis.register_script(ENQUEUE_SCRIPT)
+            await self._enqueue_script(keys=[queue_key, self._key("ready")], args=[recipient, now, *items])
+        except Exception as e:  # noqa: BLE001
+            raise OutboxEnqueueError(str(e) or type(e).__name__, await self._queued_parts(queue_key, items)) from e
+        self._stats["enqueued_messages"] += 1
+        self._stats["enqueued_parts"] += len(parts)
+        if len(parts) > 1:
+            self._stats["split_messages"] += 1
+        return len(parts)
+
+    async def _queued_parts(self, queue_key: str, items: List[str]) -> Optional[int]:
+        """After a failed enqueue: len(items) if the script ran, 0 if not, None if Redis can't tell."""
+        try:
+            return len(items) if await self.redis.lpos(queue_key, items[0]) is not None else 0
+        except Exception:  # noqa: BLE001
+            return None
+
+    # --- Recipient lease ----------------------------------------------------
+    async def _lease(self, recipient: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        acquired = await self.redis.set(
+            self._key("lease", recipient),
+            token,
+            nx=True,
+            px=int(self.config.lease_seconds * 1000),
+        )
+        return token if acquired else None
+
+    async def _release(self, recipient: str, token: str) -> None:
+        key = self._key("lease", recipient)
+        if await self.redis.get(key) == token:
+            await self.redis.delete(key)
+
+    # --- Delivery -----------------------------------------------------------
+    async def _claim(self) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Lease ready recipients and read their head parts."""
+        limit = max(self.config.concurrency, self.config.batch_size, 1)
+        ready = await self.redis.zrangebyscore(self._key("ready"), "-inf", self.clock(), start=0, num=limit)
+        claimed = []
+        for recipient in ready:
+            token = await self._lease(recipient)
+            if token is None:
+                continue
+            raw = await self.redis.lindex(self._key("q", recipient), 0)
+            if raw is None:
+                await self._drop_if_empty(recipient)
+                await self._release(recipient, token)
+                continue
+            claimed.append((recipient, token, json.loads(raw)))
+        return claimed
+
+    async def _drop_if_empty(self, recipient: str) -> None:
+        queue_key = self._key("q", recipient)
+        if await self.redis.llen(queue_key):
+            return
+        await self.redis.zrem(self._key("ready"), recipient)
+        # A part enqueued between LLEN and ZREM must stay reachable
+        if await self.redis.llen(queue_key):
+            await self.redis.zadd(self._key("ready"), {recipient: self.clock()})
+
+    async def _complete(self, recipient: str) -> None:
+        await self.redis.lpop(self._key("q", recipient))
+        await self._drop_if_empty(recipient)
+
+    async def _handle(self, recipient: str, item: Dict[str, Any], result: SendResult) -> None:
+        if result.ok:
+            self._stats["sent"] += 1
+            await self._complete(recipient)
+            return
+
+        if result.rate_limited:
+            self._stats["rate_limited"] += 1
+            await self.bucket.pause(self.config.rate_limit_pause)
+        attempts = int(item.get("attempts", 0)) + 1
+        if result.retryable and attempts < self.config.max_attempts:
+            self._stats["retries"] += 1
+            delay = backoff_delay(attempts, self.config.base_backoff, self.config.max_backoff)
+            if result.rate_limited:
+                delay = max(delay, self.config.rate_limit_pause)
+            item = {**item, "attempts": attempts, "last_error": result.error}
+            await self.redis.lset(self._key("q", recipient), 0, json.dumps(item, ensure_ascii=False))
+            await self.redis.zadd(self._key("ready"), {recipient: self.clock() + delay}, xx=True)
+            logger.warning(
+                f"⚠️ Send to {recipient} failed ({result.error}), retry {attempts} in {delay:.1f}s"
+            )
+            return
+
+        self._stats["dead_lettered"] += 1
+        logger.error(f"❌ Dropping message to {recipient} after {attempts} attempt(s): {result.error}")
+        dead = {**item, "attempts": attempts, "last_error": result.error, "failed_at": self.clock()}
+        await self.redis.rpush(self._key("dead"), json.dumps(dead, ensure_ascii=False))
+        await self.redis.ltrim(self._key("dead"), -max(self.config.dead_letter_max, 1), -1)
+        await self._complete(recipient)
+
+    async def _send_one(self, recipient: str, item: Dict[str, Any]) -> None:
+        await self.bucket.take()
+        await self._handle(recipient, item, await self.sender.send(item))
+
+    async def dispatch_once(self) -> int:
+        """One round: claim ready recipients, send their head parts; returns parts attempted."""
+        await self._ensure_setup()
+        claimed = await self._claim()
+        if not claimed:
+            return 0
+        try:
+            batch_size = min(self.config.batch_size, MAX_BATCH_SIZE, self.bucket.capacity)
+            if batch_size > 1:
+                for i in range(0, len(claimed), batch_size):
+                    chunk = claimed[i:i + batch_size]
+                    await self.bucket.take(len(chunk))
+                    results = await self.sender.send_batch([item for _, _, item in chunk])
+                    self._stats["batches"] += 1
+                    for (recipient, _, item), result in zip(chunk, results):
+                        await self._handle(recipient, item, result)
+            else:
+                await asyncio.gather(*(self._send_one(recipient, item) for recipient, _, item in claimed))
+        finally:
+            for recipient, token, _ in claimed:
+                await self._release(recipient, token)
+        return len(claimed)
+
+    async def run(self) -> None:
+        logger.info("🚀 Outbound Messenger queue started")
+        while not self._stopping:
+            try:
+                attempted = await self.dispatch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                self._stats["errors"] += 1
+                logger.error(f"❌ Outbound queue error: {e}")
+                attempted = 0
+            if not attempted:
+                await asyncio.sleep(self.config.poll_interval)
+
+    def start(self) -> Optional[asyncio.Task]:
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):  # noqa: BLE001
+                pass
+        self._task = None
+
+    # --- Monitoring -------------------------------------------------------
+    async def get_queue_info(self) -> Dict[str, Any]:
+        await self._ensure_setup()
+        return {
+            "recipients_pending": await self.redis.zcard(self._key("ready")),
+            "dead_letters": await self.redis.llen(self._key("dead")),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "running": self._task is not None and not self._task.done(),
+            "bucket_tokens": round(self.bucket.tokens, 2),
+            "paused_for": round(self.bucket.paused_for(), 1),
+            "batch_size": self.config.batch_size,
+        }
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0
@@ -4,13 +4,18 @@ Xử lý race condition khi Facebook gửi text và attachment riêng biệt
 """
 
 import redis
+import redis.asyncio
 import json
 import asyncio
 import time
 import logging
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
+from contextlib import asynccontextmanager
 import os
+import socket
+
+from src.core.config import env_field
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +29,25 @@ class RedisConfig:
     socket_timeout: int = 5
     socket_connect_timeout: int = 5
     max_connections: int = 50
+    # XREADGROUP blocks server-side up to this long when the stream is idle
+    block_ms: int = env_field("REDIS_BLOCK_MS", 5000)
+    read_count: int = env_field("REDIS_READ_COUNT", 10)
+    # Acks are buffered and sent with the next read; flushed early at this size
+    ack_batch_size: int = env_field("REDIS_ACK_BATCH_SIZE", 50)
+    # Unique per process, so a crashed worker's pending entries can be reclaimed
+    # (empty: "<host>-<pid>" of the process creating the config)
+    consumer_name: str = env_field("REDIS_CONSUMER_NAME", "")
+    # XAUTOCLAIM entries pending longer than this (must exceed the slowest event)
+    claim_min_idle_ms: int = env_field("REDIS_CLAIM_MIN_IDLE_MS", 300000)
+    claim_interval: float = env_field("REDIS_CLAIM_INTERVAL_SECS", 60.0)
+    # Per-user lease: a user's events run on one worker at a time, in stream order
+    user_lease_prefix: str = env_field("REDIS_USER_LEASE_PREFIX", "messenger:user-lease")
+    user_lease_ms: int = env_field("REDIS_USER_LEASE_MS", 30000)
+    user_lease_poll: float = env_field("REDIS_USER_LEASE_POLL_SECS", 0.1)
+
+    def __post_init__(self):
+        if not self.consumer_name:
+            self.consumer_name = f"{socket.gethostname()}-{os.getpid()}"
 
 @dataclass
 class MessageProcessingConfig:
@@ -36,36 +60,62 @@ class MessageProcessingConfig:
     fast_process_delay: float = 0.1
     # New: inactivity window for batching (seconds)
     inactivity_window: float = float(os.getenv("INACTIVITY_WINDOW_SECS", "5.0"))
+    # "redis": pending batches in Redis (any worker finalizes); "memory": per-process timers
+    aggregator_backend: str = env_field("AGGREGATOR_BACKEND", "redis", str.lower)
+    aggregator_prefix: str = env_field("AGGREGATOR_PREFIX", "messenger:agg")
+    finalize_poll_interval: float = env_field("AGGREGATOR_POLL_SECS", 0.25)
+    finalize_batch_size: int = env_field("AGGREGATOR_FINALIZE_BATCH", 50)
+    # Pending parts expire if no worker finalizes them (seconds)
+    pending_ttl: int = env_field("AGGREGATOR_PENDING_TTL", 600)
 
 class RedisMessageQueue:
-    """Redis Streams-based message queue cho Facebook webhook events"""
-    
+    """
+    Redis Streams-based message queue cho Facebook webhook events.
+
+    Uses redis.asyncio on one shared connection pool, so commands cost no
+    thread-pool hop. While the stream is idle the consumer blocks server-side
+    (`block_ms`). Acks are buffered and sent as one multi-id XACK, pipelined
+    with the next XREADGROUP.
+    """
+
     def __init__(self, config: Optional[RedisConfig] = None):
         self.config = config or RedisConfig()
+        self.pool = None
         self.redis = None
         self._initialized = False
-        
+        self._consuming = False
+        self._pending_acks: List[str] = []
+        self.stats = {
+            'reads': 0,
+            'empty_reads': 0,
+            'messages_read': 0,
+            'acks': 0,
+            'ack_batches': 0,
+            'claimed': 0,
+            'refreshed': 0,
+        }
+
     async def setup(self):
         """Khởi tạo Redis connection và consumer group"""
         try:
-            # Tạo Redis connection với pool
-            self.redis = redis.from_url(
+            # Shared pool; the read timeout must outlast a blocking XREADGROUP
+            self.pool = redis.asyncio.ConnectionPool.from_url(
                 self.config.url,
                 decode_responses=True,
-                socket_timeout=self.config.socket_timeout,
+                socket_timeout=self.config.socket_timeout + self.config.block_ms / 1000,
                 socket_connect_timeout=self.config.socket_connect_timeout,
                 retry_on_timeout=True,
                 max_connections=self.config.max_connections
             )
-            
+            self.redis = redis.asyncio.Redis(connection_pool=self.pool)
+
             # Test connection
-            await asyncio.to_thread(self.redis.ping)
+            await self.redis.ping()
             logger.info(f"✅ Redis connected: {self.config.url}")
-            
+
             # Tạo consumer group (bỏ qua nếu đã tồn tại)
             try:
-                await asyncio.to_thread(
-                    self.redis.xgroup_create,
+                await self.redis.xgroup_create(
                     self.config.stream_name,
                     self.config.consumer_group,
                     id='0',
@@ -77,18 +127,18 @@ class RedisMessageQueue:
                     logger.info(f"📋 Consumer group already exists: {self.config.consumer_group}")
                 else:
                     raise
-                    
+
             self._initialized = True
-            
+
         except Exception as e:
             logger.error(f"❌ Redis setup failed: {e}")
             raise
-    
+
     async def enqueue_event(self, user_id: str, event_type: str, data: dict) -> str:
         """Thêm event vào Redis stream"""
         if not self._initialized:
             await self.setup()
-            
+
         event_data = {
             "user_id": user_id,
             "event_type": event_type,
@@ -96,70 +146,165 @@ class RedisMessageQueue:
             "timestamp": str(time.time()),
             "processed": "false"
         }
-        
+
         try:
-            message_id = await asyncio.to_thread(
-                self.redis.xadd,
-                self.config.stream_name,
-                event_data
-            )
+            message_id = await self.redis.xadd(self.config.stream_name, event_data)
             logger.debug(f"📤 Enqueued {event_type} event for {user_id}: {message_id}")
             return message_id
         except Exception as e:
             logger.error(f"❌ Failed to enqueue event: {e}")
             raise
-    
-    async def consume_events(self, consumer_name: str = "worker-1"):
+
+    async def _read(self, consumer_name: str) -> list:
+        """XREADGROUP, pipelined after the XACK of buffered ids (one round trip)."""
+        acks, self._pending_acks = self._pending_acks, []
+        streams = {self.config.stream_name: ">"}
+        try:
+            if not acks:
+                return await self.redis.xreadgroup(
+                    self.config.consumer_group,
+                    consumer_name,
+                    streams,
+                    count=self.config.read_count,
+                    block=self.config.block_ms
+                )
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.xack(self.config.stream_name, self.config.consumer_group, *acks)
+                pipe.xreadgroup(
+                    self.config.consumer_group,
+                    consumer_name,
+                    streams,
+                    count=self.config.read_count,
+                    block=self.config.block_ms
+                )
+                _, messages = await pipe.execute()
+        except Exception:
+            # Unsent acks go with the next attempt
+            self._pending_acks = acks + self._pending_acks
+            raise
+        self.stats['acks'] += len(acks)
+        self.stats['ack_batches'] += 1
+        return messages
+
+    async def consume_events(self, consumer_name: Optional[str] = None):
         """Consume events từ Redis stream"""
         if not self._initialized:
             await self.setup()
-            
+        consumer_name = consumer_name or self.config.consumer_name
+
         logger.info(f"🔄 Starting event consumer: {consumer_name}")
-        
+
+        self._consuming = True
+        try:
+            while True:
+                try:
+                    messages = await self._read(consumer_name)
+                    self.stats['reads'] += 1
+                    if not messages:
+                        self.stats['empty_reads'] += 1
+
+                    for stream, msgs in messages or []:
+                        for msg_id, fields in msgs:
+                            self.stats['messages_read'] += 1
+                            yield msg_id, fields
+
+                except Exception as e:
+                    logger.error(f"❌ Redis consume error: {e}")
+                    await asyncio.sleep(1)
+        finally:
+            self._consuming = False
+            await self.flush_acks()
+
+    async def claim_stale(self, consumer_name: Optional[str] = None, count: int = 100) -> List[Tuple[str, dict]]:
+        """XAUTOCLAIM entries idle longer than claim_min_idle_ms (e.g. from a crashed consumer)"""
+        if not self._initialized:
+            await self.setup()
+        consumer_name = consumer_name or self.config.consumer_name
+        claimed: List[Tuple[str, dict]] = []
+        start_id = "0-0"
         while True:
-            try:
-                messages = await asyncio.to_thread(
-                    self.redis.xreadgroup,
-                    self.config.consumer_group,
-                    consumer_name,
-                    {self.config.stream_name: ">"},
-                    count=10,
-                    block=100  # 100ms block
-                )
-                
-                for stream, msgs in messages:
-                    for msg_id, fields in msgs:
-                        yield msg_id, fields
-                        
-            except Exception as e:
-                logger.error(f"❌ Redis consume error: {e}")
-                await asyncio.sleep(1)
+            response = await self.redis.xautoclaim(
+                self.config.stream_name,
+                self.config.consumer_group,
+                consumer_name,
+                self.config.claim_min_idle_ms,
+                start_id=start_id,
+                count=count
+            )
+            start_id, messages = response[0], response[1]
+            # Entries deleted from the stream come back without fields
+            claimed.extend((msg_id, fields) for msg_id, fields in messages if fields)
+            if start_id in ("0-0", b"0-0") or len(claimed) >= count:
+                break
+        if claimed:
+            self.stats['claimed'] += len(claimed)
+            logger.warning(f"♻️ Reclaimed {len(claimed)} stale pending event(s) for {consumer_name}")
+        return claimed
     
-    async def acknowledge_message(self, msg_id: str):
-        """Acknowledge message đã xử lý thành công"""
-        try:
-            await asyncio.to_thread(
-                self.redis.xack,
+    async def refresh_pending(self, msg_ids: List[str], consumer_name: Optional[str] = None, chunk: int = 500) -> int:
+        """
+        XCLAIM JUSTID to ourselves: resets the idle time of entries this process
+        still has queued or running, so claim_stale on another worker never
+        takes an event that is only waiting in this worker's executor.
+        """
+        if not msg_ids:
+            return 0
+        if not self._initialized:
+            await self.setup()
+        consumer_name = consumer_name or self.config.consumer_name
+        refreshed = 0
+        for start in range(0, len(msg_ids), chunk):
+            ids = await self.redis.xclaim(
                 self.config.stream_name,
                 self.config.consumer_group,
-                msg_id
+                consumer_name,
+                0,
+                msg_ids[start:start + chunk],
+                justid=True
             )
+            refreshed += len(ids or [])
+        self.stats['refreshed'] += refreshed
+        return refreshed
+
+    async def acknowledge_message(self, msg_id: str):
+        """Acknowledge message đã xử lý (gửi kèm lần đọc kế tiếp khi đang consume)"""
+        self._pending_acks.append(msg_id)
+        if not self._consuming or len(self._pending_acks) >= self.config.ack_batch_size:
+            await self.flush_acks()
+
+    async def flush_acks(self):
+        """Gửi các ack đang chờ bằng một lệnh XACK"""
+        if not self._pending_acks or self.redis is None:
+            return
+        acks, self._pending_acks = self._pending_acks, []
+        try:
+            await self.redis.xack(self.config.stream_name, self.config.consumer_group, *acks)
+            self.stats['acks'] += len(acks)
+            self.stats['ack_batches'] += 1
         except Exception as e:
-            logger.error(f"❌ Failed to ack message {msg_id}: {e}")
-    
+            logger.error(f"❌ Failed to ack {len(acks)} message(s): {e}")
+            self._pending_acks = acks + self._pending_acks
+
     async def get_stream_info(self) -> dict:
         """Lấy thông tin stream để monitoring"""
         try:
-            info = await asyncio.to_thread(self.redis.xinfo_stream, self.config.stream_name)
+            info = await self.redis.xinfo_stream(self.config.stream_name)
             return info
         except Exception as e:
             logger.error(f"❌ Failed to get stream info: {e}")
             return {}
-    
-    def close(self):
+
+    def get_stats(self) -> dict:
+        """Thống kê đọc / ack của consumer"""
+        return {**self.stats, 'pending_acks': len(self._pending_acks)}
+
+    async def close(self):
         """Đóng Redis connection"""
+        await self.flush_acks()
         if self.redis:
-            self.redis.close()
+            await self.redis.aclose()
+            self.redis = None
+            self._initialized = False
             logger.info("🔐 Redis connection closed")
 
 class SmartMessageAggregator:
@@ -327,14 +472,7 @@ class SmartMessageAggregator:
                 return
             user_id = ctx['user_id']
             thread_id = ctx.get('thread_id') or ''
-            final_context = {
-                'user_id': user_id,
-                'thread_id': thread_id,
-                'text': (ctx.get('text') or '').strip(),
-                'attachments': ctx.get('attachments') or [],
-                'created_at': ctx.get('created_at'),
-                'message_data': ctx.get('last_message_data', {}),
-            }
+            final_context = self._final_context(ctx)
             self.metrics['timeout_processed'] += 1
             logger.info(
                 f"✅ Inactivity window reached. Finalizing batch for user={user_id} thread={thread_id}: text_len={len(final_context['text'])}, attachments={len(final_context['attachments'])}"
@@ -346,6 +484,18 @@ class SmartMessageAggregator:
         except Exception as e:
             logger.error(f"❌ Inactivity finalization error for {key}: {e}")
     
+    @staticmethod
+    def _final_context(ctx: dict) -> dict:
+        """Payload của event process_complete_message"""
+        return {
+            'user_id': ctx['user_id'],
+            'thread_id': ctx.get('thread_id') or '',
+            'text': (ctx.get('text') or '').strip(),
+            'attachments': ctx.get('attachments') or [],
+            'created_at': ctx.get('created_at'),
+            'message_data': ctx.get('last_message_data', {}),
+        }
+    
     def _update_merge_time(self, merge_time: float):
         """Cập nhật average merge time metric"""
         current_avg = self.metrics['average_merge_time']
@@ -369,3 +519,367 @@ class SmartMessageAggregator:
     def record_error(self):
         """Ghi nhận lỗi xử lý"""
         self.metrics['processing_errors'] += 1
+
+
+# KEYS: parts list, meta hash, deadlines zset
+# ARGV: part json, now, has_text, has_attachments, window, member, ttl
+AGGREGATE_SCRIPT = """
+redis.call('RPUSH', KEYS[1], ARGV[1])
+redis.call('HSETNX', KEYS[2], 'created_at', ARGV[2])
+if ARGV[3] == '1' then redis.call('HSET', KEYS[2], 'has_text', '1') end
+if ARGV[4] == '1' then redis.call('HSET', KEYS[2], 'has_attachments', '1') end
+local window = tonumber(ARGV[5])
+if redis.call('HGET', KEYS[2], 'has_text') == '1' and redis.call('HGET', KEYS[2], 'has_attachments') == '1' then
+    window = window * 2
+end
+redis.call('ZADD', KEYS[3], tonumber(ARGV[2]) + window, ARGV[6])
+redis.call('EXPIRE', KEYS[1], ARGV[7])
+redis.call('EXPIRE', KEYS[2], ARGV[7])
+return {redis.call('LLEN', KEYS[1]), redis.call('HGET', KEYS[2], 'created_at'), tostring(window)}
+"""
+
+# KEYS: deadlines zset
+# ARGV: now, limit, key prefix
+# Removes due members and returns {member, created_at, parts} for each one
+# this call won; parts arriving afterwards start a new batch.
+CLAIM_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local claimed = {}
+for _, member in ipairs(due) do
+    if redis.call('ZREM', KEYS[1], member) == 1 then
+        local parts_key = ARGV[3] .. ':parts:' .. member
+        local meta_key = ARGV[3] .. ':meta:' .. member
+        local parts = redis.call('LRANGE', parts_key, 0, -1)
+        local created_at = redis.call('HGET', meta_key, 'created_at') or ''
+        redis.call('DEL', parts_key, meta_key)
+        table.insert(claimed, {member, created_at, parts})
+    end
+end
+return claimed
+"""
+
+
+class RedisMessageAggregator(SmartMessageAggregator):
+    """
+    SmartMessageAggregator với trạng thái chờ lưu trong Redis (nhiều worker).
+
+    Parts of a pending batch are appended to `{prefix}:parts:{user}:{thread}`
+    and its inactivity deadline lives in the `{prefix}:deadlines` sorted set,
+    both in one Lua call. Every worker polls the deadlines; an atomic Lua
+    claim hands each expired batch to exactly one worker, which merges the
+    parts and emits process_complete_message. Pending batches survive a
+    restart. When Redis fails, the in-memory aggregator (per-process timers)
+    takes the message instead.
+
+    The scripts build part keys from the prefix, so all keys must live on
+    one node (no Redis Cluster).
+    """
+
+    def __init__(self, redis_queue: RedisMessageQueue, config: Optional[MessageProcessingConfig] = None):
+        super().__init__(redis_queue, config)
+        self._aggregate_script = None
+        self._claim_script = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.metrics.update({
+            'redis_batches_finalized': 0,
+            'memory_fallbacks': 0,
+            'finalize_errors': 0,
+        })
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.config.aggregator_prefix,) + parts)
+
+    async def _scripts(self):
+        if not self.redis_queue._initialized:
+            await self.redis_queue.setup()
+        if self._aggregate_script is None:
+            self._aggregate_script = self.redis_queue.redis.register_script(AGGREGATE_SCRIPT)
+            self._claim_script = self.redis_queue.redis.register_script(CLAIM_SCRIPT)
+        return self._aggregate_script, self._claim_script
+
+    async def aggregate_message(self, user_id: str, thread_id: str, event_type: str, data: dict) -> Tuple[dict, bool]:
+        """Append the part in Redis and push the batch deadline; always returns ready=False."""
+        current_time = time.time()
+        member = f"{user_id}:{thread_id}"
+        has_text = event_type in ('text', 'combined') and bool(data.get('text'))
+        has_attachments = event_type in ('attachment', 'combined')
+        part = json.dumps({'event_type': event_type, 'data': data}, ensure_ascii=False)
+        try:
+            aggregate, _ = await self._scripts()
+            parts, created_at, window = await aggregate(
+                keys=[self._key('parts', member), self._key('meta', member), self._key('deadlines')],
+                args=[
+                    part, current_time, int(has_text), int(has_attachments),
+                    self.config.inactivity_window, member, self.config.pending_ttl,
+                ],
+            )
+        except Exception as e:
+            self.metrics['memory_fallbacks'] += 1
+            logger.error(f"❌ Redis aggregation failed for {member}, using in-memory timer: {e}")
+            return await super().aggregate_message(user_id, thread_id, event_type, data)
+
+        self.metrics['total_messages'] += 1
+        self.metrics['merged_messages'] += 1
+        self._update_merge_time(current_time - float(created_at))
+        logger.info(
+            f"⏳ Redis batch for user={user_id} thread={thread_id}: {parts} part(s), finalize in {float(window):.1f}s"
+        )
+        return {'user_id': user_id, 'thread_id': thread_id, 'parts': int(parts)}, False
+
+    def _merge_parts(self, member: str, created_at: str, parts: List[str]) -> dict:
+        user_id, _, thread_id = member.partition(':')
+        ctx = {
+            'user_id': user_id,
+            'thread_id': thread_id,
+            'text': '',
+            'attachments': [],
+            'created_at': float(created_at) if created_at else None,
+            'last_message_data': {},
+        }
+        for raw in parts:
+            part = json.loads(raw)
+            ctx = self._merge_contexts(ctx, part['event_type'], part['data'])
+            ctx['last_message_data'] = part['data']
+        return self._final_context(ctx)
+
+    async def finalize_due(self) -> int:
+        """Claim batches past their deadline and emit them; returns the number emitted."""
+        _, claim = await self._scripts()
+        claimed = await claim(
+            keys=[self._key('deadlines')],
+            args=[time.time(), self.config.finalize_batch_size, self.config.aggregator_prefix],
+        )
+        for member, created_at, parts in claimed or []:
+            if not parts:
+                continue
+            final_context = self._merge_parts(member, created_at, parts)
+            try:
+                await self.redis_queue.enqueue_event(final_context['user_id'], "process_complete_message", final_context)
+            except Exception as e:
+                # Put the batch back so another round (or worker) can emit it
+                self.metrics['finalize_errors'] += 1
+                logger.error(f"❌ Failed to emit batch {member}, re-queued: {e}")
+                await self.redis_queue.redis.rpush(self._key('parts', member), *parts)
+                await self.redis_queue.redis.hsetnx(self._key('meta', member), 'created_at', created_at or time.time())
+                await self.redis_queue.redis.zadd(self._key('deadlines'), {member: time.time()})
+                continue
+            self.metrics['timeout_processed'] += 1
+            self.metrics['redis_batches_finalized'] += 1
+            logger.info(
+                f"✅ Inactivity window reached. Finalizing batch for {member}: text_len={len(final_context['text'])}, attachments={len(final_context['attachments'])}"
+            )
+        return len(claimed or [])
+
+    async def run(self):
+        """Background loop: finalize expired batches (every worker can run one)"""
+        logger.info("🚀 Redis aggregator finalizer started")
+        while not self._stopping:
+            try:
+                finalized = await self.finalize_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics['finalize_errors'] += 1
+                logger.error(f"❌ Redis aggregator finalize error: {e}")
+                finalized = 0
+            if not finalized:
+                await asyncio.sleep(self.config.finalize_poll_interval)
+
+    def start(self) -> Optional[asyncio.Task]:
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+
+    async def get_pending_info(self) -> dict:
+        """Số batch đang chờ trong Redis"""
+        await self._scripts()
+        return {'pending_batches': await self.redis_queue.redis.zcard(self._key('deadlines'))}
+
+    def get_metrics(self) -> dict:
+        return {
+            **super().get_metrics(),
+            'backend': 'redis',
+            'finalizer_running': self._task is not None and not self._task.done(),
+        }
+
+
+# KEYS: lease, waiters zset, waiter deadlines hash
+# ARGV: owner, member, score, lease ms, waiter ttl ms
+# Registers the caller as a waiter and takes the lease only when it is the
+# oldest live waiter (lowest stream id), so a user's events run in stream
+# order even when they were read by different workers. Waiters that stopped
+# polling (crashed worker) are skipped once their deadline has passed.
+LEASE_ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local ttl = tonumber(ARGV[5])
+redis.call('ZADD', KEYS[2], 'NX', ARGV[3], ARGV[2])
+redis.call('HSET', KEYS[3], ARGV[2], now + ttl)
+redis.call('PEXPIRE', KEYS[2], ttl * 2)
+redis.call('PEXPIRE', KEYS[3], ttl * 2)
+while true do
+    local head = redis.call('ZRANGE', KEYS[2], 0, 0)[1]
+    if head == ARGV[2] then break end
+    if tonumber(redis.call('HGET', KEYS[3], head) or '0') >= now then return 0 end
+    redis.call('ZREM', KEYS[2], head)
+    redis.call('HDEL', KEYS[3], head)
+end
+if not redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[4]) then return 0 end
+redis.call('ZREM', KEYS[2], ARGV[2])
+redis.call('HDEL', KEYS[3], ARGV[2])
+return 1
+"""
+
+# KEYS: lease; ARGV: owner, lease ms
+LEASE_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('PEXPIRE', KEYS[1], ARGV[2]) end
+return 0
+"""
+
+# KEYS: lease; ARGV: owner
+LEASE_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+def _stream_order(msg_id: str) -> Tuple[int, str]:
+    """Score and member ordering stream ids `<ms>-<seq>` in a sorted set."""
+    ms, _, seq = str(msg_id).partition('-')
+    try:
+        return int(ms), f"{int(ms)}-{int(seq or 0):010d}"
+    except ValueError:
+        now_ms = int(time.time() * 1000)
+        return now_ms, f"{now_ms}-{msg_id}"
+
+
+class UserLease:
+    """
+    Per-user (PSID) Redis lease held while one of the user's events is processed.
+
+    Workers read the stream through their own consumers, so one user's events
+    can land on different workers. Before processing, a worker waits for the
+    user's lease (SET NX PX, renewed while the event runs, released by owner);
+    waiters are served in stream-id order. Together with KeyedExecutor
+    (in order within a worker) the user's events never overlap and run in
+    the order they were enqueued. A worker that dies with the lease loses it
+    after `user_lease_ms`.
+
+    When Redis fails the event runs without the lease rather than stalling.
+    """
+
+    def __init__(self, redis_queue: RedisMessageQueue, config: Optional[RedisConfig] = None):
+        self.redis_queue = redis_queue
+        self.config = config or redis_queue.config
+        self._scripts_loaded = None
+        self.stats = {
+            'acquired': 0,
+            'waits': 0,
+            'wait_ms_total': 0.0,
+            'lost': 0,
+            'errors': 0,
+        }
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.config.user_lease_prefix,) + parts)
+
+    async def _scripts(self):
+        if not self.redis_queue._initialized:
+            await self.redis_queue.setup()
+        if self._scripts_loaded is None:
+            redis_client = self.redis_queue.redis
+            self._scripts_loaded = (
+                redis_client.register_script(LEASE_ACQUIRE_SCRIPT),
+                redis_client.register_script(LEASE_RENEW_SCRIPT),
+                redis_client.register_script(LEASE_RELEASE_SCRIPT),
+            )
+        return self._scripts_loaded
+
+    async def acquire(self, user_id: str, msg_id: str) -> str:
+        """Wait for the user's lease; returns the owner token."""
+        acquire, _, _ = await self._scripts()
+        owner = f"{self.config.consumer_name}:{msg_id}"
+        score, member = _stream_order(msg_id)
+        keys = [self._key(user_id), self._key(user_id, 'waiters'), self._key(user_id, 'deadlines')]
+        # A waiter missing this many polls is treated as gone
+        waiter_ttl_ms = max(int(self.config.user_lease_poll * 1000) * 20, 1000)
+        started = time.monotonic()
+        waited = False
+        while not await acquire(keys=keys, args=[owner, member, score, self.config.user_lease_ms, waiter_ttl_ms]):
+            if not waited:
+                waited = True
+                self.stats['waits'] += 1
+                logger.info(f"⏳ Waiting for user lease {user_id} (event {msg_id})")
+            await asyncio.sleep(self.config.user_lease_poll)
+        if waited:
+            self.stats['wait_ms_total'] += (time.monotonic() - started) * 1000
+        self.stats['acquired'] += 1
+        return owner
+
+    async def _keep_alive(self, user_id: str, owner: str):
+        _, renew, _ = await self._scripts()
+        while True:
+            await asyncio.sleep(self.config.user_lease_ms / 3000)
+            try:
+                if not await renew(keys=[self._key(user_id)], args=[owner, self.config.user_lease_ms]):
+                    self.stats['lost'] += 1
+                    logger.error(f"❌ Lost user lease {user_id} ({owner}); another worker may run its next event")
+                    return
+            except Exception as e:
+                logger.warning(f"⚠️ User lease renewal failed for {user_id}: {e}")
+
+    async def release(self, user_id: str, owner: str):
+        _, _, release = await self._scripts()
+        await release(keys=[self._key(user_id)], args=[owner])
+
+    @asynccontextmanager
+    async def hold(self, user_id: Optional[str], msg_id: str):
+        """Run the body while holding `user_id`'s lease (no lease without a user id)."""
+        owner = None
+        if user_id:
+            try:
+                owner = await self.acquire(user_id, msg_id)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ User lease unavailable for {user_id}, processing {msg_id} without it: {e}")
+        keep_alive = asyncio.create_task(self._keep_alive(user_id, owner)) if owner else None
+        try:
+            yield
+        finally:
+            if keep_alive is not None:
+                keep_alive.cancel()
+                try:
+                    await self.release(user_id, owner)
+                except Exception as e:
+                    logger.warning(f"⚠️ User lease release failed for {user_id} (expires on its own): {e}")
+
+    def get_stats(self) -> dict:
+        waits = self.stats['waits']
+        return {
+            **self.stats,
+            'wait_ms_total': round(self.stats['wait_ms_total'], 1),
+            'avg_wait_ms': round(self.stats['wait_ms_total'] / waits, 1) if waits else 0.0,
+            'lease_ms': self.config.user_lease_ms,
+        }
+
+
+def create_message_aggregator(
+    redis_queue: RedisMessageQueue, config: Optional[MessageProcessingConfig] = None
+) -> SmartMessageAggregator:
+    """Aggregator theo AGGREGATOR_BACKEND ("redis" mặc định, "memory" cho một worker)"""
+    config = config or MessageProcessingConfig()
+    if config.aggregator_backend == "memory":
+        return SmartMessageAggregator(redis_queue, config)
+    return RedisMessageAggregator(redis_queue, config)
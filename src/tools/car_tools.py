@@ -1,12 +1,8 @@
 from datetime import date, datetime
 from typing import Optional, Union
 from langchain_core.tools import tool
-import pandas as pd
-import sqlalchemy
 
-
-from sqlalchemy.orm import Session
-from src.database.database import get_db_session
+from src.database.data_access import get_database
 
 __all__ = [
     "search_car_rentals",
@@ -37,7 +33,6 @@ def search_car_rentals(
     Returns:
         list[dict]: A list of car rental dictionaries matching the search criteria.
     """
-    session: Session = get_db_session()
     # Build dynamic WHERE clause
     conditions = ["1=1"]
     params = {}
@@ -50,13 +45,9 @@ def search_car_rentals(
     where_clause = " AND ".join(conditions)
     query = f"SELECT * FROM car_rentals WHERE {where_clause}"
     try:
-        df = pd.read_sql(query, session.bind, params=params)
-        results = df.to_dict('records')
-        return results
+        return get_database().fetch_all(query, params)
     except Exception as e:
         raise Exception(f"Database error: {e}")
-    finally:
-        session.close()
 
 
 @tool
@@ -70,29 +61,20 @@ def book_car_rental(rental_id: int) -> str:
     Returns:
         str: A message indicating whether the car rental was successfully booked or not.
     """
-    session: Session = get_db_session()
+    db = get_database()
     try:
         # Check if rental exists
         check_query = "SELECT id FROM car_rentals WHERE id = :rental_id"
-        check_df = pd.read_sql(check_query, session.bind, params={"rental_id": rental_id})
-        if check_df.empty:
+        if db.fetch_one(check_query, {"rental_id": rental_id}) is None:
             return f"No car rental found with ID {rental_id}."
         # Update booking status
         update_query = "UPDATE car_rentals SET booked = 1 WHERE id = :rental_id"
-        result = session.execute(
-            sqlalchemy.text(update_query),
-            {"rental_id": rental_id}
-        )
-        session.commit()
-        if result.rowcount > 0:
+        if db.execute(update_query, {"rental_id": rental_id}) > 0:
             return f"Car rental {rental_id} successfully booked."
         else:
             return f"Failed to book car rental {rental_id}."
     except Exception as e:
-        session.rollback()
         return f"Error booking car rental: {e}"
-    finally:
-        session.close()
 
 
 @tool
@@ -112,40 +94,27 @@ def update_car_rental(
     Returns:
         str: A message indicating whether the car rental was successfully updated or not.
     """
-    session: Session = get_db_session()
     try:
-        # Check if rental exists
-        check_query = "SELECT id FROM car_rentals WHERE id = :rental_id"
-        check_df = pd.read_sql(check_query, session.bind, params={"rental_id": rental_id})
-        if check_df.empty:
-            return f"No car rental found with ID {rental_id}."
-        updated = False
-        if start_date:
-            update_query = "UPDATE car_rentals SET start_date = :start_date WHERE id = :rental_id"
-            result = session.execute(
-                sqlalchemy.text(update_query),
-                {"start_date": start_date, "rental_id": rental_id}
-            )
-            if result.rowcount > 0:
-                updated = True
-        if end_date:
-            update_query = "UPDATE car_rentals SET end_date = :end_date WHERE id = :rental_id"
-            result = session.execute(
-                sqlalchemy.text(update_query),
-                {"end_date": end_date, "rental_id": rental_id}
-            )
-            if result.rowcount > 0:
-                updated = True
-        session.commit()
+        with get_database().transaction() as tx:
+            # Check if rental exists
+            check_query = "SELECT id FROM car_rentals WHERE id = :rental_id"
+            if tx.fetch_one(check_query, {"rental_id": rental_id}) is None:
+                return f"No car rental found with ID {rental_id}."
+            updated = False
+            if start_date:
+                update_query = "UPDATE car_rentals SET start_date = :start_date WHERE id = :rental_id"
+                if tx.execute(update_query, {"start_date": start_date, "rental_id": rental_id}) > 0:
+                    updated = True
+            if end_date:
+                update_query = "UPDATE car_rentals SET end_date = :end_date WHERE id = :rental_id"
+                if tx.execute(update_query, {"end_date": end_date, "rental_id": rental_id}) > 0:
+                    updated = True
         if updated:
             return f"Car rental {rental_id} successfully updated."
         else:
             return f"No updates made to car rental {rental_id}."
     except Exception as e:
-        session.rollback()
         return f"Error updating car rental: {e}"
-    finally:
-        session.close()
 
 
 @tool
@@ -159,26 +128,18 @@ def cancel_car_rental(rental_id: int) -> str:
     Returns:
         str: A message indicating whether the car rental was successfully cancelled or not.
     """
-    session: Session = get_db_session()
+    db = get_database()
     try:
         # Check if rental exists
         check_query = "SELECT id FROM car_rentals WHERE id = :rental_id"
-        check_df = pd.read_sql(check_query, session.bind, params={"rental_id": rental_id})
-        if check_df.empty:
+        if db.fetch_one(check_query, {"rental_id": rental_id}) is None:
             return f"No car rental found with ID {rental_id}."
         # Cancel booking
         update_query = "UPDATE car_rentals SET booked = 0 WHERE id = :rental_id"
-        result = session.execute(
-            sqlalchemy.text(update_query),
-            {"rental_id": rental_id}
-        )
-        session.commit()
-        if result.rowcount > 0:
+        if db.execute(update_query, {"rental_id": rental_id}) > 0:
             return f"Car rental {rental_id} successfully cancelled."
         else:
             return f"Failed to cancel car rental {rental_id}."
     except Exception as e:
-        session.rollback()
         return f"Error cancelling car rental: {e}"
-    finally:
-        session.close()
+
@@ -1,10 +1,7 @@
 from langchain_core.tools import tool
-import pandas as pd
-import sqlalchemy
 from typing import Optional
 
-from sqlalchemy.orm import Session
-from src.database.database import get_db_session
+from src.database.data_access import get_database
 
 __all__ = [
     "search_trip_recommendations",
@@ -31,7 +28,6 @@ def search_trip_recommendations(
     Returns:
         list[dict]: A list of trip recommendation dictionaries matching the search criteria.
     """
-    session: Session = get_db_session()
     # Build dynamic WHERE clause
     conditions = ["1=1"]
     params = {}
@@ -53,13 +49,9 @@ def search_trip_recommendations(
     where_clause = " AND ".join(conditions)
     query = f"SELECT * FROM trip_recommendations WHERE {where_clause}"
     try:
-        df = pd.read_sql(query, session.bind, params=params)
-        results = df.to_dict('records')
-        return results
+        return get_database().fetch_all(query, params)
     except Exception as e:
         raise Exception(f"Database error: {e}")
-    finally:
-        session.close()
 
 
 @tool
@@ -73,29 +65,20 @@ def book_excursion(recommendation_id: int) -> str:
     Returns:
         str: A message indicating whether the trip recommendation was successfully booked or not.
     """
-    session: Session = get_db_session()
+    db = get_database()
     try:
         # Check if excursion exists
         check_query = "SELECT id FROM trip_recommendations WHERE id = :recommendation_id"
-        check_df = pd.read_sql(check_query, session.bind, params={"recommendation_id": recommendation_id})
-        if check_df.empty:
+        if db.fetch_one(check_query, {"recommendation_id": recommendation_id}) is None:
             return f"No trip recommendation found with ID {recommendation_id}."
         # Update booking status
         update_query = "UPDATE trip_recommendations SET booked = 1 WHERE id = :recommendation_id"
-        result = session.execute(
-            sqlalchemy.text(update_query),
-            {"recommendation_id": recommendation_id}
-        )
-        session.commit()
-        if result.rowcount > 0:
+        if db.execute(update_query, {"recommendation_id": recommendation_id}) > 0:
             return f"Trip recommendation {recommendation_id} successfully booked."
         else:
             return f"Failed to book trip recommendation {recommendation_id}."
     except Exception as e:
-        session.rollback()
         return f"Error booking trip recommendation: {e}"
-    finally:
-        session.close()
 
 
 @tool
@@ -117,48 +100,31 @@ def update_excursion(
     Returns:
         str: A message indicating whether the trip recommendation was successfully updated or not.
     """
-    session: Session = get_db_session()
     try:
-        # Check if excursion exists
-        check_query = "SELECT id FROM trip_recommendations WHERE id = :recommendation_id"
-        check_df = pd.read_sql(check_query, session.bind, params={"recommendation_id": recommendation_id})
-        if check_df.empty:
-            return f"No trip recommendation found with ID {recommendation_id}."
-        updated = False
-        if location:
-            update_query = "UPDATE trip_recommendations SET location = :location WHERE id = :recommendation_id"
-            result = session.execute(
-                sqlalchemy.text(update_query),
-                {"location": location, "recommendation_id": recommendation_id}
-            )
-            if result.rowcount > 0:
-                updated = True
-        if name:
-            update_query = "UPDATE trip_recommendations SET name = :name WHERE id = :recommendation_id"
-            result = session.execute(
-                sqlalchemy.text(update_query),
-                {"name": name, "recommendation_id": recommendation_id}
-            )
-            if result.rowcount > 0:
-                updated = True
-        if keywords:
-            update_query = "UPDATE trip_recommendations SET keywords = :keywords WHERE id = :recommendation_id"
-            result = session.execute(
-                sqlalchemy.text(update_query),
-                {"keywords": keywords, "recommendation_id": recommendation_id}
-            )
-            if result.rowcount > 0:
-                updated = True
-        session.commit()
+        with get_database().transaction() as tx:
+            # Check if excursion exists
+            check_query = "SELECT id FROM trip_recommendations WHERE id = :recommendation_id"
+            if tx.fetch_one(check_query, {"recommendation_id": recommendation_id}) is None:
+                return f"No trip recommendation found with ID {recommendation_id}."
+            updated = False
+            if location:
+                update_query = "UPDATE trip_recommendations SET location = :location WHERE id = :recommendation_id"
+                if tx.execute(update_query, {"location": location, "recommendation_id": recommendation_id}) > 0:
+                    updated = True
+            if name:
+                update_query = "UPDATE trip_recommendations SET name = :name WHERE id = :recommendation_id"
+                if tx.execute(update_query, {"name": name, "recommendation_id": recommendation_id}) > 0:
+                    updated = True
+            if keywords:
+                update_query = "UPDATE trip_recommendations SET keywords = :keywords WHERE id = :recommendation_id"
+                if tx.execute(update_query, {"keywords": keywords, "recommendation_id": recommendation_id}) > 0:
+                    updated = True
         if updated:
             return f"Trip recommendation {recommendation_id} successfully updated."
         else:
             return f"No updates made to trip recommendation {recommendation_id}."
     except Exception as e:
-        session.rollback()
         return f"Error updating trip recommendation: {e}"
-    finally:
-        session.close()
 
 
 @tool
@@ -172,26 +138,18 @@ def cancel_excursion(recommendation_id: int) -> str:
     Returns:
         str: A message indicating whether the trip recommendation was successfully cancelled or not.
     """
-    session: Session = get_db_session()
+    db = get_database()
     try:
         # Check if excursion exists
         check_query = "SELECT id FROM trip_recommendations WHERE id = :recommendation_id"
-        check_df = pd.read_sql(check_query, session.bind, params={"recommendation_id": recommendation_id})
-        if check_df.empty:
+        if db.fetch_one(check_query, {"recommendation_id": recommendation_id}) is None:
             return f"No trip recommendation found with ID {recommendation_id}."
         # Cancel booking
         update_query = "UPDATE trip_recommendations SET booked = 0 WHERE id = :recommendation_id"
-        result = session.execute(
-            sqlalchemy.text(update_query),
-            {"recommendation_id": recommendation_id}
-        )
-        session.commit()
-        if result.rowcount > 0:
+        if db.execute(update_query, {"recommendation_id": recommendation_id}) > 0:
             return f"Trip recommendation {recommendation_id} successfully cancelled."
         else:
             return f"Failed to cancel trip recommendation {recommendation_id}."
     except Exception as e:
-        session.rollback()
         return f"Error cancelling trip recommendation: {e}"
-    finally:
-        session.close()
+
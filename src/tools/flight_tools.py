@@ -2,16 +2,13 @@
 Flight tools updated to use PostgreSQL instead of SQLite
 """
 
-import pandas as pd
-import sqlalchemy
 from datetime import date, datetime
 from typing import Optional
 from langchain_core.tools import tool
 import pytz
 from langchain_core.runnables import RunnableConfig
 
-from sqlalchemy.orm import Session
-from src.database.database import get_db_session
+from src.database.data_access import get_database
 
 __all__ = [
     "fetch_user_flight_information",
@@ -50,7 +47,6 @@ def book_ticket(
     """
     import random
     import string
-    session: Session = get_db_session()
 
     # Auto-generate book_ref if not provided (6 uppercase letters/digits)
     if not book_ref:
@@ -78,54 +74,37 @@ def book_ticket(
         boarding_no = random.randint(1, 100)
 
     try:
-        # Insert into tickets
-        insert_ticket = sqlalchemy.text(
-            """
-            INSERT INTO tickets (ticket_no, book_ref, passenger_id)
-            VALUES (:ticket_no, :book_ref, :passenger_id)
-            """
-        )
-        session.execute(insert_ticket, {
-            "ticket_no": ticket_no,
-            "book_ref": book_ref,
-            "passenger_id": passenger_id
-        })
-
-        # Insert into ticket_flights
-        insert_ticket_flight = sqlalchemy.text(
-            """
-            INSERT INTO ticket_flights (ticket_no, flight_id, fare_conditions, amount)
-            VALUES (:ticket_no, :flight_id, :fare_conditions, :amount)
-            """
-        )
-        session.execute(insert_ticket_flight, {
-            "ticket_no": ticket_no,
-            "flight_id": flight_id,
-            "fare_conditions": fare_conditions,
-            "amount": amount
-        })
-
-        # Always insert into boarding_passes (auto-generated if not provided)
-        insert_boarding_pass = sqlalchemy.text(
-            """
-            INSERT INTO boarding_passes (ticket_no, flight_id, boarding_no, seat_no)
-            VALUES (:ticket_no, :flight_id, :boarding_no, :seat_no)
-            """
-        )
-        session.execute(insert_boarding_pass, {
-            "ticket_no": ticket_no,
-            "flight_id": flight_id,
-            "boarding_no": boarding_no,
-            "seat_no": seat_no
-        })
-
-        session.commit()
+        with get_database().transaction() as tx:
+            # Insert into tickets
+            tx.execute(
+                """
+                INSERT INTO tickets (ticket_no, book_ref, passenger_id)
+                VALUES (:ticket_no, :book_ref, :passenger_id)
+                """,
+                {"ticket_no": ticket_no, "book_ref": book_ref, "passenger_id": passenger_id},
+            )
+
+            # Insert into ticket_flights
+            tx.execute(
+                """
+                INSERT INTO ticket_flights (ticket_no, flight_id, fare_conditions, amount)
+                VALUES (:ticket_no, :flight_id, :fare_conditions, :amount)
+                """,
+                {"ticket_no": ticket_no, "flight_id": flight_id, "fare_conditions": fare_conditions, "amount": amount},
+            )
+
+            # Always insert into boarding_passes (auto-generated if not provided)
+            tx.execute(
+                """
+                INSERT INTO boarding_passes (ticket_no, flight_id, boarding_no, seat_no)
+                VALUES (:ticket_no, :flight_id, :boarding_no, :seat_no)
+                """,
+                {"ticket_no": ticket_no, "flight_id": flight_id, "boarding_no": boarding_no, "seat_no": seat_no},
+            )
+
         return f"Ticket booked successfully: ticket_no={ticket_no}, flight_id={flight_id}, seat_no={seat_no}"
     except Exception as e:
-        session.rollback()
         return f"Error booking ticket: {e}"
-    finally:
-        session.close()
 
 
 @tool
@@ -140,8 +119,6 @@ def fetch_user_flight_information(user_id: str) -> list[dict]:
     if not user_id:
         raise ValueError("No passenger ID configured.")
 
-    session: Session = get_db_session()
-
     query = """
     SELECT 
         t.ticket_no, t.book_ref,
@@ -158,13 +135,9 @@ def fetch_user_flight_information(user_id: str) -> list[dict]:
     """
 
     try:
-        df = pd.read_sql(query, session.bind, params={"user_id": user_id})
-        results = df.to_dict("records")
-        return results
+        return get_database().fetch_all(query, {"user_id": user_id})
     except Exception as e:
         raise Exception(f"Database error: {e}")
-    finally:
-        session.close()
 
 
 @tool
@@ -192,8 +165,6 @@ def search_flights(
     Returns:
         A list of flight dictionaries matching the search criteria.
     """
-    session: Session = get_db_session()
-
     # Build dynamic WHERE clause
     conditions = []
     params = {}
@@ -232,13 +203,9 @@ def search_flights(
     params["limit"] = limit
 
     try:
-        df = pd.read_sql(sqlalchemy.text(query), session.bind, params=params)
-        results = df.to_dict("records")
-        return results
+        return get_database().fetch_all(query, params)
     except Exception as e:
         raise Exception(f"Database error: {e}")
-    finally:
-        session.close()
 
 
 @tool
@@ -252,30 +219,20 @@ def update_ticket_to_new_flight(ticket_no: str, new_flight_id: int) -> str:
     Returns:
         A message confirming the update or describing any error.
     """
-    session: Session = get_db_session()
+    db = get_database()
 
     try:
         # Kiểm tra ticket tồn tại
         ticket_check_query = (
             "SELECT ticket_no FROM tickets WHERE ticket_no = :ticket_no"
         )
-        ticket_df = pd.read_sql(
-            sqlalchemy.text(ticket_check_query),
-            session.bind,
-            params={"ticket_no": ticket_no},
-        )
-        if ticket_df.empty:
+        if db.fetch_one(ticket_check_query, {"ticket_no": ticket_no}) is None:
             return f"No ticket found with number {ticket_no}"
         # Kiểm tra flight mới tồn tại
         flight_check_query = (
             "SELECT flight_id FROM flights WHERE flight_id = :flight_id"
         )
-        flight_df = pd.read_sql(
-            sqlalchemy.text(flight_check_query),
-            session.bind,
-            params={"flight_id": new_flight_id},
-        )
-        if flight_df.empty:
+        if db.fetch_one(flight_check_query, {"flight_id": new_flight_id}) is None:
             return f"No flight found with ID {new_flight_id}"
         # Cập nhật ticket_flights
         update_query = """
@@ -283,23 +240,15 @@ def update_ticket_to_new_flight(ticket_no: str, new_flight_id: int) -> str:
         SET flight_id = :new_flight_id 
         WHERE ticket_no = :ticket_no
         """
-        # Execute update
-        result = session.execute(
-            sqlalchemy.text(update_query),
-            {"new_flight_id": new_flight_id, "ticket_no": ticket_no},
-        )
-        session.commit()
-        if result.rowcount > 0:
+        updated = db.execute(update_query, {"new_flight_id": new_flight_id, "ticket_no": ticket_no})
+        if updated > 0:
             return (
                 f"Ticket {ticket_no} successfully updated to flight {new_flight_id}"
             )
         else:
             return f"No ticket_flights record found for ticket {ticket_no}"
     except Exception as e:
-        session.rollback()
         return f"Error updating ticket: {e}"
-    finally:
-        session.close()
 
 
 @tool
@@ -312,39 +261,26 @@ def cancel_ticket(ticket_no: str) -> str:
     Returns:
         A message confirming the cancellation or describing any error.
     """
-    session: Session = get_db_session()
-
     try:
-        # Kiểm tra ticket tồn tại
-        ticket_check_query = (
-            "SELECT ticket_no FROM tickets WHERE ticket_no = :ticket_no"
-        )
-        ticket_df = pd.read_sql(
-            sqlalchemy.text(ticket_check_query), session.bind, params={"ticket_no": ticket_no}
-        )
-        if ticket_df.empty:
-            return f"No ticket found with number {ticket_no}"
-        # Xóa boarding passes trước (foreign key constraint)
-        delete_bp_query = "DELETE FROM boarding_passes WHERE ticket_no = :ticket_no"
-        session.execute(sqlalchemy.text(delete_bp_query), {"ticket_no": ticket_no})
-        # Xóa ticket_flights
-        delete_tf_query = "DELETE FROM ticket_flights WHERE ticket_no = :ticket_no"
-        session.execute(sqlalchemy.text(delete_tf_query), {"ticket_no": ticket_no})
-        # Xóa ticket
-        delete_ticket_query = "DELETE FROM tickets WHERE ticket_no = :ticket_no"
-        result = session.execute(
-            sqlalchemy.text(delete_ticket_query), {"ticket_no": ticket_no}
-        )
-        session.commit()
-        if result.rowcount > 0:
+        with get_database().transaction() as tx:
+            # Kiểm tra ticket tồn tại
+            ticket_check_query = (
+                "SELECT ticket_no FROM tickets WHERE ticket_no = :ticket_no"
+            )
+            if tx.fetch_one(ticket_check_query, {"ticket_no": ticket_no}) is None:
+                return f"No ticket found with number {ticket_no}"
+            # Xóa boarding passes trước (foreign key constraint)
+            tx.execute("DELETE FROM boarding_passes WHERE ticket_no = :ticket_no", {"ticket_no": ticket_no})
+            # Xóa ticket_flights
+            tx.execute("DELETE FROM ticket_flights WHERE ticket_no = :ticket_no", {"ticket_no": ticket_no})
+            # Xóa ticket
+            deleted = tx.execute("DELETE FROM tickets WHERE ticket_no = :ticket_no", {"ticket_no": ticket_no})
+        if deleted > 0:
             return f"Ticket {ticket_no} successfully cancelled"
         else:
             return f"Failed to cancel ticket {ticket_no}"
     except Exception as e:
-        session.rollback()
         return f"Error cancelling ticket: {e}"
-    finally:
-        session.close()
 
 
 @tool
@@ -356,7 +292,6 @@ def list_available_flights(limit: int = 50) -> list[dict]:
     Returns:
         A list of flight dictionaries.
     """
-    session: Session = get_db_session()
     query = """
     SELECT flight_id, flight_no, scheduled_departure, scheduled_arrival, departure_airport, arrival_airport, status, aircraft_code
     FROM flights
@@ -365,10 +300,6 @@ def list_available_flights(limit: int = 50) -> list[dict]:
     LIMIT :limit
     """
     try:
-        df = pd.read_sql(sqlalchemy.text(query), session.bind, params={"limit": limit})
-        results = df.to_dict("records")
-        return results
+        return get_database().fetch_all(query, {"limit": limit})
     except Exception as e:
         raise Exception(f"Database error: {e}")
-    finally:
-        session.close()
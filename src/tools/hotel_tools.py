@@ -1,11 +1,8 @@
 from langchain_core.tools import tool
-import pandas as pd
-import sqlalchemy
 from typing import Optional, Union
 from datetime import datetime, date
 
-from sqlalchemy.orm import Session
-from src.database.database import get_db_session
+from src.database.data_access import get_database
 
 __all__ = [
     "search_hotels",
@@ -35,7 +32,6 @@ def search_hotels(
     Returns:
         list[dict]: A list of hotel dictionaries matching the search criteria.
     """
-    session: Session = get_db_session()
     conditions = ["1=1"]
     params = {}
     if location:
@@ -50,13 +46,9 @@ def search_hotels(
     where_clause = " AND ".join(conditions)
     query = f"SELECT * FROM hotels WHERE {where_clause}"
     try:
-        df = pd.read_sql(sqlalchemy.text(query), session.bind, params=params)
-        results = df.to_dict('records')
-        return results
+        return get_database().fetch_all(query, params)
     except Exception as e:
         raise Exception(f"Database error: {e}")
-    finally:
-        session.close()
 
 @tool
 def book_hotel(hotel_id: int) -> str:
@@ -69,24 +61,18 @@ def book_hotel(hotel_id: int) -> str:
     Returns:
         str: A message indicating whether the hotel was successfully booked or not.
     """
-    session: Session = get_db_session()
+    db = get_database()
     try:
         check_query = "SELECT id FROM hotels WHERE id = :hotel_id"
-        check_df = pd.read_sql(sqlalchemy.text(check_query), session.bind, params={"hotel_id": hotel_id})
-        if check_df.empty:
+        if db.fetch_one(check_query, {"hotel_id": hotel_id}) is None:
             return f"No hotel found with ID {hotel_id}."
         update_query = "UPDATE hotels SET booked = 1 WHERE id = :hotel_id"
-        result = session.execute(sqlalchemy.text(update_query), {"hotel_id": hotel_id})
-        session.commit()
-        if result.rowcount > 0:
+        if db.execute(update_query, {"hotel_id": hotel_id}) > 0:
             return f"Hotel {hotel_id} successfully booked."
         else:
             return f"Failed to book hotel {hotel_id}."
     except Exception as e:
-        session.rollback()
         return f"Error booking hotel: {e}"
-    finally:
-        session.close()
 
 @tool
 def update_hotel(
@@ -105,33 +91,26 @@ def update_hotel(
     Returns:
         str: A message indicating whether the hotel was successfully updated or not.
     """
-    session: Session = get_db_session()
     try:
-        check_query = "SELECT id FROM hotels WHERE id = :hotel_id"
-        check_df = pd.read_sql(sqlalchemy.text(check_query), session.bind, params={"hotel_id": hotel_id})
-        if check_df.empty:
-            return f"No hotel found with ID {hotel_id}."
-        updated = False
-        if checkin_date:
-            update_query = "UPDATE hotels SET checkin_date = :checkin_date WHERE id = :hotel_id"
-            result = session.execute(sqlalchemy.text(update_query), {"checkin_date": checkin_date, "hotel_id": hotel_id})
-            if result.rowcount > 0:
-                updated = True
-        if checkout_date:
-            update_query = "UPDATE hotels SET checkout_date = :checkout_date WHERE id = :hotel_id"
-            result = session.execute(sqlalchemy.text(update_query), {"checkout_date": checkout_date, "hotel_id": hotel_id})
-            if result.rowcount > 0:
-                updated = True
-        session.commit()
+        with get_database().transaction() as tx:
+            check_query = "SELECT id FROM hotels WHERE id = :hotel_id"
+            if tx.fetch_one(check_query, {"hotel_id": hotel_id}) is None:
+                return f"No hotel found with ID {hotel_id}."
+            updated = False
+            if checkin_date:
+                update_query = "UPDATE hotels SET checkin_date = :checkin_date WHERE id = :hotel_id"
+                if tx.execute(update_query, {"checkin_date": checkin_date, "hotel_id": hotel_id}) > 0:
+                    updated = True
+            if checkout_date:
+                update_query = "UPDATE hotels SET checkout_date = :checkout_date WHERE id = :hotel_id"
+                if tx.execute(update_query, {"checkout_date": checkout_date, "hotel_id": hotel_id}) > 0:
+                    updated = True
         if updated:
             return f"Hotel {hotel_id} successfully updated."
         else:
             return f"No updates made to hotel {hotel_id}."
     except Exception as e:
-        session.rollback()
         return f"Error updating hotel: {e}"
-    finally:
-        session.close()
 
 @tool
 def cancel_hotel(hotel_id: int) -> str:
@@ -144,21 +123,15 @@ def cancel_hotel(hotel_id: int) -> str:
     Returns:
         str: A message indicating whether the hotel was successfully cancelled or not.
     """
-    session: Session = get_db_session()
+    db = get_database()
     try:
         check_query = "SELECT id FROM hotels WHERE id = :hotel_id"
-        check_df = pd.read_sql(sqlalchemy.text(check_query), session.bind, params={"hotel_id": hotel_id})
-        if check_df.empty:
+        if db.fetch_one(check_query, {"hotel_id": hotel_id}) is None:
             return f"No hotel found with ID {hotel_id}."
         update_query = "UPDATE hotels SET booked = 0 WHERE id = :hotel_id"
-        result = session.execute(sqlalchemy.text(update_query), {"hotel_id": hotel_id})
-        session.commit()
-        if result.rowcount > 0:
+        if db.execute(update_query, {"hotel_id": hotel_id}) > 0:
             return f"Hotel {hotel_id} successfully cancelled."
         else:
             return f"Failed to cancel hotel {hotel_id}."
     except Exception as e:
-        session.rollback()
         return f"Error cancelling hotel: {e}"
-    finally:
-        session.close()
\ No newline at end of file
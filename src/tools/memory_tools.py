@@ -9,6 +9,8 @@ import os
 import logging
 from dotenv import load_dotenv
 
+from src.database.embedding_cache import get_embedding_cache
+
 load_dotenv()
 
 # Khởi tạo clients
@@ -47,18 +49,21 @@ class UserMemoryStore:
         self.vector_size = EXPECTED_VECTOR_SIZE
         self._ensure_correct_collection()
 
-    def _get_embedding(self, text: str) -> List[float]:
+    def _get_embedding(self, text: str, use_cache: bool = True) -> List[float]:
         """
         Generate an embedding vector for the given text using the Gemini embedding model.
 
         Args:
             text: The input text to embed.
+            use_cache: Look up/store the vector in the shared embedding cache.
+                Disable for one-off texts (e.g. newly saved preferences).
 
         Returns:
             A list of floats representing the embedding vector.
             If embedding fails, returns a zero vector of the expected size.
         """
-        try:
+
+        def _compute() -> List[float]:
             result = genai.embed_content(
                 model=embedding_model,
                 content=text,
@@ -70,6 +75,18 @@ class UserMemoryStore:
                     f"⚠️ Warning: Expected vector size {self.vector_size}, got {len(embedding)}"
                 )
             return embedding
+
+        try:
+            if not use_cache:
+                return _compute()
+            # Zero-vector fallbacks are never cached: failures raise out of _compute
+            return get_embedding_cache().get_or_compute(
+                model=embedding_model,
+                dimensionality=None,
+                task_type="SEMANTIC_SIMILARITY",
+                text=text,
+                compute=_compute,
+            )
         except Exception as e:
             print(f"Error generating embedding: {e}")
             return [0.0] * self.vector_size
@@ -175,7 +192,7 @@ class UserMemoryStore:
         if context:
             text_to_embed += f" Context: {context}"
 
-        embedding = self._get_embedding(text_to_embed)
+        embedding = self._get_embedding(text_to_embed, use_cache=False)
         preference_id = str(uuid.uuid4())
 
         # Store in collection with enhanced payload
@@ -1,8 +1,6 @@
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-import pandas as pd
-from sqlalchemy.orm import Session
-from src.database.database import get_db_session
+from src.database.data_access import get_database
 
 
 class GetUserInfoInput(BaseModel):
@@ -21,24 +19,15 @@ def get_user_info(user_id: str) -> dict:
         A dictionary containing the user's information (user_id, name, email, phone, address)
         or an error message if the user is not found.
     """
-    session: Session = get_db_session()
     try:
-        query = "SELECT user_id, name, email, phone, address FROM users WHERE user_id = %(user_id)s"
-        result = pd.read_sql(query, session.bind, params={"user_id": user_id})
-        if not result.empty:
-            user_data = result.to_dict(orient="records")[0]
+        query = "SELECT user_id, name, email, phone, address FROM users WHERE user_id = :user_id"
+        user_data = get_database().fetch_one(query, {"user_id": user_id})
+        if user_data:
             return user_data
         else:
             return {"error": f"User with ID '{user_id}' not found."}
     except Exception as e:
-        # Rollback the transaction in case of error
-        try:
-            session.rollback()
-        except Exception:
-            pass  # If rollback fails, ignore it
         return {"error": f"An error occurred while fetching user information: {e}"}
-    finally:
-        session.close()
 
 
 # Tool: get_user_by_email
@@ -51,23 +40,15 @@ def get_user_by_email(email: str) -> dict:
     """
     Retrieve user info by email.
     """
-    session: Session = get_db_session()
     try:
-        query = "SELECT user_id, name, email, phone, address FROM users WHERE email = %(email)s"
-        result = pd.read_sql(query, session.bind, params={"email": email})
-        if not result.empty:
-            return result.to_dict(orient="records")[0]
+        query = "SELECT user_id, name, email, phone, address FROM users WHERE email = :email"
+        user_data = get_database().fetch_one(query, {"email": email})
+        if user_data:
+            return user_data
         else:
             return {"error": f"User with email '{email}' not found."}
     except Exception as e:
-        # Rollback the transaction in case of error
-        try:
-            session.rollback()
-        except Exception:
-            pass  # If rollback fails, ignore it
         return {"error": f"An error occurred while fetching user by email: {e}"}
-    finally:
-        session.close()
 
 
 # Tool: get_user_by_phone
@@ -80,23 +61,15 @@ def get_user_by_phone(phone: str) -> dict:
     """
     Retrieve user info by phone number.
     """
-    session: Session = get_db_session()
     try:
-        query = "SELECT user_id, name, email, phone, address FROM users WHERE phone = %(phone)s"
-        result = pd.read_sql(query, session.bind, params={"phone": phone})
-        if not result.empty:
-            return result.to_dict(orient="records")[0]
+        query = "SELECT user_id, name, email, phone, address FROM users WHERE phone = :phone"
+        user_data = get_database().fetch_one(query, {"phone": phone})
+        if user_data:
+            return user_data
         else:
             return {"error": f"User with phone '{phone}' not found."}
     except Exception as e:
-        # Rollback the transaction in case of error
-        try:
-            session.rollback()
-        except Exception:
-            pass  # If rollback fails, ignore it
         return {"error": f"An error occurred while fetching user by phone: {e}"}
-    finally:
-        session.close()
 
 
 # Tool: list_users (for admin/debug)
@@ -105,15 +78,11 @@ def list_users() -> list:
     """
     List all users (for admin/debug only).
     """
-    session: Session = get_db_session()
     try:
         query = "SELECT user_id, name, email, phone, address FROM users LIMIT 100"
-        result = pd.read_sql(query, session.bind)
-        return result.to_dict(orient="records")
+        return get_database().fetch_all(query)
     except Exception as e:
         return {"error": f"An error occurred while listing users: {e}"}
-    finally:
-        session.close()
 
 
 # Tool: get_latest_thread_id_by_user
@@ -126,25 +95,17 @@ def get_latest_thread_id_by_user(user_id: str) -> dict:
     """
     Lấy thread_id gần nhất của user dựa vào bảng user_threads (theo created_at mới nhất).
     """
-    session: Session = get_db_session()
     try:
         query = """
             SELECT thread_id FROM user_threads
-            WHERE user_id = %(user_id)s
+            WHERE user_id = :user_id
             ORDER BY created_at DESC, id DESC
             LIMIT 1
         """
-        result = pd.read_sql(query, session.bind, params={"user_id": user_id})
-        if not result.empty:
-            return {"thread_id": result.iloc[0]["thread_id"]}
+        row = get_database().fetch_one(query, {"user_id": user_id})
+        if row:
+            return {"thread_id": row["thread_id"]}
         else:
             return None
-    except Exception as e:
-        # Rollback the transaction in case of error
-        try:
-            session.rollback()
-        except Exception:
-            pass  # If rollback fails, ignore it
+    except Exception:
         return None
-    finally:
-        session.close()
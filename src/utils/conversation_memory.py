@@ -0,0 +1,407 @@
+"""
+Incremental token accounting and background conversation summarization.
+
+The summarizer node (langmem SummarizationNode) ran before the router on
+every turn. It counted tokens over the whole message list and, once the
+threshold was crossed, made the user wait for an LLM summarization call.
+
+With this module:
+
+- token counts are cached per message id (`TokenCounter`). The summarizer
+  node counts only messages it has not seen and keeps running totals in the
+  `token_usage` channel,
+- summarization runs after the reply (`schedule`), as a background task that
+  writes the new RunningSummary into `context` through
+  `graph.aupdate_state(..., as_node=MEMORY_NODE)`, ready for the next turn,
+- prompts get the messages the summary does not cover yet, trimmed to a token
+  budget with the cached counts (`window`).
+
+A turn that starts while a summary is still being written sees the previous
+summary and a longer window. If that turn checkpoints before the summary is
+written, the summary is dropped rather than written over the newer state
+(the next turn schedules a fresh one). With SUMMARY_LOCK_REDIS_URL (or
+REDIS_URL) one worker at a time summarizes a thread; without Redis the guard
+is per process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage, get_buffer_string
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableConfig
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+# Graph node the background summary is written as (edge to END, so the
+# update leaves no pending tasks on the thread)
+MEMORY_NODE = "memory_summary"
+
+SUMMARY_PROMPT = (
+    "Create a summary of the conversation below, in at most {max_tokens} tokens "
+    "and in the language of the conversation:\n\n{conversation}"
+)
+EXTEND_SUMMARY_PROMPT = (
+    "This is a summary of the conversation so far:\n{summary}\n\n"
+    "Extend this summary, in at most {max_tokens} tokens and in the language of the "
+    "conversation, by taking into account the new messages below:\n\n{conversation}"
+)
+
+
+@dataclass
+class ConversationMemoryConfig:
+    """Cấu hình đếm token và tóm tắt hội thoại chạy nền"""
+    enabled: bool = env_field("SUMMARY_BACKGROUND_ENABLED", True)
+    # Token budget for the messages sent with a prompt
+    max_tokens: int = env_field("SUMMARY_MAX_TOKENS", 1200)
+    # Unsummarized tokens that trigger a background summary
+    max_tokens_before_summary: int = env_field("SUMMARY_TRIGGER_TOKENS", 1000)
+    max_summary_tokens: int = env_field("SUMMARY_MAX_SUMMARY_TOKENS", 800)
+    # Most recent messages never folded into the summary
+    keep_messages: int = env_field("SUMMARY_KEEP_MESSAGES", 2)
+    token_cache_size: int = env_field("TOKEN_COUNT_CACHE_SIZE", 50000)
+    # Cross-worker lock per thread ("" keeps the per-process guard only)
+    redis_url: str = env_field(("SUMMARY_LOCK_REDIS_URL", "REDIS_URL"), "")
+    lock_prefix: str = env_field("SUMMARY_LOCK_PREFIX", "summary:lock")
+    lock_ms: int = env_field("SUMMARY_LOCK_MS", 120000)
+
+
+# KEYS: lock; ARGV: owner
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+def running_summary(values: Dict[str, Any]) -> Any:
+    context = values.get("context")
+    if isinstance(context, dict):
+        return context.get("running_summary")
+    return None
+
+
+class TokenCounter:
+    """Per-message token counts, cached by message id (bounded LRU)."""
+
+    def __init__(self, max_entries: int = 50000, count_fn: Optional[Callable[[List[Any]], int]] = None):
+        self.max_entries = max_entries
+        self.count_fn = count_fn or count_tokens_approximately
+        self._lock = threading.Lock()
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def count(self, message: Any) -> int:
+        message_id = getattr(message, "id", None)
+        if message_id:
+            with self._lock:
+                cached = self._counts.get(message_id)
+                if cached is not None:
+                    self._counts.move_to_end(message_id)
+                    self._stats["hits"] += 1
+                    return cached
+        tokens = self.count_fn([message])
+        self._stats["misses"] += 1
+        if message_id:
+            with self._lock:
+                self._counts[message_id] = tokens
+                while len(self._counts) > self.max_entries:
+                    self._counts.popitem(last=False)
+        return tokens
+
+    def total(self, messages: Sequence[Any]) -> int:
+        return sum(self.count(m) for m in messages)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached = len(self._counts)
+        return {**self._stats, "cached_messages": cached}
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0
+
+
+class ConversationMemory:
+    """Token accounting node, prompt window and background summarizer."""
+
+    def __init__(
+        self,
+        model: Any = None,
+        config: Optional[ConversationMemoryConfig] = None,
+        counter: Optional[TokenCounter] = None,
+        redis_client: Any = None,
+    ):
+        self.model = model
+        self.config = config or ConversationMemoryConfig()
+        self.counter = counter or TokenCounter(self.config.token_cache_size)
+        self._redis = redis_client
+        self._release_script = None
+        # Tasks started by this process (the Redis lock covers other workers)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            "scheduled": 0,
+            "summaries": 0,
+            "below_threshold": 0,
+            "skipped_inflight": 0,
+            "skipped_locked": 0,
+            "stale_dropped": 0,
+            "lock_errors": 0,
+            "errors": 0,
+            "summary_ms_total": 0.0,
+            "last_summary_ms": 0.0,
+        }
+
+    @staticmethod
+    def unsummarized(messages: Sequence[Any], summary: Any) -> List[Any]:
+        """Messages after the last one folded into `summary`."""
+        last_id = getattr(summary, "last_summarized_message_id", None)
+        if not last_id:
+            return list(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            if getattr(messages[i], "id", None) == last_id:
+                return list(messages[i + 1:])
+        summarized = getattr(summary, "summarized_message_ids", None) or set()
+        return [m for m in messages if getattr(m, "id", None) not in summarized]
+
+    # --- Summarizer node ----------------------------------------------------
+    def account(self, state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        """Update the running token totals; only new messages are counted."""
+        messages = state.get("messages") or []
+        usage = state.get("token_usage") or {}
+        summary = running_summary(state)
+        summarized_id = getattr(summary, "last_summarized_message_id", None)
+
+        seen = usage.get("messages", 0)
+        same_prefix = (
+            0 < seen <= len(messages)
+            and getattr(messages[seen - 1], "id", None) == usage.get("last_id")
+            and usage.get("summarized_id") == summarized_id
+        )
+        if same_prefix:
+            new_tokens = self.counter.total(messages[seen:])
+            total = usage.get("total", 0) + new_tokens
+            unsummarized = usage.get("unsummarized", 0) + new_tokens
+        else:
+            # First turn, removed messages or a new summary: recount (cached per message)
+            total = self.counter.total(messages)
+            unsummarized = self.counter.total(self.unsummarized(messages, summary))
+
+        updated = {
+            "total": total,
+            "unsummarized": unsummarized,
+            "messages": len(messages),
+            "last_id": getattr(messages[-1], "id", None) if messages else None,
+            "summarized_id": summarized_id,
+        }
+        if updated == usage:
+            return {}
+        return {"token_usage": updated}
+
+    # --- Prompt window ------------------------------------------------------
+    def window(self, messages: Sequence[Any], summary: Any = None) -> List[Any]:
+        """Unsummarized messages, newest first up to the token budget (at least one)."""
+        kept: List[Any] = []
+        used = 0
+        for message in reversed(self.unsummarized(messages, summary)):
+            tokens = self.counter.count(message)
+            if kept and used + tokens > self.config.max_tokens:
+                break
+            kept.append(message)
+            used += tokens
+        kept.reverse()
+        # A tool result without its AI tool call is rejected by the providers
+        while len(kept) > 1 and isinstance(kept[0], ToolMessage):
+            kept.pop(0)
+        return kept
+
+    # --- Background summary -------------------------------------------------
+    def _split(self, pending: List[Any]) -> List[Any]:
+        """Messages to fold into the summary; tool calls stay with their results."""
+        cut = len(pending) - max(self.config.keep_messages, 0)
+        while 0 < cut < len(pending) and isinstance(pending[cut], ToolMessage):
+            cut -= 1
+        return pending[:max(cut, 0)]
+
+    def _summary_prompt(self, messages: List[BaseMessage], summary: Any) -> List[BaseMessage]:
+        conversation = get_buffer_string(messages)
+        existing = getattr(summary, "summary", "") if summary is not None else ""
+        if existing:
+            content = EXTEND_SUMMARY_PROMPT.format(
+                summary=existing, max_tokens=self.config.max_summary_tokens, conversation=conversation
+            )
+        else:
+            content = SUMMARY_PROMPT.format(max_tokens=self.config.max_summary_tokens, conversation=conversation)
+        return [HumanMessage(content=content)]
+
+    async def summarize(self, graph: Any, config: Dict[str, Any]) -> Any:
+        """Fold older messages into the thread's RunningSummary when over the threshold."""
+        from src.graphs.state.state import RunningSummary
+
+        snapshot = await graph.aget_state(config)
+        values = snapshot.values or {}
+        messages = values.get("messages") or []
+        summary = running_summary(values)
+        pending = self.unsummarized(messages, summary)
+        if self.counter.total(pending) <= self.config.max_tokens_before_summary:
+            self._stats["below_threshold"] += 1
+            return None
+        to_summarize = self._split(pending)
+        if not to_summarize:
+            self._stats["below_threshold"] += 1
+            return None
+
+        started = time.perf_counter()
+        response = await self.model.ainvoke(self._summary_prompt(to_summarize, summary))
+        text = getattr(response, "content", response)
+        if isinstance(text, list):
+            text = " ".join(item.get("text", "") for item in text if isinstance(item, dict))
+        new_summary = RunningSummary(
+            summary=str(text).strip(),
+            summarized_message_ids=set(getattr(summary, "summarized_message_ids", None) or set())
+            | {m.id for m in to_summarize if getattr(m, "id", None)},
+            last_summarized_message_id=to_summarize[-1].id,
+        )
+        # A turn checkpointed during the LLM call: its state is newer than the
+        # snapshot the summary was built from, so don't write over it
+        latest = await graph.aget_state(config)
+        if _checkpoint_id(latest) != _checkpoint_id(snapshot):
+            self._stats["stale_dropped"] += 1
+            logger.info(f"🧠 Thread moved on during the summary; dropped ({_checkpoint_id(snapshot)})")
+            return None
+        context = {**(values.get("context") or {}), "running_summary": new_summary}
+        await graph.aupdate_state(config, {"context": context}, as_node=MEMORY_NODE)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._stats["summaries"] += 1
+        self._stats["summary_ms_total"] += elapsed_ms
+        self._stats["last_summary_ms"] = round(elapsed_ms, 1)
+        logger.info(f"🧠 Summarized {len(to_summarize)} messages in the background ({elapsed_ms:.0f}ms)")
+        return new_summary
+
+    def _redis_client(self) -> Any:
+        if self._redis is None and self.config.redis_url:
+            import redis.asyncio  # Lazy import: only needed when a lock URL is set
+
+            self._redis = redis.asyncio.from_url(
+                self.config.redis_url, socket_timeout=2, socket_connect_timeout=2
+            )
+        return self._redis
+
+    def _lock_key(self, thread_id: str) -> str:
+        return f"{self.config.lock_prefix}:{thread_id}"
+
+    async def _acquire_lock(self, thread_id: str, owner: str) -> Optional[bool]:
+        """True when acquired, False when another worker holds it, None without Redis."""
+        client = self._redis_client()
+        if client is None:
+            return None
+        try:
+            return bool(await client.set(self._lock_key(thread_id), owner, nx=True, px=self.config.lock_ms))
+        except Exception as e:  # noqa: BLE001
+            self._stats["lock_errors"] += 1
+            logger.warning(f"⚠️ Summary lock unavailable for thread {thread_id}, summarizing without it: {e}")
+            return None
+
+    async def _release_lock(self, thread_id: str, owner: str) -> None:
+        try:
+            if self._release_script is None:
+                self._release_script = self._redis_client().register_script(RELEASE_LOCK_SCRIPT)
+            await self._release_script(keys=[self._lock_key(thread_id)], args=[owner])
+        except Exception as e:  # noqa: BLE001
+            logger.warning(f"⚠️ Summary lock release failed for thread {thread_id} (expires on its own): {e}")
+
+    async def _run(self, graph: Any, config: Dict[str, Any], thread_id: str) -> None:
+        owner = uuid.uuid4().hex
+        locked = False
+        try:
+            locked = await self._acquire_lock(thread_id, owner)
+            if locked is False:
+                self._stats["skipped_locked"] += 1
+                return
+            await self.summarize(graph, config)
+        except Exception as e:  # noqa: BLE001
+            self._stats["errors"] += 1
+            logger.warning(f"⚠️ Background summary failed for thread {thread_id}: {e}")
+        finally:
+            if locked:
+                await self._release_lock(thread_id, owner)
+            self._inflight.pop(thread_id, None)
+
+    def schedule(self, graph: Any, config: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """Start a background summary for the thread (one at a time per thread)."""
+        if not self.config.enabled or self.model is None:
+            return None
+        configurable = (config or {}).get("configurable") or {}
+        thread_id = configurable.get("thread_id")
+        if not thread_id:
+            return None
+        if thread_id in self._inflight:
+            self._stats["skipped_inflight"] += 1
+            return None
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        task_config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": configurable.get("checkpoint_ns", "")}}
+        task = loop.create_task(self._run(graph, task_config, thread_id))
+        self._inflight[thread_id] = task
+        self._stats["scheduled"] += 1
+        return task
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        summaries = self._stats["summaries"]
+        return {
+            **self._stats,
+            "summary_ms_total": round(self._stats["summary_ms_total"], 1),
+            "avg_summary_ms": round(self._stats["summary_ms_total"] / summaries, 1) if summaries else 0.0,
+            "in_flight": len(self._inflight),
+            "enabled": self.config.enabled,
+            "token_cache": self.counter.get_stats(),
+        }
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0.0 if isinstance(self._stats[k], float) else 0
+        self.counter.reset_stats()
+
+
+def _checkpoint_id(snapshot: Any) -> Optional[str]:
+    config = getattr(snapshot, "config", None) or {}
+    return (config.get("configurable") or {}).get("checkpoint_id")
+
+
+def memory_summary_node(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """Never run; background summaries are written to the graph as this node."""
+    return {}
+
+
+_conversation_memory: Optional[ConversationMemory] = None
+
+
+def set_conversation_memory(memory: ConversationMemory) -> None:
+    """Register the graph's conversation memory (prompt window, health checks)."""
+    global _conversation_memory
+    _conversation_memory = memory
+
+
+def get_conversation_memory() -> Optional[ConversationMemory]:
+    return _conversation_memory
+
+
+def schedule_conversation_summary(graph: Any, config: Dict[str, Any]) -> Optional[asyncio.Task]:
+    """Call after a reply is produced; no-op when no memory is registered."""
+    memory = get_conversation_memory()
+    if memory is None:
+        return None
+    return memory.schedule(graph, config)
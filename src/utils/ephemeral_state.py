@@ -0,0 +1,254 @@
+"""
+Ephemeral state channels: keep per-turn artifacts out of checkpoints.
+
+Every node update is persisted with the checkpoint of its super-step, so the
+full payloads of retrieved documents (`documents`, `prefetched_documents`)
+were written to the checkpointer at retrieve, grade and web search. With
+this module:
+
+- node updates store documents by reference: `(key, {"doc_ref": ..., "namespace": ...}, score)`;
+  the payload goes to a bounded per-process DocumentRefStore,
+- node inputs are rehydrated from that store before the node runs; a miss
+  (other worker, restart, eviction) reloads the payload through the
+  registered loader (QdrantStore.get by namespace/key),
+- channels nothing reads back (`summarized_messages`, SummarizationNode's
+  per-turn message window) are dropped from node updates.
+
+`checkpoint_size_report` reports serialized bytes per channel of a checkpoint
+(/health/checkpoint-size).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+DOC_REF_KEY = "doc_ref"
+# Small fields kept on the reference so routing/logging code still sees them
+_REF_METADATA = ("namespace", "domain", "retrieval")
+
+DocumentLoader = Callable[[Optional[str], str], Optional[Dict[str, Any]]]
+
+
+@dataclass
+class EphemeralStateConfig:
+    """Cấu hình ephemeral channels cho checkpoint"""
+    enabled: bool = env_field("EPHEMERAL_STATE_ENABLED", True)
+    # Channels holding (key, payload, score) documents, stored by reference
+    document_channels: Tuple[str, ...] = env_field(
+        "EPHEMERAL_DOCUMENT_CHANNELS", ("documents", "prefetched_documents")
+    )
+    # Channels dropped from node updates (never read back by any node)
+    dropped_channels: Tuple[str, ...] = env_field("EPHEMERAL_DROPPED_CHANNELS", ("summarized_messages",))
+    max_documents: int = env_field("EPHEMERAL_DOCUMENT_CACHE_SIZE", 5000)
+    ttl_seconds: float = env_field("EPHEMERAL_DOCUMENT_TTL", 3600.0)
+
+
+def is_document_ref(value: Any) -> bool:
+    return isinstance(value, dict) and DOC_REF_KEY in value
+
+
+def _is_ref_document(doc: Any) -> bool:
+    # Tuples come back from checkpoint serde as lists
+    return isinstance(doc, (tuple, list)) and len(doc) >= 2 and is_document_ref(doc[1])
+
+
+def document_ref(key: Any, value: Dict[str, Any]) -> str:
+    """Stable reference for a document payload (same chunk -> same ref)."""
+    content = value.get("content", "")
+    digest = hashlib.sha1(f"{key}\x00{content}".encode("utf-8", "ignore")).hexdigest()[:20]
+    return f"{key}:{digest}"
+
+
+class DocumentRefStore:
+    """Bounded LRU of document payloads keyed by reference."""
+
+    def __init__(self, config: Optional[EphemeralStateConfig] = None, loader: Optional[DocumentLoader] = None):
+        self.config = config or EphemeralStateConfig()
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._payloads: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._stats = {
+            "dehydrated": 0,
+            "hydrated": 0,
+            "cache_hits": 0,
+            "reloaded": 0,
+            "lost": 0,
+        }
+
+    def set_loader(self, loader: Optional[DocumentLoader]) -> None:
+        self.loader = loader
+
+    def _put(self, ref: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._payloads[ref] = (value, time.monotonic())
+            self._payloads.move_to_end(ref)
+            while len(self._payloads) > self.config.max_documents:
+                self._payloads.popitem(last=False)
+
+    def _get(self, ref: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._payloads.get(ref)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.config.ttl_seconds and time.monotonic() - stored_at > self.config.ttl_seconds:
+                del self._payloads[ref]
+                return None
+            self._payloads.move_to_end(ref)
+            return value
+
+    def dehydrate(self, documents: Optional[List[Any]]) -> Optional[List[Any]]:
+        """Replace document payloads with references; other items pass through."""
+        if not documents:
+            return documents
+        slim = []
+        for doc in documents:
+            if isinstance(doc, tuple) and len(doc) >= 2 and isinstance(doc[1], dict) and not is_document_ref(doc[1]):
+                key, value, *rest = doc
+                ref = document_ref(key, value)
+                self._put(ref, value)
+                stub = {DOC_REF_KEY: ref, **{k: value[k] for k in _REF_METADATA if k in value}}
+                slim.append((key, stub, *rest))
+                self._stats["dehydrated"] += 1
+            else:
+                slim.append(doc)
+        return slim
+
+    def hydrate(self, documents: Optional[List[Any]]) -> Optional[List[Any]]:
+        """Resolve references back to payloads; unresolvable documents are dropped."""
+        if not documents:
+            return documents
+        full = []
+        for doc in documents:
+            if not _is_ref_document(doc):
+                full.append(doc)
+                continue
+            key, stub, *rest = doc
+            value = self._get(stub[DOC_REF_KEY])
+            if value is not None:
+                self._stats["cache_hits"] += 1
+            else:
+                value = self._reload(key, stub)
+                if value is None:
+                    self._stats["lost"] += 1
+                    logger.warning(f"⚠️ Document {key} could not be rehydrated, dropping it")
+                    continue
+            self._stats["hydrated"] += 1
+            full.append((key, value, *rest))
+        return full
+
+    def _reload(self, key: Any, stub: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self.loader is None:
+            return None
+        namespace = stub.get("namespace") or stub.get("domain")
+        try:
+            loaded = self.loader(namespace, key)
+        except Exception as e:  # noqa: BLE001
+            logger.warning(f"⚠️ Document loader failed for {key}: {e}")
+            return None
+        if not isinstance(loaded, dict):
+            return None
+        value = {k: v for k, v in loaded.items() if k != "embedding"}
+        value.update({k: stub[k] for k in _REF_METADATA if k in stub})
+        self._put(stub[DOC_REF_KEY], value)
+        self._stats["reloaded"] += 1
+        return value
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached = len(self._payloads)
+        return {**self._stats, "cached_documents": cached}
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0
+
+
+class EphemeralChannels:
+    """Applies the ephemeral-channel rules to node inputs and outputs."""
+
+    def __init__(self, config: Optional[EphemeralStateConfig] = None, store: Optional[DocumentRefStore] = None):
+        self.config = config or EphemeralStateConfig()
+        self.store = store or DocumentRefStore(self.config)
+
+    def hydrate_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.config.enabled:
+            return state
+        refs = {
+            channel: state[channel]
+            for channel in self.config.document_channels
+            if channel in state and state[channel] and any(_is_ref_document(d) for d in state[channel])
+        }
+        if not refs:
+            return state
+        return {**state, **{channel: self.store.hydrate(docs) for channel, docs in refs.items()}}
+
+    def slim_update(self, update: Any) -> Any:
+        if not self.config.enabled or not isinstance(update, dict):
+            return update
+        slim = {k: v for k, v in update.items() if k not in self.config.dropped_channels}
+        for channel in self.config.document_channels:
+            if slim.get(channel):
+                slim[channel] = self.store.dehydrate(slim[channel])
+        return slim
+
+    def wrap(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Sync node wrapper: hydrated input, slimmed update."""
+        def node(state, config=None):
+            return self.slim_update(func(self.hydrate_state(state), config))
+        node.__name__ = getattr(func, "__name__", "node")
+        return node
+
+    def awrap(self, afunc: Callable[..., Any]) -> Callable[..., Any]:
+        async def anode(state, config=None):
+            return self.slim_update(await afunc(self.hydrate_state(state), config))
+        anode.__name__ = getattr(afunc, "__name__", "anode")
+        return anode
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.store.get_stats(),
+            "enabled": self.config.enabled,
+            "document_channels": list(self.config.document_channels),
+            "dropped_channels": list(self.config.dropped_channels),
+        }
+
+    def reset_stats(self) -> None:
+        self.store.reset_stats()
+
+
+def checkpoint_size_report(channel_values: Dict[str, Any], serde: Any) -> Dict[str, Any]:
+    """Serialized bytes per channel (largest first) and the total."""
+    channels = {}
+    for channel, value in channel_values.items():
+        try:
+            channels[channel] = len(serde.dumps_typed(value)[1])
+        except Exception as e:  # noqa: BLE001
+            logger.debug(f"Size report: cannot serialize channel {channel}: {e}")
+            channels[channel] = None
+    ordered = dict(sorted(channels.items(), key=lambda item: item[1] or 0, reverse=True))
+    return {"total_bytes": sum(v for v in ordered.values() if v), "channels": ordered}
+
+
+_ephemeral_channels: Optional[EphemeralChannels] = None
+
+
+def set_ephemeral_channels(channels: EphemeralChannels) -> None:
+    """Register the graph's ephemeral channels so health checks can read its stats."""
+    global _ephemeral_channels
+    _ephemeral_channels = channels
+
+
+def get_ephemeral_channels() -> Optional[EphemeralChannels]:
+    return _ephemeral_channels
@@ -0,0 +1,422 @@
+"""
+Tiered fast-path router in front of RouterAssistant.
+
+`route_question` used to make an LLM call on every turn. Most turns are easy to
+classify locally; the tiers below run in order and the first confident one wins:
+
+1. explicit route hint (e.g. FacebookMessengerService for attachment-only batches)
+2. current-turn attachment metadata / pre-analyzed image marker -> process_document
+3. pure greeting / thanks -> direct_answer
+4. QueryClassifier single-category match (menu, location, promotion, FAQ) -> vectorstore
+5. embedding nearest-centroid over labelled examples for every route (optional)
+
+A classifier category on its own is one signal and scores below the threshold;
+it is confident only when a second signal agrees (two distinct keywords of the
+category, or the nearest centroid). Short follow-ups ("còn cái kia?", "7h nhé")
+depend on the previous turn and are left to the LLM, as are answers to a
+booking question. Centroids are built at startup (`warm` / `awarm`); until then
+the request path skips the centroid tier instead of embedding the examples.
+
+Only when the best local confidence is below FAST_ROUTER_CONFIDENCE is the LLM
+router called. Whenever both a local guess and an LLM decision exist, agreement
+is recorded so the threshold can be tuned from /health/fast-router.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.core.config import env_field
+from src.domain_configs.keyword_mappings import (
+    get_all_keywords_for_domain,
+    get_keywords_for_domain,
+    get_route_examples_for_domain,
+)
+from src.utils.query_classifier import QueryClassifier
+
+logger = logging.getLogger(__name__)
+
+VALID_ROUTES = ("vectorstore", "web_search", "direct_answer", "process_document")
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Classifier + a second agreeing signal
+CORROBORATED_CONFIDENCE = 0.9
+# Follow-ups that only make sense with the previous turn
+FOLLOWUP_CONFIDENCE = 0.5
+
+
+@dataclass
+class FastRouterConfig:
+    """Cấu hình fast-path router"""
+    enabled: bool = env_field("FAST_ROUTER_ENABLED", True)
+    # Local decisions at or above this confidence skip the LLM router
+    confidence_threshold: float = env_field("FAST_ROUTER_CONFIDENCE", 0.85)
+    # A single keyword category is one signal: keep it below the threshold
+    classifier_confidence: float = env_field("FAST_ROUTER_CLASSIFIER_CONFIDENCE", 0.75)
+    # Fraction of confident local decisions still checked by the LLM (agreement metrics)
+    shadow_rate: float = env_field("FAST_ROUTER_SHADOW_RATE", 0.0)
+    centroids_enabled: bool = env_field("FAST_ROUTER_CENTROIDS_ENABLED", True)
+    # Centroid tier: below this cosine the message is considered out of distribution
+    centroid_min_similarity: float = env_field("FAST_ROUTER_CENTROID_MIN_SIM", 0.6)
+    max_greeting_words: int = 8
+    # Messages this short with a previous turn are follow-ups
+    followup_max_words: int = env_field("FAST_ROUTER_FOLLOWUP_MAX_WORDS", 3)
+
+
+@dataclass
+class RouteContext:
+    """The previous turn, read from the graph state."""
+    previous_route: Optional[str] = None
+    previous_reply: str = ""
+
+
+@dataclass
+class RouteDecision:
+    datasource: Optional[str]
+    confidence: float
+    source: str  # hint | attachment | greeting | classifier | classifier+centroid | centroid | none
+
+    @property
+    def is_local(self) -> bool:
+        return self.datasource is not None
+
+
+NO_DECISION = RouteDecision(datasource=None, confidence=0.0, source="none")
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFC", text or "").lower().strip()
+
+
+class FastRouter:
+    """Local router; returns a RouteDecision with a confidence in [0, 1]."""
+
+    def __init__(
+        self,
+        config: Optional[FastRouterConfig] = None,
+        domain: str = "restaurant",
+        embed_fn: Optional[Callable[[str], Optional[List[float]]]] = None,
+        has_attachment_fn: Optional[Callable[[str], bool]] = None,
+        aembed_fn: Optional[Callable[[str], Awaitable[Optional[List[float]]]]] = None,
+    ):
+        self.config = config or FastRouterConfig()
+        self.domain = domain
+        # Domains without keyword mappings skip the keyword tiers
+        self.classifier = QueryClassifier(domain=domain) if get_all_keywords_for_domain(domain) else None
+        self.greeting_words = {_normalize(w) for w in get_keywords_for_domain(domain, "greeting_keywords")}
+        self.booking_keywords = [_normalize(k) for k in get_keywords_for_domain(domain, "booking_keywords")]
+        self.category_patterns = {
+            category: _phrase_pattern(
+                get_keywords_for_domain(domain, f"{category}_keywords")
+                + get_keywords_for_domain(domain, f"{category}_signals")
+            )
+            for category in ("menu", "location", "promotion", "faq")
+        }
+        self.route_examples = get_route_examples_for_domain(domain)
+        missing = [r for r in VALID_ROUTES if not self.route_examples.get(r)]
+        if self.route_examples and missing:
+            logger.warning(f"⚠️ Fast router centroid tier disabled, no examples for routes: {missing}")
+        self.embed_fn = embed_fn
+        self.has_attachment_fn = has_attachment_fn
+        # Async embedder used by `aroute` to warm the (shared) embedding cache
+        self.aembed_fn = aembed_fn
+        self._centroids: Optional[Dict[str, List[float]]] = None
+        self._centroid_lock = threading.Lock()
+        self._warming = False
+        self._stats = {
+            "local_routes": 0,
+            "llm_routes": 0,
+            "shadow_checks": 0,
+            "agreements": 0,
+            "disagreements": 0,
+            "by_source": {},
+        }
+
+    # --- Tiers ------------------------------------------------------------
+    def classify(
+        self,
+        text: str,
+        route_hint: Optional[str] = None,
+        use_centroids: bool = True,
+        context: Optional[RouteContext] = None,
+    ) -> RouteDecision:
+        """Best local routing guess (may be below the confidence threshold)."""
+        if route_hint in VALID_ROUTES:
+            return RouteDecision(route_hint, 1.0, "hint")
+        if not self.config.enabled or not text:
+            return NO_DECISION
+
+        if self.has_attachment_fn is not None and self.has_attachment_fn(text):
+            return RouteDecision("process_document", 0.97, "attachment")
+
+        normalized = _normalize(text)
+        words = _WORD_RE.findall(normalized)
+        if words and len(words) <= self.config.max_greeting_words and all(w in self.greeting_words for w in words):
+            return RouteDecision("direct_answer", 0.92, "greeting")
+
+        best = self._classify_by_keywords(text, normalized, context)
+        if best.confidence >= self.config.confidence_threshold or not use_centroids:
+            return self._for_context(best, words, context)
+        centroid_decision = self._classify_by_centroid(text)
+        if best.is_local and centroid_decision.datasource == best.datasource:
+            best = RouteDecision(best.datasource, CORROBORATED_CONFIDENCE, "classifier+centroid")
+        elif centroid_decision.confidence > best.confidence:
+            best = centroid_decision
+        return self._for_context(best, words, context)
+
+    def _classify_by_keywords(self, text: str, normalized: str, context: Optional[RouteContext]) -> RouteDecision:
+        if self.classifier is None:
+            return NO_DECISION
+        # Booking messages, and answers to a booking question, go to the LLM
+        previous_reply = _normalize(context.previous_reply) if context else ""
+        if any(k in normalized or k in previous_reply for k in self.booking_keywords):
+            return NO_DECISION
+        classification = self.classifier.classify_query(text)
+        category = classification["primary_category"]
+        if category == "general":
+            return NO_DECISION
+        confidence = min(float(classification["confidence"]), self.config.classifier_confidence)
+        single_category = sum(classification[f"is_{c}_query"] for c in self.category_patterns) == 1
+        pattern = self.category_patterns[category]
+        if single_category and pattern is not None and len(_distinct_matches(pattern, normalized)) >= 2:
+            return RouteDecision("vectorstore", CORROBORATED_CONFIDENCE, "classifier")
+        return RouteDecision("vectorstore", confidence, "classifier")
+
+    def _for_context(self, decision: RouteDecision, words: List[str], context: Optional[RouteContext]) -> RouteDecision:
+        """A short message after a previous turn is a follow-up; the LLM sees the conversation."""
+        is_followup = (
+            decision.is_local
+            and context is not None
+            and (context.previous_route or context.previous_reply)
+            and len(words) <= self.config.followup_max_words
+        )
+        if not is_followup or decision.confidence <= FOLLOWUP_CONFIDENCE:
+            return decision
+        return RouteDecision(decision.datasource, FOLLOWUP_CONFIDENCE, decision.source)
+
+    def warm(self) -> bool:
+        """Build the centroids (call at startup); False when the tier is unavailable."""
+        if not self._centroid_tier_available():
+            return False
+        try:
+            return bool(self._build_centroids(self.embed_fn))
+        except Exception as e:
+            logger.warning(f"⚠️ Fast router centroid warm-up failed: {e}")
+            return False
+
+    async def awarm(self) -> bool:
+        """Async `warm`: embeds the examples concurrently with `aembed_fn`."""
+        if not self._centroid_tier_available():
+            return False
+        if self.aembed_fn is None:
+            return await asyncio.to_thread(self.warm)
+        examples = [e for route in VALID_ROUTES for e in self.route_examples[route]]
+        try:
+            vectors = dict(zip(examples, await asyncio.gather(*(self.aembed_fn(e) for e in examples))))
+        except Exception as e:
+            logger.warning(f"⚠️ Fast router centroid warm-up failed: {e}")
+            return False
+        return bool(self._build_centroids(vectors.get))
+
+    def _build_centroids(self, embed: Callable[[str], Optional[List[float]]]) -> Dict[str, List[float]]:
+        with self._centroid_lock:
+            if self._centroids is not None:
+                return self._centroids
+            centroids: Dict[str, List[float]] = {}
+            for route in VALID_ROUTES:
+                vectors = [v for v in (embed(e) for e in self.route_examples[route]) if v]
+                if not vectors:
+                    continue
+                dim = len(vectors[0])
+                mean = [sum(v[i] for v in vectors) / len(vectors) for i in range(dim)]
+                centroids[route] = _unit(mean)
+            self._centroids = centroids
+            logger.info(f"✅ Fast router centroids built for routes: {list(centroids)}")
+            return centroids
+
+    def _get_centroids(self) -> Optional[Dict[str, List[float]]]:
+        """Built centroids, or None while they are still being built in the background."""
+        if self._centroids is not None:
+            return self._centroids
+        with self._centroid_lock:
+            if self._centroids is not None or self._warming:
+                return self._centroids
+            self._warming = True
+        logger.warning("⚠️ Fast router centroids not warmed at startup, building in the background")
+
+        def run():
+            try:
+                self.warm()
+            finally:
+                self._warming = False
+        threading.Thread(target=run, name="fast-router-warm", daemon=True).start()
+        return None
+
+    def _classify_by_centroid(self, text: str) -> RouteDecision:
+        """Nearest centroid; confidence grows with the margin over the runner-up."""
+        if not self._centroid_tier_available():
+            return NO_DECISION
+        centroids = self._get_centroids()
+        if not centroids or len(centroids) < len(VALID_ROUTES):
+            return NO_DECISION
+        try:
+            vector = self.embed_fn(text)
+        except Exception as e:
+            logger.warning(f"⚠️ Fast router centroid tier unavailable: {e}")
+            return NO_DECISION
+        if not vector:
+            return NO_DECISION
+        query = _unit(vector)
+        scored = sorted(
+            ((sum(a * b for a, b in zip(query, c)), route) for route, c in centroids.items()),
+            reverse=True,
+        )
+        (top_sim, top_route), (second_sim, _) = scored[0], scored[1]
+        if top_sim < self.config.centroid_min_similarity:
+            return NO_DECISION
+        confidence = min(0.99, 0.5 + 5.0 * (top_sim - second_sim))
+        return RouteDecision(top_route, confidence, "centroid")
+
+    # --- Routing ----------------------------------------------------------
+    def route(
+        self,
+        text: str,
+        llm_route: Callable[[], str],
+        route_hint: Optional[str] = None,
+        context: Optional[RouteContext] = None,
+    ) -> RouteDecision:
+        """
+        Route locally when confident, otherwise call `llm_route()`.
+
+        Returns the final decision; `source` is "llm" when the LLM decided.
+        """
+        local = self.classify(text, route_hint, context=context)
+        confident, shadow = self._should_skip_llm(local)
+        if confident and not shadow:
+            return self._accept_local(local)
+        return self._accept_llm(local, llm_route(), shadow)
+
+    async def aroute(
+        self,
+        text: str,
+        allm_route: Callable[[], Awaitable[str]],
+        route_hint: Optional[str] = None,
+        context: Optional[RouteContext] = None,
+    ) -> RouteDecision:
+        """
+        Async `route`.
+
+        The centroid tier needs the message embedding; with `aembed_fn` it is
+        fetched on the event loop first, so the synchronous tier only reads the cache.
+        """
+        local = self.classify(text, route_hint, use_centroids=False, context=context)
+        confident, _ = self._should_skip_llm(local)
+        if not confident and self.aembed_fn is not None and self._centroids is not None:
+            await self._awarm_embeddings(text)
+            local = self.classify(text, route_hint, context=context)
+        confident, shadow = self._should_skip_llm(local)
+        if confident and not shadow:
+            return self._accept_local(local)
+        return self._accept_llm(local, await allm_route(), shadow)
+
+    def _centroid_tier_available(self) -> bool:
+        return (
+            self.config.centroids_enabled
+            and self.embed_fn is not None
+            and all(self.route_examples.get(r) for r in VALID_ROUTES)
+        )
+
+    async def _awarm_embeddings(self, text: str) -> None:
+        try:
+            await self.aembed_fn(text)
+        except Exception as e:
+            logger.warning(f"⚠️ Fast router async embedding failed: {e}")
+
+    def _should_skip_llm(self, local: RouteDecision) -> Tuple[bool, bool]:
+        confident = local.is_local and local.confidence >= self.config.confidence_threshold
+        shadow = (
+            confident
+            and local.source != "hint"
+            and self.config.shadow_rate > 0
+            and random.random() < self.config.shadow_rate
+        )
+        return confident, shadow
+
+    def _accept_local(self, local: RouteDecision) -> RouteDecision:
+        self._stats["local_routes"] += 1
+        by_source = self._stats["by_source"]
+        by_source[local.source] = by_source.get(local.source, 0) + 1
+        logger.info(f"⚡ Fast router: '{local.datasource}' via {local.source} (confidence={local.confidence:.2f}), LLM skipped")
+        return local
+
+    def _accept_llm(self, local: RouteDecision, datasource: str, shadow: bool) -> RouteDecision:
+        self._stats["llm_routes"] += 1
+        if shadow:
+            self._stats["shadow_checks"] += 1
+        if local.is_local:
+            self.record_agreement(local, datasource)
+        return RouteDecision(datasource, 1.0, "llm")
+
+    def record_agreement(self, local: RouteDecision, llm_datasource: str) -> None:
+        if local.datasource == llm_datasource:
+            self._stats["agreements"] += 1
+        else:
+            self._stats["disagreements"] += 1
+            logger.info(
+                f"🔀 Fast router disagreement: local '{local.datasource}' ({local.source}, "
+                f"{local.confidence:.2f}) vs LLM '{llm_datasource}'"
+            )
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, object]:
+        total = self._stats["local_routes"] + self._stats["llm_routes"]
+        compared = self._stats["agreements"] + self._stats["disagreements"]
+        return {
+            **self._stats,
+            "by_source": dict(self._stats["by_source"]),
+            "local_rate": round(self._stats["local_routes"] / total, 4) if total else 0.0,
+            "agreement_rate": round(self._stats["agreements"] / compared, 4) if compared else None,
+            "confidence_threshold": self.config.confidence_threshold,
+        }
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = {} if k == "by_source" else 0
+
+
+def _phrase_pattern(phrases: List[str]) -> Optional["re.Pattern[str]"]:
+    normalized = sorted({_normalize(p) for p in phrases if p.strip()}, key=len, reverse=True)
+    if not normalized:
+        return None
+    return re.compile(r"(?<!\w)(?:" + "|".join(re.escape(p) for p in normalized) + r")(?!\w)")
+
+
+def _distinct_matches(pattern: "re.Pattern[str]", text: str) -> set:
+    """Whole-word keyword matches; longest phrase first, so "món gì" is not also "món"."""
+    return set(pattern.findall(text))
+
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = sum(x * x for x in vector) ** 0.5
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+_fast_router: Optional[FastRouter] = None
+
+
+def set_fast_router(router: FastRouter) -> None:
+    """Register the graph's router so health checks can read its stats."""
+    global _fast_router
+    _fast_router = router
+
+
+def get_fast_router() -> Optional[FastRouter]:
+    return _fast_router
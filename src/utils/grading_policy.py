@@ -0,0 +1,336 @@
+"""
+Score-based grading policy for grade_documents_node.
+
+Every retrieved document already carries a cosine score. Documents above a
+per-namespace upper bound are accepted without an LLM call, documents below the
+lower bound are dropped, and only the ambiguous band in between is sent to
+DocGraderAssistant.
+
+Thresholds are loaded from GRADING_THRESHOLDS_PATH (JSON) and fitted offline from
+the grader decisions logged to GRADING_DECISION_LOG_PATH:
+
+    python scripts/calibrate_grading_thresholds.py --precision 0.98
+
+The decision log is off by default; set GRADING_DECISION_LOG_ENABLED=1 while
+collecting calibration data. It rotates at GRADING_DECISION_LOG_MAX_BYTES.
+
+Bypassed documents are never graded, so the decision log only covers the
+ambiguous band once the policy is on. GRADING_POLICY_AUDIT_RATE sends a random
+fraction of bypassed documents to the LLM anyway to keep calibration data unbiased.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import logging.handlers
+import random
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+ACCEPT = "accept"
+REJECT = "reject"
+GRADE = "grade"
+
+
+@dataclass
+class GradingPolicyConfig:
+    """Cấu hình grading policy"""
+    enabled: bool = env_field("GRADING_POLICY_ENABLED", True)
+    thresholds_path: str = env_field("GRADING_THRESHOLDS_PATH", "data/cache/grading_thresholds.json")
+    decision_log_path: str = env_field("GRADING_DECISION_LOG_PATH", "data/logs/grader_decisions.jsonl")
+    log_decisions: bool = env_field("GRADING_DECISION_LOG_ENABLED", False)
+    # Rotate the decision log at this size, keeping `decision_log_backups` old files
+    decision_log_max_bytes: int = env_field("GRADING_DECISION_LOG_MAX_BYTES", 10 * 1024 * 1024)
+    decision_log_backups: int = env_field("GRADING_DECISION_LOG_BACKUPS", 3)
+    # Conservative defaults until thresholds have been calibrated
+    default_upper: float = env_field("GRADING_POLICY_UPPER", 0.9)
+    default_lower: float = env_field("GRADING_POLICY_LOWER", 0.3)
+    # Fraction of bypassed documents still sent to the LLM (calibration data)
+    audit_rate: float = env_field("GRADING_POLICY_AUDIT_RATE", 0.0)
+
+
+@dataclass
+class NamespaceThresholds:
+    lower: float
+    upper: float
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"lower": self.lower, "upper": self.upper}
+
+
+class GradingPolicy:
+    """Per-namespace accept/reject/grade decisions from retrieval scores."""
+
+    def __init__(
+        self,
+        config: Optional[GradingPolicyConfig] = None,
+        thresholds: Optional[Dict[str, NamespaceThresholds]] = None,
+    ):
+        self.config = config or GradingPolicyConfig()
+        self.default_thresholds = NamespaceThresholds(
+            lower=self.config.default_lower, upper=self.config.default_upper
+        )
+        self.thresholds: Dict[str, NamespaceThresholds] = (
+            thresholds if thresholds is not None else self._load_thresholds()
+        )
+        self._log_lock = threading.Lock()
+        self._log_handler: Optional[logging.handlers.RotatingFileHandler] = None
+        self._stats = {
+            "auto_accepted": 0,
+            "auto_rejected": 0,
+            "sent_to_llm": 0,
+            "audited": 0,
+            "llm_calls_saved": 0,
+        }
+
+    def _load_thresholds(self) -> Dict[str, NamespaceThresholds]:
+        path = Path(self.config.thresholds_path)
+        if not path.exists():
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            thresholds = {
+                ns: NamespaceThresholds(lower=float(t["lower"]), upper=float(t["upper"]))
+                for ns, t in data.get("namespaces", {}).items()
+            }
+            logger.info(f"✅ Grading thresholds loaded for namespaces: {list(thresholds)}")
+            return thresholds
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load grading thresholds from {path}: {e}")
+            return {}
+
+    def thresholds_for(self, namespace: Optional[str]) -> NamespaceThresholds:
+        return self.thresholds.get(namespace or "", self.default_thresholds)
+
+    # --- Decisions --------------------------------------------------------
+    def decide(self, namespace: Optional[str], score: Optional[float]) -> str:
+        """Return ACCEPT, REJECT or GRADE for a retrieval hit."""
+        if not self.config.enabled or not isinstance(score, (int, float)):
+            return GRADE
+        t = self.thresholds_for(namespace)
+        if score >= t.upper:
+            decision = ACCEPT
+        elif score < t.lower:
+            decision = REJECT
+        else:
+            return GRADE
+        if self.config.audit_rate > 0 and random.random() < self.config.audit_rate:
+            self._stats["audited"] += 1
+            return GRADE
+        return decision
+
+    def partition(
+        self, documents: List[Tuple[Any, ...]]
+    ) -> Tuple[List[Any], List[Any], List[Any]]:
+        """
+        Split (key, value, score) hits into (accepted, rejected, to_grade).
+
+        Lexical-only hybrid hits carry no cosine score and are always graded.
+        """
+        accepted, rejected, to_grade = [], [], []
+        for d in documents:
+            value = d[1] if len(d) > 1 and isinstance(d[1], dict) else {}
+            score = d[2] if len(d) > 2 else None
+            if value.get("retrieval") == "lexical":
+                decision = GRADE
+            else:
+                decision = self.decide(document_namespace(value), score)
+            if decision == ACCEPT:
+                accepted.append(d)
+            elif decision == REJECT:
+                rejected.append(d)
+            else:
+                to_grade.append(d)
+        self._stats["auto_accepted"] += len(accepted)
+        self._stats["auto_rejected"] += len(rejected)
+        self._stats["sent_to_llm"] += len(to_grade)
+        return accepted, rejected, to_grade
+
+    def record_llm_calls_saved(self, count: int) -> None:
+        if count > 0:
+            self._stats["llm_calls_saved"] += count
+
+    # --- Calibration data -------------------------------------------------
+    def log_decision(self, namespace: Optional[str], score: Optional[float], binary_score: str) -> None:
+        """Append one LLM grader decision (the calibration label) to the JSONL log."""
+        if not self.config.log_decisions or not isinstance(score, (int, float)):
+            return
+        record = {
+            "ts": time.time(),
+            "namespace": namespace or "",
+            "score": float(score),
+            "relevant": str(binary_score).strip().lower() == "yes",
+        }
+        try:
+            self._decision_log_handler().handle(logging.makeLogRecord({"msg": json.dumps(record)}))
+        except Exception as e:
+            logger.debug(f"Could not log grader decision: {e}")
+
+    def _decision_log_handler(self) -> logging.handlers.RotatingFileHandler:
+        if self._log_handler is None:
+            with self._log_lock:
+                if self._log_handler is None:
+                    path = Path(self.config.decision_log_path)
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    handler = logging.handlers.RotatingFileHandler(
+                        path,
+                        maxBytes=self.config.decision_log_max_bytes,
+                        backupCount=self.config.decision_log_backups,
+                        encoding="utf-8",
+                        delay=True,
+                    )
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    self._log_handler = handler
+        return self._log_handler
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "enabled": self.config.enabled,
+            "thresholds": {ns: t.to_dict() for ns, t in self.thresholds.items()},
+            "default_thresholds": self.default_thresholds.to_dict(),
+        }
+
+    def reset_stats(self) -> None:
+        for k in self._stats:
+            self._stats[k] = 0
+
+
+def document_namespace(value: Dict[str, Any]) -> Optional[str]:
+    """Namespace of a retrieved document payload (set by MultiNamespaceRetriever)."""
+    return value.get("namespace") or value.get("domain")
+
+
+# --- Offline calibration ---------------------------------------------------
+def decision_log_files(path: str) -> List[str]:
+    """The decision log and its rotated backups (path.1, path.2, ...), oldest first."""
+    files = []
+    index = 1
+    while Path(f"{path}.{index}").is_file():
+        files.append(f"{path}.{index}")
+        index += 1
+    files.reverse()
+    if Path(path).is_file():
+        files.append(path)
+    return files
+
+
+def load_decisions(path: str) -> List[Dict[str, Any]]:
+    """Read the decision log, including rotated backups."""
+    records = []
+    for file_path in decision_log_files(path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+
+def fit_namespace_thresholds(
+    samples: Iterable[Tuple[float, bool]],
+    precision: float = 0.98,
+    min_support: int = 20,
+) -> Optional[NamespaceThresholds]:
+    """
+    Fit (lower, upper) from (score, relevant) pairs.
+
+    upper: lowest score such that at least `precision` of the hits at or above
+    it were graded relevant (with at least `min_support` such hits).
+    lower: highest score such that at least `precision` of the hits below it were
+    graded irrelevant. Returns None when there is not enough data.
+    """
+    ranked = sorted(samples, key=lambda s: s[0])
+    n = len(ranked)
+    if n < min_support:
+        return None
+
+    upper = float("inf")
+    relevant_above = 0
+    for i in range(n - 1, -1, -1):
+        relevant_above += ranked[i][1]
+        support = n - i
+        if support >= min_support and relevant_above / support >= precision:
+            upper = ranked[i][0]
+
+    lower = float("-inf")
+    irrelevant_below = 0
+    for i in range(n):
+        irrelevant_below += not ranked[i][1]
+        support = i + 1
+        if support >= min_support and irrelevant_below / support >= precision:
+            # Scores strictly below the next hit are rejected
+            lower = ranked[i + 1][0] if i + 1 < n else ranked[i][0]
+
+    if upper == float("inf") and lower == float("-inf"):
+        return None
+    upper = min(upper, 1.0) if upper != float("inf") else 1.01
+    lower = max(lower, 0.0) if lower != float("-inf") else 0.0
+    if lower > upper:
+        lower = upper
+    return NamespaceThresholds(lower=round(lower, 4), upper=round(upper, 4))
+
+
+def fit_thresholds(
+    records: Iterable[Dict[str, Any]],
+    precision: float = 0.98,
+    min_support: int = 20,
+) -> Dict[str, NamespaceThresholds]:
+    """Fit thresholds for every namespace present in the decision log."""
+    by_namespace: Dict[str, List[Tuple[float, bool]]] = {}
+    for record in records:
+        try:
+            by_namespace.setdefault(record.get("namespace", ""), []).append(
+                (float(record["score"]), bool(record["relevant"]))
+            )
+        except (KeyError, TypeError, ValueError):
+            continue
+    fitted = {}
+    for namespace, samples in by_namespace.items():
+        thresholds = fit_namespace_thresholds(samples, precision, min_support)
+        if thresholds is not None:
+            fitted[namespace] = thresholds
+    return fitted
+
+
+def save_thresholds(thresholds: Dict[str, NamespaceThresholds], path: str, **metadata: Any) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "fitted_at": time.time(),
+                **metadata,
+                "namespaces": {ns: t.to_dict() for ns, t in thresholds.items()},
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+
+
+_grading_policy: Optional[GradingPolicy] = None
+_grading_policy_lock = threading.Lock()
+
+
+def get_grading_policy() -> GradingPolicy:
+    """Get the process-wide grading policy instance."""
+    global _grading_policy
+    if _grading_policy is None:
+        with _grading_policy_lock:
+            if _grading_policy is None:
+                _grading_policy = GradingPolicy()
+    return _grading_policy
@@ -18,6 +18,7 @@ class SearchStrategy(Enum):
     PRIMARY_ONLY = "primary_only"
     FALLBACK = "fallback" 
     COMPREHENSIVE = "comprehensive"
+    HYBRID = "hybrid"
 
 
 @dataclass
@@ -27,6 +28,8 @@ class SearchResult:
     content_dict: Dict[str, Any]
     score: float
     namespace: str
+    # Reciprocal-rank-fusion score (HYBRID only); `score` stays the dense cosine score
+    fused_score: Optional[float] = None
     
     @property
     def content(self) -> str:
@@ -42,9 +45,12 @@ class MultiNamespaceRetriever:
     Production-ready multi-namespace retriever with intelligent search strategies.
     
     Features:
-    - Concurrent namespace searching for performance
+    - Embed-once fan-out: the query is embedded a single time and the vector is
+      reused for primary, fallback and comprehensive searches
+    - Batched namespace searching (one Qdrant search_batch request)
     - Smart deduplication with configurable similarity thresholds
     - Adaptive scoring and re-ranking
+    - Hybrid BM25 + dense retrieval fused with reciprocal-rank fusion
     - Comprehensive error handling and fallbacks
     - Memory-efficient result processing
     """
@@ -55,19 +61,25 @@ class MultiNamespaceRetriever:
         namespaces: List[str], 
         default_namespace: str = "maketing",
         max_workers: int = 4,
-        deduplication_threshold: float = 0.95
+        deduplication_threshold: float = 0.95,
+        rrf_k: int = 60
     ):
         self.store = qdrant_store
         self.namespaces = namespaces
         self.default_namespace = default_namespace
         self.max_workers = min(max_workers, len(namespaces))  # Don't over-parallelize
         self.deduplication_threshold = deduplication_threshold
+        self.rrf_k = rrf_k
         
         # Performance monitoring
         self._search_stats = {
             'total_searches': 0,
             'fallback_triggered': 0,
-            'deduplication_removed': 0
+            'deduplication_removed': 0,
+            'embedding_calls': 0,
+            'batched_requests': 0,
+            'hybrid_searches': 0,
+            'lexical_hits': 0
         }
         
     def search_with_fallback(
@@ -76,17 +88,26 @@ class MultiNamespaceRetriever:
         primary_namespace: str, 
         limit: int = 12,
         fallback_threshold: float = 0.65,
-        min_primary_results: int = 4
+        min_primary_results: int = 4,
+        query_vector: Optional[List[float]] = None
     ) -> List[Tuple[str, Dict[str, Any], float]]:
         """
         Search with intelligent fallback strategy - optimized for production.
+
+        The query is embedded once (or `query_vector` is reused if given) and the
+        same vector serves the primary and all fallback namespaces.
         """
         self._search_stats['total_searches'] += 1
         
         logging.info(f"🔍 Fallback search - Primary: {primary_namespace}, Query: {query[:50]}...")
         
+        query_vector = query_vector if query_vector is not None else self._embed_query(query)
+        if query_vector is None:
+            logging.warning("⚠️ Empty query embedding, skipping fallback search")
+            return []
+        
         # Step 1: Search primary namespace
-        primary_results = self._search_single_namespace(primary_namespace, query, limit)
+        primary_results = self._search_single_namespace(primary_namespace, query_vector, limit)
         
         if not self._should_use_fallback(primary_results, fallback_threshold, min_primary_results):
             logging.info(f"✅ Primary sufficient: {len(primary_results)} results")
@@ -95,20 +116,31 @@ class MultiNamespaceRetriever:
         # Step 2: Execute fallback searches concurrently
         self._search_stats['fallback_triggered'] += 1
         fallback_namespaces = [ns for ns in self.namespaces if ns != primary_namespace]
-        
-        all_results = list(primary_results)
         remaining_limit = max(0, limit - len(primary_results))
         
+        fallback_results = []
         if remaining_limit > 0:
-            fallback_results = self._search_multiple_namespaces_concurrent(
-                fallback_namespaces, query, remaining_limit
+            fallback_results = self._search_multiple_namespaces(
+                fallback_namespaces, query_vector, remaining_limit
             )
-            
+        
+        # Step 3: Merge, re-rank and return
+        return self._merge_fallback(primary_results, fallback_results, primary_namespace, limit)
+    
+    def _merge_fallback(
+        self,
+        primary_results: List[SearchResult],
+        fallback_results: List[SearchResult],
+        primary_namespace: str,
+        limit: int
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        all_results = list(primary_results)
+        remaining_limit = max(0, limit - len(primary_results))
+        if remaining_limit > 0 and fallback_results:
             # Smart deduplication and merging
             unique_fallback = self._remove_duplicates(fallback_results, all_results)
             all_results.extend(unique_fallback[:remaining_limit])
         
-        # Step 3: Re-rank and return
         final_results = self._rerank_results(all_results, primary_namespace)[:limit]
         
         logging.info(f"🎯 Fallback complete: {len(final_results)} total results")
@@ -117,20 +149,32 @@ class MultiNamespaceRetriever:
     def search_all_namespaces(
         self, 
         query: str, 
-        limit_per_namespace: int = 6
+        limit_per_namespace: int = 6,
+        query_vector: Optional[List[float]] = None
     ) -> List[Tuple[str, Dict[str, Any], float]]:
         """
-        Comprehensive search across ALL namespaces concurrently - production optimized.
+        Comprehensive search across ALL namespaces in one batched request - production optimized.
         """
         self._search_stats['total_searches'] += 1
         
         logging.info(f"🌐 Comprehensive search across {len(self.namespaces)} namespaces")
         
-        # Concurrent search across all namespaces
-        all_results = self._search_multiple_namespaces_concurrent(
-            self.namespaces, query, limit_per_namespace
-        )
+        query_vector = query_vector if query_vector is not None else self._embed_query(query)
+        if query_vector is None:
+            logging.warning("⚠️ Empty query embedding, skipping comprehensive search")
+            return []
         
+        # Single batched search across all namespaces
+        all_results = self._search_multiple_namespaces(
+            self.namespaces, query_vector, limit_per_namespace
+        )
+        return self._finish_comprehensive(all_results, limit_per_namespace)
+    
+    def _finish_comprehensive(
+        self,
+        all_results: List[SearchResult],
+        limit_per_namespace: int
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
         # Advanced deduplication and ranking
         unique_results = self._remove_duplicates(all_results, [])
         final_results = self._rerank_results(unique_results, self.default_namespace)
@@ -141,41 +185,335 @@ class MultiNamespaceRetriever:
         logging.info(f"🎯 Comprehensive search complete: {len(final_results)} unique results")
         return [result.to_tuple() for result in final_results]
     
+    def search_hybrid(
+        self,
+        query: str,
+        primary_namespace: Optional[str] = None,
+        limit: int = 12,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        """
+        Dense + BM25 search across all namespaces, fused with reciprocal-rank fusion.
+
+        Exact-match names (branches, districts, dishes) are ranked by the lexical
+        index even when the embedding ranks them poorly. Degrades to
+        `search_with_fallback` when no namespace has a lexical index (or no term matches).
+        """
+        primary_namespace = primary_namespace or self.default_namespace
+        lexical_results = self._start_hybrid(query, primary_namespace, limit)
+        if not lexical_results:
+            return self.search_with_fallback(
+                query, primary_namespace, limit=limit, query_vector=query_vector
+            )
+        
+        query_vector = query_vector if query_vector is not None else self._embed_query(query)
+        dense_results: List[SearchResult] = []
+        if query_vector is not None:
+            dense_results = self._search_multiple_namespaces(self.namespaces, query_vector, limit)
+        return self._finish_hybrid(dense_results, lexical_results, primary_namespace, limit)
+    
+    def _start_hybrid(
+        self,
+        query: str,
+        primary_namespace: str,
+        limit: int
+    ) -> List[SearchResult]:
+        """Lexical half of a hybrid search; empty means use the dense fallback."""
+        lexical_results = self._lexical_search_namespaces(self.namespaces, query, limit)
+        if not lexical_results:
+            logging.info("ℹ️ No lexical index or matches, using dense fallback search")
+            return []
+        
+        self._search_stats['total_searches'] += 1
+        self._search_stats['hybrid_searches'] += 1
+        self._search_stats['lexical_hits'] += len(lexical_results)
+        logging.info(f"🔀 Hybrid search - Primary: {primary_namespace}, Query: {query[:50]}...")
+        return lexical_results
+    
+    def _finish_hybrid(
+        self,
+        dense_results: List[SearchResult],
+        lexical_results: List[SearchResult],
+        primary_namespace: str,
+        limit: int
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        final_results = self._rerank_results(
+            self._remove_duplicates(dense_results, []),
+            primary_namespace,
+            lexical_results=lexical_results
+        )[:limit]
+        
+        logging.info(f"🎯 Hybrid search complete: {len(final_results)} fused results")
+        return [result.to_tuple() for result in final_results]
+    
+    def search(
+        self,
+        query: str,
+        strategy: SearchStrategy = SearchStrategy.FALLBACK,
+        limit: int = 12,
+        primary_namespace: Optional[str] = None,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Dispatch to the search method for `strategy`."""
+        primary_namespace = primary_namespace or self.default_namespace
+        if strategy == SearchStrategy.HYBRID:
+            return self.search_hybrid(query, primary_namespace, limit, query_vector=query_vector)
+        if strategy == SearchStrategy.COMPREHENSIVE:
+            limit_per_ns = max(1, limit // max(1, len(self.namespaces)))
+            return self.search_all_namespaces(query, limit_per_ns, query_vector=query_vector)
+        if strategy == SearchStrategy.PRIMARY_ONLY:
+            query_vector = query_vector if query_vector is not None else self._embed_query(query)
+            if query_vector is None:
+                return []
+            self._search_stats['total_searches'] += 1
+            results = self._search_single_namespace(primary_namespace, query_vector, limit)
+            return [result.to_tuple() for result in results]
+        return self.search_with_fallback(query, primary_namespace, limit, query_vector=query_vector)
+    
+    # --- Async variants (AsyncQdrantClient + async embeddings) -----------
+    async def asearch_with_fallback(
+        self,
+        query: str,
+        primary_namespace: str,
+        limit: int = 12,
+        fallback_threshold: float = 0.65,
+        min_primary_results: int = 4,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Async `search_with_fallback`."""
+        self._search_stats['total_searches'] += 1
+        
+        query_vector = query_vector if query_vector is not None else await self._aembed_query(query)
+        if query_vector is None:
+            logging.warning("⚠️ Empty query embedding, skipping fallback search")
+            return []
+        
+        primary_results = await self._asearch_single_namespace(primary_namespace, query_vector, limit)
+        if not self._should_use_fallback(primary_results, fallback_threshold, min_primary_results):
+            logging.info(f"✅ Primary sufficient: {len(primary_results)} results")
+            return [result.to_tuple() for result in primary_results]
+        
+        self._search_stats['fallback_triggered'] += 1
+        fallback_namespaces = [ns for ns in self.namespaces if ns != primary_namespace]
+        remaining_limit = max(0, limit - len(primary_results))
+        fallback_results = []
+        if remaining_limit > 0:
+            fallback_results = await self._asearch_multiple_namespaces(
+                fallback_namespaces, query_vector, remaining_limit
+            )
+        return self._merge_fallback(primary_results, fallback_results, primary_namespace, limit)
+    
+    async def asearch_all_namespaces(
+        self,
+        query: str,
+        limit_per_namespace: int = 6,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Async `search_all_namespaces`."""
+        self._search_stats['total_searches'] += 1
+        
+        query_vector = query_vector if query_vector is not None else await self._aembed_query(query)
+        if query_vector is None:
+            logging.warning("⚠️ Empty query embedding, skipping comprehensive search")
+            return []
+        
+        all_results = await self._asearch_multiple_namespaces(
+            self.namespaces, query_vector, limit_per_namespace
+        )
+        return self._finish_comprehensive(all_results, limit_per_namespace)
+    
+    async def asearch_hybrid(
+        self,
+        query: str,
+        primary_namespace: Optional[str] = None,
+        limit: int = 12,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Async `search_hybrid` (the BM25 half is in-process)."""
+        primary_namespace = primary_namespace or self.default_namespace
+        lexical_results = self._start_hybrid(query, primary_namespace, limit)
+        if not lexical_results:
+            return await self.asearch_with_fallback(
+                query, primary_namespace, limit=limit, query_vector=query_vector
+            )
+        
+        query_vector = query_vector if query_vector is not None else await self._aembed_query(query)
+        dense_results: List[SearchResult] = []
+        if query_vector is not None:
+            dense_results = await self._asearch_multiple_namespaces(self.namespaces, query_vector, limit)
+        return self._finish_hybrid(dense_results, lexical_results, primary_namespace, limit)
+    
+    async def asearch(
+        self,
+        query: str,
+        strategy: SearchStrategy = SearchStrategy.FALLBACK,
+        limit: int = 12,
+        primary_namespace: Optional[str] = None,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Async `search`: dispatch to the async method for `strategy`."""
+        primary_namespace = primary_namespace or self.default_namespace
+        if strategy == SearchStrategy.HYBRID:
+            return await self.asearch_hybrid(query, primary_namespace, limit, query_vector=query_vector)
+        if strategy == SearchStrategy.COMPREHENSIVE:
+            limit_per_ns = max(1, limit // max(1, len(self.namespaces)))
+            return await self.asearch_all_namespaces(query, limit_per_ns, query_vector=query_vector)
+        if strategy == SearchStrategy.PRIMARY_ONLY:
+            query_vector = query_vector if query_vector is not None else await self._aembed_query(query)
+            if query_vector is None:
+                return []
+            self._search_stats['total_searches'] += 1
+            results = await self._asearch_single_namespace(primary_namespace, query_vector, limit)
+            return [result.to_tuple() for result in results]
+        return await self.asearch_with_fallback(query, primary_namespace, limit, query_vector=query_vector)
+    
+    async def _aembed_query(self, query: str) -> Optional[List[float]]:
+        try:
+            self._search_stats['embedding_calls'] += 1
+            return await self.store.aembed_query(query)
+        except Exception as e:
+            logging.error(f"❌ Failed to embed query: {e}")
+            return None
+    
+    async def _asearch_single_namespace(
+        self,
+        namespace: str,
+        query_vector: List[float],
+        limit: int
+    ) -> List[SearchResult]:
+        try:
+            raw_results = await self.store.asearch_by_vector(
+                namespace=namespace, query_vector=query_vector, limit=limit
+            )
+            return self._to_search_results(namespace, raw_results)
+        except Exception as e:
+            logging.error(f"❌ Failed to search namespace '{namespace}': {e}")
+            return []
+    
+    async def _asearch_multiple_namespaces(
+        self,
+        namespaces: List[str],
+        query_vector: List[float],
+        limit_per_namespace: int
+    ) -> List[SearchResult]:
+        if not namespaces:
+            return []
+        try:
+            self._search_stats['batched_requests'] += 1
+            batch = await self.store.asearch_many(namespaces, query_vector, limit=limit_per_namespace)
+        except Exception as e:
+            logging.error(f"❌ Batched namespace search failed: {e}")
+            return []
+        
+        all_results = []
+        for namespace in namespaces:
+            results = self._to_search_results(namespace, batch.get(namespace, []))
+            all_results.extend(results)
+            logging.info(f"📦 Namespace '{namespace}': {len(results)} results")
+        return all_results
+    
+    def _lexical_search_namespaces(
+        self,
+        namespaces: List[str],
+        query: str,
+        limit_per_namespace: int
+    ) -> List[SearchResult]:
+        """BM25 search over every namespace that has a lexical index."""
+        lexical_search = getattr(self.store, 'lexical_search', None)
+        if lexical_search is None:
+            return []
+        all_results = []
+        for namespace in namespaces:
+            try:
+                raw_results = lexical_search(namespace, query, limit=limit_per_namespace)
+            except Exception as e:
+                logging.error(f"❌ Lexical search failed for namespace '{namespace}': {e}")
+                continue
+            if raw_results:
+                all_results.extend(self._to_search_results(namespace, raw_results))
+        if all_results:
+            all_results.sort(key=lambda result: result.score, reverse=True)
+        return all_results
+    
+    def _embed_query(self, query: str) -> Optional[List[float]]:
+        """Embed the query exactly once per retrieval call."""
+        try:
+            self._search_stats['embedding_calls'] += 1
+            return self.store.embed_query(query)
+        except Exception as e:
+            logging.error(f"❌ Failed to embed query: {e}")
+            return None
+
+    def _to_search_results(
+        self,
+        namespace: str,
+        raw_results: List[Tuple[str, Dict[str, Any], float]]
+    ) -> List[SearchResult]:
+        # Record the source namespace on the payload (grading thresholds are per namespace)
+        return [
+            SearchResult(
+                chunk_id=chunk_id,
+                content_dict={**content_dict, 'namespace': content_dict.get('namespace', namespace)},
+                score=score,
+                namespace=content_dict.get('domain', namespace)
+            )
+            for chunk_id, content_dict, score in raw_results
+        ]
+
     def _search_single_namespace(
         self, 
         namespace: str, 
-        query: str, 
+        query_vector: List[float], 
         limit: int
     ) -> List[SearchResult]:
-        """Search a single namespace with error handling."""
+        """Search a single namespace with a precomputed vector and error handling."""
         try:
-            raw_results = self.store.search(namespace=namespace, query=query, limit=limit)
-            return [
-                SearchResult(
-                    chunk_id=chunk_id,
-                    content_dict=content_dict,
-                    score=score,
-                    namespace=content_dict.get('domain', namespace)
-                )
-                for chunk_id, content_dict, score in raw_results
-            ]
+            raw_results = self.store.search_by_vector(
+                namespace=namespace, query_vector=query_vector, limit=limit
+            )
+            return self._to_search_results(namespace, raw_results)
         except Exception as e:
             logging.error(f"❌ Failed to search namespace '{namespace}': {e}")
             return []
     
+    def _search_multiple_namespaces(
+        self, 
+        namespaces: List[str], 
+        query_vector: List[float], 
+        limit_per_namespace: int
+    ) -> List[SearchResult]:
+        """Search multiple namespaces in a single batched Qdrant request."""
+        if not namespaces:
+            return []
+        try:
+            self._search_stats['batched_requests'] += 1
+            batch = self.store.search_many(namespaces, query_vector, limit=limit_per_namespace)
+        except Exception as e:
+            logging.error(f"❌ Batched namespace search failed, using concurrent searches: {e}")
+            return self._search_multiple_namespaces_concurrent(
+                namespaces, query_vector, limit_per_namespace
+            )
+        
+        all_results = []
+        for namespace in namespaces:
+            results = self._to_search_results(namespace, batch.get(namespace, []))
+            all_results.extend(results)
+            logging.info(f"📦 Namespace '{namespace}': {len(results)} results")
+        return all_results
+    
     def _search_multiple_namespaces_concurrent(
         self, 
         namespaces: List[str], 
-        query: str, 
+        query_vector: List[float], 
         limit_per_namespace: int
     ) -> List[SearchResult]:
-        """Search multiple namespaces concurrently for better performance."""
+        """Search multiple namespaces concurrently (fallback when batching fails)."""
         all_results = []
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
             # Submit all search tasks
             future_to_namespace = {
-                executor.submit(self._search_single_namespace, ns, query, limit_per_namespace): ns
+                executor.submit(self._search_single_namespace, ns, query_vector, limit_per_namespace): ns
                 for ns in namespaces
             }
             
@@ -185,7 +523,7 @@ class MultiNamespaceRetriever:
                 try:
                     results = future.result(timeout=10)  # 10s timeout per namespace
                     all_results.extend(results)
-                    logging.info(f"� Namespace '{namespace}': {len(results)} results")
+                    logging.info(f"📦 Namespace '{namespace}': {len(results)} results")
                 except Exception as e:
                     logging.error(f"❌ Timeout/error in namespace '{namespace}': {e}")
         
@@ -250,11 +588,19 @@ class MultiNamespaceRetriever:
     def _rerank_results(
         self, 
         results: List[SearchResult], 
-        primary_namespace: str
+        primary_namespace: str,
+        lexical_results: Optional[List[SearchResult]] = None
     ) -> List[SearchResult]:
         """
         Advanced re-ranking with namespace preference and score normalization.
+
+        When `lexical_results` (BM25, best first) are given, dense and lexical
+        rankings are fused with reciprocal-rank fusion:
+        score = sum(1 / (rrf_k + rank)) over both lists, with the same 5% primary
+        namespace preference as the dense-only path.
         """
+        if lexical_results:
+            return self._fuse_reciprocal_rank(results, lexical_results, primary_namespace)
         if not results:
             return results
         
@@ -278,6 +624,37 @@ class MultiNamespaceRetriever:
         
         return ranked_results
     
+    def _fuse_reciprocal_rank(
+        self,
+        dense_results: List[SearchResult],
+        lexical_results: List[SearchResult],
+        primary_namespace: str
+    ) -> List[SearchResult]:
+        """Reciprocal-rank fusion of a dense and a lexical ranking."""
+        fused: Dict[Tuple[str, str], SearchResult] = {}
+        fused_scores: Dict[Tuple[str, str], float] = {}
+        
+        dense_ranked = sorted(dense_results, key=lambda result: result.score, reverse=True)
+        for ranking in (dense_ranked, lexical_results):
+            for rank, result in enumerate(ranking, start=1):
+                doc_key = (result.namespace, result.chunk_id)
+                fused_scores[doc_key] = fused_scores.get(doc_key, 0.0) + 1.0 / (self.rrf_k + rank)
+                # Keep the dense hit when both lists contain the chunk (its score is a cosine)
+                fused.setdefault(doc_key, result)
+        
+        for doc_key, result in fused.items():
+            boost = 1.05 if result.namespace == primary_namespace else 1.0
+            result.fused_score = fused_scores[doc_key] * boost
+        
+        # Lexical-only hits carry a BM25 score; don't expose it as a similarity
+        dense_keys = {(result.namespace, result.chunk_id) for result in dense_results}
+        for doc_key, result in fused.items():
+            if doc_key not in dense_keys:
+                result.score = 0.0
+                result.content_dict = {**result.content_dict, 'retrieval': 'lexical'}
+        
+        return sorted(fused.values(), key=lambda result: result.fused_score, reverse=True)
+    
     def get_search_stats(self) -> Dict[str, Any]:
         """Get performance statistics for monitoring."""
         return {
@@ -291,5 +668,9 @@ class MultiNamespaceRetriever:
         self._search_stats = {
             'total_searches': 0,
             'fallback_triggered': 0,
-            'deduplication_removed': 0
+            'deduplication_removed': 0,
+            'embedding_calls': 0,
+            'batched_requests': 0,
+            'hybrid_searches': 0,
+            'lexical_hits': 0
         }
@@ -0,0 +1,198 @@
+"""
+Speculative retrieval while the LLM router is deciding.
+
+Most turns that reach the LLM router end up on `vectorstore`, so the first
+retrieve (query embedding + Qdrant/hybrid search) is started in a worker thread
+(or as an event-loop task on the async graph path) as soon as the router call
+begins. If the router picks `vectorstore` the result
+is handed to the retrieve node; for any other route it is discarded.
+
+Enabled per domain with the `speculative_retrieval` key of the domain config;
+SPECULATIVE_RETRIEVAL_ENABLED=false turns it off everywhere. Hit rate, saved
+latency and wasted retrieval time are exposed on /health/speculative-retrieval.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpeculativeRetrievalConfig:
+    """Cấu hình speculative retrieval"""
+    enabled: bool = env_field("SPECULATIVE_RETRIEVAL_ENABLED", True)
+    max_workers: int = env_field("SPECULATIVE_RETRIEVAL_WORKERS", 4)
+    # Upper bound on how long a routed turn waits for an in-flight speculation
+    wait_timeout: float = env_field("SPECULATIVE_RETRIEVAL_TIMEOUT", 15.0)
+
+
+class Speculation:
+    """Handle on one in-flight speculative retrieval."""
+
+    def __init__(self, future: Union[concurrent.futures.Future, asyncio.Task], started_at: float):
+        self.future = future
+        self.started_at = started_at
+        self.finished_at: Optional[float] = None
+        future.add_done_callback(self._mark_finished)
+
+    def _mark_finished(self, _future: Any) -> None:
+        self.finished_at = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+
+class SpeculativeRetriever:
+    """Runs retrieval speculatively and accounts for hits and wasted work."""
+
+    def __init__(self, config: Optional[SpeculativeRetrievalConfig] = None, enabled: bool = True):
+        self.config = config or SpeculativeRetrievalConfig()
+        self.enabled = self.config.enabled and enabled
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "started": 0,
+            "hits": 0,
+            "discarded": 0,
+            "cancelled": 0,
+            "failed": 0,
+            "saved_seconds": 0.0,
+            "wasted_seconds": 0.0,
+        }
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.config.max_workers,
+                        thread_name_prefix="speculative-retrieve",
+                    )
+        return self._executor
+
+    def _add(self, key: str, value: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += value
+
+    def start(self, fn: Callable[..., Any], *args: Any) -> Optional[Speculation]:
+        """Submit `fn(*args)`; returns None when speculation is disabled."""
+        if not self.enabled:
+            return None
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except RuntimeError as e:  # executor shut down
+            logger.warning(f"⚠️ Speculative retrieval not started: {e}")
+            return None
+        self._add("started")
+        return Speculation(future, time.perf_counter())
+
+    def astart(self, fn: Callable[..., Awaitable[Any]], *args: Any) -> Optional[Speculation]:
+        """Async `start`: runs `fn(*args)` as a task on the running event loop."""
+        if not self.enabled:
+            return None
+        self._add("started")
+        return Speculation(asyncio.ensure_future(fn(*args)), time.perf_counter())
+
+    def take(self, speculation: Optional[Speculation], decided_at: Optional[float] = None) -> Optional[Any]:
+        """
+        Result of a speculation the router confirmed, or None if it failed.
+
+        `decided_at` is when routing finished; retrieval time that overlapped the
+        router call is counted as saved latency.
+        """
+        if speculation is None:
+            return None
+        decided_at = decided_at or time.perf_counter()
+        try:
+            result = speculation.future.result(timeout=self.config.wait_timeout)
+        except Exception as e:  # noqa: BLE001
+            self._add("failed")
+            logger.warning(f"⚠️ Speculative retrieval failed, retrieving normally: {e}")
+            return None
+        return self._record_hit(speculation, decided_at, result)
+
+    async def atake(self, speculation: Optional[Speculation], decided_at: Optional[float] = None) -> Optional[Any]:
+        """Async `take` for speculations started with `astart`."""
+        if speculation is None:
+            return None
+        decided_at = decided_at or time.perf_counter()
+        try:
+            result = await asyncio.wait_for(speculation.future, timeout=self.config.wait_timeout)
+        except Exception as e:  # noqa: BLE001
+            self._add("failed")
+            logger.warning(f"⚠️ Speculative retrieval failed, retrieving normally: {e}")
+            return None
+        return self._record_hit(speculation, decided_at, result)
+
+    def _record_hit(self, speculation: Speculation, decided_at: float, result: Any) -> Any:
+        overlap = min(speculation.elapsed, max(0.0, decided_at - speculation.started_at))
+        self._add("hits")
+        self._add("saved_seconds", overlap)
+        logger.info(f"🎯 Speculative retrieval hit ({overlap * 1000:.0f}ms overlapped with routing)")
+        return result
+
+    def discard(self, speculation: Optional[Speculation]) -> None:
+        """Drop a speculation for a non-vectorstore route; its runtime counts as wasted."""
+        if speculation is None:
+            return
+        self._add("discarded")
+        if isinstance(speculation.future, asyncio.Future):
+            # Tasks stop at their next await; the time already spent is wasted
+            if not speculation.future.done():
+                speculation.future.cancel()
+                self._add("cancelled")
+            self._add("wasted_seconds", speculation.elapsed)
+            return
+        if speculation.future.cancel():
+            self._add("cancelled")
+            return
+        # Already running: account for the work once it finishes
+        speculation.future.add_done_callback(
+            lambda _f: self._add("wasted_seconds", speculation.elapsed)
+        )
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        resolved = stats["hits"] + stats["discarded"] + stats["failed"]
+        stats["hit_rate"] = round(stats["hits"] / resolved, 4) if resolved else None
+        stats["saved_seconds"] = round(stats["saved_seconds"], 3)
+        stats["wasted_seconds"] = round(stats["wasted_seconds"], 3)
+        stats["enabled"] = self.enabled
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            for k in self._stats:
+                self._stats[k] = 0.0 if k.endswith("_seconds") else 0
+
+
+def is_enabled_for_domain(domain: Dict[str, Any]) -> bool:
+    """Per-domain switch (`speculative_retrieval` key, default off)."""
+    return bool(domain.get("speculative_retrieval", False))
+
+
+_speculative_retriever: Optional[SpeculativeRetriever] = None
+
+
+def set_speculative_retriever(speculative: SpeculativeRetriever) -> None:
+    """Register the graph's speculative retriever so health checks can read its stats."""
+    global _speculative_retriever
+    _speculative_retriever = speculative
+
+
+def get_speculative_retriever() -> Optional[SpeculativeRetriever]:
+    return _speculative_retriever
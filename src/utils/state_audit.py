@@ -0,0 +1,213 @@
+"""
+State-update audit for graph nodes (debug mode).
+
+Every key a node returns goes through its channel's reducer and into the
+write set of the super-step checkpoint, even when the value did not change.
+Nodes that echoed the whole state back (`{**state, **updates}`) made every
+channel - messages, dialog_state, reasoning_steps... - churn on each turn.
+
+Nodes return only the keys they change (`changed_channels`). With
+STATE_AUDIT_ENABLED=true the graph wraps each node with `StateUpdateAudit`,
+which per node:
+
+- flags channels written with a value that leaves the channel unchanged,
+- times the reducers applied to the node's update,
+- measures the serialized bytes the update adds to the checkpoint.
+
+Numbers are exposed at /health/state-audit. The audit applies every reducer
+a second time and serializes every update, so keep it off in production.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, get_type_hints
+
+from src.core.config import env_field
+
+logger = logging.getLogger(__name__)
+
+Reducer = Callable[[Any, Any], Any]
+
+
+@dataclass
+class StateAuditConfig:
+    """Cấu hình audit cập nhật state của node"""
+    enabled: bool = env_field("STATE_AUDIT_ENABLED", False)
+    # Log every unchanged write (the counters are kept either way)
+    log_unchanged: bool = env_field("STATE_AUDIT_LOG_UNCHANGED", True)
+
+
+def _same(old: Any, new: Any) -> bool:
+    if old is new:
+        return True
+    try:
+        return bool(old == new)
+    except Exception:  # noqa: BLE001
+        return False
+
+
+def changed_channels(
+    state: Mapping[str, Any],
+    updates: Mapping[str, Any],
+    reducer_channels: Iterable[str] = (),
+) -> Dict[str, Any]:
+    """
+    Keep only updates that change their (last-value) channel.
+
+    Updates to `reducer_channels` (see `channel_reducers`) are kept as they are:
+    the reducer appends or resets rather than replaces, so comparing the update
+    with the current value says nothing about its effect.
+    """
+    reducer_channels = set(reducer_channels)
+    return {
+        k: v for k, v in updates.items()
+        if k in reducer_channels or k not in state or not _same(state[k], v)
+    }
+
+
+def channel_reducers(schema: Any) -> Dict[str, Reducer]:
+    """Reducers declared on a state schema as `Annotated[type, reducer]`."""
+    try:
+        hints = get_type_hints(schema, include_extras=True)
+    except Exception as e:  # noqa: BLE001
+        logger.debug(f"State audit: cannot resolve hints of {schema}: {e}")
+        hints = getattr(schema, "__annotations__", {})
+    reducers = {}
+    for channel, hint in hints.items():
+        for meta in reversed(getattr(hint, "__metadata__", ())):
+            if callable(meta):
+                reducers[channel] = meta
+                break
+    return reducers
+
+
+class StateUpdateAudit:
+    """Wraps graph nodes and records what their updates cost."""
+
+    def __init__(self, schema: Any = None, config: Optional[StateAuditConfig] = None, serde: Any = None):
+        self.config = config or StateAuditConfig()
+        self.reducers = channel_reducers(schema) if schema is not None else {}
+        self._serde = serde
+        self._lock = threading.Lock()
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def serde(self) -> Any:
+        if self._serde is None:
+            from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+            self._serde = JsonPlusSerializer()
+        return self._serde
+
+    def _size(self, value: Any) -> int:
+        try:
+            return len(self.serde.dumps_typed(value)[1])
+        except Exception as e:  # noqa: BLE001
+            logger.debug(f"State audit: cannot serialize update value: {e}")
+            return 0
+
+    def record(self, node: str, state: Mapping[str, Any], update: Any) -> Dict[str, Any]:
+        """Audit one node update against the state the node was given."""
+        report = {"unchanged": [], "reducer_ms": 0.0, "bytes": 0}
+        if not isinstance(update, dict) or not isinstance(state, Mapping):
+            return report
+        for channel, value in update.items():
+            old = state.get(channel)
+            reducer = self.reducers.get(channel)
+            if reducer is not None:
+                started = time.perf_counter()
+                try:
+                    merged = reducer(old if old is not None else [], value)
+                except Exception as e:  # noqa: BLE001
+                    logger.debug(f"State audit: reducer of {channel} failed: {e}")
+                    merged = value
+                report["reducer_ms"] += (time.perf_counter() - started) * 1000
+                unchanged = channel in state and _same(old, merged)
+            else:
+                unchanged = channel in state and _same(old, value)
+            if unchanged:
+                report["unchanged"].append(channel)
+            report["bytes"] += self._size(value)
+
+        with self._lock:
+            stats = self._nodes.setdefault(node, {
+                "calls": 0,
+                "writes": 0,
+                "unchanged_writes": 0,
+                "unchanged_channels": {},
+                "reducer_ms": 0.0,
+                "update_bytes": 0,
+                "max_update_bytes": 0,
+            })
+            stats["calls"] += 1
+            stats["writes"] += len(update)
+            stats["unchanged_writes"] += len(report["unchanged"])
+            for channel in report["unchanged"]:
+                stats["unchanged_channels"][channel] = stats["unchanged_channels"].get(channel, 0) + 1
+            stats["reducer_ms"] += report["reducer_ms"]
+            stats["update_bytes"] += report["bytes"]
+            stats["max_update_bytes"] = max(stats["max_update_bytes"], report["bytes"])
+
+        if report["unchanged"] and self.config.log_unchanged:
+            logger.warning(f"⚠️ Node {node} wrote unchanged channels: {report['unchanged']}")
+        return report
+
+    def wrap(self, func: Callable[..., Any], name: Optional[str] = None) -> Callable[..., Any]:
+        """Sync node wrapper; returns `func` itself when the audit is off."""
+        if not self.config.enabled:
+            return func
+        node_name = name or getattr(func, "__name__", "node")
+
+        def node(state, config=None):
+            update = func(state, config)
+            self.record(node_name, state, update)
+            return update
+        node.__name__ = node_name
+        return node
+
+    def awrap(self, afunc: Callable[..., Any], name: Optional[str] = None) -> Callable[..., Any]:
+        if not self.config.enabled:
+            return afunc
+        node_name = name or getattr(afunc, "__name__", "anode")
+
+        async def anode(state, config=None):
+            update = await afunc(state, config)
+            self.record(node_name, state, update)
+            return update
+        anode.__name__ = node_name
+        return anode
+
+    # --- Monitoring -------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            nodes = {
+                node: {
+                    **stats,
+                    "unchanged_channels": dict(stats["unchanged_channels"]),
+                    "reducer_ms": round(stats["reducer_ms"], 3),
+                    "avg_update_bytes": stats["update_bytes"] // stats["calls"] if stats["calls"] else 0,
+                }
+                for node, stats in self._nodes.items()
+            }
+        return {"enabled": self.config.enabled, "nodes": nodes}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._nodes.clear()
+
+
+_state_audit: Optional[StateUpdateAudit] = None
+
+
+def set_state_audit(audit: StateUpdateAudit) -> None:
+    """Register the graph's audit so health checks can read its stats."""
+    global _state_audit
+    _state_audit = audit
+
+
+def get_state_audit() -> Optional[StateUpdateAudit]:
+    return _state_audit
@@ -1,6 +1,24 @@
+import dataclasses
+
 import pytest
 
 
 @pytest.fixture(scope="session")
 def anyio_backend():
     return "asyncio"
+
+
+@pytest.fixture
+def make_config(monkeypatch):
+    """
+    Build a config dataclass from `defaults` plus keyword overrides.
+
+    The environment variables behind its `env_field`s are cleared first, so a
+    developer's .env cannot leak into the test.
+    """
+    def make(cls, defaults=None, **overrides):
+        for f in dataclasses.fields(cls):
+            for var in f.metadata.get("env", ()):
+                monkeypatch.delenv(var, raising=False)
+        return cls(**{**(defaults or {}), **overrides})
+    return make
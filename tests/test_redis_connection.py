@@ -32,7 +32,7 @@ async def main():
         else:
             print(info)
 
-        queue.close()
+        await queue.close()
         return 0
 
     except Exception as e:
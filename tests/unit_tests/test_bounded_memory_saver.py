@@ -0,0 +1,83 @@
+from dataclasses import replace
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+from src.database.bounded_memory_saver import BoundedMemoryConfig, BoundedMemorySaver
+
+
+@pytest.fixture
+def saver(make_config, tmp_path):
+    config = make_config(
+        BoundedMemoryConfig,
+        dict(
+            max_threads=2,
+            idle_ttl=3600,
+            keep_checkpoints=3,
+            spill_path=str(tmp_path / "spill.sqlite3"),
+            sweep_interval=0,
+        ),
+    )
+    return BoundedMemorySaver(config)
+
+
+def _put(saver, thread_id, steps, config=None):
+    config = config or {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    for _ in range(steps):
+        current = saver.get_tuple(config)
+        version = saver.get_next_version(
+            current.checkpoint["channel_versions"].get("messages") if current else None, None
+        )
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": [f"{thread_id}-{version}"]}
+        checkpoint["channel_versions"] = {"messages": version}
+        config = saver.put(config, checkpoint, {}, {"messages": version})
+    return config
+
+
+class TestBoundedMemorySaver:
+
+    def test_prunes_history_and_unreferenced_blobs(self, saver):
+        _put(saver, "t1", 6)
+        assert len(list(saver.list({"configurable": {"thread_id": "t1"}}))) == 3
+        assert len(saver.blobs) == 3
+        assert saver.get_stats()["pruned_checkpoints"] == 3
+
+    def test_lru_eviction_spills_and_reloads(self, saver):
+        config = _put(saver, "a", 2)
+        expected = saver.get_tuple(config).checkpoint["channel_values"]
+        _put(saver, "b", 1)
+        _put(saver, "c", 1)
+
+        stats = saver.get_stats()
+        assert stats["resident_threads"] == 2 and stats["spilled_threads"] == 1
+        assert "a" not in saver.storage
+
+        reloaded = saver.get_tuple({"configurable": {"thread_id": "a", "checkpoint_ns": ""}})
+        assert reloaded.checkpoint["channel_values"] == expected
+        assert saver.get_stats()["reloads"] == 1
+        # Writing to a reloaded thread keeps its history chain
+        assert _put(saver, "a", 1, reloaded.config)
+        assert len(list(saver.list({"configurable": {"thread_id": "a"}}))) == 3
+
+    def test_idle_threads_evicted(self, saver):
+        saver = BoundedMemorySaver(replace(saver.config, max_threads=10, idle_ttl=0))
+        _put(saver, "a", 1)
+        _put(saver, "b", 1)
+        # With a zero TTL every sweep evicts all idle threads
+        assert saver.get_stats()["resident_threads"] <= 1
+
+    def test_dropped_without_spill_path(self, saver):
+        saver = BoundedMemorySaver(replace(saver.config, max_threads=1, spill_path=""))
+        _put(saver, "a", 1)
+        _put(saver, "b", 1)
+        assert saver.get_stats()["dropped"] == 1
+        assert saver.get_tuple({"configurable": {"thread_id": "a", "checkpoint_ns": ""}}) is None
+
+    def test_reports_resident_bytes(self, saver):
+        config = _put(saver, "a", 1)
+        before = saver.get_stats()["resident_bytes"]
+        saver.put_writes(config, [("messages", "x" * 1000)], "task-1")
+        assert saver.get_stats()["resident_bytes"] >= before + 1000
+        saver.delete_thread("a")
+        assert saver.get_stats()["resident_bytes"] == 0
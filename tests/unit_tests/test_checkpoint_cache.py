@@ -0,0 +1,223 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.database import checkpointer
+from src.database.checkpoint_cache import CheckpointCacheConfig, WriteBackCheckpointSaver
+
+
+@pytest.fixture
+def saver(make_config):
+    config = make_config(
+        CheckpointCacheConfig, dict(max_threads=10, write_back=True, flush_interval=60, max_pending_threads=100)
+    )
+    return WriteBackCheckpointSaver(MemorySaver(), config=config, start_flusher=False)
+
+
+class FailingSaver(MemorySaver):
+    """Fails the first put; `on_fail` runs first (e.g. a put racing the flush)."""
+
+    def __init__(self, on_fail=None):
+        super().__init__()
+        self.on_fail = on_fail
+        self.failures = 0
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        if self.failures == 0:
+            self.failures += 1
+            if self.on_fail:
+                self.on_fail()
+            raise ConnectionError("database unavailable")
+        return super().put(config, checkpoint, metadata, new_versions)
+
+
+def _latest_id(inner):
+    def latest_id(thread_id, checkpoint_ns):
+        latest = inner.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}})
+        return latest.checkpoint["id"] if latest else None
+    return latest_id
+
+
+def _put_step(saver, config, step, values, versions):
+    checkpoint = empty_checkpoint()
+    # Like Pregel, each checkpoint carries every channel, not just the changed ones
+    values.update({"messages": [f"m{step}"], f"step{step}": step})
+    versions.update({"messages": step + 1, f"step{step}": step + 1})
+    checkpoint["channel_values"] = dict(values)
+    checkpoint["channel_versions"] = dict(versions)
+    config = saver.put(config, checkpoint, {"step": step}, {"messages": step + 1, f"step{step}": step + 1})
+    return config, checkpoint
+
+
+def _put_chain(saver, thread_id, steps):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    checkpoints = []
+    values, versions = {}, {}
+    for step in range(steps):
+        config, checkpoint = _put_step(saver, config, step, values, versions)
+        checkpoints.append(checkpoint)
+    return config, checkpoints
+
+
+class TestWriteBackCheckpointSaver:
+
+    def test_coalesces_puts_until_flush(self, saver):
+        config, checkpoints = _put_chain(saver, "t1", 3)
+        assert list(saver.saver.list(None)) == []
+
+        assert saver.flush() == 1
+        persisted = list(saver.saver.list({"configurable": {"thread_id": "t1"}}))
+        assert len(persisted) == 1
+        assert persisted[0].checkpoint["id"] == checkpoints[-1]["id"]
+        # Every channel changed inside the flush window was written
+        assert set(persisted[0].checkpoint["channel_values"]) == {"messages", "step0", "step1", "step2"}
+        stats = saver.get_stats()
+        assert stats["puts"] == 3 and stats["coalesced"] == 2 and stats["flushed_checkpoints"] == 1
+
+    def test_latest_read_served_from_cache(self, saver):
+        config, checkpoints = _put_chain(saver, "t1", 2)
+        checkpoint_tuple = saver.get_tuple({"configurable": {"thread_id": "t1", "checkpoint_ns": ""}})
+        assert checkpoint_tuple.checkpoint["id"] == checkpoints[-1]["id"]
+        assert saver.get_stats()["cache_hits"] == 1
+
+    def test_parent_is_last_persisted_checkpoint(self, saver):
+        _put_chain(saver, "t1", 1)
+        saver.flush()
+        first_id = saver.get_tuple({"configurable": {"thread_id": "t1"}}).checkpoint["id"]
+        config = saver.get_tuple({"configurable": {"thread_id": "t1"}}).config
+        for step in range(2):
+            checkpoint = empty_checkpoint()
+            config = saver.put(config, checkpoint, {"step": step + 1}, {})
+        saver.flush()
+        latest = saver.saver.get_tuple({"configurable": {"thread_id": "t1", "checkpoint_ns": ""}})
+        assert latest.parent_config["configurable"]["checkpoint_id"] == first_id
+
+    def test_pending_writes_are_flushed_with_checkpoint(self, saver):
+        config, _ = _put_chain(saver, "t1", 1)
+        saver.put_writes(config, [("messages", "hi")], "task-1")
+        assert saver.get_tuple(config).pending_writes == [("task-1", "messages", "hi")]
+        saver.flush()
+        assert saver.saver.get_tuple(config).pending_writes == [("task-1", "messages", "hi")]
+
+    def test_lru_bounds_cached_threads(self, saver):
+        saver = WriteBackCheckpointSaver(
+            MemorySaver(), config=replace(saver.config, max_threads=2, write_back=False), start_flusher=False
+        )
+        for thread_id in ("a", "b", "c"):
+            _put_chain(saver, thread_id, 1)
+        stats = saver.get_stats()
+        assert stats["cached_threads"] == 2 and stats["evictions"] == 1
+        # Evicted thread is read back from the inner saver
+        assert saver.get_tuple({"configurable": {"thread_id": "a", "checkpoint_ns": ""}}) is not None
+        assert saver.get_stats()["cache_misses"] == 1
+
+    def test_async_put_and_get(self, saver):
+        async def run():
+            config = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+            checkpoint = empty_checkpoint()
+            config = await saver.aput(config, checkpoint, {}, {})
+            return config, await saver.aget_tuple(config)
+
+        config, checkpoint_tuple = asyncio.run(run())
+        assert checkpoint_tuple.config == config
+        saver.flush()
+        assert saver.saver.get_tuple(config) is not None
+
+    def test_failed_flush_merges_into_newer_pending_checkpoint(self, saver):
+        state = {"values": {}, "versions": {}, "config": None}
+        inner = FailingSaver()
+        saver = WriteBackCheckpointSaver(inner, config=saver.config, start_flusher=False)
+
+        def put_next():
+            state["config"], _ = _put_step(saver, state["config"], 1, state["values"], state["versions"])
+        inner.on_fail = put_next
+
+        state["config"] = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+        state["config"], _ = _put_step(saver, state["config"], 0, state["values"], state["versions"])
+        # The flush fails while checkpoint 1 (child of the unflushed 0) is buffered
+        assert saver.flush() == 0
+        assert saver.get_stats()["pending_threads"] == 1
+        assert saver.flush() == 1
+
+        persisted = list(inner.list({"configurable": {"thread_id": "t1"}}))
+        assert len(persisted) == 1 and persisted[0].parent_config is None
+        # step0 was only changed by the failed checkpoint; its blob is still written
+        assert persisted[0].checkpoint["channel_values"] == {"messages": ["m1"], "step0": 0, "step1": 1}
+        assert saver.get_tuple(state["config"]).parent_config is None
+        assert saver.get_stats()["flush_errors"] == 1
+
+    def test_failed_flush_is_retried(self, saver):
+        inner = FailingSaver()
+        saver = WriteBackCheckpointSaver(inner, config=saver.config, start_flusher=False)
+        config, checkpoints = _put_chain(saver, "t1", 2)
+        assert saver.flush() == 0 and saver.flush() == 1
+        assert inner.get_tuple(config).checkpoint["id"] == checkpoints[-1]["id"]
+
+    def test_write_through_by_default(self, make_config):
+        assert make_config(CheckpointCacheConfig).write_back is False
+
+    def test_cached_latest_checked_against_other_workers_writes(self, saver):
+        inner = MemorySaver()
+        config = replace(saver.config, write_back=False)
+        worker_a = WriteBackCheckpointSaver(inner, config=config, start_flusher=False, latest_id=_latest_id(inner))
+        worker_b = WriteBackCheckpointSaver(inner, config=config, start_flusher=False, latest_id=_latest_id(inner))
+        thread = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+
+        _put_chain(worker_a, "t1", 1)
+        assert worker_a.get_tuple(thread) is not None and worker_a.get_stats()["cache_hits"] == 1
+        # Worker B handles the next turn of the same thread
+        _, checkpoints = _put_chain(worker_b, "t1", 2)
+
+        assert worker_a.get_tuple(thread).checkpoint["id"] == checkpoints[-1]["id"]
+        stats = worker_a.get_stats()
+        assert stats["stale_reads"] == 1 and stats["cache_misses"] == 1
+        # Re-cached and current again
+        assert worker_a.get_tuple(thread).checkpoint["id"] == checkpoints[-1]["id"]
+        assert worker_a.get_stats()["cache_hits"] == 2
+
+    def test_async_read_checked_and_check_failure_falls_back_to_saver(self, saver):
+        inner = MemorySaver()
+
+        async def alatest_id(thread_id, checkpoint_ns):
+            raise ConnectionError("pool exhausted")
+
+        config = replace(saver.config, write_back=False)
+        saver = WriteBackCheckpointSaver(inner, config=config, start_flusher=False, alatest_id=alatest_id)
+        config, checkpoints = _put_chain(saver, "t1", 1)
+        checkpoint_tuple = asyncio.run(saver.aget_tuple({"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}))
+        assert checkpoint_tuple.checkpoint["id"] == checkpoints[-1]["id"]
+        stats = saver.get_stats()
+        assert stats["validation_errors"] == 1 and stats["cache_misses"] == 1
+
+
+class FakePool:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncPool(FakePool):
+    async def close(self):
+        self.closed = True
+
+
+class TestCloseCheckpointer:
+
+    def test_shutdown_flushes_pending_and_closes_both_pools(self, saver, monkeypatch):
+        config, checkpoints = _put_chain(saver, "t1", 2)
+        pool, async_pool = FakePool(), FakeAsyncPool()
+        monkeypatch.setattr(checkpointer, "_checkpointer", saver)
+        monkeypatch.setattr(checkpointer, "_pool", pool)
+        monkeypatch.setattr(checkpointer, "_async_pool", async_pool)
+
+        asyncio.run(checkpointer.close_checkpointer())
+
+        assert saver.saver.get_tuple(config).checkpoint["id"] == checkpoints[-1]["id"]
+        assert pool.closed and async_pool.closed
+        assert checkpointer._pool is None and checkpointer._async_pool is None
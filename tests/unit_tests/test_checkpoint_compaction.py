@@ -0,0 +1,93 @@
+from datetime import date
+
+import pytest
+
+from src.database.checkpoint_compaction import (
+    CheckpointCompactionConfig,
+    CheckpointCompactor,
+    archive_ddl,
+    delete_sql,
+)
+
+
+class _Result:
+    def __init__(self, rows=(), rowcount=0):
+        self.rows = list(rows)
+        self.rowcount = rowcount
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    """Records SQL; answers the lock, candidate and boundary queries."""
+
+    def __init__(self, locked=True, delete_rows=None):
+        self.locked = locked
+        self.delete_rows = delete_rows or {}
+        self.statements = []
+        self.closed = False
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        if "pg_try_advisory_lock" in sql:
+            return _Result([{"locked": self.locked}])
+        if "HAVING count(*)" in sql:
+            return _Result([{"thread_id": "t1", "checkpoint_ns": "", "checkpoints": 30}])
+        if "AS cutoff" in sql:
+            return _Result([{"cutoff": "c10", "parent": "c28"}])
+        if sql.startswith("SELECT count(*) AS n"):
+            return _Result([{"n": 3}])
+        for table, counts in self.delete_rows.items():
+            if f"DELETE FROM {table} " in sql:
+                return _Result(rowcount=counts.pop(0) if counts else 0)
+        return _Result()
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def config(make_config):
+    return make_config(
+        CheckpointCompactionConfig,
+        dict(keep=20, batch_size=2, batch_pause=0, archive=False, dry_run=False),
+    )
+
+
+class TestCheckpointCompactor:
+
+    def test_dry_run_only_counts(self, config):
+        conn = FakeConnection()
+        report = CheckpointCompactor(config, connect=lambda: conn).run(dry_run=True)
+        assert report["dry_run"] and report["threads"] == 1
+        assert (report["checkpoints"], report["writes"], report["blobs"]) == (3, 3, 3)
+        assert not any("DELETE" in s for s in conn.statements)
+        assert conn.closed
+
+    def test_deletes_in_batches_checkpoints_last(self, config):
+        conn = FakeConnection(delete_rows={
+            "checkpoint_writes": [2, 2, 1], "checkpoint_blobs": [1], "checkpoints": [2, 0],
+        })
+        report = CheckpointCompactor(config, connect=lambda: conn).run()
+        assert (report["writes"], report["blobs"], report["checkpoints"]) == (5, 1, 2)
+        deletes = [s.split()[2] for s in conn.statements if s.startswith("DELETE")]
+        assert deletes == ["checkpoint_writes"] * 3 + ["checkpoint_blobs"] + ["checkpoints"] * 2
+        assert "pg_advisory_unlock" in conn.statements[-1]
+
+    def test_skips_when_another_worker_holds_the_lock(self, config):
+        conn = FakeConnection(locked=False)
+        compactor = CheckpointCompactor(config, connect=lambda: conn)
+        assert compactor.run()["locked"] is False
+        assert compactor.get_stats()["skipped_runs"] == 1
+        assert len(conn.statements) == 1
+
+    def test_archive_moves_rows_into_monthly_partitions(self):
+        assert delete_sql("checkpoints", archive=True).endswith("INSERT INTO checkpoints_archive SELECT * FROM moved")
+        ddl = archive_ddl("checkpoint_blobs", today=date(2026, 12, 5))
+        assert "PARTITION BY RANGE (archived_at)" in ddl[0]
+        assert "checkpoint_blobs_archive_202612" in ddl[1] and "('2026-12-01') TO ('2027-01-01')" in ddl[1]
+        assert "checkpoint_blobs_archive_202701" in ddl[2]
@@ -0,0 +1,50 @@
+from dataclasses import replace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.database.checkpoint_serde import CheckpointSerdeConfig, CompressedSerializer
+
+
+@pytest.fixture
+def serde(make_config):
+    config = make_config(CheckpointSerdeConfig, dict(compression="zstd", threshold=256, level=3))
+    return CompressedSerializer(JsonPlusSerializer(), config)
+
+
+MESSAGES = [HumanMessage(content="Cho em đặt bàn 4 người tối nay"), AIMessage(content="Dạ vâng ạ. " * 200)]
+
+
+class TestCompressedSerializer:
+
+    def test_large_values_compressed_and_round_trip(self, serde):
+        type_, data = serde.dumps_typed(MESSAGES)
+        assert type_ == "msgpack+zstd"
+        assert len(data) < len(JsonPlusSerializer().dumps_typed(MESSAGES)[1])
+        assert serde.loads_typed((type_, data)) == MESSAGES
+
+    def test_small_values_stored_raw(self, serde):
+        assert serde.dumps_typed("ok") == JsonPlusSerializer().dumps_typed("ok")
+        assert serde.get_stats()["compressed"] == 0
+
+    def test_reads_rows_written_before_and_after_toggling(self, serde):
+        plain = JsonPlusSerializer().dumps_typed(MESSAGES)
+        assert serde.loads_typed(plain) == MESSAGES
+        compressed = serde.dumps_typed(MESSAGES)
+        uncompressed = CompressedSerializer(JsonPlusSerializer(), replace(serde.config, compression="none"))
+        assert uncompressed.loads_typed(compressed) == MESSAGES
+
+    def test_works_as_checkpointer_serde(self, serde):
+        saver = InMemorySaver(serde=serde)
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": MESSAGES}
+        checkpoint["channel_versions"] = {"messages": 1}
+        config = saver.put({"configurable": {"thread_id": "t", "checkpoint_ns": ""}}, checkpoint, {}, {"messages": 1})
+        assert saver.get_tuple(config).checkpoint["channel_values"]["messages"] == MESSAGES
+
+    def test_unknown_compression_fails_at_startup(self, serde):
+        with pytest.raises(ValueError, match="CHECKPOINT_COMPRESSION"):
+            CompressedSerializer(JsonPlusSerializer(), replace(serde.config, compression="lz4"))
@@ -0,0 +1,212 @@
+import asyncio
+from typing import Annotated, Optional, TypedDict
+
+import pytest
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+
+from src.utils.conversation_memory import (
+    MEMORY_NODE,
+    RELEASE_LOCK_SCRIPT,
+    ConversationMemory,
+    ConversationMemoryConfig,
+    TokenCounter,
+    memory_summary_node,
+)
+
+
+class CountingFn:
+    """One token per character; records how many messages were counted."""
+
+    def __init__(self):
+        self.counted = 0
+
+    def __call__(self, messages):
+        self.counted += len(messages)
+        return sum(len(m.content) for m in messages)
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        self.prompts.append(messages[0].content)
+        return AIMessage(content=f"summary {len(self.prompts)}")
+
+
+class FakeRedis:
+    """SET NX PX and the lock release script."""
+
+    def __init__(self):
+        self.strings = {}
+        self.fail = False
+
+    async def set(self, key, value, nx=False, px=None):
+        if self.fail:
+            raise ConnectionError("redis down")
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = value
+        return True
+
+    def register_script(self, source):
+        assert source == RELEASE_LOCK_SCRIPT
+
+        async def release(keys, args):
+            if self.strings.get(keys[0]) == args[0]:
+                del self.strings[keys[0]]
+                return 1
+            return 0
+        return release
+
+
+class MemoryState(TypedDict):
+    messages: Annotated[list, add_messages]
+    context: dict
+    token_usage: Optional[dict]
+
+
+@pytest.fixture
+def memory(make_config):
+    config = make_config(
+        ConversationMemoryConfig,
+        dict(max_tokens=30, max_tokens_before_summary=25, keep_messages=2, redis_url=""),
+    )
+    return ConversationMemory(config=config, counter=TokenCounter(count_fn=CountingFn()))
+
+
+def _with_model(memory, model, redis_client=None):
+    return ConversationMemory(
+        model=model, config=memory.config, counter=TokenCounter(count_fn=CountingFn()), redis_client=redis_client
+    )
+
+
+def _compile(memory):
+    graph = StateGraph(MemoryState)
+    graph.add_node("summarizer", memory.account)
+    graph.add_node(MEMORY_NODE, memory_summary_node)
+    graph.set_entry_point("summarizer")
+    graph.add_edge("summarizer", END)
+    graph.add_edge(MEMORY_NODE, END)
+    return graph.compile(checkpointer=InMemorySaver())
+
+
+def _messages(n, size=10):
+    return [
+        (HumanMessage if i % 2 == 0 else AIMessage)(content="x" * size, id=f"m{i}")
+        for i in range(n)
+    ]
+
+
+class TestConversationMemory:
+
+    def test_account_counts_only_new_messages(self, memory):
+        messages = _messages(4)
+        usage = memory.account({"messages": messages})["token_usage"]
+        assert usage["total"] == 40 and usage["unsummarized"] == 40 and usage["messages"] == 4
+
+        messages.append(HumanMessage(content="y" * 5, id="m4"))
+        counted_before = memory.counter.count_fn.counted
+        usage = memory.account({"messages": messages, "token_usage": usage})["token_usage"]
+        assert usage["total"] == 45 and usage["last_id"] == "m4"
+        assert memory.counter.count_fn.counted == counted_before + 1
+        # Nothing new: no write
+        assert memory.account({"messages": messages, "token_usage": usage}) == {}
+
+    def test_window_fits_budget_and_never_starts_with_tool_result(self, memory):
+        messages = _messages(6)
+        assert [m.id for m in memory.window(messages)] == ["m3", "m4", "m5"]
+
+        messages[3] = ToolMessage(content="x" * 10, tool_call_id="call-1", id="m3")
+        assert [m.id for m in memory.window(messages)] == ["m4", "m5"]
+
+    def test_background_summary_written_as_memory_node(self, memory):
+        summarizer = FakeSummarizer()
+        memory = _with_model(memory, summarizer)
+        app = _compile(memory)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        async def scenario():
+            await app.ainvoke({"messages": _messages(5)}, config)
+            await memory.schedule(app, config)
+            # Below the threshold after the summary: nothing scheduled twice
+            await memory.schedule(app, config)
+            return await app.aget_state(config)
+
+        snapshot = asyncio.run(scenario())
+        summary = snapshot.values["context"]["running_summary"]
+        assert summary.summary == "summary 1" and summary.last_summarized_message_id == "m2"
+        assert summary.summarized_message_ids == {"m0", "m1", "m2"}
+        assert snapshot.next == ()
+        assert len(summarizer.prompts) == 1 and "Create a summary" in summarizer.prompts[0]
+        stats = memory.get_stats()
+        assert stats["summaries"] == 1 and stats["below_threshold"] == 1 and stats["in_flight"] == 0
+
+        # Next turn: the window only holds messages after the summary
+        assert [m.id for m in memory.window(snapshot.values["messages"], summary)] == ["m3", "m4"]
+
+    def test_schedule_without_loop_or_model_is_noop(self, memory):
+        assert memory.schedule(object(), {"configurable": {"thread_id": "t1"}}) is None
+        assert _with_model(memory, FakeSummarizer()).schedule(object(), {"configurable": {"thread_id": "t1"}}) is None
+
+    def test_summary_dropped_when_a_turn_checkpoints_meanwhile(self, memory):
+        config = {"configurable": {"thread_id": "t1"}}
+
+        class TurnDuringSummary(FakeSummarizer):
+            async def ainvoke(self, messages):
+                # The user's next turn is checkpointed while the LLM call runs
+                await app.ainvoke({"messages": [HumanMessage(content="y" * 5, id="m5")]}, config)
+                return await super().ainvoke(messages)
+
+        memory = _with_model(memory, TurnDuringSummary())
+        app = _compile(memory)
+
+        async def scenario():
+            await app.ainvoke({"messages": _messages(5)}, config)
+            await memory.schedule(app, config)
+            return await app.aget_state(config)
+
+        snapshot = asyncio.run(scenario())
+        assert "running_summary" not in (snapshot.values.get("context") or {})
+        assert [m.id for m in snapshot.values["messages"]][-1] == "m5"
+        assert memory.get_stats()["stale_dropped"] == 1 and memory.get_stats()["summaries"] == 0
+
+    def test_one_worker_summarizes_a_thread_at_a_time(self, memory):
+        redis = FakeRedis()
+        first = _with_model(memory, FakeSummarizer(), redis_client=redis)
+        second = _with_model(memory, FakeSummarizer(), redis_client=redis)
+        app = _compile(first)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        async def scenario():
+            await app.ainvoke({"messages": _messages(5)}, config)
+            # Another worker holds the thread's lock
+            redis.strings[second._lock_key("t1")] = "other-worker"
+            await second.schedule(app, config)
+            del redis.strings[second._lock_key("t1")]
+            await first.schedule(app, config)
+
+        asyncio.run(scenario())
+        assert second.get_stats()["skipped_locked"] == 1 and second.model.prompts == []
+        assert first.get_stats()["summaries"] == 1
+        # Released by its owner
+        assert redis.strings == {}
+
+    def test_summarizes_without_the_lock_when_redis_fails(self, memory):
+        redis = FakeRedis()
+        redis.fail = True
+        memory = _with_model(memory, FakeSummarizer(), redis_client=redis)
+        app = _compile(memory)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        async def scenario():
+            await app.ainvoke({"messages": _messages(5)}, config)
+            await memory.schedule(app, config)
+
+        asyncio.run(scenario())
+        stats = memory.get_stats()
+        assert stats["lock_errors"] == 1 and stats["summaries"] == 1
@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from dataclasses import replace
+
+import pytest
+
+from src.database.data_access import DataAccessConfig, Database, to_pyformat
+
+
+class FakeCursor:
+    def __init__(self, rows, rowcount):
+        self._rows = rows
+        self.rowcount = rowcount
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class FakeConnection:
+    def __init__(self, rows=(), rowcount=0, fail=False):
+        self.rows = list(rows)
+        self.rowcount = rowcount
+        self.fail = fail
+        self.executed = []
+        self.transactions = 0
+
+    def execute(self, sql, params):
+        self.executed.append((sql, params))
+        if self.fail:
+            raise RuntimeError("boom")
+        return FakeCursor(self.rows, self.rowcount)
+
+    @contextmanager
+    def transaction(self):
+        self.transactions += 1
+        yield
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextmanager
+    def connection(self):
+        yield self.conn
+
+    def get_stats(self):
+        return {"pool_size": 1}
+
+
+@pytest.fixture
+def config(make_config):
+    return make_config(DataAccessConfig, dict(db_uri="postgresql://test", slow_query_ms=10_000))
+
+
+class TestToPyformat:
+
+    def test_named_params_converted_casts_and_literals_kept(self):
+        sql = "SELECT * FROM t WHERE a = :a AND b::text = :b_2 AND c LIKE 'x%' AND ts > '10:00:00'"
+        assert to_pyformat(sql) == (
+            "SELECT * FROM t WHERE a = %(a)s AND b::text = %(b_2)s AND c LIKE 'x%%' AND ts > '10:00:00'"
+        )
+
+    def test_existing_pyformat_untouched(self):
+        assert to_pyformat("WHERE user_id = %(user_id)s") == "WHERE user_id = %(user_id)s"
+
+
+class TestDatabase:
+
+    def test_rows_returned_as_dicts_with_converted_sql(self, config):
+        conn = FakeConnection(rows=[{"user_id": "1", "name": "An"}])
+        db = Database(config, pool=FakePool(conn))
+        assert db.fetch_one("SELECT * FROM users WHERE user_id = :uid", {"uid": "1"}) == {"user_id": "1", "name": "An"}
+        assert conn.executed == [("SELECT * FROM users WHERE user_id = %(uid)s", {"uid": "1"})]
+        assert db.fetch_all("SELECT 1") == [{"user_id": "1", "name": "An"}]
+        # params always passed so %% is unescaped by the driver
+        assert conn.executed[-1][1] == {}
+
+    def test_timing_hooks_and_stats(self, config):
+        calls = []
+        db = Database(replace(config, slow_query_ms=0), pool=FakePool(FakeConnection(rowcount=3)))
+        db.add_hook(lambda sql, ms, rows, error: calls.append((sql, rows, error)))
+        assert db.execute("UPDATE hotels SET booked = 1") == 3
+        assert calls == [("UPDATE hotels SET booked = 1", 3, None)]
+        stats = db.get_stats()
+        assert stats["queries"] == 1 and stats["slow_queries"] == 1 and stats["pool"] == {"pool_size": 1}
+
+    def test_errors_recorded_and_raised(self, config):
+        errors = []
+        db = Database(config, pool=FakePool(FakeConnection(fail=True)))
+        db.add_hook(lambda sql, ms, rows, error: errors.append(error))
+        with pytest.raises(RuntimeError):
+            db.fetch_all("SELECT 1")
+        assert isinstance(errors[0], RuntimeError)
+        assert db.get_stats()["errors"] == 1
+
+    def test_transaction_uses_one_connection(self, config):
+        conn = FakeConnection(rows=[{"id": 1}], rowcount=1)
+        db = Database(config, pool=FakePool(conn))
+        with db.transaction() as tx:
+            assert tx.fetch_one("SELECT id FROM hotels WHERE id = :id", {"id": 1}) == {"id": 1}
+            assert tx.execute("UPDATE hotels SET booked = 0 WHERE id = :id", {"id": 1}) == 1
+        assert conn.transactions == 1 and len(conn.executed) == 2
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from src.graphs.core.assistants.doc_grader_assistant import (
+    BatchDocGraderAssistant,
+    BatchGradeDocuments,
+    GradeDocuments,
+    GradedDocument,
+)
+
+
+class FakeStructuredLLM:
+    """`with_structured_output` stand-in: records each prompt and returns the queued answers."""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.prompts = []
+
+    def with_structured_output(self, schema):
+        def answer(prompt_value):
+            self.prompts.append(prompt_value.to_string())
+            result = self.answers.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return RunnableLambda(answer)
+
+
+def _batch(*grades):
+    return BatchGradeDocuments(
+        grades=[GradedDocument(document_id=i, binary_score=score) for i, score in grades]
+    )
+
+
+DOCUMENTS = ["Chi nhánh Times City: 458 Minh Khai", "Lẩu bò tươi 299k", "Hotline 1900 636 886"]
+
+
+@pytest.fixture
+def llm():
+    return FakeStructuredLLM([])
+
+
+@pytest.fixture
+def grader(llm):
+    return BatchDocGraderAssistant(llm, "nhà hàng lẩu bò")
+
+
+class PerDocumentGrader:
+    def __init__(self, score="yes", fail_on=()):
+        self.score = score
+        self.fail_on = set(fail_on)
+        self.graded = []
+
+    def __call__(self, content):
+        self.graded.append(content)
+        if content in self.fail_on:
+            raise RuntimeError("LLM timeout")
+        return GradeDocuments(binary_score=self.score)
+
+    async def acall(self, content):
+        return self(content)
+
+
+class TestBatchDocGraderAssistant:
+
+    def test_grades_map_to_document_ids(self, grader, llm):
+        llm.answers.append(_batch((2, "yes"), (0, "no"), (1, "Yes ")))
+
+        grades = grader.grade("Chi nhánh Times City ở đâu?", DOCUMENTS, {}, {})
+
+        assert {i: g.binary_score for i, g in grades.items()} == {0: "no", 1: "yes", 2: "yes"}
+        prompt = llm.prompts[0]
+        assert all(f"[document_id={i}]\n{doc}" in prompt for i, doc in enumerate(DOCUMENTS))
+
+    def test_unknown_ids_and_scores_are_dropped(self, grader, llm):
+        llm.answers.append(_batch((0, "yes"), (3, "yes"), (1, "maybe")))
+
+        grades = grader.grade("q", DOCUMENTS, {}, {})
+
+        assert list(grades) == [0]
+
+    def test_short_batch_falls_back_per_document_for_missing_ids(self, grader, llm):
+        llm.answers.append(_batch((1, "no")))
+        grade_one = PerDocumentGrader("yes")
+
+        grades = grader.grade_all("q", DOCUMENTS, {}, {}, grade_one=grade_one)
+
+        assert grade_one.graded == [DOCUMENTS[0], DOCUMENTS[2]]
+        assert {i: g.binary_score for i, g in grades.items()} == {0: "yes", 1: "no", 2: "yes"}
+
+    def test_malformed_batch_grades_every_document(self, grader, llm):
+        # Not a BatchGradeDocuments (the assistant's fallback message) -> grade one by one
+        llm.answers.append(ValueError("could not parse structured output"))
+        grade_one = PerDocumentGrader("no", fail_on={DOCUMENTS[1]})
+
+        grades = grader.grade_all("q", DOCUMENTS, {}, {}, grade_one=grade_one)
+
+        assert grade_one.graded == DOCUMENTS
+        assert grades[0].binary_score == "no" and grades[1] is None and grades[2].binary_score == "no"
+
+    def test_async_short_batch_grades_missing_concurrently(self, grader, llm):
+        llm.answers.append(_batch((0, "yes"), (2, "no")))
+        grade_one = PerDocumentGrader("no")
+
+        grades = asyncio.run(grader.agrade_all("q", DOCUMENTS, {}, {}, agrade_one=grade_one.acall))
+
+        assert grade_one.graded == [DOCUMENTS[1]]
+        assert {i: g.binary_score for i, g in grades.items()} == {0: "yes", 1: "no", 2: "no"}
+
+    def test_batch_disabled_grades_one_by_one(self, grader, llm):
+        grade_one = PerDocumentGrader("yes")
+
+        grades = grader.grade_all("q", DOCUMENTS[:1], {}, {}, grade_one=grade_one, use_batch=False)
+
+        assert llm.prompts == [] and grades[0].binary_score == "yes"
+
+    def test_empty_document_list_makes_no_call(self, grader, llm):
+        assert grader.grade("q", [], {}, {}) == {}
+        assert asyncio.run(grader.agrade("q", [], {}, {})) == {}
+        assert grader.grade_all("q", [], {}, {}, grade_one=PerDocumentGrader()) == {}
+        assert llm.prompts == []
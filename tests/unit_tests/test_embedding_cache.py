@@ -0,0 +1,99 @@
+import unicodedata
+from dataclasses import replace
+
+import pytest
+
+from src.database.embedding_cache import (
+    EmbeddingCache,
+    EmbeddingCacheConfig,
+    SQLiteEmbeddingStore,
+    make_embedding_key,
+    normalize_embedding_text,
+)
+
+CACHE_CONFIG = dict(enabled=True, max_entries=4, ttl_seconds=3600, persistent_backend="none")
+
+
+@pytest.fixture
+def config(make_config):
+    return make_config(EmbeddingCacheConfig, CACHE_CONFIG)
+
+
+class TestEmbeddingCache:
+
+    def test_normalization_collapses_case_whitespace_and_unicode_forms(self):
+        """NFC/NFD variants, case and spacing map to the same key"""
+        precomposed = "Lẩu  bò   Times City"
+        decomposed = unicodedata.normalize("NFD", "lẩu bò times city")
+        assert normalize_embedding_text(precomposed) == normalize_embedding_text(decomposed)
+        assert make_embedding_key("m", 768, None, precomposed) == make_embedding_key(
+            "m", 768, None, decomposed
+        )
+
+    def test_key_depends_on_model_dimensionality_and_task_type(self):
+        base = make_embedding_key("models/text-embedding-004", 768, None, "menu")
+        assert base != make_embedding_key("models/text-embedding-004", 512, None, "menu")
+        assert base != make_embedding_key("other-model", 768, None, "menu")
+        assert base != make_embedding_key("models/text-embedding-004", 768, "SEMANTIC_SIMILARITY", "menu")
+
+    def test_get_or_compute_calls_backend_once(self, config):
+        cache = EmbeddingCache(config)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return [0.1, 0.2, 0.3]
+
+        first = cache.get_or_compute("m", 3, None, "Chi nhánh Vincom", compute)
+        second = cache.get_or_compute("m", 3, None, "chi nhánh  vincom ", compute)
+
+        assert first == second == [0.1, 0.2, 0.3]
+        assert len(calls) == 1
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_lru_eviction(self, config):
+        cache = EmbeddingCache(replace(config, max_entries=2))
+        cache.set("m", 3, None, "a", [1.0])
+        cache.set("m", 3, None, "b", [2.0])
+        assert cache.get("m", 3, None, "a") == [1.0]  # refresh "a"
+        cache.set("m", 3, None, "c", [3.0])
+
+        assert cache.get("m", 3, None, "b") is None
+        assert cache.get("m", 3, None, "a") == [1.0]
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_ttl_expiry(self, config, monkeypatch):
+        cache = EmbeddingCache(replace(config, ttl_seconds=10))
+        now = [1000.0]
+        monkeypatch.setattr("src.database.embedding_cache.time.time", lambda: now[0])
+        cache.set("m", 3, None, "faq", [1.0])
+        now[0] += 11
+        assert cache.get("m", 3, None, "faq") is None
+        assert cache.get_stats()["expired"] == 1
+
+    def test_failures_are_not_cached(self, config):
+        cache = EmbeddingCache(config)
+
+        def boom():
+            raise RuntimeError("quota exceeded")
+
+        with pytest.raises(RuntimeError):
+            cache.get_or_compute("m", 3, None, "hotline", boom)
+        assert cache.get_stats()["size"] == 0
+
+    def test_sqlite_tier_survives_new_process_cache(self, config, tmp_path):
+        path = str(tmp_path / "emb.sqlite3")
+        first = EmbeddingCache(config, persistent_store=SQLiteEmbeddingStore(path, 3600))
+        first.set("m", 2, None, "ưu đãi", [0.5, 0.25])
+
+        second = EmbeddingCache(config, persistent_store=SQLiteEmbeddingStore(path, 3600))
+        assert second.get("m", 2, None, "Ưu Đãi") == [0.5, 0.25]
+        assert second.get_stats()["persistent_hits"] == 1
+
+    def test_config_reads_environment_when_created(self, monkeypatch):
+        monkeypatch.setenv("EMBEDDING_CACHE_SIZE", "12")
+        monkeypatch.setenv("REDIS_URL", "redis://cache:6379")
+        config = EmbeddingCacheConfig()
+        assert config.max_entries == 12 and config.redis_url == "redis://cache:6379"
@@ -0,0 +1,111 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.utils.ephemeral_state import (
+    DocumentRefStore,
+    EphemeralChannels,
+    EphemeralStateConfig,
+    checkpoint_size_report,
+    is_document_ref,
+)
+
+
+@pytest.fixture
+def config(make_config):
+    return make_config(EphemeralStateConfig, dict(max_documents=100, ttl_seconds=0))
+
+
+DOCS = [
+    ("menu-1", {"content": "Lẩu bò Tian Long " * 50, "namespace": "maketing"}, 0.91),
+    ("faq-2", {"content": "Giờ mở cửa 10h-22h", "namespace": "faq", "retrieval": "lexical"}, 0.0),
+]
+
+
+class TestDocumentRefStore:
+
+    def test_round_trip(self, config):
+        store = DocumentRefStore(config)
+        slim = store.dehydrate(DOCS)
+        assert all(is_document_ref(d[1]) for d in slim)
+        assert [d[0] for d in slim] == ["menu-1", "faq-2"] and slim[0][2] == 0.91
+        assert slim[1][1]["retrieval"] == "lexical"
+        assert store.hydrate(slim) == DOCS
+        # Checkpoint serde turns the tuples into lists
+        assert store.hydrate([list(d) for d in slim]) == DOCS
+
+    def test_miss_reloads_through_loader(self, config):
+        calls = []
+
+        def loader(namespace, key):
+            calls.append((namespace, key))
+            return {"content": "from qdrant", "embedding": [0.1]}
+
+        slim = DocumentRefStore(config).dehydrate(DOCS[:1])
+        store = DocumentRefStore(config, loader=loader)
+        hydrated = store.hydrate(slim)
+        assert calls == [("maketing", "menu-1")]
+        assert hydrated[0][1] == {"content": "from qdrant", "namespace": "maketing"}
+        assert store.get_stats()["reloaded"] == 1
+
+    def test_unresolvable_documents_dropped(self, config):
+        slim = DocumentRefStore(config).dehydrate(DOCS)
+        store = DocumentRefStore(config)
+        assert store.hydrate(slim) == []
+        assert store.get_stats()["lost"] == 2
+
+
+class TestEphemeralChannels:
+
+    def test_wrapped_node_sees_payloads_and_returns_refs(self, config):
+        channels = EphemeralChannels(config)
+        seen = {}
+
+        def retrieve(state, config=None):
+            return {"documents": DOCS, "summarized_messages": ["m"], "search_attempts": 1}
+
+        def generate(state, config=None):
+            seen["documents"] = state["documents"]
+            return {"messages": ["ok"]}
+
+        update = channels.wrap(retrieve)({}, None)
+        assert "summarized_messages" not in update
+        assert all(is_document_ref(d[1]) for d in update["documents"])
+        channels.wrap(generate)({"documents": update["documents"]}, None)
+        assert seen["documents"] == DOCS
+
+    def test_async_wrapper(self, config):
+        channels = EphemeralChannels(config)
+
+        async def aretrieve(state, config=None):
+            return {"documents": DOCS}
+
+        update = asyncio.run(channels.awrap(aretrieve)({}, None))
+        assert channels.hydrate_state(update)["documents"] == DOCS
+
+    def test_disabled_passes_through(self, config):
+        channels = EphemeralChannels(replace(config, enabled=False))
+        assert channels.slim_update({"documents": DOCS}) == {"documents": DOCS}
+
+
+class TestCheckpointSizeReport:
+
+    def test_reports_largest_channel_first(self, config):
+        serde = JsonPlusSerializer()
+        report = checkpoint_size_report({"documents": DOCS, "question": "hi"}, serde)
+        assert list(report["channels"]) == ["documents", "question"]
+        assert report["total_bytes"] == sum(report["channels"].values())
+
+        slim = DocumentRefStore(config).dehydrate(DOCS)
+        assert checkpoint_size_report({"documents": slim}, serde)["total_bytes"] < report["channels"]["documents"]
+
+
+class TestEphemeralStateConfig:
+
+    def test_channel_lists_read_from_environment(self, monkeypatch):
+        monkeypatch.setenv("EPHEMERAL_DOCUMENT_CHANNELS", "documents, web_results")
+        config = EphemeralStateConfig()
+        assert config.document_channels == ("documents", "web_results")
+        assert config.dropped_channels == ("summarized_messages",)
@@ -0,0 +1,153 @@
+import asyncio
+import re
+from dataclasses import replace
+
+import pytest
+
+from src.utils.fast_router import VALID_ROUTES, FastRouter, FastRouterConfig, RouteContext
+
+
+def _has_attachment(text):
+    return bool(re.search(r"\[HÌNH ẢNH\]\s*URL:\s*https?://", text))
+
+
+@pytest.fixture
+def router(make_config):
+    config = make_config(
+        FastRouterConfig,
+        dict(
+            enabled=True,
+            confidence_threshold=0.85,
+            classifier_confidence=0.75,
+            shadow_rate=0.0,
+            centroids_enabled=False,
+        ),
+    )
+    return FastRouter(config=config, has_attachment_fn=_has_attachment)
+
+
+def _route_embedder(router, query_route):
+    """2-d-per-route one-hot embeddings: examples of each route point the same way."""
+    example_route = {e: r for r, examples in router.route_examples.items() for e in examples}
+
+    def embed(text):
+        route = example_route.get(text, query_route)
+        return [1.0 if r == route else 0.0 for r in VALID_ROUTES]
+    return embed
+
+
+class TestFastRouter:
+
+    def test_route_hint_wins(self, router):
+        decision = router.classify("xin chào", route_hint="process_document")
+        assert (decision.datasource, decision.source) == ("process_document", "hint")
+
+    def test_attachment_routes_to_process_document(self, router):
+        decision = router.classify("[HÌNH ẢNH] URL: https://cdn.example/a.jpg")
+        assert (decision.datasource, decision.source) == ("process_document", "attachment")
+
+    def test_greeting_routes_to_direct_answer(self, router):
+        assert router.classify("Xin chào shop ạ!").datasource == "direct_answer"
+
+    def test_clear_branch_query_routes_to_vectorstore(self, router):
+        decision = router.classify("Chi nhánh Times City ở đâu?")
+        assert decision.datasource == "vectorstore" and decision.confidence >= 0.85
+
+    def test_booking_message_is_left_to_llm(self, router):
+        calls = []
+
+        def llm():
+            calls.append(1)
+            return "direct_answer"
+
+        decision = router.route("Đặt bàn 7h tối nay ở chi nhánh Vincom", llm_route=llm)
+        assert decision.source == "llm" and calls == [1]
+
+    def test_llm_skipped_and_agreement_recorded(self, router):
+        router.route("Menu có món gì?", llm_route=lambda: "vectorstore")
+        router.route("Menu có ưu đãi món gì không?", llm_route=lambda: "direct_answer")
+        stats = router.get_stats()
+        assert stats["local_routes"] == 1
+        assert stats["llm_routes"] == 1
+        assert stats["disagreements"] == 1
+
+    def test_single_keyword_is_one_signal(self, router):
+        # One location keyword: below the threshold, the LLM decides
+        decision = router.classify("Hotline là gì?")
+        assert decision.datasource == "vectorstore" and decision.confidence == 0.75
+
+    def test_classifier_agreeing_with_centroid_is_confident(self, router):
+        router = FastRouter(config=replace(router.config, centroids_enabled=True), has_attachment_fn=_has_attachment)
+        router.embed_fn = _route_embedder(router, "vectorstore")
+        assert router.warm()
+
+        decision = router.classify("Hotline là gì?")
+
+        assert (decision.datasource, decision.source) == ("vectorstore", "classifier+centroid")
+        assert decision.confidence >= 0.85
+
+    def test_followup_is_left_to_llm(self, router):
+        context = RouteContext(previous_route="vectorstore", previous_reply="Bên em có chi nhánh Times City ạ.")
+        assert router.classify("Còn giá combo?").confidence >= 0.85
+        assert router.classify("Còn giá combo?", context=context).confidence < 0.85
+
+    def test_answer_to_booking_question_skips_classifier(self, router):
+        context = RouteContext(previous_route="direct_answer", previous_reply="Anh đặt bàn cho mấy người lớn ạ?")
+        assert not router.classify("Thêm combo giá rẻ thì sao?", context=context).is_local
+
+    def test_centroids_cover_every_route(self, router):
+        router = FastRouter(config=replace(router.config, centroids_enabled=True), has_attachment_fn=_has_attachment)
+        router.embed_fn = _route_embedder(router, "web_search")
+        assert router.warm()
+
+        decision = router._classify_by_centroid("q")
+
+        assert set(router._centroids) == set(VALID_ROUTES)
+        assert (decision.datasource, decision.source) == ("web_search", "centroid")
+        assert decision.confidence == 0.99
+
+    def test_centroid_tier_needs_examples_for_every_route(self, router):
+        router = FastRouter(config=replace(router.config, centroids_enabled=True), has_attachment_fn=_has_attachment)
+        router.embed_fn = _route_embedder(router, "vectorstore")
+        router.route_examples = {r: e for r, e in router.route_examples.items() if r != "web_search"}
+        assert not router.warm()
+        assert not router._classify_by_centroid("q").is_local
+
+    def test_request_path_does_not_embed_examples(self, router):
+        router = FastRouter(config=replace(router.config, centroids_enabled=True), has_attachment_fn=_has_attachment)
+        embedded = []
+        started = []
+        router.embed_fn = lambda text: embedded.append(text) or [1.0, 0.0, 0.0, 0.0]
+        router.warm = lambda: started.append(1)
+
+        decision = router._classify_by_centroid("q")
+
+        assert not decision.is_local and embedded == []
+        assert router._warming or started == [1]
+
+    def test_awarm_then_aroute_uses_centroid_tier(self, router):
+        router = FastRouter(config=replace(router.config, centroids_enabled=True), has_attachment_fn=_has_attachment)
+        embed = _route_embedder(router, "direct_answer")
+        cache = {}
+
+        async def aembed(text):
+            cache[text] = embed(text)
+            return cache[text]
+
+        router.aembed_fn = aembed
+        router.embed_fn = lambda text: cache[text]  # sync tier only reads warmed vectors
+
+        async def allm():
+            raise AssertionError("LLM router should be skipped")
+
+        async def main():
+            assert await router.awarm()
+            return await router.aroute("q", allm_route=allm)
+
+        decision = asyncio.run(main())
+        assert (decision.datasource, decision.source) == ("direct_answer", "centroid")
+
+    def test_domain_without_keywords_skips_classifier(self, make_config):
+        config = make_config(FastRouterConfig, centroids_enabled=False)
+        router = FastRouter(config=config, domain="insurance")
+        assert not router.classify("Chính sách bồi thường thế nào?").is_local
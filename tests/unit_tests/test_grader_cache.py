@@ -0,0 +1,66 @@
+import pytest
+
+from src.database.grader_cache import (
+    GraderCacheConfig,
+    GraderDecisionCache,
+    SQLiteGraderStore,
+    bump_corpus_version,
+    prompt_fingerprint,
+    read_corpus_version,
+)
+
+
+@pytest.fixture
+def config(make_config, tmp_path):
+    return make_config(GraderCacheConfig, dict(
+        enabled=True,
+        max_entries=100,
+        ttl_seconds=3600,
+        persistent_backend="none",
+        corpus_version_path=str(tmp_path / "corpus_version.json"),
+        corpus_version_check_interval=0.0,
+    ))
+
+
+class TestGraderDecisionCache:
+
+    def test_repeat_question_hits(self, config):
+        cache = GraderDecisionCache(config)
+        cache.set("doc_grader", "p1", "Chi nhánh Times City ở đâu?", "458 Minh Khai", "yes")
+
+        assert cache.get("doc_grader", "p1", "chi nhánh  times city ở đâu?", "458 Minh Khai") == "yes"
+        assert cache.get("doc_grader", "p2", "Chi nhánh Times City ở đâu?", "458 Minh Khai") is None
+        assert cache.get("hallucination_grader", "p1", "Chi nhánh Times City ở đâu?", "458 Minh Khai") is None
+        assert cache.get_stats()["hits"] == 1
+
+    def test_corpus_version_bump_invalidates(self, config):
+        cache = GraderDecisionCache(config)
+        cache.set("doc_grader", "p1", "menu lẩu", "Lẩu bò 299k", "no")
+        assert cache.get("doc_grader", "p1", "menu lẩu", "Lẩu bò 299k") == "no"
+
+        bump_corpus_version(config, reason="test")
+
+        assert cache.get("doc_grader", "p1", "menu lẩu", "Lẩu bò 299k") is None
+
+    def test_read_corpus_version(self, config):
+        assert read_corpus_version(config) == "0"
+        version = bump_corpus_version(config, reason="test")
+        assert read_corpus_version(config) == version
+
+    def test_only_yes_no_decisions_are_cached(self, config):
+        cache = GraderDecisionCache(config)
+        cache.set("doc_grader", "p1", "q", "doc", "maybe")
+        assert cache.get_stats()["size"] == 0
+
+    def test_sqlite_tier_shared_between_instances(self, config, tmp_path):
+        path = str(tmp_path / "grader.sqlite3")
+        first = GraderDecisionCache(config, persistent_store=SQLiteGraderStore(path, 3600))
+        first.set("doc_grader", "p1", "hotline", "1900 636 886", "yes")
+
+        second = GraderDecisionCache(config, persistent_store=SQLiteGraderStore(path, 3600))
+        assert second.get("doc_grader", "p1", "hotline", "1900 636 886") == "yes"
+        assert second.get_stats()["persistent_hits"] == 1
+
+    def test_prompt_fingerprint_changes_with_prompt(self):
+        assert prompt_fingerprint("a") == prompt_fingerprint("a")
+        assert prompt_fingerprint("a") != prompt_fingerprint("b")
@@ -0,0 +1,105 @@
+import json
+from dataclasses import replace
+
+import pytest
+
+from src.utils.grading_policy import (
+    ACCEPT,
+    GRADE,
+    REJECT,
+    GradingPolicy,
+    GradingPolicyConfig,
+    NamespaceThresholds,
+    fit_namespace_thresholds,
+    fit_thresholds,
+    load_decisions,
+)
+
+
+THRESHOLDS = {"faq": NamespaceThresholds(lower=0.5, upper=0.75)}
+
+
+@pytest.fixture
+def policy(make_config, tmp_path):
+    config = make_config(
+        GradingPolicyConfig,
+        dict(
+            enabled=True,
+            thresholds_path=str(tmp_path / "thresholds.json"),
+            decision_log_path=str(tmp_path / "decisions.jsonl"),
+            log_decisions=True,
+            default_upper=0.9,
+            default_lower=0.3,
+            audit_rate=0.0,
+        ),
+    )
+    return GradingPolicy(config, thresholds=THRESHOLDS)
+
+
+class TestGradingPolicy:
+
+    def test_decide_uses_namespace_thresholds(self, policy):
+        assert policy.decide("faq", 0.8) == ACCEPT
+        assert policy.decide("faq", 0.6) == GRADE
+        assert policy.decide("faq", 0.4) == REJECT
+        # Unknown namespace falls back to the conservative defaults
+        assert policy.decide("maketing", 0.8) == GRADE
+
+    def test_disabled_policy_grades_everything(self, policy):
+        policy = GradingPolicy(replace(policy.config, enabled=False), thresholds=THRESHOLDS)
+        assert policy.decide("faq", 0.99) == GRADE
+
+    def test_partition_counts_and_lexical_hits(self, policy):
+        docs = [
+            ("a", {"content": "A", "namespace": "faq"}, 0.9),
+            ("b", {"content": "B", "namespace": "faq"}, 0.6),
+            ("c", {"content": "C", "namespace": "faq"}, 0.1),
+            ("d", {"content": "D", "namespace": "faq", "retrieval": "lexical"}, 0.0),
+        ]
+        accepted, rejected, to_grade = policy.partition(docs)
+        assert [d[0] for d in accepted] == ["a"]
+        assert [d[0] for d in rejected] == ["c"]
+        assert [d[0] for d in to_grade] == ["b", "d"]
+        stats = policy.get_stats()
+        assert stats["auto_accepted"] == 1 and stats["auto_rejected"] == 1 and stats["sent_to_llm"] == 2
+
+    def test_log_decision_appends_jsonl(self, policy, tmp_path):
+        policy.log_decision("faq", 0.66, "yes")
+        policy.log_decision("faq", 0.41, "no")
+        lines = (tmp_path / "decisions.jsonl").read_text().splitlines()
+        assert [json.loads(line)["relevant"] for line in lines] == [True, False]
+
+    def test_decision_log_is_off_by_default(self, tmp_path):
+        config = GradingPolicyConfig(decision_log_path=str(tmp_path / "decisions.jsonl"))
+        GradingPolicy(config, thresholds={}).log_decision("faq", 0.66, "yes")
+        assert not (tmp_path / "decisions.jsonl").exists()
+
+    def test_decision_log_rotates_at_size_cap(self, policy, tmp_path):
+        config = replace(policy.config, decision_log_max_bytes=200, decision_log_backups=2)
+        policy = GradingPolicy(config, thresholds=THRESHOLDS)
+        for i in range(20):
+            policy.log_decision("faq", 0.5 + i * 0.01, "yes")
+        files = sorted(p.name for p in tmp_path.glob("decisions.jsonl*"))
+        assert files == ["decisions.jsonl", "decisions.jsonl.1", "decisions.jsonl.2"]
+        assert all(p.stat().st_size <= 200 for p in tmp_path.glob("decisions.jsonl*"))
+        # Calibration reads the backups too, oldest first
+        scores = [r["score"] for r in load_decisions(str(tmp_path / "decisions.jsonl"))]
+        assert scores == sorted(scores) and scores[-1] == pytest.approx(0.69)
+
+
+class TestCalibration:
+
+    def test_fit_separable_scores(self):
+        samples = [(0.2 + i * 0.005, False) for i in range(40)] + [(0.7 + i * 0.005, True) for i in range(40)]
+        t = fit_namespace_thresholds(samples, precision=0.98, min_support=20)
+        assert t.lower <= 0.7 <= t.upper <= 0.8
+        assert t.lower > 0.39
+
+    def test_not_enough_data(self):
+        assert fit_namespace_thresholds([(0.9, True)] * 5, min_support=20) is None
+
+    def test_fit_thresholds_groups_by_namespace(self):
+        records = [{"namespace": "faq", "score": 0.8 + i * 0.001, "relevant": True} for i in range(30)]
+        records += [{"namespace": "maketing", "score": 0.5, "relevant": True}]
+        fitted = fit_thresholds(records, min_support=20)
+        assert set(fitted) == {"faq"}
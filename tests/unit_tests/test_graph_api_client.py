@@ -0,0 +1,84 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.services.graph_api_client import GraphApiClient, GraphApiClientConfig
+
+
+class GraphHandler(BaseHTTPRequestHandler):
+    """Stand-in Graph API: keep-alive HTTP/1.1, echoes the path."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._reply(200, {"path": self.path.split("?")[0], "name": "An"})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(200, {"message_id": "mid.1"})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def graph_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GraphHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(make_config, graph_server):
+    config = make_config(
+        GraphApiClientConfig,
+        dict(http2=True, send_timeout=2, sender_action_timeout=1, profile_timeout=2),
+    )
+    return GraphApiClient(graph_server, config)
+
+
+class TestGraphApiClient:
+
+    def test_calls_share_one_connection(self, client):
+        async def scenario():
+            await client.start()
+            sent = await client.request("POST", "/v18.0/me/messages", "send", json={"message": {"text": "hi"}})
+            await client.request("POST", "/v18.0/me/messages", "sender_action", json={"sender_action": "typing_on"})
+            profile = await client.request("GET", "/v18.0/123", "profile", params={"fields": "name"})
+            await client.aclose()
+            return sent.json(), profile.json()
+
+        sent, profile = asyncio.run(scenario())
+        assert sent == {"message_id": "mid.1"} and profile["path"] == "/v18.0/123"
+        stats = client.get_stats()
+        assert stats["requests"] == 3 and stats["new_connections"] == 1
+        assert stats["reused_requests"] == 2 and stats["reuse_ratio"] == pytest.approx(0.667)
+        assert set(stats["endpoints"]) == {"send", "sender_action", "profile"}
+        assert stats["open"] is False and stats["clients_created"] == 1
+
+    def test_endpoint_timeouts_and_errors(self, client):
+        timeouts = client._timeouts()
+        assert timeouts["sender_action"].read == 1 and timeouts["send"].read == 2
+        assert timeouts["profile"].connect == client.config.connect_timeout
+
+        async def scenario():
+            with pytest.raises(Exception):
+                await client.request("GET", "http://127.0.0.1:1/unreachable", "profile")
+            await client.aclose()
+
+        asyncio.run(scenario())
+        assert client.get_stats()["errors"] == 1
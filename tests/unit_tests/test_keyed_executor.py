@@ -0,0 +1,87 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+
+from src.services.keyed_executor import KeyedExecutor, KeyedExecutorConfig, stream_id_time
+
+
+@pytest.fixture
+def executor(make_config):
+    config = make_config(KeyedExecutorConfig, dict(concurrency=4, max_pending=100))
+    return KeyedExecutor(config, clock=lambda: 1000.0)
+
+
+class TestKeyedExecutor:
+
+    def test_same_key_in_order_different_keys_in_parallel(self, executor):
+        log = []
+        running = {"now": 0, "max": 0}
+
+        def job(key, i, delay):
+            async def run():
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+                log.append((key, i, "start"))
+                await asyncio.sleep(delay)
+                log.append((key, i, "end"))
+                running["now"] -= 1
+            return run
+
+        async def main():
+            await executor.submit("a", job("a", 1, 0.05))
+            await executor.submit("a", job("a", 2, 0.0))
+            await executor.submit("b", job("b", 1, 0.0))
+            await executor.join()
+        asyncio.run(main())
+
+        a_events = [e for e in log if e[0] == "a"]
+        assert a_events == [("a", 1, "start"), ("a", 1, "end"), ("a", 2, "start"), ("a", 2, "end")]
+        # b finished while a's slow first job was still running
+        assert log.index(("b", 1, "end")) < log.index(("a", 1, "end"))
+        assert running["max"] == 2
+        stats = executor.get_stats()
+        assert stats["completed"] == 3 and stats["in_flight"] == 0 and stats["active_keys"] == 0
+
+    def test_concurrency_limit_and_failures(self, executor):
+        executor = KeyedExecutor(replace(executor.config, concurrency=2), clock=executor.clock)
+        running = {"now": 0, "max": 0}
+
+        async def job():
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+
+        async def boom():
+            raise RuntimeError("LLM timeout")
+
+        async def main():
+            for key in "abcde":
+                await executor.submit(key, job)
+            await executor.submit("f", boom)
+            await executor.join()
+        asyncio.run(main())
+
+        assert running["max"] == 2
+        assert executor.get_stats()["failed"] == 1 and executor.get_stats()["completed"] == 5
+
+    def test_duplicate_ids_and_queue_lag(self, executor):
+        async def main():
+            release = asyncio.Event()
+
+            async def wait():
+                await release.wait()
+
+            assert await executor.submit("a", wait, job_id="999000-0", enqueued_at=stream_id_time("999000-0"))
+            # A reclaimed entry that is still being processed is ignored
+            assert not await executor.submit("a", wait, job_id="999000-0")
+            assert executor.tracked_ids() == ["999000-0"]
+            await asyncio.sleep(0)
+            release.set()
+            await executor.join()
+        asyncio.run(main())
+
+        stats = executor.get_stats()
+        assert stats["duplicates"] == 1 and stats["completed"] == 1
+        assert stats["last_lag_ms"] == 1000.0  # entry created at 999.0s, started at 1000.0s
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from src.database.lexical_index import (
+    BM25Index,
+    LexicalIndexCache,
+    LexicalIndexConfig,
+    fold_diacritics,
+    tokenize,
+)
+
+
+DOCS = [
+    ("chunk_0", {"content": "Chi nhánh Times City: 458 Minh Khai, Hai Bà Trưng", "embedding": [0.1]}),
+    ("chunk_1", {"content": "Chi nhánh Vincom Bà Triệu phục vụ lẩu bò và lẩu nấm"}),
+    ("chunk_2", {"content": "Ưu đãi sinh nhật: giảm 10% cho khách đặt bàn trước"}),
+]
+
+
+class TestTokenizer:
+
+    def test_folded_variants_and_bigrams(self):
+        tokens = tokenize("Lẩu Bò")
+        assert "lẩu" in tokens and "lau" in tokens
+        assert "bò" in tokens and "bo" in tokens
+        assert "lau_bo" in tokens
+
+    def test_fold_d_stroke(self):
+        assert fold_diacritics("đặt bàn") == "dat ban"
+
+
+class TestBM25Index:
+
+    def test_exact_name_ranks_first(self):
+        index = BM25Index.build(DOCS)
+        results = index.search("chi nhánh times city ở đâu", limit=2)
+        assert results[0][0] == "chunk_0"
+        assert "embedding" not in results[0][1]
+
+    def test_unaccented_query_matches(self):
+        index = BM25Index.build(DOCS)
+        assert index.search("lau bo", limit=1)[0][0] == "chunk_1"
+
+    def test_no_match_returns_empty(self):
+        index = BM25Index.build(DOCS)
+        assert index.search("karaoke", limit=5) == []
+
+    def test_save_and_load_roundtrip(self, tmp_path):
+        path = tmp_path / "kb__faq.bm25.json"
+        BM25Index.build(DOCS).save(path)
+        loaded = BM25Index.load(path)
+        assert loaded.search("vincom", limit=1) == BM25Index.build(DOCS).search("vincom", limit=1)
+
+
+class Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cache(make_config, tmp_path):
+    config = make_config(LexicalIndexConfig, dict(index_dir=str(tmp_path), check_interval=5.0))
+    return LexicalIndexCache("kb", config, clock=Clock())
+
+
+def _rebuild(cache, namespace, docs, mtime):
+    path = cache.path(namespace)
+    BM25Index.build(docs).save(path)
+    os.utime(path, (mtime, mtime))
+
+
+class TestLexicalIndexCache:
+
+    def test_file_checked_at_most_once_per_interval(self, cache):
+        _rebuild(cache, "faq", DOCS, mtime=1000)
+
+        assert len(cache.get("faq")) == 3
+        for _ in range(10):
+            cache.get("faq")
+        assert cache.get_stats()["stat_checks"] == 1
+
+        # Rebuilt by the ingestion run: picked up after the interval
+        _rebuild(cache, "faq", DOCS[:1], mtime=2000)
+        assert len(cache.get("faq")) == 3
+        cache.clock.now = 5.0
+        assert len(cache.get("faq")) == 1
+        assert cache.get_stats() == {"stat_checks": 2, "loads": 2, "loaded_namespaces": 1, "check_interval": 5.0}
+
+    def test_missing_index_and_invalidate(self, cache):
+        assert cache.get("faq") is None
+        _rebuild(cache, "faq", DOCS, mtime=1000)
+        assert cache.get("faq") is None
+        # A rebuild in this process does not wait for the interval
+        cache.invalidate("faq")
+        assert len(cache.get("faq")) == 3
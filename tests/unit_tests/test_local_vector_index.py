@@ -0,0 +1,171 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.database.local_vector_index import LocalVectorIndex, LocalVectorIndexConfig
+
+
+class FakeQdrantClient:
+    """Minimal in-memory stand-in for the count/scroll calls the index uses."""
+
+    def __init__(self, points_by_namespace):
+        self.points_by_namespace = points_by_namespace
+        self.scroll_calls = 0
+        self.fail = False
+
+    def _namespace(self, flt):
+        return flt.must[0].match.value
+
+    def count(self, collection_name, count_filter, exact=True):
+        if self.fail:
+            raise ConnectionError("qdrant down")
+        return SimpleNamespace(count=len(self.points_by_namespace.get(self._namespace(count_filter), [])))
+
+    def scroll(self, collection_name, scroll_filter, with_payload, with_vectors, limit, offset=None):
+        self.scroll_calls += 1
+        points = self.points_by_namespace.get(self._namespace(scroll_filter), [])
+        start = offset or 0
+        page = points[start:start + limit]
+        next_offset = start + limit if start + limit < len(points) else None
+        return page, next_offset
+
+
+def _point(key, vector, content):
+    return SimpleNamespace(
+        payload={"key": key, "value": {"content": content, "embedding": vector}},
+        vector=vector,
+    )
+
+
+@pytest.fixture
+def client():
+    return FakeQdrantClient(
+        {
+            "faq": [
+                _point("vat", [1.0, 0.0, 0.0], "Xuất hóa đơn VAT"),
+                _point("hotline", [0.0, 1.0, 0.0], "Hotline 1900 636 886"),
+                _point("parking", [0.6, 0.8, 0.0], "Chỗ đỗ xe"),
+            ]
+        }
+    )
+
+
+class CorpusVersion:
+    def __init__(self, version="v1"):
+        self.version = version
+
+    def __call__(self):
+        return self.version
+
+
+@pytest.fixture
+def corpus():
+    return CorpusVersion()
+
+
+@pytest.fixture
+def config(make_config, tmp_path):
+    return make_config(
+        LocalVectorIndexConfig,
+        dict(enabled=True, index_dir=str(tmp_path), refresh_interval=3600, max_points=1000, scroll_batch_size=2),
+    )
+
+
+@pytest.fixture
+def index(client, corpus, config):
+    index = LocalVectorIndex(client, "kb", ["faq"], config, corpus_version_fn=corpus)
+    index.wait_for_refresh()
+    return index
+
+
+class TestLocalVectorIndex:
+
+    def test_exact_cosine_top_k(self, index):
+        results = index.search("faq", [2.0, 0.1, 0.0], limit=2)
+
+        assert [key for key, _, _ in results] == ["vat", "parking"]
+        assert results[0][2] == pytest.approx(0.99875, rel=1e-3)
+        assert "embedding" not in results[0][1]
+
+    def test_unmirrored_namespace_returns_none(self, index):
+        assert index.search("maketing", [1.0, 0.0, 0.0]) is None
+
+    def test_snapshot_shared_between_workers(self, client, corpus, config, index):
+        scrolls_after_first = client.scroll_calls
+
+        second = LocalVectorIndex(client, "kb", ["faq"], config, corpus_version_fn=corpus)
+        second.wait_for_refresh()
+
+        assert client.scroll_calls == scrolls_after_first  # reused on-disk snapshot
+        assert len(second.search("faq", [0.0, 1.0, 0.0], limit=5)) == 3
+
+    def test_point_count_change_triggers_rebuild(self, client, index):
+        client.points_by_namespace["faq"].append(_point("menu", [0.0, 0.0, 1.0], "Thực đơn"))
+
+        index.refresh()
+
+        assert index.search("faq", [0.0, 0.0, 1.0], limit=1)[0][0] == "menu"
+
+    def test_corpus_version_change_rebuilds_same_size_namespace(self, client, corpus, index):
+        # Re-ingested content, same number of chunks
+        client.points_by_namespace["faq"][0] = _point("vat", [0.0, 0.0, 1.0], "Hóa đơn VAT mới")
+        index.refresh()
+        assert index.search("faq", [1.0, 0.0, 0.0], limit=1)[0][1]["content"] == "Xuất hóa đơn VAT"
+
+        corpus.version = "v2"
+        index.refresh()
+
+        key, value, _ = index.search("faq", [0.0, 0.0, 1.0], limit=1)[0]
+        assert (key, value["content"]) == ("vat", "Hóa đơn VAT mới")
+
+    def test_rebuild_never_pairs_old_payloads_with_new_vectors(self, client, corpus, index, tmp_path):
+        # A reader of another worker has read meta.json, but not the matrix yet
+        old_meta = json.loads((tmp_path / "kb__faq.meta.json").read_text())
+
+        client.points_by_namespace["faq"] = [
+            _point("menu", [0.0, 0.0, 1.0], "Thực đơn"),
+            _point("hotline", [0.0, 1.0, 0.0], "Hotline 1900 636 886"),
+            _point("parking", [0.6, 0.8, 0.0], "Chỗ đỗ xe"),
+        ]
+        corpus.version = "v2"
+        index.refresh()
+
+        # Same row count, but the old meta still names the old matrix
+        old_matrix = np.load(tmp_path / old_meta["matrix"])
+        assert old_meta["keys"][0] == "vat" and old_matrix[0].tolist() == [1.0, 0.0, 0.0]
+        assert index.search("faq", [0.0, 0.0, 1.0], limit=1)[0][0] == "menu"
+
+        corpus.version = "v3"
+        index.refresh()
+        # Only the current matrix and the one before it are kept
+        assert len(list(tmp_path.glob("kb__faq.*.npy"))) == 2
+
+    def test_first_build_runs_in_background(self, client, corpus, config):
+        release = threading.Event()
+        scroll = client.scroll
+
+        def slow_scroll(*args, **kwargs):
+            release.wait(5)
+            return scroll(*args, **kwargs)
+
+        client.scroll = slow_scroll
+        index = LocalVectorIndex(client, "kb", ["faq"], config, corpus_version_fn=corpus)
+        # Not mirrored yet: callers fall back to Qdrant
+        assert index.search("faq", [1.0, 0.0, 0.0]) is None
+
+        release.set()
+        index.wait_for_refresh()
+
+        assert index.search("faq", [1.0, 0.0, 0.0], limit=1)[0][0] == "vat"
+
+    def test_keeps_serving_when_qdrant_is_down(self, client, corpus, config, index):
+        client.fail = True
+
+        index = LocalVectorIndex(client, "kb", ["faq"], config, corpus_version_fn=corpus)
+        index.wait_for_refresh()
+
+        assert index.search("faq", [1.0, 0.0, 0.0], limit=1)[0][0] == "vat"
+        assert index.get_stats()["refresh_errors"] == 1
@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from src.utils.multi_namespace_retriever import MultiNamespaceRetriever, SearchResult, SearchStrategy
+
+
+class FakeStore:
+    """The embedding and search calls MultiNamespaceRetriever makes on QdrantStore."""
+
+    def __init__(self, hits, lexical_hits=None, failing=()):
+        self.hits = hits
+        self.lexical_hits = lexical_hits or {}
+        self.failing = set(failing)
+        self.embed_calls = []
+        self.search_many_calls = []
+        self.batch_fails = False
+
+    def embed_query(self, query):
+        self.embed_calls.append(query)
+        return [0.1, 0.2, 0.3]
+
+    async def aembed_query(self, query):
+        return self.embed_query(query)
+
+    def search_by_vector(self, namespace, query_vector, limit=10):
+        if namespace in self.failing:
+            raise ConnectionError(f"{namespace} unavailable")
+        return self.hits.get(namespace, [])[:limit]
+
+    async def asearch_by_vector(self, namespace, query_vector, limit=10):
+        return self.search_by_vector(namespace, query_vector, limit)
+
+    def search_many(self, namespaces, query_vector, limit=10):
+        self.search_many_calls.append((list(namespaces), query_vector))
+        if self.batch_fails:
+            raise ConnectionError("search_batch unavailable")
+        return {ns: self.search_by_vector(ns, query_vector, limit) for ns in namespaces}
+
+    async def asearch_many(self, namespaces, query_vector, limit=10):
+        return self.search_many(namespaces, query_vector, limit)
+
+    def lexical_search(self, namespace, query, limit=10):
+        return self.lexical_hits.get(namespace)
+
+
+def _hit(chunk_id, content, score):
+    return (chunk_id, {"content": content}, score)
+
+
+@pytest.fixture
+def store():
+    return FakeStore({
+        "maketing": [_hit("m1", "Chi nhánh Times City", 0.62), _hit("m2", "Lẩu bò tươi", 0.55)],
+        "faq": [_hit("f1", "Xuất hóa đơn VAT", 0.64), _hit("f2", "Chỗ đỗ xe ô tô", 0.40)],
+    })
+
+
+@pytest.fixture
+def retriever(store):
+    return MultiNamespaceRetriever(store, ["maketing", "faq"], default_namespace="maketing")
+
+
+def _result(chunk_id, score, namespace="maketing"):
+    return SearchResult(chunk_id=chunk_id, content_dict={"content": chunk_id}, score=score, namespace=namespace)
+
+
+class TestMultiNamespaceRetriever:
+
+    def test_query_embedded_once_for_all_namespaces(self, store, retriever):
+        # Primary results are below the fallback threshold: the other namespaces are searched too
+        results = retriever.search_with_fallback("Chi nhánh ở đâu?", "maketing", limit=4, fallback_threshold=0.9)
+
+        assert store.embed_calls == ["Chi nhánh ở đâu?"]
+        assert store.search_many_calls == [(["faq"], [0.1, 0.2, 0.3])]
+        assert {chunk_id for chunk_id, _, _ in results} == {"m1", "m2", "f1", "f2"}
+        assert retriever.get_search_stats()["embedding_calls"] == 1
+
+    def test_comprehensive_search_is_one_batched_request(self, store, retriever):
+        results = retriever.search("VAT", strategy=SearchStrategy.COMPREHENSIVE, limit=4)
+
+        assert len(store.embed_calls) == 1 and len(store.search_many_calls) == 1
+        assert store.search_many_calls[0][0] == ["maketing", "faq"]
+        # Primary namespace preference (+0.05) puts m1 ahead of the higher-scoring f1
+        assert [chunk_id for chunk_id, _, _ in results] == ["m1", "f1", "m2", "f2"]
+        assert results[0][1]["namespace"] == "maketing"
+
+    def test_async_search_embeds_once(self, store, retriever):
+        results = asyncio.run(retriever.asearch("VAT", strategy=SearchStrategy.COMPREHENSIVE, limit=4))
+
+        assert len(store.embed_calls) == 1 and len(results) == 4
+
+    def test_duplicates_across_namespaces_are_removed(self, store, retriever):
+        shared = _hit("c1", "Hotline 1900 636 886", 0.7)
+        store.hits = {"maketing": [shared], "faq": [shared, _hit("f1", "Xuất hóa đơn VAT", 0.5)]}
+
+        results = retriever.search_all_namespaces("hotline", limit_per_namespace=5)
+
+        assert [chunk_id for chunk_id, _, _ in results] == ["c1", "f1"]
+        assert retriever.get_search_stats()["deduplication_removed"] == 1
+
+    def test_one_failing_namespace_does_not_drop_the_others(self, store, retriever):
+        store.batch_fails = True
+        store.failing = {"faq"}
+
+        results = retriever.search_all_namespaces("lẩu", limit_per_namespace=5)
+
+        assert [chunk_id for chunk_id, _, _ in results] == ["m1", "m2"]
+
+
+class TestReciprocalRankFusion:
+
+    def test_rrf_order(self, store):
+        retriever = MultiNamespaceRetriever(store, ["maketing", "faq"], rrf_k=60)
+        dense = [_result("a", 0.9, "faq"), _result("b", 0.8, "faq"), _result("c", 0.7, "faq")]
+        lexical = [_result("c", 12.0, "faq"), _result("a", 9.0, "faq")]
+
+        fused = retriever._fuse_reciprocal_rank(dense, lexical, primary_namespace="maketing")
+
+        # a: 1/61 + 1/62, c: 1/63 + 1/61, b: 1/62
+        assert [r.chunk_id for r in fused] == ["a", "c", "b"]
+        assert fused[0].fused_score == pytest.approx(1 / 61 + 1 / 62)
+        assert fused[0].score == 0.9  # the dense cosine is kept
+
+    def test_chunk_in_both_rankings_appears_once(self, store, retriever):
+        dense = [_result("a", 0.9)]
+        lexical = [_result("a", 7.5), _result("x", 5.0)]
+
+        fused = retriever._fuse_reciprocal_rank(dense, lexical, primary_namespace="maketing")
+
+        assert [r.chunk_id for r in fused] == ["a", "x"]
+        # Lexical-only hits don't expose the BM25 score as a similarity
+        assert fused[1].score == 0.0 and fused[1].content_dict["retrieval"] == "lexical"
+
+    def test_primary_namespace_boost_breaks_ties(self, store, retriever):
+        dense = [_result("faq-1", 0.9, "faq"), _result("mk-1", 0.8, "maketing")]
+        lexical = [_result("mk-1", 3.0, "maketing"), _result("faq-1", 2.0, "faq")]
+
+        fused = retriever._fuse_reciprocal_rank(dense, lexical, primary_namespace="maketing")
+
+        assert [r.chunk_id for r in fused] == ["mk-1", "faq-1"]
+
+    def test_hybrid_search_fuses_lexical_hits(self, store, retriever):
+        store.lexical_hits = {"faq": [_hit("f2", "Chỗ đỗ xe ô tô", 8.0)]}
+
+        results = retriever.search("đỗ xe", strategy=SearchStrategy.HYBRID, limit=3)
+
+        assert results[0][0] == "f2"
+        assert len(store.embed_calls) == 1 and retriever.get_search_stats()["hybrid_searches"] == 1
@@ -0,0 +1,357 @@
+import asyncio
+import json
+import math
+from dataclasses import replace
+
+import pytest
+
+from src.services.outbound_queue import (
+    ENQUEUE_SCRIPT,
+    TOKEN_BUCKET_PAUSE_SCRIPT,
+    TOKEN_BUCKET_TAKE_SCRIPT,
+    OutboundQueue,
+    OutboundQueueConfig,
+    OutboxEnqueueError,
+    RedisTokenBucket,
+    SendResult,
+    classify_response,
+    split_message,
+)
+
+
+class FakeRedis:
+    """The list / sorted-set / string / hash commands and scripts OutboundQueue uses."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.lists = {}
+        self.zsets = {}
+        self.strings = {}
+        self.hashes = {}
+        self.fail_scripts_after_run = False
+
+    def register_script(self, source):
+        fn = {
+            TOKEN_BUCKET_TAKE_SCRIPT: self._take,
+            TOKEN_BUCKET_PAUSE_SCRIPT: self._pause,
+            ENQUEUE_SCRIPT: self._enqueue,
+        }[source]
+
+        async def script(keys, args):
+            result = fn(keys, [str(a) for a in args])
+            if self.fail_scripts_after_run:
+                raise TimeoutError("reply lost")
+            return result
+        return script
+
+    def _now_ms(self):
+        return int(self.clock() * 1000)
+
+    def _take(self, keys, argv):
+        now = self._now_ms()
+        rate, capacity, n = float(argv[0]) / 1000, float(argv[1]), min(float(argv[2]), float(argv[1]))
+        state = self.hashes.setdefault(keys[0], {})
+        tokens = float(state.get("tokens", capacity))
+        updated = float(state.get("updated", now))
+        paused_until = float(state.get("paused_until", 0))
+        if now < paused_until:
+            return [int(paused_until - now), str(tokens), 1]
+        tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+        wait = 0
+        if tokens >= n:
+            tokens -= n
+        else:
+            wait = math.ceil((n - tokens) / rate)
+        state.update(tokens=tokens, updated=now)
+        return [wait, str(tokens), 0]
+
+    def _pause(self, keys, argv):
+        now = self._now_ms()
+        state = self.hashes.setdefault(keys[0], {})
+        paused_until = max(float(state.get("paused_until", 0)), now + int(argv[0]))
+        state.update(tokens=0, updated=paused_until, paused_until=paused_until)
+        return paused_until
+
+    def _enqueue(self, keys, argv):
+        recipient, now, items = argv[0], float(argv[1]), argv[2:]
+        self.lists.setdefault(keys[0], []).extend(items)
+        self.zsets.setdefault(keys[1], {}).setdefault(recipient, now)
+        return len(items)
+
+    async def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+    async def lpop(self, key):
+        items = self.lists.get(key) or []
+        return items.pop(0) if items else None
+
+    async def lindex(self, key, index):
+        items = self.lists.get(key) or []
+        return items[index] if -len(items) <= index < len(items) else None
+
+    async def lset(self, key, index, value):
+        self.lists[key][index] = value
+
+    async def llen(self, key):
+        return len(self.lists.get(key) or [])
+
+    async def ltrim(self, key, start, end):
+        items = self.lists.get(key) or []
+        start = max(len(items) + start, 0) if start < 0 else start
+        end = len(items) + end if end < 0 else end
+        self.lists[key] = items[start:end + 1]
+
+    async def lpos(self, key, value):
+        items = self.lists.get(key) or []
+        return items.index(value) if value in items else None
+
+    async def zadd(self, key, mapping, nx=False, xx=False):
+        zset = self.zsets.setdefault(key, {})
+        for member, score in mapping.items():
+            if (nx and member in zset) or (xx and member not in zset):
+                continue
+            zset[member] = score
+
+    async def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    async def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    async def zrangebyscore(self, key, low, high, start=0, num=None):
+        members = sorted((s, m) for m, s in self.zsets.get(key, {}).items() if s <= high)
+        return [m for _, m in members][start:start + num if num is not None else None]
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = value
+        return True
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def delete(self, key):
+        self.strings.pop(key, None)
+
+
+class FakeRedisQueue:
+    def __init__(self, clock):
+        self.redis = FakeRedis(clock)
+        self._initialized = True
+
+
+class FakeSender:
+    def __init__(self, results=None):
+        self.results = list(results or [])
+        self.sent = []
+        self.batches = []
+
+    async def send(self, item):
+        self.sent.append((item["recipient"], item["text"]))
+        return self.results.pop(0) if self.results else SendResult(ok=True)
+
+    async def send_batch(self, items):
+        self.batches.append([item["recipient"] for item in items])
+        return [await self.send(item) for item in items]
+
+
+async def _raise_connection_error(keys, args):
+    raise ConnectionError("redis down")
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+QUEUE_CONFIG = dict(
+    rate_per_second=1000,
+    burst=100,
+    batch_size=1,
+    max_attempts=3,
+    base_backoff=1.0,
+    max_backoff=10.0,
+    rate_limit_pause=30.0,
+)
+
+
+@pytest.fixture
+def config(make_config):
+    return make_config(OutboundQueueConfig, QUEUE_CONFIG)
+
+
+class TestSplitMessage:
+
+    def test_short_text_is_one_message(self):
+        assert split_message("  Xin chào!  ") == ["Xin chào!"]
+        assert split_message("") == []
+
+    def test_splits_at_sentence_boundaries(self):
+        text = "Câu một dài. Câu hai cũng dài! Câu ba? Câu bốn."
+        parts = split_message(text, limit=20)
+        assert parts == ["Câu một dài.", "Câu hai cũng dài!", "Câu ba? Câu bốn."]
+        assert all(len(p) <= 20 for p in parts)
+
+    def test_keeps_paragraphs_and_cuts_unbreakable_words(self):
+        assert split_message("Một.\n\nHai.", limit=20) == ["Một.\n\nHai."]
+        parts = split_message("x" * 45, limit=20)
+        assert parts == ["x" * 20, "x" * 20, "x" * 5]
+
+
+class TestRedisTokenBucket:
+
+    def test_burst_then_rate(self):
+        clock = Clock(0.0)
+        bucket = RedisTokenBucket(FakeRedisQueue(clock), "page:bucket", rate=2, capacity=2)
+
+        async def run():
+            assert await bucket.try_take() == 0 and await bucket.try_take() == 0
+            assert await bucket.try_take() == 0.5
+            clock.now = 0.5
+            assert await bucket.try_take() == 0
+        asyncio.run(run())
+
+    def test_shared_by_workers_of_a_page(self):
+        clock = Clock(0.0)
+        redis_queue = FakeRedisQueue(clock)
+        first = RedisTokenBucket(redis_queue, "page:bucket", rate=2, capacity=2)
+        second = RedisTokenBucket(redis_queue, "page:bucket", rate=2, capacity=2)
+        other_page = RedisTokenBucket(redis_queue, "other:bucket", rate=2, capacity=2)
+
+        async def run():
+            assert await first.try_take(2) == 0
+            assert await second.try_take() == 0.5
+            assert await other_page.try_take() == 0
+        asyncio.run(run())
+
+    def test_pause_blocks_every_worker_until_expired(self):
+        clock = Clock(0.0)
+        redis_queue = FakeRedisQueue(clock)
+        bucket = RedisTokenBucket(redis_queue, "page:bucket", rate=10, capacity=5)
+        other_worker = RedisTokenBucket(redis_queue, "page:bucket", rate=10, capacity=5)
+
+        async def run():
+            await bucket.pause(30)
+            assert await other_worker.try_take() == 30
+            clock.now = 31
+            assert await other_worker.try_take() == 0
+        asyncio.run(run())
+
+
+class TestClassifyResponse:
+
+    def test_rate_limit_and_permanent_errors(self):
+        assert classify_response(200, {"message_id": "m"}).ok
+        limited = classify_response(400, {"error": {"code": 613, "message": "Calls exceeded"}})
+        assert limited.rate_limited and limited.retryable
+        assert classify_response(503, {}).retryable
+        permanent = classify_response(400, {"error": {"code": 551, "message": "unavailable"}})
+        assert not permanent.retryable and permanent.error.startswith("551")
+
+
+class TestOutboundQueue:
+
+    def test_parts_are_delivered_in_order_per_recipient(self, config):
+        sender = FakeSender()
+        clock = Clock()
+        config = replace(config, max_message_chars=20)
+        queue = OutboundQueue(FakeRedisQueue(clock), sender, config, page_id="page", clock=clock)
+
+        async def run():
+            assert await queue.enqueue("u1", "Câu một dài. Câu hai cũng dài!") == 2
+            await queue.enqueue("u2", "Chào")
+            while await queue.dispatch_once():
+                pass
+        asyncio.run(run())
+
+        assert [t for r, t in sender.sent if r == "u1"] == ["Câu một dài.", "Câu hai cũng dài!"]
+        assert ("u2", "Chào") in sender.sent
+        assert queue.redis.zsets[queue._key("ready")] == {}
+        assert queue.get_stats()["sent"] == 3 and queue.get_stats()["split_messages"] == 1
+
+    def test_rate_limit_reschedules_and_pauses_page(self, config):
+        clock = Clock()
+        sender = FakeSender([SendResult(ok=False, retryable=True, rate_limited=True, error="613: limit")])
+        queue = OutboundQueue(FakeRedisQueue(clock), sender, config, page_id="page", clock=clock)
+
+        async def run():
+            await queue.enqueue("u1", "Xin chào")
+            await queue.dispatch_once()
+            # Not ready until the page pause is over
+            assert await queue.dispatch_once() == 0
+        asyncio.run(run())
+
+        item = json.loads(queue.redis.lists[queue._key("q", "u1")][0])
+        assert item["attempts"] == 1 and item["last_error"] == "613: limit"
+        assert queue.redis.zsets[queue._key("ready")]["u1"] >= clock.now + 30
+        assert queue.redis.hashes[queue._key("bucket")]["paused_until"] == (clock.now + 30) * 1000
+        assert queue.get_stats()["rate_limited"] == 1
+
+    def test_permanent_failure_goes_to_dead_letters(self, config):
+        sender = FakeSender([SendResult(ok=False, retryable=False, error="551: unavailable")])
+        clock = Clock()
+        queue = OutboundQueue(FakeRedisQueue(clock), sender, config, page_id="page", clock=clock)
+
+        async def run():
+            await queue.enqueue("u1", "Xin chào")
+            await queue.dispatch_once()
+            return await queue.get_queue_info()
+        info = asyncio.run(run())
+
+        assert info == {"recipients_pending": 0, "dead_letters": 1}
+        assert queue.redis.lists[queue._key("q", "u1")] == []
+
+    def test_dead_letters_are_capped(self, config):
+        sender = FakeSender([SendResult(ok=False, retryable=False, error="551: unavailable")] * 3)
+        clock = Clock()
+        config = replace(config, dead_letter_max=2)
+        queue = OutboundQueue(FakeRedisQueue(clock), sender, config, page_id="page", clock=clock)
+
+        async def run():
+            for recipient in ("u1", "u2", "u3"):
+                await queue.enqueue(recipient, "Xin chào")
+            while await queue.dispatch_once():
+                pass
+        asyncio.run(run())
+
+        dead = [json.loads(item)["recipient"] for item in queue.redis.lists[queue._key("dead")]]
+        assert len(dead) == 2 and queue.get_stats()["dead_lettered"] == 3
+
+    def test_enqueue_error_reports_whether_the_reply_was_queued(self, config):
+        clock = Clock()
+        config = replace(config, max_message_chars=20)
+        queue = OutboundQueue(FakeRedisQueue(clock), FakeSender(), config, page_id="page", clock=clock)
+        queue.redis.fail_scripts_after_run = True
+
+        async def run():
+            with pytest.raises(OutboxEnqueueError) as queued:
+                await queue.enqueue("u1", "Câu một dài. Câu hai cũng dài!")
+            queue.redis.register_script = lambda source: _raise_connection_error
+            queue._enqueue_script = None
+            with pytest.raises(OutboxEnqueueError) as not_queued:
+                await queue.enqueue("u2", "Chào")
+            return queued.value, not_queued.value
+        queued, not_queued = asyncio.run(run())
+
+        assert queued.enqueued == 2 and len(queue.redis.lists[queue._key("q", "u1")]) == 2
+        assert not_queued.enqueued == 0 and queue._key("q", "u2") not in queue.redis.lists
+
+    def test_batch_sends_one_head_part_per_recipient(self, config):
+        sender = FakeSender()
+        clock = Clock()
+        config = replace(config, batch_size=10, max_message_chars=20)
+        queue = OutboundQueue(FakeRedisQueue(clock), sender, config, page_id="page", clock=clock)
+
+        async def run():
+            await queue.enqueue("u1", "Câu một dài. Câu hai cũng dài!")
+            await queue.enqueue("u2", "Chào")
+            await queue.dispatch_once()
+        asyncio.run(run())
+
+        assert sender.batches == [["u1", "u2"]]
+        assert len(queue.redis.lists[queue._key("q", "u1")]) == 1
@@ -0,0 +1,387 @@
+import asyncio
+import json
+from dataclasses import replace
+
+import pytest
+
+from src.services.redis_message_queue import (
+    AGGREGATE_SCRIPT,
+    CLAIM_SCRIPT,
+    LEASE_ACQUIRE_SCRIPT,
+    LEASE_RELEASE_SCRIPT,
+    LEASE_RENEW_SCRIPT,
+    MessageProcessingConfig,
+    RedisConfig,
+    RedisMessageAggregator,
+    RedisMessageQueue,
+    SmartMessageAggregator,
+    UserLease,
+    create_message_aggregator,
+)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def xack(self, *args):
+        self.commands.append(("xack", args, {}))
+
+    def xreadgroup(self, *args, **kwargs):
+        self.commands.append(("xreadgroup", args, kwargs))
+
+    async def execute(self):
+        self.redis.pipelines.append([name for name, _, _ in self.commands])
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeStreamRedis:
+    """Returns one prepared batch per XREADGROUP and records acks."""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.acks = []
+        self.reads = []
+        self.pipelines = []
+        self.xclaims = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        self.reads.append(block)
+        batch = self.batches.pop(0) if self.batches else []
+        return [["messenger:events", batch]] if batch else []
+
+    async def xack(self, stream, group, *ids):
+        self.acks.append(list(ids))
+        return len(ids)
+
+    async def xclaim(self, stream, group, consumer, min_idle_time, message_ids, justid=False):
+        self.xclaims.append((consumer, min_idle_time, list(message_ids), justid))
+        return list(message_ids)
+
+    async def xautoclaim(self, stream, group, consumer, min_idle_time, start_id="0-0", count=None):
+        # Two pages; the second holds an entry trimmed from the stream
+        if start_id == "0-0":
+            return ["5-0", [("1-0", {"user_id": "a"})], []]
+        return ["0-0", [("5-0", None), ("6-0", {"user_id": "b"})], []]
+
+
+class FakeAggregatorRedis:
+    """Runs the aggregator's Lua scripts as Python equivalents (no Lua interpreter here)."""
+
+    def __init__(self):
+        self.lists = {}
+        self.hashes = {}
+        self.zsets = {}
+        self.stream = []
+
+    def register_script(self, source):
+        fn = {AGGREGATE_SCRIPT: self._aggregate, CLAIM_SCRIPT: self._claim}[source]
+
+        async def script(keys, args):
+            return fn(keys, [str(a) for a in args])
+        return script
+
+    def _aggregate(self, keys, argv):
+        parts_key, meta_key, deadlines = keys
+        part, now, has_text, has_attachments, window, member, _ttl = argv
+        self.lists.setdefault(parts_key, []).append(part)
+        meta = self.hashes.setdefault(meta_key, {})
+        meta.setdefault("created_at", now)
+        if has_text == "1":
+            meta["has_text"] = "1"
+        if has_attachments == "1":
+            meta["has_attachments"] = "1"
+        window = float(window)
+        if meta.get("has_text") == "1" and meta.get("has_attachments") == "1":
+            window *= 2
+        self.zsets.setdefault(deadlines, {})[member] = float(now) + window
+        return [len(self.lists[parts_key]), meta["created_at"], str(window)]
+
+    def _claim(self, keys, argv):
+        now, limit, prefix = float(argv[0]), int(argv[1]), argv[2]
+        zset = self.zsets.setdefault(keys[0], {})
+        due = sorted((score, m) for m, score in zset.items() if score <= now)[:limit]
+        claimed = []
+        for _, member in due:
+            del zset[member]
+            parts = self.lists.pop(f"{prefix}:parts:{member}", [])
+            meta = self.hashes.pop(f"{prefix}:meta:{member}", {})
+            claimed.append([member, meta.get("created_at", ""), parts])
+        return claimed
+
+    async def xadd(self, stream, fields):
+        self.stream.append(fields)
+        return f"{len(self.stream)}-0"
+
+    async def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+
+class FakeLeaseRedis:
+    """Runs the user-lease Lua scripts as Python equivalents."""
+
+    def __init__(self):
+        self.now_ms = 0
+        self.strings = {}  # key -> (value, expires_at_ms)
+        self.zsets = {}
+        self.hashes = {}
+
+    def register_script(self, source):
+        fn = {
+            LEASE_ACQUIRE_SCRIPT: self._acquire,
+            LEASE_RENEW_SCRIPT: self._renew,
+            LEASE_RELEASE_SCRIPT: self._release,
+        }[source]
+
+        async def script(keys, args):
+            return fn(keys, [str(a) for a in args])
+        return script
+
+    def _get(self, key):
+        value, expires_at = self.strings.get(key, (None, 0))
+        return value if expires_at > self.now_ms else None
+
+    def _acquire(self, keys, argv):
+        lease, waiters, deadlines = keys
+        owner, member, score, lease_ms, ttl = argv[0], argv[1], float(argv[2]), int(argv[3]), int(argv[4])
+        zset = self.zsets.setdefault(waiters, {})
+        zset.setdefault(member, score)
+        self.hashes.setdefault(deadlines, {})[member] = self.now_ms + ttl
+        while True:
+            head = min(zset, key=lambda m: (zset[m], m))
+            if head == member:
+                break
+            if self.hashes[deadlines].get(head, 0) >= self.now_ms:
+                return 0
+            del zset[head]
+            self.hashes[deadlines].pop(head, None)
+        if self._get(lease) is not None:
+            return 0
+        self.strings[lease] = (owner, self.now_ms + lease_ms)
+        del zset[member]
+        self.hashes[deadlines].pop(member, None)
+        return 1
+
+    def _renew(self, keys, argv):
+        if self._get(keys[0]) != argv[0]:
+            return 0
+        self.strings[keys[0]] = (argv[0], self.now_ms + int(argv[1]))
+        return 1
+
+    def _release(self, keys, argv):
+        if self._get(keys[0]) != argv[0]:
+            return 0
+        del self.strings[keys[0]]
+        return 1
+
+
+@pytest.fixture
+def config(make_config):
+    return make_config(RedisConfig, dict(block_ms=5000, ack_batch_size=50))
+
+
+def _connected(config, redis):
+    queue = RedisMessageQueue(config)
+    queue.redis = redis
+    queue._initialized = True
+    return queue
+
+
+class TestRedisMessageQueue:
+
+    def test_acks_are_batched_and_pipelined_with_next_read(self, config):
+        redis = FakeStreamRedis([
+            [("1-0", {"user_id": "a"}), ("2-0", {"user_id": "b"})],
+            [("3-0", {"user_id": "a"})],
+        ])
+        queue = _connected(config, redis)
+
+        async def run():
+            seen = []
+            events = queue.consume_events()
+            async for msg_id, _ in events:
+                seen.append(msg_id)
+                await queue.acknowledge_message(msg_id)
+                if len(seen) == 3:
+                    break
+            await events.aclose()
+            return seen
+        seen = asyncio.run(run())
+
+        assert seen == ["1-0", "2-0", "3-0"]
+        # Both acks of the first batch ride in one XACK with the second read
+        assert redis.pipelines == [["xack", "xreadgroup"]]
+        assert redis.acks == [["1-0", "2-0"], ["3-0"]]
+        assert redis.reads == [5000, 5000]
+        assert queue.get_stats()["acks"] == 3 and queue.get_stats()["pending_acks"] == 0
+
+    def test_claim_stale_pages_through_xautoclaim(self, config):
+        queue = _connected(config, FakeStreamRedis([]))
+        claimed = asyncio.run(queue.claim_stale("worker-b"))
+        assert claimed == [("1-0", {"user_id": "a"}), ("6-0", {"user_id": "b"})]
+        assert queue.get_stats()["claimed"] == 2
+
+    def test_ack_outside_consumer_is_sent_immediately(self, config):
+        redis = FakeStreamRedis([])
+        queue = _connected(config, redis)
+        asyncio.run(queue.acknowledge_message("9-0"))
+        assert redis.acks == [["9-0"]] and redis.pipelines == []
+
+    def test_refresh_pending_reclaims_local_entries_to_self(self, config):
+        redis = FakeStreamRedis([])
+        queue = _connected(replace(config, consumer_name="worker-a"), redis)
+        assert asyncio.run(queue.refresh_pending(["1-0", "2-0", "3-0"], chunk=2)) == 3
+        assert asyncio.run(queue.refresh_pending([])) == 0
+        # Idle time reset without moving the entries or bumping delivery counts
+        assert redis.xclaims == [("worker-a", 0, ["1-0", "2-0"], True), ("worker-a", 0, ["3-0"], True)]
+        assert queue.get_stats()["refreshed"] == 3
+
+
+class TestUserLease:
+
+    def _leases(self, config):
+        redis = FakeLeaseRedis()
+        config = replace(config, user_lease_ms=30000, user_lease_poll=0.001)
+        leases = [
+            UserLease(_connected(replace(config, consumer_name=name), redis))
+            for name in ("worker-a", "worker-b")
+        ]
+        return redis, leases
+
+    def test_events_of_one_user_run_in_stream_order_across_workers(self, config):
+        redis, (worker_a, worker_b) = self._leases(config)
+        log = []
+
+        async def event(lease, msg_id, delay=0.0):
+            async with lease.hold("psid-1", msg_id):
+                log.append(("start", msg_id))
+                await asyncio.sleep(delay)
+                log.append(("end", msg_id))
+
+        async def run():
+            first = asyncio.create_task(event(worker_a, "100-0", delay=0.02))
+            await asyncio.sleep(0.005)
+            # Worker A's later event registers before worker B's earlier one
+            third = asyncio.create_task(event(worker_a, "300-0"))
+            await asyncio.sleep(0.002)
+            second = asyncio.create_task(event(worker_b, "200-0", delay=0.01))
+            await asyncio.gather(first, second, third)
+        asyncio.run(run())
+
+        assert log == [
+            ("start", "100-0"), ("end", "100-0"),
+            ("start", "200-0"), ("end", "200-0"),
+            ("start", "300-0"), ("end", "300-0"),
+        ]
+        assert redis.strings == {}
+        assert worker_a.get_stats()["acquired"] == 2 and worker_b.get_stats()["waits"] == 1
+
+    def test_dead_waiter_and_expired_lease_do_not_block(self, config):
+        redis, (worker_a, worker_b) = self._leases(config)
+
+        async def run():
+            # Worker A takes the lease and dies; an older waiter registered and died too
+            await worker_a.acquire("psid-1", "100-0")
+            redis.zsets["messenger:user-lease:psid-1:waiters"] = {"50-0000000000": 50}
+            redis.hashes["messenger:user-lease:psid-1:deadlines"] = {"50-0000000000": 10}
+            redis.now_ms = 31000
+            async with worker_b.hold("psid-1", "200-0"):
+                return redis._get("messenger:user-lease:psid-1")
+        assert asyncio.run(run()) == "worker-b:200-0"
+
+    def test_redis_failure_processes_without_lease(self, config):
+        class BrokenRedis:
+            def register_script(self, source):
+                async def script(keys, args):
+                    raise ConnectionError("redis down")
+                return script
+
+        lease = UserLease(_connected(config, BrokenRedis()))
+
+        async def run():
+            async with lease.hold("psid-1", "100-0"):
+                return True
+        assert asyncio.run(run()) is True
+        assert lease.get_stats()["errors"] == 1
+
+
+@pytest.fixture
+def processing_config(make_config):
+    return make_config(MessageProcessingConfig, dict(inactivity_window=5.0, aggregator_prefix="agg"))
+
+
+class TestRedisMessageAggregator:
+
+    def test_parts_merge_into_one_event_after_deadline(self, config, processing_config):
+        redis = FakeAggregatorRedis()
+        aggregator = RedisMessageAggregator(_connected(config, redis), processing_config)
+
+        async def run():
+            await aggregator.aggregate_message("u1", "t1", "text", {"text": "xem ảnh này"})
+            await aggregator.aggregate_message("u1", "t1", "attachment", {"attachments": [{"type": "image"}]})
+            # text + attachment doubles the inactivity window
+            deadline = redis.zsets["agg:deadlines"]["u1:t1"]
+            assert await aggregator.finalize_due() == 0
+            redis.zsets["agg:deadlines"]["u1:t1"] = deadline - 10
+            return deadline, await aggregator.finalize_due(), await aggregator.get_pending_info()
+        deadline, finalized, pending = asyncio.run(run())
+
+        assert finalized == 1 and pending == {"pending_batches": 0}
+        assert len(redis.stream) == 1
+        event = redis.stream[0]
+        assert event["event_type"] == "process_complete_message"
+        data = json.loads(event["data"])
+        assert data["user_id"] == "u1" and data["thread_id"] == "t1"
+        assert data["text"] == "xem ảnh này" and data["attachments"] == [{"type": "image"}]
+        created_at = data["created_at"]
+        assert abs(deadline - created_at - 10.0) < 1.0
+        assert redis.lists == {} and redis.hashes == {}
+
+    def test_falls_back_to_memory_timer_when_redis_fails(self, config, processing_config):
+        class BrokenRedis:
+            def register_script(self, source):
+                async def script(keys, args):
+                    raise ConnectionError("redis down")
+                return script
+
+        aggregator = RedisMessageAggregator(_connected(config, BrokenRedis()), processing_config)
+
+        async def run():
+            _, ready = await aggregator.aggregate_message("u1", "t1", "text", {"text": "chào"})
+            pending = dict(aggregator.pending_contexts)
+            for ctx in pending.values():
+                ctx["timer"].cancel()
+            return ready, pending
+        ready, pending = asyncio.run(run())
+
+        assert ready is False and "u1:t1" in pending
+        assert aggregator.get_metrics()["memory_fallbacks"] == 1
+
+    def test_aggregator_backend_comes_from_the_environment_at_construction(self, config, monkeypatch):
+        monkeypatch.setenv("AGGREGATOR_BACKEND", "memory")
+        aggregator = create_message_aggregator(_connected(config, FakeAggregatorRedis()))
+        assert type(aggregator) is SmartMessageAggregator
+
+
+class TestRedisConfig:
+
+    def test_consumer_name_defaults_to_creating_process(self, make_config, monkeypatch):
+        monkeypatch.setattr("src.services.redis_message_queue.os.getpid", lambda: 4242)
+        assert make_config(RedisConfig).consumer_name.endswith("-4242")
+        assert make_config(RedisConfig, consumer_name="worker-a").consumer_name == "worker-a"
+
+    def test_read_settings_come_from_the_environment_at_construction(self, monkeypatch):
+        monkeypatch.setenv("REDIS_BLOCK_MS", "250")
+        monkeypatch.setenv("REDIS_ACK_BATCH_SIZE", "5")
+        config = RedisConfig()
+        assert config.block_ms == 250 and config.ack_batch_size == 5
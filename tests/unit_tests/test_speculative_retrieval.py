@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+from src.utils.speculative_retrieval import (
+    SpeculativeRetrievalConfig,
+    SpeculativeRetriever,
+    is_enabled_for_domain,
+)
+
+
+@pytest.fixture
+def speculative(make_config):
+    config = make_config(SpeculativeRetrievalConfig, dict(enabled=True, max_workers=2, wait_timeout=5.0))
+    return SpeculativeRetriever(config)
+
+
+class TestSpeculativeRetriever:
+
+    def test_hit_returns_result_and_counts_saved_time(self, speculative):
+        speculation = speculative.start(lambda: time.sleep(0.05) or {"documents": ["a"]})
+        time.sleep(0.06)
+        assert speculative.take(speculation) == {"documents": ["a"]}
+        stats = speculative.get_stats()
+        assert stats["hits"] == 1 and stats["hit_rate"] == 1.0
+        assert stats["saved_seconds"] > 0
+
+    def test_discard_counts_wasted_work(self, speculative):
+        release = threading.Event()
+        speculation = speculative.start(lambda: release.wait(1) and None)
+        time.sleep(0.02)
+        speculative.discard(speculation)
+        release.set()
+        speculation.future.result(timeout=1)
+        time.sleep(0.01)
+        stats = speculative.get_stats()
+        assert stats["discarded"] == 1 and stats["hit_rate"] == 0.0
+        assert stats["wasted_seconds"] > 0
+
+    def test_failure_falls_back_to_none(self, speculative):
+        def boom():
+            raise RuntimeError("qdrant down")
+
+        assert speculative.take(speculative.start(boom)) is None
+        assert speculative.get_stats()["failed"] == 1
+
+    def test_disabled_never_starts(self, speculative):
+        speculative = SpeculativeRetriever(speculative.config, enabled=False)
+        assert speculative.start(lambda: 1) is None
+        assert speculative.take(None) is None
+        speculative.discard(None)
+        assert speculative.get_stats()["started"] == 0
+
+    def test_domain_switch(self):
+        assert is_enabled_for_domain({"speculative_retrieval": True})
+        assert not is_enabled_for_domain({})
+
+    def test_async_hit_and_discard(self, speculative):
+        import asyncio
+
+        async def retrieve(docs):
+            await asyncio.sleep(0.01)
+            return {"documents": docs}
+
+        async def scenario():
+            hit = speculative.astart(retrieve, ["a"])
+            assert await speculative.atake(hit) == {"documents": ["a"]}
+            miss = speculative.astart(retrieve, ["b"])
+            speculative.discard(miss)
+            await asyncio.sleep(0)
+            assert miss.future.cancelled()
+
+        asyncio.run(scenario())
+        stats = speculative.get_stats()
+        assert stats["hits"] == 1 and stats["discarded"] == 1 and stats["cancelled"] == 1
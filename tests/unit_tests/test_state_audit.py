@@ -0,0 +1,81 @@
+import asyncio
+from dataclasses import replace
+from typing import Annotated, List, TypedDict
+
+import pytest
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
+
+from src.graphs.core.assistants.base_assistant import BaseAssistant
+from src.utils.state_audit import StateAuditConfig, StateUpdateAudit, changed_channels
+
+
+def append(left, right):
+    return (left or []) + right
+
+
+class AuditState(TypedDict):
+    steps: Annotated[List[str], append]
+    question: str
+    documents: list
+
+
+@pytest.fixture
+def audit(make_config):
+    config = make_config(StateAuditConfig, dict(enabled=True, log_unchanged=False))
+    return StateUpdateAudit(AuditState, config=config)
+
+
+class TestStateAudit:
+
+    def test_changed_channels_keeps_only_new_values(self):
+        state = {"question": "q", "documents": [], "rewrite_count": 0}
+        updates = {"question": "q", "documents": [], "rewrite_count": 1, "datasource": ""}
+        assert changed_channels(state, updates) == {"rewrite_count": 1, "datasource": ""}
+
+    def test_changed_channels_keeps_reducer_channel_writes(self):
+        state = {"steps": ["reset"], "question": "q"}
+        updates = {"steps": ["reset"], "question": "q"}
+        assert changed_channels(state, updates, reducer_channels={"steps"}) == {"steps": ["reset"]}
+
+    def test_flags_unchanged_writes_and_measures_updates(self, audit):
+        state = {"steps": ["a"], "question": "q", "documents": []}
+
+        node = audit.wrap(lambda s, config=None: {**s, "question": "new"}, name="echo")
+        assert node(state) == {"steps": ["a"], "question": "new", "documents": []}
+
+        stats = audit.get_stats()["nodes"]["echo"]
+        # The reducer appends, so echoing steps is a change (duplication), not a no-op
+        assert stats["unchanged_channels"] == {"documents": 1}
+        assert stats["calls"] == 1 and stats["writes"] == 3 and stats["unchanged_writes"] == 1
+        assert stats["update_bytes"] > 0 and stats["reducer_ms"] >= 0
+
+    def test_async_wrapper_and_disabled_passthrough(self, audit):
+        async def anode(state, config=None):
+            return {"question": state["question"]}
+
+        assert asyncio.run(audit.awrap(anode)({"question": "q"})) == {"question": "q"}
+        assert audit.get_stats()["nodes"]["anode"]["unchanged_channels"] == {"question": 1}
+
+        def node(state, config=None):
+            return {}
+
+        disabled = StateUpdateAudit(AuditState, config=replace(audit.config, enabled=False))
+        assert disabled.wrap(node) is node
+
+
+class TestPromptBinding:
+
+    def test_only_template_variables_copied_into_prompt(self):
+        prompt = ChatPromptTemplate.from_messages(
+            [("system", "{user_info} {domain_context}"), MessagesPlaceholder("messages")]
+        ).partial(domain_context="d")
+        assistant = BaseAssistant(prompt | RunnableLambda(lambda value: value))
+        bound = assistant.binding_prompt({"messages": ["hi"], "documents": [1, 2], "question": "q", "user": {}})
+        assert "documents" not in bound and "question" not in bound
+        assert bound["messages"] == ["hi"] and "user_info" in bound
+
+    def test_unknown_runnable_gets_full_state(self):
+        assistant = BaseAssistant(RunnableLambda(lambda value: value))
+        assert assistant.binding_prompt({"messages": ["hi"], "question": "q"})["question"] == "q"
@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+import src.repositories.checkpoints as checkpoints
+from src.database.data_access import DataAccessConfig, Database
+from src.repositories.checkpoints import build_history_stream_query, iter_thread_history
+
+
+class FakeServerCursor:
+    def __init__(self, conn, name):
+        self.conn = conn
+        self.name = name
+        self.itersize = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.conn.executed.append((self.name, sql, params))
+
+    def __iter__(self):
+        for row in self.conn.rows:
+            self.conn.fetched += 1
+            yield row
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+        self.fetched = 0
+        self.cursors = []
+
+    def cursor(self, name=None):
+        cursor = FakeServerCursor(self, name)
+        self.cursors.append(cursor)
+        return cursor
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextmanager
+    def connection(self):
+        yield self.conn
+
+    def get_stats(self):
+        return {}
+
+
+def _row(checkpoint_id, task_id=None, **extra):
+    row = {
+        "thread_id": "t1",
+        "checkpoint_ns": "",
+        "checkpoint_id": checkpoint_id,
+        "parent_checkpoint_id": None,
+        "checkpoint": {"channel_values": {"dialog_state": ["assistant"]}},
+        "metadata": {"step": 1},
+        "created_at": None,
+        "task_id": task_id,
+        "idx": 0,
+        "channel": "messages" if task_id else None,
+        "task_path": "",
+    }
+    row.update(extra)
+    return row
+
+
+class TestThreadHistoryStream:
+
+    def test_stream_uses_named_cursor_lazily(self):
+        conn = FakeConnection([{"n": 1}, {"n": 2}, {"n": 3}])
+        db = Database(DataAccessConfig(db_uri="postgresql://test", slow_query_ms=10_000), pool=FakePool(conn))
+        rows = db.stream("SELECT n FROM t WHERE a = :a", {"a": 1}, batch_size=2)
+        assert next(rows) == {"n": 1} and conn.fetched == 1
+        assert list(rows) == [{"n": 2}, {"n": 3}]
+        name, sql, params = conn.executed[0]
+        assert name.startswith("stream_") and sql.endswith("a = %(a)s") and params == {"a": 1}
+        assert conn.cursors[0].itersize == 2
+        assert db.get_stats()["queries"] == 1
+
+    def test_query_is_keyset_and_selects_no_write_blobs(self):
+        query, params = build_history_stream_query("t1", before_checkpoint_id="c5", limit=10)
+        assert "c.checkpoint_id < :before_checkpoint_id" in query and "LIMIT :limit" in query
+        assert "OFFSET" not in query and "w.blob" not in query and "checkpoint_blobs" not in query
+        assert params == {"thread_id": "t1", "checkpoint_ns": "", "before_checkpoint_id": "c5", "limit": 10}
+
+        query, params = build_history_stream_query("t1", channels=["messages"])
+        assert "b.channel = ANY(:channels)" in query and "AS blob_blobs" in query
+        assert params["channels"] == ["messages"]
+
+    def test_groups_tasks_and_decodes_requested_channels(self, monkeypatch):
+        serde = JsonPlusSerializer()
+        blob = serde.dumps_typed(["hello"])
+        rows = [
+            _row("c2", "task-a", blob_channels=["messages"], blob_types=[blob[0]], blob_blobs=[blob[1]]),
+            _row("c2", "task-b", blob_channels=["messages"], blob_types=[blob[0]], blob_blobs=[blob[1]]),
+            _row("c1", blob_channels=["messages"], blob_types=["empty"], blob_blobs=[None]),
+        ]
+        captured = {}
+
+        class FakeDatabase:
+            def stream(self, sql, params, batch_size):
+                captured.update(params=params, batch_size=batch_size)
+                return iter(rows)
+
+        monkeypatch.setattr(checkpoints, "get_database", lambda: FakeDatabase())
+        items = list(iter_thread_history("t1", channels=["messages"], batch_size=25, serde=serde))
+
+        assert [i["checkpoint"]["checkpoint_id"] for i in items] == ["c2", "c1"]
+        assert [t["id"] for t in items[0]["tasks"]] == ["task-a", "task-b"] and items[1]["tasks"] == []
+        assert items[0]["values"] == [{"dialog_state": ["assistant"], "messages": ["hello"]}]
+        assert items[1]["values"] == [{"dialog_state": ["assistant"]}]
+        assert captured["batch_size"] == 25 and captured["params"]["channels"] == ["messages"]
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from src.repositories.checkpoints import (
+    build_thread_search_query,
+    decode_thread_cursor,
+    encode_thread_cursor,
+)
+
+
+class TestThreadSearchQuery:
+
+    def test_first_page_reads_thread_latest_with_limit_plus_one(self):
+        query, params = build_thread_search_query(limit=20, sort_by="updated_at", sort_order="desc")
+        assert "FROM thread_latest" in query and "DISTINCT ON" not in query
+        assert "ORDER BY updated_at DESC, thread_id DESC" in query
+        assert "OFFSET" not in query
+        assert params == {"checkpoint_ns": "", "limit": 21}
+
+    def test_cursor_adds_keyset_condition(self):
+        ts = datetime(2026, 10, 1, 8, 30, tzinfo=timezone.utc)
+        cursor = encode_thread_cursor(ts, "thread-9")
+        assert decode_thread_cursor(cursor) == (ts.isoformat(), "thread-9")
+
+        query, params = build_thread_search_query(cursor=cursor, sort_by="created_at", sort_order="asc", offset=40)
+        assert "(created_at, thread_id) > (CAST(:after_value AS timestamptz), :after_thread_id)" in query
+        assert params["after_value"] == ts.isoformat() and params["after_thread_id"] == "thread-9"
+        assert "OFFSET" not in query  # cursor wins over legacy offset
+
+    def test_filters_are_parameterised(self):
+        query, params = build_thread_search_query(
+            metadata_filter={"assistant_id": "agent", "skip": None},
+            values_filter={"dialog_state'; DROP TABLE x; --": ["booking"]},
+        )
+        assert "metadata @> CAST(:metadata_filter AS jsonb)" in query
+        assert params["metadata_filter"] == '{"assistant_id": "agent"}'
+        assert "DROP TABLE" not in query and params["values_key_0"].startswith("dialog_state")
+
+    def test_invalid_cursor(self):
+        with pytest.raises(ValueError):
+            build_thread_search_query(cursor="not-a-cursor")
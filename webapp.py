@@ -7,9 +7,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
 from src.api.user import router as user_router
 from src.api.admin import router as admin_router
-from src.api.facebook import router as fb_router
-from src.database.checkpointer import get_checkpointer_ctx
+from src.api.facebook import router as fb_router, get_fb_service
+from src.database.checkpointer import close_checkpointer, get_checkpointer_ctx
 from src.graphs.main_graph import create_main_graph
+from src.utils.fast_router import get_fast_router
 # Unified single marketing graph architecture; travel graph count no longer relevant.
 
 AGENTS_DESCRIPTION_PATH = os.path.join(
@@ -27,7 +28,19 @@ async def lifespan(app: FastAPI):
     with get_checkpointer_ctx() as checkpointer:
         app.state.checkpointer = checkpointer
         app.state.graph = create_main_graph(checkpointer)
-        yield
+        # Embed the fast router's route examples before the first request
+        fast_router = get_fast_router()
+        if fast_router is not None:
+            await fast_router.awarm()
+        # Pooled Graph API connections live as long as the app
+        fb_service = get_fb_service()
+        await fb_service.start()
+        try:
+            yield
+        finally:
+            await fb_service.aclose()
+            # Write-back checkpoints still queued are flushed before the pools close
+            await close_checkpointer()
 
 app = FastAPI(lifespan=lifespan)
 